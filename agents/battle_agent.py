@@ -1,9 +1,10 @@
 from openai import Assistant, Tool
-from battle.battle_state import BattleState
+from battle.dict_codec import decode_battle_dict
 from battle.decision_engine import recommend_move
 
 def select_move_tool(state: dict) -> str:
-    battle_state = BattleState(**state)
+    """Recommend a move for a battle given as a battle spec dict (see agents.tool_server)"""
+    battle_state = decode_battle_dict(state)
     return recommend_move(battle_state)
 
 tool = Tool.from_function(select_move_tool)
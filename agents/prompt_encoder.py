@@ -0,0 +1,300 @@
+"""
+Compact, token-budgeted battle state text for LLM prompts.
+
+The encoder renders a BattleState as a few short sections instead of the
+verbose battle report or summary dict. Sections are ordered from least to
+most volatile, so the text of one turn starts with the same bytes as the
+text of the turn before (good for prompt caching):
+
+    header      legend for the notation below                   (always kept)
+    team        our Pokemon, levels, speed and moves            (always kept)
+    opponents   revealed opponent Pokemon and the moves they used
+    usage       likely unrevealed moves and items of the opponent active
+    state       turn, field, HP and status of every Pokemon     (always kept)
+    recent      moves of the last few turns
+    prediction  the opponent's likely next moves
+    actions     ranked moves and switches
+
+The encoder subscribes to the state. Each kind of change re-renders only
+the sections that read it (SECTION_INPUTS); the others keep their cached
+text and token count, and the text shared with the previous prompt is
+reused rather than rebuilt. When the prompt exceeds the token budget,
+sections are dropped in order of VALUE, lowest first. Output is
+deterministic: no set iteration, fixed number formats.
+
+Tokens are estimated with estimate_tokens; pass count_tokens to use a
+real tokenizer instead.
+"""
+import re
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from battle.battle_state import (
+    BattleState, CHANGES, CHANGE_TURN, CHANGE_MOVE, CHANGE_DAMAGE, CHANGE_HP, CHANGE_STATUS, CHANGE_SWITCH,
+    CHANGE_FIELD, SIDE_CODES
+)
+from battle.battle_utils import BattleStateAnalyzer
+from battle.field_state import WeatherType
+from pokemon import Move
+
+# Sections in prompt order, with the kinds of state change each one reads
+SECTION_INPUTS = {
+    "header": set(),
+    "team": {CHANGE_SWITCH},
+    "opponents": {CHANGE_MOVE, CHANGE_SWITCH},
+    "usage": {CHANGE_MOVE, CHANGE_SWITCH},
+    "state": {CHANGE_TURN, CHANGE_DAMAGE, CHANGE_HP, CHANGE_STATUS, CHANGE_SWITCH, CHANGE_FIELD},
+    "recent": {CHANGE_TURN, CHANGE_MOVE},
+    "prediction": {CHANGE_MOVE, CHANGE_SWITCH},
+    "actions": set(CHANGES),
+}
+SECTIONS = tuple(SECTION_INPUTS)
+# What a droppable section is worth to the model; the cheapest go first when over budget
+VALUE = {"usage": 1, "recent": 2, "prediction": 3, "opponents": 4, "actions": 5}
+REQUIRED = tuple(section for section in SECTIONS if section not in VALUE)
+_SECTIONS_BY_CHANGE = {change: tuple(section for section, inputs in SECTION_INPUTS.items() if change in inputs)
+                       for change in CHANGES}
+
+DEFAULT_BUDGET = 400
+# Turns of move history in the recent section
+RECENT_TURNS = 3
+# Entries in the usage, prediction and actions sections
+TOP_ENTRIES = 3
+
+_CATEGORIES = {"physical": "phys", "special": "spec", "status": "stat"}
+_STATUS_ABBREVIATIONS = {"paralyzed": "par", "burned": "brn", "frozen": "frz", "poisoned": "psn",
+                         "badly_poisoned": "tox", "asleep": "slp"}
+_TOKEN_PIECES = re.compile(r"[A-Za-z]+|\d+|\S")
+
+HEADER = "POKEMON BATTLE. move[type,cat,power,acc]; *active; ally hp cur/max, opp hp %; higher score is better"
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of text for a BPE tokenizer (about 4 letters or 3 digits a token)"""
+    tokens = 0
+    for piece in _TOKEN_PIECES.findall(text):
+        if piece[0].isalpha():
+            tokens += (len(piece) + 3) // 4
+        elif piece[0].isdigit():
+            tokens += (len(piece) + 2) // 3
+        else:
+            tokens += 1
+    return tokens
+
+
+@dataclass
+class EncodedPrompt:
+    """A rendered battle prompt"""
+    text: str
+    tokens: int
+    sections: Tuple[str, ...]        # Sections kept, in prompt order
+    dropped: Tuple[str, ...]         # Sections dropped to meet the budget, first dropped first
+    stable_chars: int                # Length of the prefix shared with the previous prompt
+    rendered: Tuple[str, ...] = ()   # Sections re-rendered for this prompt
+
+
+def _format_move(move: Move) -> str:
+    power = "-" if move.power is None else move.power
+    accuracy = "-" if move.accuracy is None else move.accuracy
+    return f"{move.name}[{move.type},{_CATEGORIES.get(move.damage_class, move.damage_class)},{power},{accuracy}]"
+
+
+def _format_status(status: Optional[str]) -> str:
+    return "" if status is None else " " + _STATUS_ABBREVIATIONS.get(status, status)
+
+
+def _revealed_moves(state: BattleState) -> Dict[int, List[str]]:
+    """Moves each opponent team slot has used, in first-use order"""
+    log = state.event_log
+    side = SIDE_CODES["opponent"]
+    revealed: Dict[int, Dict[str, None]] = {}
+    for stint in log.stints_by_side[side]:
+        slot = log.stint_roster[stint]
+        moves = revealed.setdefault(slot, {})
+        start = log.stint_first_move[stint]
+        for position in range(start, start + log.stint_move_count[stint]):
+            moves[log.names[log.arg0[log.move_events[side][position]]]] = None
+    return {slot: list(moves) for slot, moves in revealed.items()}
+
+
+class PromptEncoder:
+    """Renders a battle as compact prompt text, re-rendering only the sections a change touches"""
+
+    def __init__(self, battle_state: BattleState, budget: int = DEFAULT_BUDGET,
+                 analyzer: Optional[BattleStateAnalyzer] = None,
+                 count_tokens: Callable[[str], int] = estimate_tokens):
+        """
+        Args:
+            battle_state: Battle to encode; the encoder subscribes to it until detach()
+            budget: Token budget of the prompt (required sections are kept even beyond it)
+            analyzer: Incremental analyzer of this battle to share (one is attached if not given)
+            count_tokens: Token counter, e.g. the length of a tokenizer's encoding
+        """
+        if analyzer is not None and analyzer.battle_state is not battle_state:
+            raise ValueError("The analyzer is attached to a different battle")
+        self.battle_state = battle_state
+        self.budget = budget
+        self.count_tokens = count_tokens
+        self._owns_analyzer = analyzer is None
+        self.analyzer = analyzer or BattleStateAnalyzer.attach(battle_state)
+        # Section name -> (text, tokens), dropped when one of its inputs changes
+        self._cache: Dict[str, Tuple[str, int]] = {}
+        # The previous prompt: its sections, their end offsets and its text
+        self._parts: List[Tuple[str, str]] = []
+        self._offsets: List[int] = []
+        self._text = ""
+        battle_state.subscribe(self._invalidate)
+
+    def detach(self):
+        """Stop following the state (and detach the analyzer if the encoder made it)"""
+        self.battle_state.unsubscribe(self._invalidate)
+        if self._owns_analyzer:
+            self.analyzer.detach()
+        self._cache.clear()
+
+    def _invalidate(self, state: BattleState, change: str):
+        cache = self._cache
+        for section in _SECTIONS_BY_CHANGE[change]:
+            cache.pop(section, None)
+
+    def section(self, name: str) -> str:
+        """The text of one section (empty if it has nothing to say)"""
+        return self._section(name, [])[0]
+
+    def _section(self, name: str, rendered: List[str]) -> Tuple[str, int]:
+        entry = self._cache.get(name)
+        if entry is None:
+            text = "\n".join(getattr(self, f"_render_{name}")())
+            entry = self._cache[name] = (text, self.count_tokens(text + "\n") if text else 0)
+            rendered.append(name)
+        return entry
+
+    def encode(self, budget: Optional[int] = None) -> EncodedPrompt:
+        """Render the prompt within a token budget (the encoder's budget by default)"""
+        budget = self.budget if budget is None else budget
+        rendered: List[str] = []
+        entries = {name: self._section(name, rendered) for name in SECTIONS}
+        kept = {name for name, (text, _) in entries.items() if text}
+        total = sum(entries[name][1] for name in kept)
+        dropped = []
+        for name in sorted(VALUE, key=VALUE.get):
+            if total <= budget:
+                break
+            if name in kept:
+                kept.discard(name)
+                total -= entries[name][1]
+                dropped.append(name)
+
+        parts = [(name, entries[name][0]) for name in SECTIONS if name in kept]
+        text, stable_chars = self._join(parts)
+        return EncodedPrompt(text, total, tuple(name for name, _ in parts), tuple(dropped), stable_chars,
+                             tuple(rendered))
+
+    def _join(self, parts: List[Tuple[str, str]]) -> Tuple[str, int]:
+        """Join sections, reusing the text shared with the previous prompt"""
+        previous = self._parts
+        shared = 0
+        while shared < len(parts) and shared < len(previous) and parts[shared] == previous[shared]:
+            shared += 1
+        stable_chars = self._offsets[shared - 1] if shared else 0
+        offsets = self._offsets[:shared]
+        pieces = [self._text[:stable_chars]]
+        end = stable_chars
+        for _, section_text in parts[shared:]:
+            pieces.append(section_text + "\n")
+            end += len(section_text) + 1
+            offsets.append(end)
+        self._parts = parts
+        self._offsets = offsets
+        self._text = "".join(pieces)
+        return self._text, stable_chars
+
+    # Sections
+    def _render_header(self):
+        yield HEADER
+
+    def _render_team(self):
+        team = self.battle_state.ally_team
+        yield "TEAM"
+        for slot, pokemon in enumerate(team.members):
+            moves = " ".join(_format_move(move) for move in pokemon.moves)
+            yield f"{slot} {pokemon.name} {'/'.join(pokemon.types)} L{pokemon.level} spe{pokemon.speed}: {moves}"
+
+    def _render_opponents(self):
+        team = self.battle_state.opponent_team
+        revealed = _revealed_moves(self.battle_state)
+        yield "OPPONENTS"
+        for slot, pokemon in enumerate(team.members):
+            moves = ", ".join(revealed.get(slot, ())) or "none seen"
+            yield f"{slot} {pokemon.name} {'/'.join(pokemon.types)} L{pokemon.level} spe{pokemon.speed}: {moves}"
+
+    def _render_usage(self):
+        profile = self.analyzer.get_opponent_usage_profile(limit=TOP_ENTRIES)
+        if not profile["available"]:
+            return
+        for label, key in (("likely moves", "unrevealed_moves"), ("likely items", "items")):
+            if profile[key]:
+                values = ", ".join(f"{name} {frequency:.0%}" for name, frequency in profile[key])
+                yield f"USAGE {profile['species']} {label}: {values}"
+
+    def _render_state(self):
+        state = self.battle_state
+        field = state.field
+        line = f"TURN {state.turn_count}"
+        if field.weather_type is not WeatherType.NONE:
+            turns = "permanent" if field.weather_permanent else f"{field.weather_turns}t"
+            line += f" | weather {field.weather_type.value} {turns}"
+        screens = [f"{screen.affects_side} {screen.effect_name} {screen.turns_remaining}t"
+                   for screen in field.screen_effects()]
+        if screens:
+            line += " | screens " + ", ".join(screens)
+        yield line
+        for side, label in (("ally", "ALLY"), ("opponent", "OPP")):
+            team = state.teams[SIDE_CODES[side]]
+            members = []
+            for slot, pokemon in enumerate(team.members):
+                hp, max_hp = state.get_hp(side, slot), team.max_hp[slot]
+                if hp <= 0:
+                    health = "fnt"
+                elif side == "ally":
+                    health = f"{hp}/{max_hp}"
+                else:
+                    health = f"{hp * 100 // max_hp}%"
+                marker = "*" if slot == team.active else ""
+                members.append(f"{marker}{pokemon.name} {health}{_format_status(state.get_status(side, slot))}")
+            yield f"{label}: " + ", ".join(members)
+
+    def _render_recent(self):
+        state = self.battle_state
+        first_turn = state.turn_count - RECENT_TURNS + 1
+        turns: Dict[int, List[str]] = {}
+        for side, label in (("ally", "ally"), ("opponent", "opp")):
+            for move, turn in state.event_log.move_history(SIDE_CODES[side]):
+                if turn >= first_turn:
+                    turns.setdefault(turn, []).append(f"{label} {move}")
+        if turns:
+            yield "RECENT " + "; ".join(f"t{turn} " + ", ".join(moves) for turn, moves in sorted(turns.items()))
+
+    def _render_prediction(self):
+        prediction = self.analyzer.predict_opponent_next_move()
+        if prediction["prediction"] == "Unknown":
+            return
+        likely = list(prediction["distribution"].items())[:TOP_ENTRIES]
+        yield "OPP NEXT " + ", ".join(f"{move} {probability:.0%}" for move, probability in likely)
+
+    def _render_actions(self):
+        actions = self.analyzer.get_ranked_actions()[:TOP_ENTRIES]
+        if not actions:
+            return
+        yield "ACTIONS " + "; ".join(
+            f"{'switch ' if action.kind == 'switch' else ''}{action.name} {action.score:+.2f} "
+            f"(deal {action.damage_dealt:.0%}, take {action.damage_taken:.0%})" for action in actions)
+
+
+def encode_battle_prompt(battle_state: BattleState, budget: int = DEFAULT_BUDGET,
+                         count_tokens: Callable[[str], int] = estimate_tokens) -> EncodedPrompt:
+    """Encode a battle once, without staying subscribed to it"""
+    encoder = PromptEncoder(battle_state, budget, count_tokens=count_tokens)
+    try:
+        return encoder.encode()
+    finally:
+        encoder.detach()
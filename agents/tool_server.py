@@ -0,0 +1,449 @@
+"""
+Long-lived battle-agent tool server.
+
+The server keeps the dex, type chart, learnsets and usage index loaded,
+and holds one BattleState session per battle, so a move request costs
+only the decision itself. Clients speak JSON-RPC 2.0, one message per
+line, over stdin/stdout or a local socket (TCP on localhost or a Unix
+socket path). Requests may be batched as a JSON array; messages without
+an id are notifications and get no response.
+
+Methods:
+    new_battle   {"battle": BATTLE_SPEC, "battle_id": optional} -> {"battle_id", "turn"}
+    update       {"battle_id", "events": [EVENT, ...]} -> {"battle_id", "turn", "applied"}
+                 (every event is checked first; a bad one fails the update with none applied)
+    select_move  {"battle_id", "engine": "greedy", "deadline_ms": null, "options": {}} -> {"move", "latency_ms"}
+    state        {"battle_id"} -> BattleState.get_battle_summary()
+    report       {"battle_id"} -> {"report"} (kept up to date incrementally)
+    prompt       {"battle_id", "budget": optional} -> {"prompt", "tokens", "dropped", "stable_chars"}
+                 (compact LLM prompt text, see agents.prompt_encoder)
+    end_battle   {"battle_id"} -> {"ended": true}
+    stats        {} -> sessions and per-method latency (count, mean, p50, p95, max in ms)
+    ping         {} -> "pong"
+
+BATTLE_SPEC and POKEMON are the validated dicts of battle.dict_codec, e.g.
+    {"my_team": [{"species": "Blaziken", "moves": ["Flamethrower"], "level": 50, "hp": 120}],
+     "opponent_pokemon": {"species": 260, "moves": [57, 89]}}
+EVENT ("side" is "ally" or "opponent"):
+    {"type": "turn"}
+    {"type": "move", "side", "move"}
+    {"type": "damage", "side", "amount", "move": optional, "critical": false}   (side took the hit)
+    {"type": "hp", "side", "hp", "index": optional}
+    {"type": "status", "side", "status", "index": optional}
+    {"type": "switch", "side", "index" or "species" (+ "moves", "level" for a new opponent Pokemon)}
+    {"type": "ko", "side"}
+    {"type": "order", "first", "ally_move", "opponent_move"}
+    {"type": "weather", "weather": "rain", "turns": 5, "permanent": false}   ("none" clears it)
+    {"type": "screen", "side", "effect": "Reflect", "turns": 5}
+"""
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from itertools import count
+from typing import Any, Callable, Deque, Dict, IO, List, Optional
+from agents.prompt_encoder import PromptEncoder
+from battle.battle_state import BattleState, SIDE_CODES
+from battle.battle_utils import BattleStateAnalyzer, create_battle_report
+from battle.decision_engine import recommend_move
+from battle.dict_codec import POKEMON_SCHEMA, Field, Schema, decode_battle_dict, decode_pokemon_dict
+from battle.field_state import WeatherType, SCREEN_EFFECTS, MAX_SCREEN_EFFECTS, MAX_SCREEN_TURNS
+from battle.opponent_model import candidate_table, species_key
+from battle.spread_inference import grid_for
+from battle.team_state import STATUS_CONDITIONS, MAX_TEAM_SIZE
+from pokedata.dex import get_dex
+
+# Keys of a switch event that describe a newly revealed Pokemon
+POKEMON_KEYS = tuple(field.name for field in POKEMON_SCHEMA)
+
+# Schema of each event type, checked for every event of an update before any is applied
+_SIDES = tuple(SIDE_CODES)
+_TYPE = Field("type", (str,), required=True)
+_SIDE = Field("side", (str,), required=True, check=lambda value: value in SIDE_CODES, expected=f"one of {_SIDES}")
+_SLOT = Field("index", (int, type(None)))
+_TURNS = Field("turns", (int,), default=5, check=lambda value: value >= 0, expected="non-negative")
+_WEATHER_NAMES = tuple(weather.value for weather in WeatherType)
+EVENT_SCHEMAS: Dict[str, Schema] = {
+    "turn": Schema(_TYPE),
+    "move": Schema(_TYPE, _SIDE, Field("move", (str,), required=True), Field("target", (str,), default="opponent")),
+    "damage": Schema(_TYPE, _SIDE,
+                     Field("amount", (int,), required=True, check=lambda value: value >= 0, expected="non-negative"),
+                     Field("move", (str, type(None))), Field("critical", (bool,), default=False)),
+    "hp": Schema(_TYPE, _SIDE, Field("hp", (int,), required=True), _SLOT),
+    "status": Schema(_TYPE, _SIDE, Field("status", (str, type(None)), check=lambda value: value in STATUS_CONDITIONS,
+                                         expected=f"one of {STATUS_CONDITIONS}"), _SLOT),
+    "switch": Schema(_TYPE, _SIDE, Field("index", (int,)), Field("species", (str,)),
+                     *(field for field in POKEMON_SCHEMA if field.name != "species")),
+    "ko": Schema(_TYPE, _SIDE),
+    "order": Schema(_TYPE, Field("first", (str,), required=True, check=lambda value: value in SIDE_CODES,
+                                 expected=f"one of {_SIDES}"),
+                    Field("ally_move", (str,), required=True), Field("opponent_move", (str,), required=True)),
+    "weather": Schema(_TYPE, Field("weather", (str,), required=True, check=lambda value: value in _WEATHER_NAMES,
+                                   expected=f"one of {_WEATHER_NAMES}"),
+                      _TURNS, Field("permanent", (bool,), default=False)),
+    "screen": Schema(_TYPE, _SIDE, Field("effect", (str,), required=True),
+                     Field("turns", (int,), default=5, check=lambda value: 0 <= value <= MAX_SCREEN_TURNS,
+                           expected=f"0 to {MAX_SCREEN_TURNS}")),
+}
+
+# Latencies kept per method for the stats method
+LATENCY_WINDOW = 10000
+
+# JSON-RPC error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class ToolError(Exception):
+    """An error reported to the client as a JSON-RPC error"""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def _side(event: Dict, key: str = "side") -> str:
+    side = event.get(key)
+    if side not in SIDE_CODES:
+        raise ValueError(f"Event {event.get('type')} needs {key} 'ally' or 'opponent', got {side!r}")
+    return side
+
+
+def apply_event(state: BattleState, event: Dict):
+    """Apply one EVENT to a battle (see the module docstring)"""
+    kind = event.get("type")
+    if kind == "turn":
+        state.advance_turn()
+    elif kind == "move":
+        state.record_move_used(_side(event), event["move"], event.get("target", "opponent"))
+    elif kind == "damage":
+        side = _side(event)
+        taken = state.apply_damage(side, event["amount"])
+        state.record_damage(side, taken, move_name=event.get("move"), critical=event.get("critical", False))
+        state.record_damage("opponent" if side == "ally" else "ally", 0, taken)
+    elif kind == "hp":
+        state.set_hp(_side(event), event["hp"], event.get("index"))
+    elif kind == "status":
+        state.set_status(_side(event), event.get("status"), event.get("index"))
+    elif kind == "switch":
+        side = _side(event)
+        team = state.get_team(side)
+        if "index" in event:
+            if not 0 <= event["index"] < len(team):
+                raise ValueError(f"Switch index {event['index']} is not a team slot")
+            state.switch_to(side, event["index"])
+        else:
+            species = get_dex().find_species(event["species"])
+            if species is None:
+                raise KeyError(f"Unknown species: {event['species']}")
+            member = next((pokemon for pokemon in team.members if pokemon.name == species.name), None)
+            if member is None:
+                member = decode_pokemon_dict({key: event[key] for key in POKEMON_KEYS if key in event},
+                                             path="event")
+            state.switch_pokemon(member, side)
+    elif kind == "ko":
+        state.record_ko(_side(event))
+    elif kind == "order":
+        state.record_turn_order(_side(event, "first"), event["ally_move"], event["opponent_move"])
+    elif kind == "weather":
+        weather = WeatherType(event["weather"])
+        if weather is WeatherType.NONE:
+            state.clear_weather()
+        else:
+            state.set_weather(weather, event.get("turns", 5), event.get("permanent", False))
+    elif kind == "screen":
+        state.add_screen_effect(event["effect"], event.get("turns", 5), _side(event))
+    else:
+        raise ValueError(f"Unknown event type: {kind!r}")
+
+
+def check_events(state: BattleState, events: Any):
+    """
+    Check a list of EVENTs against their schemas and the battle, raising ValueError
+    for the first bad one, so an update applies all of its events or none.
+    Team slots, new team members and new screen effects are followed through the list.
+    """
+    if not isinstance(events, list):
+        raise ValueError(f"events: expected an array, got {type(events).__name__}")
+    dex = get_dex()
+    team_names = {side: [pokemon.name for pokemon in state.get_team(side).members] for side in SIDE_CODES}
+    screens = set(SCREEN_EFFECTS) | set(state.field.custom_screens)
+    for position, event in enumerate(events):
+        if not isinstance(event, dict):
+            raise ValueError(f"Event {position}: expected an object, got {type(event).__name__}")
+        kind = event.get("type")
+        schema = EVENT_SCHEMAS.get(kind)
+        if schema is None:
+            raise ValueError(f"Event {position}: unknown event type {kind!r}")
+        path = f"Event {position} ({kind})"
+        schema.values(event, path)
+        names = team_names.get(event.get("side"))
+        index = event.get("index")
+        if index is not None and not 0 <= index < len(names):
+            raise ValueError(f"{path}.index: expected a team slot, got {index}")
+        if kind == "switch" and index is None:
+            if "species" not in event:
+                raise ValueError(f"{path}: needs index or species")
+            species = dex.find_species(event["species"])
+            if species is None:
+                raise ValueError(f"{path}.species: unknown species {event['species']!r}")
+            if species.name not in names:
+                decode_pokemon_dict({key: event[key] for key in POKEMON_KEYS if key in event}, path=path)
+                if len(names) >= MAX_TEAM_SIZE:
+                    raise ValueError(f"{path}: a team can have at most {MAX_TEAM_SIZE} Pokemon")
+                names.append(species.name)
+        elif kind == "screen" and event["effect"] not in screens:
+            if len(screens) >= MAX_SCREEN_EFFECTS:
+                raise ValueError(f"{path}.effect: cannot track more than {MAX_SCREEN_EFFECTS} distinct screen effects")
+            screens.add(event["effect"])
+
+
+def _warm_battle(state: BattleState):
+    """Build the caches a battle's decisions read: moveset tables and spread grids"""
+    for team in state.teams:
+        for pokemon in team.members:
+            candidate_table(species_key(pokemon))
+    for pokemon in state.opponent_team.members:
+        grid_for(pokemon)
+
+
+def _error_response(request_id, code: int, message: str) -> Dict:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+@dataclass
+class BattleSession:
+    """One battle held by the server"""
+    state: BattleState
+    analyzer: BattleStateAnalyzer
+    encoder: PromptEncoder
+    updates: int = 0
+
+
+class ToolServer:
+    """Dispatches JSON-RPC requests to battle sessions held in memory"""
+
+    def __init__(self):
+        self.sessions: Dict[str, BattleSession] = {}
+        self.latencies_ms: Dict[str, Deque[float]] = {}
+        self._ids = count(1)
+        # Sessions are shared by every connection, so requests run one at a time
+        self._lock = threading.Lock()
+        self.methods: Dict[str, Callable] = {
+            "new_battle": self.new_battle,
+            "update": self.update,
+            "select_move": self.select_move,
+            "state": self.get_state,
+            "report": self.report,
+            "prompt": self.prompt,
+            "end_battle": self.end_battle,
+            "stats": self.stats,
+            "ping": self.ping,
+        }
+
+    def warm_up(self):
+        """Load the shared data every session uses"""
+        from pokedata.learnsets import get_learnsets
+        from pokedata.usage_ingest import get_usage_index
+        import utils.type_effectiveness  # Loads the type chart
+        get_dex()
+        get_learnsets()
+        get_usage_index()
+
+    def _session(self, battle_id: str) -> BattleSession:
+        session = self.sessions.get(battle_id)
+        if session is None:
+            raise ToolError(INVALID_PARAMS, f"Unknown battle_id: {battle_id}")
+        return session
+
+    # Methods
+    def new_battle(self, battle: Dict, battle_id: Optional[str] = None) -> Dict:
+        state = decode_battle_dict(battle)
+        battle_id = str(battle_id) if battle_id is not None else f"battle-{next(self._ids)}"
+        if battle_id in self.sessions:
+            raise ToolError(INVALID_PARAMS, f"battle_id already in use: {battle_id}")
+        _warm_battle(state)
+        analyzer = BattleStateAnalyzer.attach(state)
+        self.sessions[battle_id] = BattleSession(state, analyzer, PromptEncoder(state, analyzer=analyzer))
+        return {"battle_id": battle_id, "turn": state.turn_count}
+
+    def update(self, battle_id: str, events: List[Dict]) -> Dict:
+        session = self._session(battle_id)
+        try:
+            check_events(session.state, events)
+        except ValueError as error:
+            raise ToolError(INVALID_PARAMS, str(error))
+        for event in events:
+            apply_event(session.state, event)
+        session.updates += len(events)
+        return {"battle_id": battle_id, "turn": session.state.turn_count, "applied": len(events)}
+
+    def select_move(self, battle_id: str, engine: str = "greedy", deadline_ms: Optional[float] = None,
+                    options: Optional[Dict] = None) -> Dict:
+        state = self._session(battle_id).state
+        start = time.perf_counter()
+        move = recommend_move(state, engine, deadline_ms, **(options or {}))
+        return {"move": move, "latency_ms": (time.perf_counter() - start) * 1000}
+
+    def get_state(self, battle_id: str) -> Dict:
+        return self._session(battle_id).state.get_battle_summary()
+
+    def report(self, battle_id: str) -> Dict:
+        session = self._session(battle_id)
+        return {"report": create_battle_report(session.state, session.analyzer)}
+
+    def prompt(self, battle_id: str, budget: Optional[int] = None) -> Dict:
+        prompt = self._session(battle_id).encoder.encode(budget)
+        return {"prompt": prompt.text, "tokens": prompt.tokens, "dropped": list(prompt.dropped),
+                "stable_chars": prompt.stable_chars}
+
+    def end_battle(self, battle_id: str) -> Dict:
+        session = self._session(battle_id)
+        session.encoder.detach()
+        session.analyzer.detach()
+        del self.sessions[battle_id]
+        return {"ended": True}
+
+    def stats(self) -> Dict:
+        latency = {}
+        for method, values in self.latencies_ms.items():
+            ordered = sorted(values)
+            latency[method] = {
+                "count": len(ordered),
+                "mean_ms": sum(ordered) / len(ordered),
+                "p50_ms": ordered[len(ordered) // 2],
+                "p95_ms": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))],
+                "max_ms": ordered[-1],
+            }
+        return {"sessions": len(self.sessions), "latency": latency}
+
+    def ping(self) -> str:
+        return "pong"
+
+    # JSON-RPC
+    def handle(self, request) -> Optional[Dict]:
+        """Answer one JSON-RPC request object (None for a notification)"""
+        if not isinstance(request, dict) or request.get("jsonrpc") != "2.0" or \
+                not isinstance(request.get("method"), str):
+            return _error_response(None, INVALID_REQUEST, "Expected a JSON-RPC 2.0 request object")
+        try:
+            response = {"jsonrpc": "2.0", "id": request.get("id"), "result": self._call(request)}
+        except ToolError as error:
+            response = _error_response(request.get("id"), error.code, str(error))
+        return response if "id" in request else None
+
+    def _call(self, request: Dict):
+        name = request["method"]
+        method = self.methods.get(name)
+        if method is None:
+            raise ToolError(METHOD_NOT_FOUND, f"Unknown method: {name}")
+        params = request.get("params", {})
+        if not isinstance(params, dict):
+            raise ToolError(INVALID_PARAMS, "params must be an object")
+        with self._lock:
+            start = time.perf_counter()
+            try:
+                result = method(**params)
+            except ToolError:
+                raise
+            except TypeError as error:
+                raise ToolError(INVALID_PARAMS, str(error))
+            except (KeyError, ValueError) as error:
+                raise ToolError(INVALID_PARAMS, str(error.args[0]) if error.args else type(error).__name__)
+            except Exception as error:
+                raise ToolError(SERVER_ERROR, f"{type(error).__name__}: {error}")
+            latencies = self.latencies_ms.get(name)
+            if latencies is None:
+                latencies = self.latencies_ms[name] = deque(maxlen=LATENCY_WINDOW)
+            latencies.append((time.perf_counter() - start) * 1000)
+        return result
+
+    def handle_line(self, line: str) -> Optional[str]:
+        """Answer one line of the protocol (a request or a batch) with a line, or None"""
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError as error:
+            return json.dumps(_error_response(None, PARSE_ERROR, f"Parse error: {error}"))
+        if isinstance(message, list):
+            if not message:
+                return json.dumps(_error_response(None, INVALID_REQUEST, "Empty batch"))
+            responses = [response for response in map(self.handle, message) if response is not None]
+            return json.dumps(responses) if responses else None
+        response = self.handle(message)
+        return json.dumps(response) if response is not None else None
+
+
+# Transports
+def serve_stream(server: ToolServer, reader: IO[str], writer: IO[str]):
+    """Serve requests line by line until the reader is exhausted"""
+    for line in reader:
+        if not line.strip():
+            continue
+        response = server.handle_line(line)
+        if response is not None:
+            writer.write(response + "\n")
+            writer.flush()
+
+
+class _ConnectionHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        reader = (line.decode("utf-8") for line in self.rfile)
+        serve_stream(self.server.tool_server, reader, _SocketWriter(self.wfile))
+
+
+class _SocketWriter:
+    """Text writer over a socket file"""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, text: str):
+        self.wfile.write(text.encode("utf-8"))
+
+    def flush(self):
+        self.wfile.flush()
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def make_socket_server(server: ToolServer, address) -> socketserver.BaseServer:
+    """
+    Create a socket server for the tool server; call serve_forever() on it.
+    Args:
+        address: A port number (TCP on 127.0.0.1; 0 picks a free port) or a Unix socket path
+    """
+    if isinstance(address, int):
+        socket_server = _TCPServer(("127.0.0.1", address), _ConnectionHandler)
+    else:
+        if os.path.exists(address):
+            os.remove(address)
+        socket_server = _UnixServer(address, _ConnectionHandler)
+    socket_server.tool_server = server
+    return socket_server
+
+
+def serve_stdio(server: Optional[ToolServer] = None):
+    """Serve JSON-RPC on stdin/stdout"""
+    server = server or ToolServer()
+    server.warm_up()
+    protocol = sys.stdout
+    # The engines print diagnostics to stdout; keep them out of the protocol stream
+    sys.stdout = sys.stderr
+    try:
+        serve_stream(server, sys.stdin, protocol)
+    finally:
+        sys.stdout = protocol
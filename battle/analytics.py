@@ -0,0 +1,315 @@
+"""
+Corpus-wide statistics over archived battle logs.
+
+A BattleAggregate folds battles one at a time into counters: battles,
+turns and draws, move uses per species, results by lead matchup, and per
+species appearances, damage dealt and taken and faints. Everything it
+reads comes from the event log's stint table, so folding a battle is a
+pass over its stints. Aggregates merge by adding their counters, so a
+corpus is reduced by folding shards of battles on worker processes
+(report_pipeline.plan_shards) and merging the partial aggregates, in any
+order.
+
+Results are written as a compact columnar file, one table per statistic:
+    header   magic "PKSTATS", format version (u8), table count (u16)
+    strings  u32 count, then u16 length-prefixed UTF-8 strings
+    tables   name (string id u32), rows (u32), column count (u16), then per column
+             name (string id u32), typecode (1 byte), rows little-endian values;
+             typecode "S" marks a column of string ids stored as u32
+Tables: totals, moves, matchups and species (see BattleAggregate.tables).
+Lead matchups are stored with the two leads in sorted order and counted
+for the first lead, so both sides of a matchup share one row.
+"""
+import struct
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
+from battle.battle_state import BattleState
+from battle.event_log import PokemonBattleHistory, SIDES
+from battle.report_pipeline import LogShard, plan_shards, SHARDS_PER_WORKER
+from battle.serialization import iter_battle_log, _array_to_le_bytes, _array_from_le_bytes
+
+MAGIC = b'PKSTATS'
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct('<7sBH')
+_COUNT = struct.Struct('<I')
+_LENGTH = struct.Struct('<H')
+_TABLE = struct.Struct('<IIH')
+_COLUMN = struct.Struct('<Ic')
+_STRING_COLUMN = 'S'
+
+
+class BattleAggregate:
+    """Mergeable statistics over any number of battles"""
+
+    def __init__(self):
+        self.battles = 0
+        self.turns = 0
+        self.draws = 0
+        # (species, move) -> uses
+        self.move_uses: Counter = Counter()
+        # (lead a, lead b) with a <= b -> battles, wins of a, wins of b
+        self.matchup_battles: Counter = Counter()
+        self.matchup_first_wins: Counter = Counter()
+        self.matchup_second_wins: Counter = Counter()
+        # species -> battles it appeared in, damage dealt, damage taken, faints
+        self.species_battles: Counter = Counter()
+        self.damage_dealt: Counter = Counter()
+        self.damage_taken: Counter = Counter()
+        self.faints: Counter = Counter()
+
+    def add_battle(self, state: BattleState):
+        """Fold one battle into the aggregate"""
+        log = state.event_log
+        self.battles += 1
+        self.turns += state.turn_count
+        if state.winner is None:
+            self.draws += 1
+
+        for side in range(len(SIDES)):
+            appeared = set()
+            for stint in log.stints_by_side[side]:
+                history = PokemonBattleHistory(log, stint)
+                species = history.pokemon.name
+                appeared.add(species)
+                self.damage_dealt[species] += history.damage_dealt
+                self.damage_taken[species] += history.damage_taken
+                if history.was_ko:
+                    self.faints[species] += 1
+                for move_name, _ in history.moves_used:
+                    self.move_uses[(species, move_name)] += 1
+            self.species_battles.update(appeared)
+
+        leads = [log.roster[side][index].name for side, index in enumerate(log.lead_indices())]
+        key = tuple(sorted(leads))
+        self.matchup_battles[key] += 1
+        if state.winner is not None:
+            winner = SIDES.index(state.winner)
+            # In a mirror matchup the ally lead counts as the first
+            first_won = winner == 0 if leads[0] == leads[1] else leads[winner] == key[0]
+            if first_won:
+                self.matchup_first_wins[key] += 1
+            else:
+                self.matchup_second_wins[key] += 1
+
+    def add_battles(self, states: Iterable[BattleState]) -> 'BattleAggregate':
+        for state in states:
+            self.add_battle(state)
+        return self
+
+    def merge(self, other: 'BattleAggregate') -> 'BattleAggregate':
+        """Add another aggregate's counts to this one"""
+        self.battles += other.battles
+        self.turns += other.turns
+        self.draws += other.draws
+        for name in _COUNTERS:
+            getattr(self, name).update(getattr(other, name))
+        return self
+
+    @property
+    def average_turns(self) -> float:
+        return self.turns / self.battles if self.battles else 0.0
+
+    def lead_win_rate(self, lead: str, opponent_lead: str) -> Optional[float]:
+        """Share of battles won by a lead against another, counting draws as half; None if never seen"""
+        key = tuple(sorted((lead, opponent_lead)))
+        battles = self.matchup_battles.get(key, 0)
+        if not battles:
+            return None
+        first, second = self.matchup_first_wins[key], self.matchup_second_wins[key]
+        wins = first if lead == key[0] else second
+        return (wins + 0.5 * (battles - first - second)) / battles
+
+    def tables(self) -> Dict[str, Dict[str, list]]:
+        """The statistics as column lists per table, rows sorted by key"""
+        moves = sorted(self.move_uses.items())
+        matchups = sorted(self.matchup_battles.items())
+        species = sorted(self.species_battles.items())
+        return {
+            "totals": {
+                "battles": [self.battles],
+                "turns": [self.turns],
+                "draws": [self.draws],
+                "average_turns": [self.average_turns],
+            },
+            "moves": {
+                "species": [key[0] for key, _ in moves],
+                "move": [key[1] for key, _ in moves],
+                "uses": [count for _, count in moves],
+            },
+            "matchups": {
+                "lead_a": [key[0] for key, _ in matchups],
+                "lead_b": [key[1] for key, _ in matchups],
+                "battles": [battles for _, battles in matchups],
+                "wins_a": [self.matchup_first_wins[key] for key, _ in matchups],
+                "wins_b": [self.matchup_second_wins[key] for key, _ in matchups],
+                "win_rate_a": [self.lead_win_rate(key[0], key[1]) for key, _ in matchups],
+            },
+            "species": {
+                "species": [name for name, _ in species],
+                "battles": [battles for _, battles in species],
+                "damage_dealt": [self.damage_dealt[name] for name, _ in species],
+                "damage_taken": [self.damage_taken[name] for name, _ in species],
+                "faints": [self.faints[name] for name, _ in species],
+                "damage_dealt_per_battle": [self.damage_dealt[name] / battles for name, battles in species],
+            },
+        }
+
+    @classmethod
+    def from_tables(cls, tables: Dict[str, Dict[str, list]]) -> 'BattleAggregate':
+        """Rebuild an aggregate from its tables, e.g. to merge new battles into a written file"""
+        aggregate = cls()
+        totals = tables["totals"]
+        aggregate.battles, aggregate.turns, aggregate.draws = (
+            int(totals["battles"][0]), int(totals["turns"][0]), int(totals["draws"][0]))
+        moves = tables["moves"]
+        aggregate.move_uses.update(dict(zip(zip(moves["species"], moves["move"]), moves["uses"])))
+        matchups = tables["matchups"]
+        keys = list(zip(matchups["lead_a"], matchups["lead_b"]))
+        for name, column in (("matchup_battles", "battles"), ("matchup_first_wins", "wins_a"),
+                             ("matchup_second_wins", "wins_b")):
+            getattr(aggregate, name).update(dict(zip(keys, matchups[column])))
+        species = tables["species"]
+        for name, column in (("species_battles", "battles"), ("damage_dealt", "damage_dealt"),
+                             ("damage_taken", "damage_taken"), ("faints", "faints")):
+            getattr(aggregate, name).update(dict(zip(species["species"], species[column])))
+        # Keep only non-zero counts, as folding battles does
+        for name in _COUNTERS:
+            counter = getattr(aggregate, name)
+            for key in [key for key, count in counter.items() if not count]:
+                del counter[key]
+        return aggregate
+
+
+_COUNTERS = ("move_uses", "matchup_battles", "matchup_first_wins", "matchup_second_wins",
+             "species_battles", "damage_dealt", "damage_taken", "faints")
+
+
+# Map-reduce over battle log files
+def aggregate_shard(shard: LogShard) -> BattleAggregate:
+    """Fold the battles of one shard"""
+    return BattleAggregate().add_battles(iter_battle_log(shard.path, shard.start, shard.stop))
+
+
+def aggregate_corpus(paths: Iterable[str], workers: int = 1) -> BattleAggregate:
+    """
+    Fold every battle in the battle log files under the given files and directories.
+    Args:
+        workers: Worker processes, each folding shards into partial aggregates; 1 folds in this process
+    """
+    paths = list(paths)
+    total = BattleAggregate()
+    if workers <= 1:
+        for shard in plan_shards(paths):
+            total.merge(aggregate_shard(shard))
+        return total
+    shards = plan_shards(paths, shards=workers * SHARDS_PER_WORKER)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(aggregate_shard, shards):
+            total.merge(partial)
+    return total
+
+
+# Columnar files
+def _column_array(values: list) -> Tuple[str, array]:
+    if all(isinstance(value, int) for value in values):
+        return 'q', array('q', values)
+    return 'd', array('d', [float('nan') if value is None else value for value in values])
+
+
+def write_columnar(tables: Dict[str, Dict[str, list]], path: str):
+    """Write tables of columns as a columnar statistics file"""
+    strings: List[str] = []
+    string_ids: Dict[str, int] = {}
+
+    def string(value: str) -> int:
+        string_id = string_ids.get(value)
+        if string_id is None:
+            string_id = string_ids[value] = len(strings)
+            strings.append(value)
+        return string_id
+
+    body = []
+    for table_name, columns in tables.items():
+        rows = len(next(iter(columns.values()), []))
+        body.append(_TABLE.pack(string(table_name), rows, len(columns)))
+        for column_name, values in columns.items():
+            if len(values) != rows:
+                raise ValueError(f"Column {table_name}.{column_name} has {len(values)} rows, expected {rows}")
+            if values and all(isinstance(value, str) for value in values):
+                typecode, data = _STRING_COLUMN, array('I', [string(value) for value in values])
+            else:
+                typecode, data = _column_array(list(values))
+            body.append(_COLUMN.pack(string(column_name), typecode.encode('ascii')))
+            body.append(_array_to_le_bytes(data))
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(tables)))
+        f.write(_COUNT.pack(len(strings)))
+        for value in strings:
+            encoded = value.encode('utf-8')
+            f.write(_LENGTH.pack(len(encoded)))
+            f.write(encoded)
+        for part in body:
+            f.write(part)
+
+
+def _read_exact(f: BinaryIO, size: int) -> bytes:
+    data = f.read(size)
+    if len(data) < size:
+        raise ValueError("Statistics file is truncated")
+    return data
+
+
+def read_columnar(path: str, table_names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, list]]:
+    """
+    Read a columnar statistics file.
+    Args:
+        table_names: Tables to load (default all); other tables are skipped without decoding
+    Returns:
+        Columns per table: strings as lists of str, numbers as arrays
+    """
+    wanted = set(table_names) if table_names is not None else None
+    with open(path, "rb") as f:
+        magic, version, table_count = _HEADER.unpack(_read_exact(f, _HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a statistics file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported statistics file version {version} (expected {FORMAT_VERSION})")
+        (string_count,) = _COUNT.unpack(_read_exact(f, _COUNT.size))
+        strings = []
+        for _ in range(string_count):
+            (length,) = _LENGTH.unpack(_read_exact(f, _LENGTH.size))
+            strings.append(_read_exact(f, length).decode('utf-8'))
+
+        tables = {}
+        for _ in range(table_count):
+            name_id, rows, column_count = _TABLE.unpack(_read_exact(f, _TABLE.size))
+            table_name = strings[name_id]
+            keep = wanted is None or table_name in wanted
+            columns = {}
+            for _ in range(column_count):
+                column_id, typecode = _COLUMN.unpack(_read_exact(f, _COLUMN.size))
+                typecode = typecode.decode('ascii')
+                stored = 'I' if typecode == _STRING_COLUMN else typecode
+                size = rows * array(stored).itemsize
+                if not keep:
+                    f.seek(size, 1)
+                    continue
+                values = _array_from_le_bytes(stored, _read_exact(f, size))
+                columns[strings[column_id]] = [strings[i] for i in values] if typecode == _STRING_COLUMN else values
+            if keep:
+                tables[table_name] = columns
+    return tables
+
+
+def write_aggregate(aggregate: BattleAggregate, path: str):
+    """Write an aggregate's tables as a columnar statistics file"""
+    write_columnar(aggregate.tables(), path)
+
+
+def load_aggregate(path: str) -> BattleAggregate:
+    """Load an aggregate written by write_aggregate"""
+    return BattleAggregate.from_tables(read_columnar(path))
@@ -1,80 +1,327 @@
-from typing import Union, Dict, List, Optional, Set
-from dataclasses import dataclass, field
+import copy
+from typing import Callable, Union, Dict, List, Optional, Set
+from collections import Counter, deque
 from pokemon import Pokemon, Move
-from enum import Enum
-
-class WeatherType(Enum):
-    """Weather conditions that can be active in battle"""
-    NONE = "none"
-    SUN = "sun"
-    RAIN = "rain"
-    SANDSTORM = "sandstorm"
-    HAIL = "hail"
-    SNOW = "snow"  # For newer generations
-    FOG = "fog"
-    HARSH_SUNLIGHT = "harsh_sunlight"
-    HEAVY_RAIN = "heavy_rain"
-    STRONG_WINDS = "strong_winds"
-
-@dataclass
-class WeatherCondition:
-    """Represents active weather in battle"""
-    weather_type: WeatherType
-    turns_remaining: int
-    is_permanent: bool = False  # For abilities like Drought
-
-@dataclass
-class ScreenEffect:
-    """Represents screen effects like Light Screen, Reflect, etc."""
-    effect_name: str
-    turns_remaining: int
-    affects_side: str  # "ally" or "opponent"
-
-@dataclass
-class PokemonBattleHistory:
-    """Tracks a Pokemon's battle history"""
-    pokemon: Pokemon
-    turn_switched_in: int
-    turn_switched_out: Optional[int] = None
-    moves_used: List[tuple] = field(default_factory=list)  # (move_name, turn)
-    damage_taken: int = 0
-    damage_dealt: int = 0
-    was_ko: bool = False
+from battle.event_log import BattleEventLog, EventType, MoveHistoryView, PokemonBattleHistory, SIDES, SIDE_CODES
+from battle.field_state import (
+    FieldState, WeatherType, WeatherCondition, ScreenEffect,
+    WEATHER_CODES, WEATHER_BY_CODE
+)
+from battle.team_state import TeamState, status_code
+from battle.opponent_model import OpponentModel
+from battle.move_predictor import OpponentMovePredictor
+
+# Number of opponent moves kept in the recent-move window
+RECENT_MOVE_WINDOW = 5
+
+# Kinds of change reported to subscribers (see BattleState.subscribe)
+CHANGE_TURN = "turn"        # advance_turn (also counts down the field)
+CHANGE_MOVE = "move"        # record_move_used
+CHANGE_DAMAGE = "damage"    # record_damage, record_turn_order, record_ko
+CHANGE_HP = "hp"            # set_hp, apply_damage
+CHANGE_STATUS = "status"    # set_status
+CHANGE_SWITCH = "switch"    # switch_to, switch_pokemon, active Pokemon setters
+CHANGE_FIELD = "field"      # weather and screens
+CHANGES = (CHANGE_TURN, CHANGE_MOVE, CHANGE_DAMAGE, CHANGE_HP, CHANGE_STATUS, CHANGE_SWITCH, CHANGE_FIELD)
+
+# A subscriber is called with the state and the kind of change after each mutation
+Listener = Callable[['BattleState', str], None]
 
 class BattleState:
-    def __init__(self, my_pokemon: Pokemon, opponent_pokemon: Pokemon):
+    def __init__(self, my_pokemon: Pokemon, opponent_pokemon: Pokemon,
+                 my_team: Optional[List[Pokemon]] = None, opponent_team: Optional[List[Pokemon]] = None):
         """
         Initialize BattleState with comprehensive battle tracking.
         Args:
-            my_pokemon: Pokemon object
-            opponent_pokemon: Pokemon object
+            my_pokemon: Pokemon object (active Pokemon on my side)
+            opponent_pokemon: Pokemon object (active opponent Pokemon)
+            my_team: Optional full team for my side (up to 6, my_pokemon is added if missing)
+            opponent_team: Optional known opponent team (grows as the opponent switches)
         """
-        self.my_pokemon = my_pokemon
-        self.my_moves = my_pokemon.moves
-        self.opponent_pokemon = opponent_pokemon
-        self.opponent_moves = opponent_pokemon.moves
+        self.ally_team = self._build_team(my_pokemon, my_team)
+        self.opponent_team = self._build_team(opponent_pokemon, opponent_team)
+        self.teams = (self.ally_team, self.opponent_team)
+        
+        # Clones share Pokemon objects and keep HP/status only in the team arrays
+        self._is_clone = False
         
         # Battle tracking
         self.turn_count = 0
-        self.weather: Optional[WeatherCondition] = None
-        self.screens: List[ScreenEffect] = []
-        
-        # Pokemon history tracking
-        self.ally_pokemon_history: List[PokemonBattleHistory] = []
-        self.opponent_pokemon_history: List[PokemonBattleHistory] = []
+        self.field = FieldState()
         
-        # Currently active Pokemon history entries
-        self.current_ally_history = PokemonBattleHistory(my_pokemon, 0)
-        self.current_opponent_history = PokemonBattleHistory(opponent_pokemon, 0)
+        # Append-only event log; move and Pokemon histories are views over it
+        self._event_log: Optional[BattleEventLog] = BattleEventLog(
+            (self.ally_team.members, self.opponent_team.members),
+            (self.ally_team.active, self.opponent_team.active))
+        self._log_origin = None
         
         # Seen moves tracking
         self.seen_opponent_moves: Set[str] = set()
-        self.opponent_move_history: List[tuple] = []  # (move_name, turn, target)
+        
+        # Belief over the opponent's movesets (built on first use)
+        self._opponent_model: Optional[OpponentModel] = None
+        
+        # N-gram model of the opponent's move sequences (built on first use)
+        self._move_predictor: Optional[OpponentMovePredictor] = None
+        
+        # Feasible stat spreads of the opponent's Pokemon (built on the first observation)
+        self._spread_inference = None
+        
+        # Incremental opponent move statistics, maintained by record_move_used
+        self.opponent_move_counts: Counter = Counter()
+        self.recent_opponent_moves: deque = deque(maxlen=RECENT_MOVE_WINDOW)
+        self._most_used_opponent_move: Optional[str] = None
+        self._first_seen_order: Dict[str, int] = {}
+        self._opponent_moves_total = 0
+        
+        # Move counts for the currently active ally Pokemon (reset on switch)
+        self.ally_move_counts: Counter = Counter()
         
         # Battle state flags
         self.is_my_turn = True
         self.battle_ended = False
         self.winner: Optional[str] = None
+        
+        # Subscribers notified of mutations (not carried over to clones)
+        self._listeners: List[Listener] = []
+
+    @staticmethod
+    def _build_team(active: Pokemon, members: Optional[List[Pokemon]]) -> TeamState:
+        if not members:
+            return TeamState([active])
+        team = TeamState(members)
+        index = team.index_of(active)
+        if index < 0:
+            team = TeamState([active] + list(members))
+            index = 0
+        team.active = index
+        return team
+
+    # Active Pokemon (kept as properties for compatibility)
+    @property
+    def my_pokemon(self) -> Pokemon:
+        return self.ally_team.members[self.ally_team.active]
+
+    @my_pokemon.setter
+    def my_pokemon(self, pokemon: Pokemon):
+        self._set_active(self.ally_team, pokemon)
+        if self._listeners:
+            self._notify(CHANGE_SWITCH)
+
+    @property
+    def opponent_pokemon(self) -> Pokemon:
+        return self.opponent_team.members[self.opponent_team.active]
+
+    @opponent_pokemon.setter
+    def opponent_pokemon(self, pokemon: Pokemon):
+        self._set_active(self.opponent_team, pokemon)
+        if self._listeners:
+            self._notify(CHANGE_SWITCH)
+
+    @property
+    def my_moves(self) -> List[Move]:
+        return self.my_pokemon.moves
+
+    @property
+    def opponent_moves(self) -> List[Move]:
+        return self.opponent_pokemon.moves
+
+    @staticmethod
+    def _set_active(team: TeamState, pokemon: Pokemon):
+        index = team.index_of(pokemon)
+        team.active = index if index >= 0 else team.add(pokemon)
+
+    # Team HP and status (team arrays are authoritative; original states also update the Pokemon)
+    def get_team(self, side: str) -> TeamState:
+        return self.teams[SIDE_CODES[side]]
+
+    def get_hp(self, side: str, index: Optional[int] = None) -> int:
+        """Current HP of the active Pokemon (or a team slot) on a side"""
+        team = self.teams[SIDE_CODES[side]]
+        if index is None:
+            index = team.active
+        if self._is_clone:
+            return team.hp[index]
+        return team.members[index].current_hp
+
+    def get_max_hp(self, side: str, index: Optional[int] = None) -> int:
+        team = self.teams[SIDE_CODES[side]]
+        return team.max_hp[team.active if index is None else index]
+
+    def get_status(self, side: str, index: Optional[int] = None) -> Optional[str]:
+        team = self.teams[SIDE_CODES[side]]
+        if index is None:
+            index = team.active
+        if self._is_clone:
+            return team.get_status(index)
+        return team.members[index].status_condition
+
+    def set_hp(self, side: str, hp: int, index: Optional[int] = None):
+        """Set the HP of the active Pokemon (or a team slot) on a side, clamped to [0, max HP]"""
+        team = self.teams[SIDE_CODES[side]]
+        if index is None:
+            index = team.active
+        hp = max(0, min(hp, team.max_hp[index]))
+        team.hp[index] = hp
+        if not self._is_clone:
+            team.members[index].current_hp = hp
+        if self._listeners:
+            self._notify(CHANGE_HP)
+
+    def apply_damage(self, side: str, damage: int, index: Optional[int] = None) -> int:
+        """Apply damage to the active Pokemon (or a team slot) and return the damage actually taken"""
+        current = self.get_hp(side, index)
+        actual = min(damage, current)
+        self.set_hp(side, current - actual, index)
+        return actual
+
+    def set_status(self, side: str, status: Optional[str], index: Optional[int] = None):
+        team = self.teams[SIDE_CODES[side]]
+        if index is None:
+            index = team.active
+        team.status[index] = status_code(status)
+        if not self._is_clone:
+            team.members[index].status_condition = status
+        if self._listeners:
+            self._notify(CHANGE_STATUS)
+
+    def get_bench(self, side: str) -> List[int]:
+        """Team slots of the non-fainted Pokemon that can switch in"""
+        team = self.teams[SIDE_CODES[side]]
+        if not self._is_clone:
+            team.sync_from_pokemon()
+        return team.bench_indices()
+
+    def clone(self, keep_history: bool = False) -> 'BattleState':
+        """
+        Create an independent copy for search and simulation.
+        Pokemon objects are shared; HP, status, field and counters are copied.
+        Args:
+            keep_history: Copy the event log too (otherwise the clone starts a fresh log)
+        """
+        if not self._is_clone:
+            self.ally_team.sync_from_pokemon()
+            self.opponent_team.sync_from_pokemon()
+        
+        state = BattleState.__new__(BattleState)
+        state.ally_team = self.ally_team.copy()
+        state.opponent_team = self.opponent_team.copy()
+        state.teams = (state.ally_team, state.opponent_team)
+        state._is_clone = True
+        state.turn_count = self.turn_count
+        state.field = self.field.copy()
+        
+        if keep_history:
+            state._event_log = self.event_log.copy((state.ally_team.members, state.opponent_team.members))
+            state._log_origin = None
+        else:
+            # The fresh log is only built if the clone records something
+            state._event_log = None
+            state._log_origin = ((state.ally_team.active, state.opponent_team.active), self.turn_count,
+                                 state._team_snapshot())
+        
+        state.seen_opponent_moves = set(self.seen_opponent_moves)
+        state._opponent_model = self._opponent_model.copy() if self._opponent_model is not None else None
+        state._move_predictor = self._move_predictor.copy() if self._move_predictor is not None else None
+        state._spread_inference = self._spread_inference.copy() if self._spread_inference is not None else None
+        state.opponent_move_counts = self.opponent_move_counts.copy()
+        state.recent_opponent_moves = self.recent_opponent_moves.copy()
+        state._most_used_opponent_move = self._most_used_opponent_move
+        state._first_seen_order = dict(self._first_seen_order)
+        state._opponent_moves_total = self._opponent_moves_total
+        state.ally_move_counts = self.ally_move_counts.copy()
+        
+        state.is_my_turn = self.is_my_turn
+        state.battle_ended = self.battle_ended
+        state.winner = self.winner
+        state._listeners = []
+        return state
+
+    def mirrored(self) -> 'BattleState':
+        """
+        Clone seen from the opponent's side: teams and screens swap sides.
+        Move statistics are not carried over, since they only describe one side.
+        """
+        state = self.clone()
+        state.ally_team, state.opponent_team = state.opponent_team, state.ally_team
+        state.teams = (state.ally_team, state.opponent_team)
+        state.field.swap_sides()
+        state._log_origin = ((state.ally_team.active, state.opponent_team.active), self.turn_count,
+                             state._team_snapshot())
+        state.seen_opponent_moves = set()
+        state._opponent_model = None
+        state._move_predictor = None
+        state._spread_inference = None
+        state.opponent_move_counts = Counter()
+        state.recent_opponent_moves = deque(maxlen=RECENT_MOVE_WINDOW)
+        state._most_used_opponent_move = None
+        state._first_seen_order = {}
+        state._opponent_moves_total = 0
+        state.ally_move_counts = Counter()
+        if state.winner is not None:
+            state.winner = "opponent" if state.winner == "ally" else "ally"
+        return state
+
+    @property
+    def opponent_model(self) -> OpponentModel:
+        """Belief over the opponent's movesets, updated by record_move_used"""
+        model = self._opponent_model
+        if model is None:
+            model = self._opponent_model = OpponentModel()
+        return model
+
+    @property
+    def move_predictor(self) -> OpponentMovePredictor:
+        """Next-move model of the opponent's Pokemon, updated by record_move_used"""
+        predictor = self._move_predictor
+        if predictor is None:
+            predictor = self._move_predictor = OpponentMovePredictor()
+        return predictor
+
+    @property
+    def spread_inference(self) -> 'SpreadInference':
+        """Feasible stat spreads of the opponent's Pokemon, narrowed by record_damage and record_turn_order"""
+        inference = self._spread_inference
+        if inference is None:
+            from battle.spread_inference import SpreadInference
+            inference = self._spread_inference = SpreadInference()
+        return inference
+
+    def estimated_opponent(self) -> Pokemon:
+        """The opponent's active Pokemon with the stats inferred so far (the Pokemon itself if none)"""
+        inference = self._spread_inference
+        pokemon = self.opponent_pokemon
+        return inference.estimate(pokemon) if inference is not None else pokemon
+
+    @property
+    def event_log(self) -> BattleEventLog:
+        log = self._event_log
+        if log is None:
+            leads, turn, start = self._log_origin
+            log = self._event_log = BattleEventLog((self.ally_team.members, self.opponent_team.members),
+                                                   leads, turn, start)
+        return log
+
+    def _team_snapshot(self) -> tuple:
+        """HP and status arrays of both teams, for the start of a fresh event log"""
+        return tuple((team.hp[:], team.status[:]) for team in self.teams)
+
+    def sync_teams(self):
+        """Reload the team HP/status arrays from the Pokemon objects (root states only)"""
+        if not self._is_clone:
+            self.ally_team.sync_from_pokemon()
+            self.opponent_team.sync_from_pokemon()
+
+    def state_key(self) -> tuple:
+        """
+        Hashable key for the position (active slots, HP, status and field).
+        History is not part of the key, so positions reached by different move orders match.
+        """
+        self.sync_teams()
+        ally, opponent, field = self.ally_team, self.opponent_team, self.field
+        return (ally.active, opponent.active, ally.hp.tobytes(), opponent.hp.tobytes(),
+                ally.status.tobytes(), opponent.status.tobytes(), field.weather_code,
+                field.weather_turns, field.screen_turns.tobytes(), field.custom_screens)
 
     # Original methods for backward compatibility
     def get_my_pokemon_types(self) -> List[str]:
@@ -93,94 +340,237 @@ class BattleState:
         """Get opponent Pokemon's name"""
         return self.opponent_pokemon.name
 
+    # History views over the event log
+    @property
+    def opponent_move_history(self) -> MoveHistoryView:
+        """Opponent moves as (move_name, turn, target) tuples"""
+        return self.event_log.move_history(SIDE_CODES["opponent"], with_target=True)
+
+    @property
+    def current_ally_history(self) -> PokemonBattleHistory:
+        return PokemonBattleHistory(self.event_log, self.event_log.current_stint(SIDE_CODES["ally"]))
+
+    @property
+    def current_opponent_history(self) -> PokemonBattleHistory:
+        return PokemonBattleHistory(self.event_log, self.event_log.current_stint(SIDE_CODES["opponent"]))
+
+    @property
+    def ally_pokemon_history(self) -> List[PokemonBattleHistory]:
+        """History of ally Pokemon that have been switched out"""
+        return self.event_log.archived_histories(SIDE_CODES["ally"])
+
+    @property
+    def opponent_pokemon_history(self) -> List[PokemonBattleHistory]:
+        """History of opponent Pokemon that have been switched out"""
+        return self.event_log.archived_histories(SIDE_CODES["opponent"])
+
     # New battle state tracking methods
     def advance_turn(self):
         """Advance to the next turn and update effects"""
         self.turn_count += 1
+        self.event_log.log_turn(self.turn_count)
         self.is_my_turn = not self.is_my_turn
         
-        # Update weather
-        if self.weather and not self.weather.is_permanent:
-            self.weather.turns_remaining -= 1
-            if self.weather.turns_remaining <= 0:
-                self.weather = None
-        
-        # Update screens
-        self.screens = [screen for screen in self.screens 
-                       if self._update_screen_effect(screen)]
-    
-    def _update_screen_effect(self, screen: ScreenEffect) -> bool:
-        """Update screen effect and return True if it should continue"""
-        screen.turns_remaining -= 1
-        return screen.turns_remaining > 0
+        # Count down weather and screens
+        self.field.tick()
+        if self._listeners:
+            self._notify(CHANGE_TURN)
+
+    # Field conditions
+    @property
+    def weather(self) -> Optional[WeatherCondition]:
+        """Snapshot of the current weather, or None if there is no weather"""
+        field = self.field
+        if not field.weather_code:
+            return None
+        return WeatherCondition(field.weather_type, field.weather_turns, field.weather_permanent)
+
+    @property
+    def weather_type(self) -> WeatherType:
+        """Current weather type (WeatherType.NONE if there is no weather)"""
+        return self.field.weather_type
+
+    @property
+    def screens(self) -> List[ScreenEffect]:
+        """Snapshots of all active screen effects"""
+        return self.field.screen_effects()
 
     def set_weather(self, weather_type: WeatherType, duration: int = 5, permanent: bool = False):
         """Set the current weather condition"""
-        self.weather = WeatherCondition(weather_type, duration, permanent)
+        self.field.set_weather(weather_type, duration, permanent)
+        self.event_log.log_weather(self.turn_count, WEATHER_CODES[weather_type], duration, permanent)
+        if self._listeners:
+            self._notify(CHANGE_FIELD)
 
     def clear_weather(self):
         """Clear the current weather"""
-        self.weather = None
+        self.field.clear_weather()
+        self.event_log.log_weather(self.turn_count, -1)
+        if self._listeners:
+            self._notify(CHANGE_FIELD)
 
     def add_screen_effect(self, effect_name: str, duration: int, side: str):
-        """Add a screen effect (Light Screen, Reflect, etc.)"""
-        # Remove existing effect of the same type on the same side
-        self.screens = [s for s in self.screens 
-                       if not (s.effect_name == effect_name and s.affects_side == side)]
-        
-        screen = ScreenEffect(effect_name, duration, side)
-        self.screens.append(screen)
+        """Add a screen effect (Light Screen, Reflect, etc.), replacing one of the same type on that side"""
+        self.field.set_screen(side, self.field.effect_slot(effect_name, add=True), duration)
+        self.event_log.log_screen(self.turn_count, SIDE_CODES[side], effect_name, duration)
+        if self._listeners:
+            self._notify(CHANGE_FIELD)
 
     def get_active_screens(self, side: str) -> List[ScreenEffect]:
         """Get all active screen effects for a side"""
-        return [screen for screen in self.screens if screen.affects_side == side]
+        return self.field.screen_effects(side)
 
     def record_move_used(self, pokemon_side: str, move_name: str, target: str = "opponent"):
         """Record that a move was used"""
         if pokemon_side == "ally":
-            self.current_ally_history.moves_used.append((move_name, self.turn_count))
+            self.event_log.log_move(self.turn_count, SIDE_CODES["ally"], move_name, target)
+            self.ally_move_counts[move_name] += 1
         elif pokemon_side == "opponent":
-            self.current_opponent_history.moves_used.append((move_name, self.turn_count))
+            self.event_log.log_move(self.turn_count, SIDE_CODES["opponent"], move_name, target)
             self.seen_opponent_moves.add(move_name)
-            self.opponent_move_history.append((move_name, self.turn_count, target))
+            self._update_opponent_move_stats(move_name)
+            self.opponent_model.observe(self.opponent_pokemon, move_name)
+            self.move_predictor.observe(self.opponent_pokemon, move_name)
+        if self._listeners:
+            self._notify(CHANGE_MOVE)
 
-    def record_damage(self, pokemon_side: str, damage_taken: int, damage_dealt: int = 0):
-        """Record damage taken and dealt"""
-        if pokemon_side == "ally":
-            self.current_ally_history.damage_taken += damage_taken
-            self.current_ally_history.damage_dealt += damage_dealt
-        elif pokemon_side == "opponent":
-            self.current_opponent_history.damage_taken += damage_taken
-            self.current_opponent_history.damage_dealt += damage_dealt
+    def _update_opponent_move_stats(self, move_name: str):
+        """Update opponent move counters, most-used move and recent window in O(1)"""
+        self.opponent_move_counts[move_name] += 1
+        self._opponent_moves_total += 1
+        self.recent_opponent_moves.append(move_name)
+        self._first_seen_order.setdefault(move_name, len(self._first_seen_order))
+        
+        # Ties go to the move seen first, matching max() over the frequency dict
+        leader = self._most_used_opponent_move
+        if leader is None:
+            self._most_used_opponent_move = move_name
+            return
+        count = self.opponent_move_counts[move_name]
+        leader_count = self.opponent_move_counts[leader]
+        if count > leader_count or (count == leader_count and
+                                    self._first_seen_order[move_name] < self._first_seen_order[leader]):
+            self._most_used_opponent_move = move_name
+
+    def record_damage(self, pokemon_side: str, damage_taken: int, damage_dealt: int = 0,
+                      move_name: Optional[str] = None, critical: bool = False):
+        """
+        Record damage taken and dealt.
+        Args:
+            move_name: The move the damage was taken from; given after the damage
+                was applied, it narrows the opponent's possible stat spreads
+            critical: The hit was a critical hit
+        """
+        if pokemon_side in SIDE_CODES:
+            self.event_log.log_damage(self.turn_count, SIDE_CODES[pokemon_side], damage_taken, damage_dealt)
+            if move_name is not None and damage_taken > 0:
+                self.spread_inference.record_hit(self, pokemon_side, move_name, damage_taken, critical)
+            if self._listeners:
+                self._notify(CHANGE_DAMAGE)
+
+    def record_turn_order(self, first_side: str, ally_move: str, opponent_move: str):
+        """Record which side's active Pokemon moved first this turn (narrows the opponent's speed)"""
+        if first_side in SIDE_CODES:
+            self.spread_inference.record_order(self, first_side, ally_move, opponent_move)
+            if self._listeners:
+                self._notify(CHANGE_DAMAGE)
 
     def switch_pokemon(self, new_pokemon: Pokemon, side: str):
-        """Handle Pokemon switching"""
-        if side == "ally":
-            # Archive current Pokemon history
-            self.current_ally_history.turn_switched_out = self.turn_count
-            self.ally_pokemon_history.append(self.current_ally_history)
-            
-            # Update current Pokemon
-            self.my_pokemon = new_pokemon
-            self.my_moves = new_pokemon.moves
-            self.current_ally_history = PokemonBattleHistory(new_pokemon, self.turn_count)
-            
-        elif side == "opponent":
-            # Archive current Pokemon history
-            self.current_opponent_history.turn_switched_out = self.turn_count
-            self.opponent_pokemon_history.append(self.current_opponent_history)
-            
-            # Update current Pokemon
-            self.opponent_pokemon = new_pokemon
-            self.opponent_moves = new_pokemon.moves
-            self.current_opponent_history = PokemonBattleHistory(new_pokemon, self.turn_count)
+        """Handle Pokemon switching (the Pokemon is added to the team if it is not a member)"""
+        team = self.teams[SIDE_CODES[side]]
+        index = team.index_of(new_pokemon)
+        if index < 0:
+            index = team.add(new_pokemon)
+        self.switch_to(side, index)
+
+    def switch_to(self, side: str, index: int):
+        """Switch the active Pokemon on a side to a team slot"""
+        side_code = SIDE_CODES[side]
+        self.event_log.log_switch(self.turn_count, side_code, index)
+        self.teams[side_code].active = index
+        if side_code == 0:
+            self.ally_move_counts = Counter()
+        if self._listeners:
+            self._notify(CHANGE_SWITCH)
 
     def record_ko(self, pokemon_side: str):
         """Record that a Pokemon was knocked out"""
-        if pokemon_side == "ally":
-            self.current_ally_history.was_ko = True
-        elif pokemon_side == "opponent":
-            self.current_opponent_history.was_ko = True
+        if pokemon_side in SIDE_CODES:
+            self.event_log.log_ko(self.turn_count, SIDE_CODES[pokemon_side])
+            if self._listeners:
+                self._notify(CHANGE_DAMAGE)
+
+    # Change notification
+    def subscribe(self, listener: Listener) -> Listener:
+        """
+        Call listener(state, change) after every mutation made through this state's
+        methods (change is one of CHANGES). Changes made directly to Pokemon objects
+        or to the field are not seen; report them with notify().
+        """
+        self._listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener: Listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def notify(self, change: str):
+        """Report a change made outside this state's methods to the subscribers"""
+        if change not in CHANGES:
+            raise ValueError(f"Unknown change: {change}. Expected one of {CHANGES}")
+        self._notify(change)
+
+    def _notify(self, change: str):
+        for listener in list(self._listeners):
+            listener(self, change)
+
+    def replay(self, turn: Optional[int] = None) -> 'BattleState':
+        """
+        Rebuild the battle state as it was at the end of a given turn by replaying the event log.
+        The replay runs on copies of the Pokemon, starting from the HP and status they had
+        when logging started, so it never changes this battle. Damage events are applied
+        to HP; HP or status set without an event (set_hp, set_status) is not replayed.
+        Args:
+            turn: Turn to stop at (defaults to the current turn)
+        """
+        log = self.event_log
+        rosters = []
+        for side_code, roster in enumerate(log.roster):
+            members = []
+            for index, pokemon in enumerate(roster):
+                member = copy.copy(pokemon)
+                member.current_hp, member.status_condition = log.start_of(side_code, index)
+                members.append(member)
+            rosters.append(members)
+        allies, opponents = rosters
+        ally_lead, opponent_lead = log.lead_indices()
+        state = BattleState(allies[ally_lead], opponents[opponent_lead], allies, opponents)
+        state.turn_count = log.stint_turn_in[log.stints_by_side[0][0]]
+        
+        for event_turn, kind, side_code, arg0, arg1, arg2 in log.events():
+            if turn is not None and event_turn > turn:
+                break
+            side = SIDES[side_code] if side_code >= 0 else None
+            if kind == EventType.TURN:
+                state.advance_turn()
+            elif kind == EventType.MOVE:
+                state.record_move_used(side, log.names[arg0], log.names[arg1])
+            elif kind == EventType.DAMAGE:
+                state.apply_damage(side, arg0)
+                state.record_damage(side, arg0, arg1)
+            elif kind == EventType.SWITCH:
+                state.switch_to(side, arg0)
+            elif kind == EventType.KO:
+                state.record_ko(side)
+            elif kind == EventType.WEATHER:
+                if arg0 < 0:
+                    state.clear_weather()
+                else:
+                    state.set_weather(WEATHER_BY_CODE[arg0], arg1, bool(arg2))
+            elif kind == EventType.SCREEN:
+                state.add_screen_effect(log.names[arg0], arg1, side)
+        
+        return state
 
     def get_battle_summary(self) -> Dict:
         """Get a comprehensive summary of the battle state"""
@@ -189,18 +579,18 @@ class BattleState:
             "current_pokemon": {
                 "ally": {
                     "name": self.my_pokemon.name,
-                    "hp": f"{self.my_pokemon.current_hp}/{self.my_pokemon.calculate_hp()}",
+                    "hp": f"{self.get_hp('ally')}/{self.get_max_hp('ally')}",
                     "types": self.my_pokemon.types
                 },
                 "opponent": {
                     "name": self.opponent_pokemon.name,
-                    "hp": f"{self.opponent_pokemon.current_hp}/{self.opponent_pokemon.calculate_hp()}",
+                    "hp": f"{self.get_hp('opponent')}/{self.get_max_hp('opponent')}",
                     "types": self.opponent_pokemon.types
                 }
             },
             "weather": {
-                "type": self.weather.weather_type.value if self.weather else "none",
-                "turns_remaining": self.weather.turns_remaining if self.weather else 0
+                "type": self.field.weather_type.value,
+                "turns_remaining": self.field.weather_turns
             },
             "screens": [
                 {
@@ -209,48 +599,43 @@ class BattleState:
                     "turns_remaining": screen.turns_remaining
                 } for screen in self.screens
             ],
-            "seen_opponent_moves": list(self.seen_opponent_moves),
+            "seen_opponent_moves": list(self.opponent_move_counts),
             "ally_pokemon_used": len(self.ally_pokemon_history) + 1,
             "opponent_pokemon_used": len(self.opponent_pokemon_history) + 1,
             "is_my_turn": self.is_my_turn
         }
 
     def get_opponent_move_pattern(self) -> Dict:
-        """Analyze opponent's move usage patterns"""
-        if not self.opponent_move_history:
+        """
+        Analyze opponent's move usage patterns.
+        Served from the incremental counters, so the cost does not grow with battle length.
+        """
+        if self._most_used_opponent_move is None:
             return {"most_used": None, "recent_moves": [], "move_frequency": {}}
         
-        # Count move frequency
-        move_counts = {}
-        for move_name, _, _ in self.opponent_move_history:
-            move_counts[move_name] = move_counts.get(move_name, 0) + 1
-        
-        # Get most used move
-        most_used = max(move_counts.items(), key=lambda x: x[1]) if move_counts else None
-        
-        # Get recent moves (last 5)
-        recent_moves = [move[0] for move in self.opponent_move_history[-5:]]
-        
+        most_used = self._most_used_opponent_move
         return {
-            "most_used": most_used[0] if most_used else None,
-            "recent_moves": recent_moves,
-            "move_frequency": move_counts,
+            "most_used": most_used,
+            "most_used_count": self.opponent_move_counts[most_used],
+            "recent_moves": list(self.recent_opponent_moves),
+            "move_frequency": dict(self.opponent_move_counts),
             "total_moves_seen": len(self.seen_opponent_moves),
-            "total_moves_used": len(self.opponent_move_history)
+            "total_moves_used": self._opponent_moves_total
         }
 
     def has_screen_active(self, effect_name: str, side: str) -> bool:
         """Check if a specific screen effect is active"""
-        return any(screen.effect_name == effect_name and screen.affects_side == side 
-                  for screen in self.screens)
+        slot = self.field.effect_slot(effect_name)
+        return slot >= 0 and self.field.has_screen(side, slot)
 
     def get_weather_info(self) -> Dict:
         """Get current weather information"""
-        if not self.weather:
+        field = self.field
+        if not field.weather_code:
             return {"type": "none", "turns_remaining": 0, "is_permanent": False}
         
         return {
-            "type": self.weather.weather_type.value,
-            "turns_remaining": self.weather.turns_remaining,
-            "is_permanent": self.weather.is_permanent
-        }
\ No newline at end of file
+            "type": field.weather_type.value,
+            "turns_remaining": field.weather_turns,
+            "is_permanent": field.weather_permanent
+        }
@@ -1,18 +1,98 @@
 """
-Battle state utilities for convenient access to enhanced battle tracking features
+Battle state utilities for convenient access to enhanced battle tracking features.
+
+An analyzer created with incremental=True (or BattleStateAnalyzer.attach)
+subscribes to its BattleState and caches every section of the analysis.
+Each kind of state change only invalidates the sections that read it
+(SECTION_INPUTS), so refreshing a report after a change recomputes just
+those sections, and refreshing an unchanged battle costs a dict lookup.
 """
-from typing import Dict, List, Optional, Tuple
-from battle.battle_state import BattleState, WeatherType, ScreenEffect, PokemonBattleHistory
+from collections import Counter
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from battle.battle_state import (
+    BattleState, WeatherType, ScreenEffect, PokemonBattleHistory, CHANGES,
+    CHANGE_TURN, CHANGE_MOVE, CHANGE_DAMAGE, CHANGE_HP, CHANGE_STATUS, CHANGE_SWITCH, CHANGE_FIELD
+)
+from battle.switch_advisor import RankedAction, rank_actions
+from battle.move_predictor import next_move_distribution
+from pokedata.usage_ingest import UsageIndex, get_usage_index, MOVE, ITEM, ABILITY, TEAMMATE
 from pokemon import Pokemon
 
+# The kinds of state change each analysis section depends on
+SECTION_INPUTS = {
+    "summary": set(CHANGES),
+    "momentum": {CHANGE_TURN, CHANGE_MOVE, CHANGE_SWITCH, CHANGE_FIELD},
+    "prediction": {CHANGE_MOVE, CHANGE_SWITCH},
+    "type_analysis": {CHANGE_SWITCH},
+    "usage_profile": {CHANGE_MOVE, CHANGE_SWITCH},
+    "phase": {CHANGE_TURN, CHANGE_HP, CHANGE_SWITCH},
+    # Ranked actions read HP, status, the field, the moveset belief and inferred stats
+    "actions": {CHANGE_TURN, CHANGE_MOVE, CHANGE_DAMAGE, CHANGE_HP, CHANGE_STATUS, CHANGE_SWITCH, CHANGE_FIELD},
+    "recommendations": {CHANGE_TURN, CHANGE_MOVE, CHANGE_DAMAGE, CHANGE_HP, CHANGE_STATUS, CHANGE_SWITCH,
+                        CHANGE_FIELD},
+    "report": set(CHANGES),
+}
+_SECTIONS_BY_CHANGE = {change: tuple(section for section, inputs in SECTION_INPUTS.items() if change in inputs)
+                       for change in CHANGES}
+
 class BattleStateAnalyzer:
     """Utility class for analyzing battle state and providing insights"""
     
-    def __init__(self, battle_state: BattleState):
+    def __init__(self, battle_state: BattleState, incremental: bool = False):
+        """
+        Args:
+            battle_state: Battle to analyze
+            incremental: Subscribe to the state and cache each section until one of its
+                inputs changes (cached results are shared, so do not modify them)
+        """
         self.battle_state = battle_state
+        self.incremental = incremental
+        self._cache: Dict[str, Dict[tuple, object]] = {}
+        # Times each section was computed (incremental analyzers only)
+        self.recomputed: Counter = Counter()
+        if incremental:
+            battle_state.subscribe(self._invalidate)
+    
+    @classmethod
+    def attach(cls, battle_state: BattleState) -> 'BattleStateAnalyzer':
+        """An incremental analyzer that stays attached to the state"""
+        return cls(battle_state, incremental=True)
+    
+    def detach(self):
+        """Stop following the state and drop the cache"""
+        self.battle_state.unsubscribe(self._invalidate)
+        self.incremental = False
+        self._cache.clear()
+    
+    def _invalidate(self, state: BattleState, change: str):
+        cache = self._cache
+        for section in _SECTIONS_BY_CHANGE[change]:
+            cache.pop(section, None)
+    
+    def _section(self, section: str, compute: Callable, *args):
+        """The cached value of a section, computed if it is missing or stale"""
+        if not self.incremental:
+            return compute(*args)
+        entries = self._cache.setdefault(section, {})
+        if args in entries:
+            return entries[args]
+        value = entries[args] = compute(*args)
+        self.recomputed[section] += 1
+        return value
+    
+    def get_summary(self) -> Dict:
+        """The state's battle summary"""
+        return self._section("summary", self.battle_state.get_battle_summary)
+    
+    def get_ranked_actions(self) -> List[RankedAction]:
+        """Every move and switch, best first (see battle.switch_advisor)"""
+        return self._section("actions", rank_actions, self.battle_state)
     
     def get_momentum_analysis(self) -> Dict:
         """Analyze battle momentum based on recent events"""
+        return self._section("momentum", self._momentum_analysis)
+    
+    def _momentum_analysis(self) -> Dict:
         recent_turns = 3
         
         # Get recent moves from both sides
@@ -31,39 +111,49 @@ class BattleStateAnalyzer:
             "recent_ally_moves": ally_recent,
             "recent_opponent_moves": opponent_recent,
             "turn_count": self.battle_state.turn_count,
-            "weather_turns_left": self.battle_state.weather.turns_remaining if self.battle_state.weather else 0,
-            "active_screens": len(self.battle_state.screens)
+            "weather_turns_left": self.battle_state.field.weather_turns,
+            "active_screens": self.battle_state.field.active_screen_count
         }
     
     def predict_opponent_next_move(self) -> Dict:
-        """Predict opponent's next move based on patterns"""
+        """Predict the opponent's next move with the n-gram move predictor"""
+        return self._section("prediction", self._predict_opponent_next_move)
+    
+    def _predict_opponent_next_move(self) -> Dict:
         patterns = self.battle_state.get_opponent_move_pattern()
         
         if not patterns['recent_moves']:
             return {"prediction": "Unknown", "confidence": 0}
         
-        # Simple prediction based on frequency
-        move_freq = patterns['move_frequency']
-        most_frequent = max(move_freq.items(), key=lambda x: x[1]) if move_freq else None
-        
-        # Check for recent patterns
-        recent = patterns['recent_moves'][-3:] if len(patterns['recent_moves']) >= 3 else patterns['recent_moves']
-        
-        prediction = most_frequent[0] if most_frequent else "Unknown"
+        distribution = next_move_distribution(self.battle_state)
+        if not distribution:
+            return {"prediction": "Unknown", "confidence": 0}
+        prediction, probability = max(distribution.items(), key=lambda item: item[1])
         
-        # Calculate confidence based on frequency
-        total_moves = sum(move_freq.values()) if move_freq else 1
-        confidence = (most_frequent[1] / total_moves * 100) if most_frequent else 0
+        # Explain with the longest move context the predictor has seen
+        model = self.battle_state.move_predictor.model(self.battle_state.opponent_pokemon)
+        context, count = model.support() if model is not None else ((), 0)
+        if context:
+            times = "once" if count == 1 else f"{count} times"
+            reasoning = f"Most likely after {' -> '.join(context)} (seen {times})"
+        elif count:
+            reasoning = f"Most likely from its {count} moves so far and usage statistics"
+        else:
+            reasoning = "Most likely from usage statistics"
         
         return {
             "prediction": prediction,
-            "confidence": confidence,
-            "reasoning": f"Most used move ({most_frequent[1]}/{total_moves} times)" if most_frequent else "No pattern detected",
-            "recent_pattern": recent
+            "confidence": probability * 100,
+            "reasoning": reasoning,
+            "recent_pattern": patterns['recent_moves'][-3:],
+            "distribution": dict(sorted(distribution.items(), key=lambda item: item[1], reverse=True))
         }
     
     def get_type_effectiveness_summary(self) -> Dict:
         """Get type effectiveness summary for current matchup"""
+        return self._section("type_analysis", self._type_effectiveness_summary)
+    
+    def _type_effectiveness_summary(self) -> Dict:
         ally_types = self.battle_state.my_pokemon.types
         opponent_types = self.battle_state.opponent_pokemon.types
         
@@ -97,11 +187,40 @@ class BattleStateAnalyzer:
             "recommendation": "Use type advantages" if ally_advantages else "Consider switching or status moves"
         }
     
+    def get_opponent_usage_profile(self, limit: int = 5, usage: Optional[UsageIndex] = None) -> Dict:
+        """Most common moves, items, abilities and teammates of the opponent's species (from the usage index)"""
+        return self._section("usage_profile", self._opponent_usage_profile, limit, usage)
+    
+    def _opponent_usage_profile(self, limit: int, usage: Optional[UsageIndex]) -> Dict:
+        usage = usage or get_usage_index()
+        species = self.battle_state.opponent_pokemon.name
+        if usage is None or not usage.has_species(species):
+            return {"species": species, "available": False}
+        
+        seen = self.battle_state.seen_opponent_moves
+        moves = usage.top(MOVE, species)
+        on_field = {pokemon.name for pokemon in self.battle_state.opponent_team.members}
+        return {
+            "species": species,
+            "available": True,
+            "teams": usage.species_count(species),
+            "moves": moves[:limit],
+            "unrevealed_moves": [(move, frequency) for move, frequency in moves if move not in seen][:limit],
+            "items": usage.top(ITEM, species, limit),
+            "abilities": usage.top(ABILITY, species, limit),
+            "teammates": usage.top(TEAMMATE, species, limit),
+            "unseen_teammates": [(name, frequency) for name, frequency in usage.top(TEAMMATE, species)
+                                 if name not in on_field][:limit]
+        }
+    
     def get_battle_phase_analysis(self) -> Dict:
         """Analyze what phase of battle we're in"""
+        return self._section("phase", self._battle_phase_analysis)
+    
+    def _battle_phase_analysis(self) -> Dict:
         turn_count = self.battle_state.turn_count
-        ally_hp_percent = (self.battle_state.my_pokemon.current_hp / self.battle_state.my_pokemon.calculate_hp()) * 100
-        opponent_hp_percent = (self.battle_state.opponent_pokemon.current_hp / self.battle_state.opponent_pokemon.calculate_hp()) * 100
+        ally_hp_percent = (self.battle_state.get_hp("ally") / self.battle_state.get_max_hp("ally")) * 100
+        opponent_hp_percent = (self.battle_state.get_hp("opponent") / self.battle_state.get_max_hp("opponent")) * 100
         
         phase = "early"
         if turn_count > 10:
@@ -126,81 +245,127 @@ class BattleStateAnalyzer:
             "urgency": "high" if min(ally_hp_percent, opponent_hp_percent) < 25 else "normal"
         }
 
-def create_battle_report(battle_state: BattleState) -> str:
-    """Generate a comprehensive battle report"""
-    analyzer = BattleStateAnalyzer(battle_state)
-    
+def _analyzer_for(battle_state: BattleState, analyzer: Optional[BattleStateAnalyzer]) -> BattleStateAnalyzer:
+    if analyzer is None:
+        return BattleStateAnalyzer(battle_state)
+    if analyzer.battle_state is not battle_state:
+        raise ValueError("The analyzer is attached to a different battle")
+    return analyzer
+
+def create_battle_report(battle_state: BattleState, analyzer: Optional[BattleStateAnalyzer] = None) -> str:
+    """
+    Generate a comprehensive battle report.
+    Args:
+        analyzer: Analyzer of this battle to reuse; an incremental one returns the
+            cached report until the battle changes and then rebuilds only stale sections
+    """
+    analyzer = _analyzer_for(battle_state, analyzer)
+    return analyzer._section("report", _build_battle_report, analyzer)
+
+def _build_battle_report(analyzer: BattleStateAnalyzer) -> str:
+    return "\n".join(_battle_report_lines(analyzer))
+
+def iter_battle_report(battle_state: BattleState, analyzer: Optional[BattleStateAnalyzer] = None) -> Iterator[str]:
+    """
+    Generate the battle report line by line, without building it in memory.
+    The lines joined with newlines are create_battle_report's report.
+    """
+    return _battle_report_lines(_analyzer_for(battle_state, analyzer))
+
+def _battle_report_lines(analyzer: BattleStateAnalyzer) -> Iterator[str]:
     # Get all analysis data
-    summary = battle_state.get_battle_summary()
+    summary = analyzer.get_summary()
     momentum = analyzer.get_momentum_analysis()
     prediction = analyzer.predict_opponent_next_move()
     type_analysis = analyzer.get_type_effectiveness_summary()
     phase_analysis = analyzer.get_battle_phase_analysis()
+    usage_profile = analyzer.get_opponent_usage_profile(limit=3)
     
-    report = []
-    report.append("=" * 50)
-    report.append("BATTLE REPORT")
-    report.append("=" * 50)
+    yield "=" * 50
+    yield "BATTLE REPORT"
+    yield "=" * 50
     
     # Current state
-    report.append(f"\nCURRENT BATTLE STATE (Turn {summary['turn_count']}):")
-    report.append(f"  Your Pokemon: {summary['current_pokemon']['ally']['name']} ({summary['current_pokemon']['ally']['hp']})")
-    report.append(f"  Opponent: {summary['current_pokemon']['opponent']['name']} ({summary['current_pokemon']['opponent']['hp']})")
+    yield f"\nCURRENT BATTLE STATE (Turn {summary['turn_count']}):"
+    yield f"  Your Pokemon: {summary['current_pokemon']['ally']['name']} ({summary['current_pokemon']['ally']['hp']})"
+    yield f"  Opponent: {summary['current_pokemon']['opponent']['name']} ({summary['current_pokemon']['opponent']['hp']})"
     
     # Weather and field conditions
     if summary['weather']['type'] != 'none':
-        report.append(f"  Weather: {summary['weather']['type']} ({summary['weather']['turns_remaining']} turns left)")
+        yield f"  Weather: {summary['weather']['type']} ({summary['weather']['turns_remaining']} turns left)"
     
     if summary['screens']:
-        report.append("  Active screens:")
+        yield "  Active screens:"
         for screen in summary['screens']:
-            report.append(f"    {screen['effect']} ({screen['side']}, {screen['turns_remaining']} turns)")
+            yield f"    {screen['effect']} ({screen['side']}, {screen['turns_remaining']} turns)"
     
     # Battle phase
-    report.append(f"\nBATTLE PHASE: {phase_analysis['phase'].upper()}")
-    report.append(f"  Strategy: {phase_analysis['recommended_strategy']}")
-    report.append(f"  Urgency: {phase_analysis['urgency']}")
+    yield f"\nBATTLE PHASE: {phase_analysis['phase'].upper()}"
+    yield f"  Strategy: {phase_analysis['recommended_strategy']}"
+    yield f"  Urgency: {phase_analysis['urgency']}"
     
     # Type effectiveness
-    report.append(f"\nTYPE MATCHUP:")
-    report.append(f"  Your types: {', '.join(type_analysis['ally_types'])}")
-    report.append(f"  Opponent types: {', '.join(type_analysis['opponent_types'])}")
+    yield f"\nTYPE MATCHUP:"
+    yield f"  Your types: {', '.join(type_analysis['ally_types'])}"
+    yield f"  Opponent types: {', '.join(type_analysis['opponent_types'])}"
     if type_analysis['advantages']:
-        report.append(f"  Advantages: {', '.join(type_analysis['advantages'])}")
+        yield f"  Advantages: {', '.join(type_analysis['advantages'])}"
     if type_analysis['disadvantages']:
-        report.append(f"  Disadvantages: {', '.join(type_analysis['disadvantages'])}")
-    report.append(f"  Recommendation: {type_analysis['recommendation']}")
+        yield f"  Disadvantages: {', '.join(type_analysis['disadvantages'])}"
+    yield f"  Recommendation: {type_analysis['recommendation']}"
     
     # Opponent intelligence
-    report.append(f"\nOPPONENT ANALYSIS:")
-    report.append(f"  Moves seen: {', '.join(summary['seen_opponent_moves'])}")
+    yield f"\nOPPONENT ANALYSIS:"
+    yield f"  Moves seen: {', '.join(summary['seen_opponent_moves'])}"
     if prediction['prediction'] != "Unknown":
-        report.append(f"  Predicted next move: {prediction['prediction']} ({prediction['confidence']:.1f}% confidence)")
-        report.append(f"  Reasoning: {prediction['reasoning']}")
+        yield f"  Predicted next move: {prediction['prediction']} ({prediction['confidence']:.1f}% confidence)"
+        yield f"  Reasoning: {prediction['reasoning']}"
+    if usage_profile['available']:
+        for label, key in (("Likely moves", "unrevealed_moves"), ("Likely items", "items"),
+                           ("Likely abilities", "abilities")):
+            if usage_profile[key]:
+                values = ", ".join(f"{name} ({frequency:.0%})" for name, frequency in usage_profile[key])
+                yield f"  {label}: {values}"
     
     # Team usage
     if summary['ally_pokemon_used'] > 1:
-        report.append(f"\nTEAM STATUS:")
-        report.append(f"  Pokemon used: {summary['ally_pokemon_used']}")
-        report.append(f"  Opponent Pokemon seen: {summary['opponent_pokemon_used']}")
-    
-    report.append("\n" + "=" * 50)
+        yield f"\nTEAM STATUS:"
+        yield f"  Pokemon used: {summary['ally_pokemon_used']}"
+        yield f"  Opponent Pokemon seen: {summary['opponent_pokemon_used']}"
     
-    return "\n".join(report)
+    yield "\n" + "=" * 50
 
-def get_battle_recommendations(battle_state: BattleState) -> Dict:
-    """Get strategic recommendations based on current battle state"""
-    analyzer = BattleStateAnalyzer(battle_state)
+def get_battle_recommendations(battle_state: BattleState, analyzer: Optional[BattleStateAnalyzer] = None) -> Dict:
+    """
+    Get strategic recommendations based on current battle state.
+    Args:
+        analyzer: Analyzer of this battle to reuse (see create_battle_report)
+    """
+    analyzer = _analyzer_for(battle_state, analyzer)
+    return analyzer._section("recommendations", _build_recommendations, analyzer)
+
+def _build_recommendations(analyzer: BattleStateAnalyzer) -> Dict:
+    battle_state = analyzer.battle_state
     phase_analysis = analyzer.get_battle_phase_analysis()
     type_analysis = analyzer.get_type_effectiveness_summary()
+    actions = analyzer.get_ranked_actions()
+    best_action = actions[0] if actions else None
+    best_switch = next((action for action in actions if action.kind == "switch"), None)
     
     recommendations = []
     
+    # Concrete best action from the unified move/switch ranking
+    if best_action is not None:
+        recommendations.append(best_action.describe())
+    
     # Phase-based recommendations
     if phase_analysis['recommended_strategy'] == 'finishing':
         recommendations.append("Focus on high-damage moves to finish the opponent")
     elif phase_analysis['recommended_strategy'] == 'defensive':
-        recommendations.append("Consider healing or switching to a healthier Pokemon")
+        if best_switch is not None:
+            recommendations.append(f"Consider healing or switching to {best_switch.name}")
+        else:
+            recommendations.append("Consider healing or switching to a healthier Pokemon")
     elif phase_analysis['recommended_strategy'] == 'setup':
         recommendations.append("Good time for stat boosts or field setup moves")
     
@@ -208,7 +373,10 @@ def get_battle_recommendations(battle_state: BattleState) -> Dict:
     if type_analysis['advantages']:
         recommendations.append("Use moves matching your type advantages")
     elif type_analysis['disadvantages']:
-        recommendations.append("Consider switching Pokemon or using neutral moves")
+        if best_switch is not None:
+            recommendations.append(f"Consider switching to {best_switch.name} or using neutral moves")
+        else:
+            recommendations.append("Consider switching Pokemon or using neutral moves")
     
     # Weather recommendations
     weather_info = battle_state.get_weather_info()
@@ -218,16 +386,15 @@ def get_battle_recommendations(battle_state: BattleState) -> Dict:
         recommendations.append("Water moves boosted, Fire moves weakened")
     
     # Screen recommendations
-    ally_screens = battle_state.get_active_screens("ally")
-    opponent_screens = battle_state.get_active_screens("opponent")
-    
-    if any(s.effect_name == "Light Screen" for s in opponent_screens):
+    if battle_state.has_screen_active("Light Screen", "opponent"):
         recommendations.append("Opponent has Light Screen - use physical moves")
-    if any(s.effect_name == "Reflect" for s in opponent_screens):
+    if battle_state.has_screen_active("Reflect", "opponent"):
         recommendations.append("Opponent has Reflect - use special moves")
     
     return {
         "recommendations": recommendations,
         "priority": phase_analysis['urgency'],
-        "phase": phase_analysis['phase']
+        "phase": phase_analysis['phase'],
+        "best_action": best_action,
+        "ranked_actions": actions
     }
@@ -1,14 +1,137 @@
+import time
+from dataclasses import dataclass
 from utils.type_effectiveness import get_multiplier
-from utils.damage_calculator import calculate_physical_damage, calculate_special_damage
+from utils.damage_calculator import calculate_physical_damage, calculate_special_damage, calculate_damage_batch
 from pokemon import Pokemon, Move
 from battle.battle_state import WeatherType
+from pokedata.dex import get_dex
 
-def recommend_move(state):
+ENGINES = ("greedy", "expectiminimax", "mcts")
+
+
+@dataclass(frozen=True)
+class ScoreWeights:
+    """Tunable constants of the greedy move score"""
+    damage_weight: float = 1
+    counter_bonus: float = 20           # Move is super effective against the opponent's recent move types
+    ko_bonus: float = 50                # Move can KO
+    near_ko_bonus: float = 25           # Move brings the opponent close to KO
+    near_ko_fraction: float = 0.8       # Fraction of the opponent's HP that counts as close to KO
+    predictability_penalty: float = 10  # Move has been overused
+    predictability_threshold: int = 2   # Uses before a move counts as overused
+    priority_bonus: float = 10          # Move has positive priority
+
+
+DEFAULT_SCORE_WEIGHTS = ScoreWeights()
+
+
+# Search depth used when a deadline is given without an explicit depth
+DEADLINE_MAX_DEPTH = 8
+
+
+def recommend_move(state, engine="greedy", deadline_ms=None, **engine_options):
     """
     Recommend the best move based on actual damage calculations and battle state.
     Enhanced to consider weather, screens, and opponent move history.
+
+    Args:
+        state: Current BattleState
+        engine: "greedy" scores each move one ply deep; "expectiminimax" searches
+            our moves against the opponent's replies (see battle.search); "mcts"
+            runs Monte Carlo Tree Search (see battle.mcts)
+        deadline_ms: Hard time limit for the decision; the engine returns the best
+            move found so far when it arrives
+        engine_options: Passed to the engine (e.g. weights for greedy; depth, iterations, seed for search)
     """
-    return _recommend_move_with_enhanced_analysis(state)
+    if engine == "greedy" and deadline_ms is None and not engine_options:
+        return _recommend_move_with_enhanced_analysis(state)
+    return run_search_engine(state, engine, deadline_ms=deadline_ms, **engine_options).best_move
+
+
+def recommend_moves(states, weights=DEFAULT_SCORE_WEIGHTS):
+    """
+    Recommend a move for each of many battles at once.
+    Damage for every (our Pokemon, opponent, move) triple across all states is
+    calculated in one vectorized pass; scoring matches the greedy recommend_move.
+    Returns one move name (or None when there are no moves) per state.
+    """
+    triples = [(state.my_pokemon, state.estimated_opponent(), move)
+               for state in states for move in state.my_pokemon.moves]
+    damages = calculate_damage_batch(triples).tolist() if triples else []
+
+    recommendations = []
+    offset = 0
+    for state in states:
+        moves = state.my_pokemon.moves
+        opponent_patterns = state.get_opponent_move_pattern()
+        best_score = -1
+        best_move = None
+        for index, move in enumerate(moves):
+            score = _calculate_move_score(state, move, opponent_patterns, damages[offset + index], weights)
+            if score > best_score:
+                best_score = score
+                best_move = move.name
+        offset += len(moves)
+        recommendations.append(best_move)
+    return recommendations
+
+
+def run_search_engine(state, engine="expectiminimax", deadline_ms=None, workers=None, **engine_options):
+    """
+    Run an engine and return its full SearchResult.
+    With deadline_ms, expectiminimax deepens iteratively (up to depth, default
+    DEADLINE_MAX_DEPTH) and MCTS runs simulations (up to iterations, default
+    unlimited) until the deadline. SearchResult.depth/iterations report how far it got.
+    With workers > 1 the search engines run root-parallel (see battle.parallel_search).
+    """
+    if workers is not None and workers > 1 and engine != "greedy":
+        from battle.parallel_search import parallel_search
+        return parallel_search(state, engine, workers, deadline_ms, **engine_options)
+
+    start = time.perf_counter()
+    deadline = start + deadline_ms / 1000 if deadline_ms is not None else None
+
+    # Imported here because the search engines import this module
+    if engine == "greedy":
+        result = _greedy_search(state, deadline, **engine_options)
+    elif engine == "expectiminimax":
+        from battle.search import ExpectiminimaxSearch
+        if deadline is not None:
+            engine_options.setdefault("depth", DEADLINE_MAX_DEPTH)
+        result = ExpectiminimaxSearch(**engine_options).search(state, deadline)
+    elif engine == "mcts":
+        from battle.mcts import MCTSSearch
+        if deadline is not None:
+            engine_options.setdefault("iterations", None)
+        result = MCTSSearch(**engine_options).search(state, deadline)
+    else:
+        raise ValueError(f"Unknown engine: {engine}. Expected one of {ENGINES}")
+
+    result.elapsed_ms = (time.perf_counter() - start) * 1000
+    return result
+
+
+def _greedy_search(state, deadline=None, weights=DEFAULT_SCORE_WEIGHTS):
+    """Score each move one ply deep, stopping early if the deadline passes"""
+    from battle.search import SearchResult
+
+    moves = state.my_pokemon.moves
+    result = SearchResult(best_move=moves[0].name if moves else None, depth=1, engine="greedy")
+    opponent_patterns = state.get_opponent_move_pattern()
+    best_score = None
+    for move in moves:
+        if deadline is not None and result.move_scores and time.perf_counter() >= deadline:
+            result.completed = False
+            break
+        score = _calculate_move_score(state, move, opponent_patterns, weights=weights)
+        result.move_scores[move.name] = score
+        result.nodes += 1
+        if best_score is None or score > best_score:
+            best_score = score
+            result.best_move = move.name
+    result.score = best_score or 0.0
+    result.iterations = 1
+    return result
 
 
 def _recommend_move_with_enhanced_analysis(state):
@@ -36,26 +159,30 @@ def _recommend_move_with_enhanced_analysis(state):
     return best_move
 
 
-def _calculate_move_score(state, move, opponent_patterns):
-    """Calculate a comprehensive score for a move considering all battle factors"""
+def _calculate_move_score(state, move, opponent_patterns, damage=None, weights=DEFAULT_SCORE_WEIGHTS):
+    """
+    Calculate a comprehensive score for a move considering all battle factors.
+    damage can be passed in when it was already calculated (e.g. by a batched pass).
+    """
     base_score = 0
     
     my_pokemon = state.my_pokemon
-    opponent_pokemon = state.opponent_pokemon
+    opponent_pokemon = state.estimated_opponent()
     
     # Base damage calculation
     if move.power and move.power > 0:
         try:
-            if move.damage_class.lower() == 'physical':
-                damage = calculate_physical_damage(my_pokemon, opponent_pokemon, move)
-            elif move.damage_class.lower() == 'special':
-                damage = calculate_special_damage(my_pokemon, opponent_pokemon, move)
-            else:
-                damage = 0
+            if damage is None:
+                if move.damage_class.lower() == 'physical':
+                    damage = calculate_physical_damage(my_pokemon, opponent_pokemon, move)
+                elif move.damage_class.lower() == 'special':
+                    damage = calculate_special_damage(my_pokemon, opponent_pokemon, move)
+                else:
+                    damage = 0
             
             # Apply accuracy
             accuracy_factor = (move.accuracy or 100) / 100
-            base_score = damage * accuracy_factor
+            base_score = damage * accuracy_factor * weights.damage_weight
             
         except Exception as e:
             print(f"Error calculating damage for {move.name}: {e}")
@@ -70,22 +197,22 @@ def _calculate_move_score(state, move, opponent_patterns):
     base_score *= screen_modifier
     
     # Strategic considerations based on opponent patterns
-    strategic_bonus = _get_strategic_bonus(state, move, opponent_patterns)
+    strategic_bonus = _get_strategic_bonus(state, move, opponent_patterns, damage, weights)
     base_score += strategic_bonus
     
     # Priority considerations
     if hasattr(move, 'priority') and move.priority > 0:
-        base_score += 10  # Small bonus for priority moves
+        base_score += weights.priority_bonus  # Small bonus for priority moves
     
     return base_score
 
 
 def _get_weather_modifier(state, move):
     """Get weather-based damage modifier"""
-    if not state.weather:
+    weather = state.weather_type
+    if weather == WeatherType.NONE:
         return 1.0
     
-    weather = state.weather.weather_type
     move_type = move.type.lower()
     
     # Weather boosts
@@ -112,91 +239,93 @@ def _get_screen_modifier(state, move):
         return 1.0
     
     # Check if opponent has screens that would reduce our damage
-    opponent_screens = state.get_active_screens("opponent")
-    
-    for screen in opponent_screens:
-        if screen.effect_name == "Light Screen" and move.damage_class.lower() == 'special':
-            return 0.5
-        elif screen.effect_name == "Reflect" and move.damage_class.lower() == 'physical':
-            return 0.5
+    damage_class = move.damage_class.lower()
+    if damage_class == 'special' and state.has_screen_active("Light Screen", "opponent"):
+        return 0.5
+    elif damage_class == 'physical' and state.has_screen_active("Reflect", "opponent"):
+        return 0.5
     
     return 1.0
 
 
-def _get_strategic_bonus(state, move, opponent_patterns):
+def _get_strategic_bonus(state, move, opponent_patterns, damage=None, weights=DEFAULT_SCORE_WEIGHTS):
     """Get strategic bonus based on battle history and patterns"""
     bonus = 0
     
-    # If opponent frequently uses a specific move type, prioritize counters
-    if opponent_patterns['recent_moves']:
-        recent_move_types = _get_move_types_from_names(opponent_patterns['recent_moves'])
-        if _move_is_effective_against_types(move, recent_move_types):
-            bonus += 20
+    # Prioritize counters to the move types the opponent is likely to carry
+    type_probabilities = _get_opponent_type_probabilities(state, opponent_patterns)
+    if type_probabilities:
+        bonus += weights.counter_bonus * _counter_probability(move, type_probabilities)
     
     # Bonus for moves that can KO
-    if hasattr(state.opponent_pokemon, 'current_hp'):
+    opponent_hp = state.get_hp("opponent")
+    if opponent_hp is not None:
         try:
-            if move.damage_class.lower() == 'physical':
-                potential_damage = calculate_physical_damage(state.my_pokemon, state.opponent_pokemon, move)
+            if damage is not None:
+                potential_damage = damage
+            elif move.damage_class.lower() == 'physical':
+                potential_damage = calculate_physical_damage(state.my_pokemon, state.estimated_opponent(), move)
             elif move.damage_class.lower() == 'special':
-                potential_damage = calculate_special_damage(state.my_pokemon, state.opponent_pokemon, move)
+                potential_damage = calculate_special_damage(state.my_pokemon, state.estimated_opponent(), move)
             else:
                 potential_damage = 0
             
-            if potential_damage >= state.opponent_pokemon.current_hp:
-                bonus += 50  # Big bonus for potential KO
-            elif potential_damage >= state.opponent_pokemon.current_hp * 0.8:
-                bonus += 25  # Bonus for bringing close to KO
+            if potential_damage >= opponent_hp:
+                bonus += weights.ko_bonus  # Big bonus for potential KO
+            elif potential_damage >= opponent_hp * weights.near_ko_fraction:
+                bonus += weights.near_ko_bonus  # Bonus for bringing close to KO
         except:
             pass
     
     # Penalty for moves the opponent might expect (overused moves)
-    if hasattr(state, 'current_ally_history'):
-        ally_moves = [move_name for move_name, _ in state.current_ally_history.moves_used]
-        move_usage_count = ally_moves.count(move.name)
-        if move_usage_count > 2:
-            bonus -= 10  # Small penalty for predictability
+    if hasattr(state, 'ally_move_counts'):
+        move_usage_count = state.ally_move_counts[move.name]
+        if move_usage_count > weights.predictability_threshold:
+            bonus -= weights.predictability_penalty  # Small penalty for predictability
     
     return bonus
 
 
 def _get_move_types_from_names(move_names):
-    """Helper to get move types from move names (simplified)"""
-    # This would typically require a move database lookup
-    # For now, return common types based on move names
-    type_mapping = {
-        'flamethrower': 'fire',
-        'hydro pump': 'water',
-        'thunderbolt': 'electric',
-        'earthquake': 'ground',
-        'ice beam': 'ice',
-        'leaf blade': 'grass',
-        'dragon claw': 'dragon'
-    }
-    
-    return [type_mapping.get(move.lower(), 'normal') for move in move_names]
-
-
-def _move_is_effective_against_types(move, target_types):
-    """Check if move is super effective against target types"""
-    # Simplified effectiveness check
-    effective_matchups = {
-        'water': ['fire', 'ground', 'rock'],
-        'fire': ['grass', 'ice', 'bug', 'steel'],
-        'grass': ['water', 'ground', 'rock'],
-        'electric': ['water', 'flying'],
-        'ice': ['grass', 'ground', 'flying', 'dragon'],
-        'fighting': ['normal', 'rock', 'steel', 'ice', 'dark'],
-        'ground': ['fire', 'electric', 'poison', 'rock', 'steel']
-    }
-    
-    move_type = move.type.lower()
-    if move_type in effective_matchups:
-        return any(target_type in effective_matchups[move_type] for target_type in target_types)
-    
-    return False
+    """Look up move types (lowercase) in the local dex; moves it does not know are skipped"""
+    dex = get_dex()
+    move_types = []
+    for name in move_names:
+        move = dex.find_move(name)
+        if move is not None:
+            move_types.append(move.type.lower())
+    return move_types
 
 
+def _get_opponent_type_probabilities(state, opponent_patterns):
+    """
+    Probability that the opponent carries a move of each type.
+    Comes from the moveset belief when the opponent's species has a learnset,
+    otherwise from the recently seen moves.
+    """
+    model = getattr(state, 'opponent_model', None)
+    belief = model.belief(state.opponent_pokemon) if model is not None else None
+    if belief is not None:
+        return belief.type_probabilities()
+    return {move_type: 1.0 for move_type in _get_move_types_from_names(opponent_patterns['recent_moves'])}
+
+
+def _counter_probability(move, type_probabilities):
+    """Probability that the move is super effective against one of the opponent's move types"""
+    targets = _EFFECTIVE_MATCHUPS.get(move.type.lower(), ())
+    return max((type_probabilities.get(target, 0.0) for target in targets), default=0.0)
+
+
+# Simplified super effective matchups used by the counter bonus
+_EFFECTIVE_MATCHUPS = {
+    'water': ['fire', 'ground', 'rock'],
+    'fire': ['grass', 'ice', 'bug', 'steel'],
+    'grass': ['water', 'ground', 'rock'],
+    'electric': ['water', 'flying'],
+    'ice': ['grass', 'ground', 'flying', 'dragon'],
+    'fighting': ['normal', 'rock', 'steel', 'ice', 'dark'],
+    'ground': ['fire', 'electric', 'poison', 'rock', 'steel']
+}
 
 
 def calculate_move_damage(attacker, defender, move):
@@ -259,7 +388,8 @@ def get_all_move_analysis(state):
     
     analysis = []
     my_pokemon = state.my_pokemon
-    opponent_pokemon = state.opponent_pokemon
+    opponent_pokemon = state.estimated_opponent()
+    opponent_hp = state.get_hp("opponent")
     
     for move in my_pokemon.moves:
         move_info = {
@@ -285,9 +415,9 @@ def get_all_move_analysis(state):
                 'max_damage': max_damage,
                 'average_damage': avg_damage,
                 'expected_damage': expected_damage,
-                'can_ko': max_damage >= opponent_pokemon.current_hp,
-                'guaranteed_ko': min_damage >= opponent_pokemon.current_hp,
-                'damage_percent': (avg_damage / opponent_pokemon.current_hp) * 100 if opponent_pokemon.current_hp > 0 else 0
+                'can_ko': max_damage >= opponent_hp,
+                'guaranteed_ko': min_damage >= opponent_hp,
+                'damage_percent': (avg_damage / opponent_hp) * 100 if opponent_hp > 0 else 0
             })
         else:
             # Status move
@@ -0,0 +1,318 @@
+"""
+Validated dict encoding of Pokemon, Move and BattleState for tool calls.
+
+Tool calls arrive as JSON dicts. The decoder checks each dict against a
+schema (field types, ranges and unknown keys, reported with the path of
+the offending field) and builds objects straight from the local dex, so
+no PokeAPI access is needed. Species and moves are given by dex id or by
+name; anything the dex does not have can be given inline.
+
+    MOVE       dex id | name | {"name", "type", "power", "accuracy", "pp",
+                                "damage_class", "priority", "effect"}
+    SPECIES    dex id | name | {"name", "types", "stats": [hp, atk, def, spa, spd, spe]}
+    POKEMON    {"species": SPECIES, "moves": [MOVE, ...], "level": 50,
+                "hp": current HP, "status": "burned", "item", "nature"}
+    BATTLE     {"my_team": [POKEMON, ...], "opponent_team": [POKEMON, ...],
+                "my_active": 0, "opponent_active": 0, "turn": 0,
+                "weather": {"type": "rain", "turns": 5, "permanent": false},
+                "screens": [{"side": "opponent", "effect": "Reflect", "turns": 5}],
+                "opponent_moves": [dex id | name, ...]}
+               ("my_pokemon"/"opponent_pokemon" may be given instead of one-member teams;
+               opponent_moves are the moves the active opponent has been seen using,
+               replayed in order)
+
+The encoder writes the same form, using dex ids wherever the dex has the
+species or move. Abilities, height and weight are not part of it.
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from pokemon import Pokemon, Move, PokemonStats
+from pokedata.dex import Dex, get_dex
+from battle.battle_state import BattleState, SIDE_CODES
+from battle.event_log import PokemonBattleHistory, SIDES
+from battle.field_state import WeatherType, MAX_SCREEN_TURNS
+from battle.team_state import STATUS_CONDITIONS, MAX_TEAM_SIZE
+
+_STAT_NAMES = ("hp", "attack", "defense", "special_attack", "special_defense", "speed")
+_DAMAGE_CLASSES = ("physical", "special", "status")
+_WEATHER_TYPES = {weather.value: weather for weather in WeatherType}
+
+
+@dataclass(frozen=True)
+class Field:
+    """One key of a dict schema"""
+    name: str
+    types: Tuple[type, ...]
+    required: bool = False
+    default: Any = None
+    # Extra check on the value, and what it expects when it fails
+    check: Optional[Callable[[Any], bool]] = None
+    expected: str = ""
+
+
+class Schema:
+    """The fields of a dict, indexed by key so decoding only visits the keys present"""
+
+    def __init__(self, *fields: Field):
+        self.fields = fields
+        self.positions = {field.name: (index, field) for index, field in enumerate(fields)}
+        self.defaults = [field.default for field in fields]
+        self.required = [field.name for field in fields if field.required]
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def values(self, data: Any, path: str) -> List[Any]:
+        """Validate a dict against the schema and return its values in schema order"""
+        return _fields(data, self, path)
+
+
+def _is_team_slot(value: int) -> bool:
+    return 0 <= value < MAX_TEAM_SIZE
+
+
+_OPTIONAL_STR = (str, type(None))
+_NUMBER = (int, type(None))
+
+MOVE_SCHEMA = Schema(
+    Field("name", (str,), required=True),
+    Field("type", (str,), required=True),
+    Field("power", _NUMBER),
+    Field("accuracy", _NUMBER),
+    Field("pp", (int,), default=10, check=lambda value: value > 0, expected="positive"),
+    Field("damage_class", (str,), required=True, check=lambda value: value in _DAMAGE_CLASSES,
+          expected=f"one of {_DAMAGE_CLASSES}"),
+    Field("priority", (int,), default=0),
+    Field("effect", _OPTIONAL_STR),
+)
+SPECIES_SCHEMA = Schema(
+    Field("name", (str,), required=True),
+    Field("types", (list,), required=True, check=lambda value: 1 <= len(value) <= 2 and
+          all(isinstance(name, str) for name in value), expected="one or two type names"),
+    Field("stats", (list,), required=True, check=lambda value: len(value) == 6 and
+          all(type(stat) is int and stat > 0 for stat in value), expected="six positive base stats"),
+)
+POKEMON_SCHEMA = Schema(
+    Field("species", (int, str, dict), required=True),
+    Field("moves", (list,), default=(), check=lambda value: len(value) <= 4, expected="at most 4 moves"),
+    Field("level", (int,), default=50, check=lambda value: 1 <= value <= 100, expected="1 to 100"),
+    Field("hp", _NUMBER, check=lambda value: value is None or value >= 0, expected="non-negative"),
+    Field("status", _OPTIONAL_STR, check=lambda value: value in STATUS_CONDITIONS,
+          expected=f"one of {STATUS_CONDITIONS}"),
+    Field("item", _OPTIONAL_STR),
+    Field("nature", _OPTIONAL_STR),
+)
+WEATHER_SCHEMA = Schema(
+    Field("type", (str,), required=True, check=lambda value: value in _WEATHER_TYPES,
+          expected=f"one of {tuple(_WEATHER_TYPES)}"),
+    Field("turns", (int,), default=5, check=lambda value: value >= 0, expected="non-negative"),
+    Field("permanent", (bool,), default=False),
+)
+SCREEN_SCHEMA = Schema(
+    Field("side", (str,), required=True, check=lambda value: value in SIDES, expected=f"one of {SIDES}"),
+    # Effects outside SCREEN_EFFECTS take a slot of their own battle
+    Field("effect", (str,), required=True, check=lambda value: value != "", expected="an effect name"),
+    Field("turns", (int,), default=5, check=lambda value: 0 <= value <= MAX_SCREEN_TURNS,
+          expected=f"0 to {MAX_SCREEN_TURNS}"),
+)
+BATTLE_SCHEMA = Schema(
+    Field("my_team", (list,)),
+    Field("opponent_team", (list,)),
+    Field("my_pokemon", (dict,)),
+    Field("opponent_pokemon", (dict,)),
+    Field("my_active", (int,), default=0, check=_is_team_slot, expected="a team slot"),
+    Field("opponent_active", (int,), default=0, check=_is_team_slot, expected="a team slot"),
+    Field("turn", (int,), default=0, check=lambda value: value >= 0, expected="non-negative"),
+    Field("weather", (dict, type(None))),
+    Field("screens", (list,), default=()),
+    Field("opponent_moves", (list,), default=()),
+)
+
+
+def _fields(data: Any, schema: 'Schema', path: str) -> List[Any]:
+    """Validate a dict against a schema and return its values in schema order"""
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected an object, got {type(data).__name__}")
+    values = schema.defaults.copy()
+    positions = schema.positions
+    for key, value in data.items():
+        entry = positions.get(key)
+        if entry is None:
+            raise ValueError(f"{path}: unknown field {key!r}")
+        index, field = entry
+        # bool is an int, but never a valid count or id
+        if not isinstance(value, field.types) or (value.__class__ is bool and bool not in field.types):
+            expected = " or ".join("null" if kind is type(None) else kind.__name__ for kind in field.types)
+            raise ValueError(f"{path}.{key}: expected {expected}, got {type(value).__name__}")
+        if field.check is not None and not field.check(value):
+            raise ValueError(f"{path}.{key}: expected {field.expected}, got {value!r}")
+        values[index] = value
+    for name in schema.required:
+        if name not in data:
+            raise ValueError(f"{path}.{name}: required")
+    return values
+
+
+# Decoding
+def decode_move(data: Any, dex: Optional[Dex] = None, path: str = "move") -> Move:
+    """Build a Move from a dex id, a name or an inline MOVE dict"""
+    dex = dex or get_dex()
+    if data.__class__ is int:
+        move = dex.moves.get(data)
+        if move is None:
+            raise ValueError(f"{path}: unknown move id {data}")
+        return move
+    if isinstance(data, str):
+        move = dex.find_move(data)
+        if move is None:
+            raise ValueError(f"{path}: unknown move {data!r}")
+        return move
+    name, move_type, power, accuracy, pp, damage_class, priority, effect = _fields(data, MOVE_SCHEMA, path)
+    return Move(name, move_type, power, accuracy, pp, damage_class, effect, priority)
+
+
+def _decode_species(data: Any, dex: Dex, path: str) -> Tuple[str, List[str], PokemonStats, Optional[int]]:
+    if data.__class__ is int:
+        species = dex.species.get(data)
+        if species is None:
+            raise ValueError(f"{path}: unknown species id {data}")
+    elif isinstance(data, str):
+        species = dex.find_species(data)
+        if species is None:
+            raise ValueError(f"{path}: unknown species {data!r}")
+    else:
+        name, types, stats = _fields(data, SPECIES_SCHEMA, path)
+        return name, list(types), PokemonStats(*stats), None
+    return species.name, list(species.types), species.stats, species.id
+
+
+def decode_pokemon_dict(data: Any, dex: Optional[Dex] = None, path: str = "pokemon") -> Pokemon:
+    """Build a Pokemon from a POKEMON dict"""
+    dex = dex or get_dex()
+    species, moves, level, hp, status, item, nature = _fields(data, POKEMON_SCHEMA, path)
+    name, types, stats, species_id = _decode_species(species, dex, f"{path}.species")
+    pokemon = Pokemon(
+        name=name,
+        types=types,
+        stats=stats,
+        moves=[decode_move(move, dex, f"{path}.moves[{index}]") for index, move in enumerate(moves)],
+        level=level,
+        nature=nature,
+        item=item,
+        status_condition=status,
+        species_id=species_id
+    )
+    if hp is not None:
+        pokemon.current_hp = min(hp, pokemon.current_hp)
+    return pokemon
+
+
+def _decode_team(side: str, members: Optional[List], single: Optional[Dict], active: int,
+                 dex: Dex) -> List[Pokemon]:
+    if members is not None:
+        if not 1 <= len(members) <= MAX_TEAM_SIZE:
+            raise ValueError(f"battle.{side}_team: expected 1 to {MAX_TEAM_SIZE} Pokemon, got {len(members)}")
+        team = [decode_pokemon_dict(member, dex, f"battle.{side}_team[{index}]")
+                for index, member in enumerate(members)]
+    elif single is not None:
+        team = [decode_pokemon_dict(single, dex, f"battle.{side}_pokemon")]
+    else:
+        raise ValueError(f"battle: needs {side}_team or {side}_pokemon")
+    if active >= len(team):
+        raise ValueError(f"battle.{side}_active: expected a team slot, got {active}")
+    return team
+
+
+def decode_battle_dict(data: Any, dex: Optional[Dex] = None) -> BattleState:
+    """Build a BattleState from a BATTLE dict"""
+    dex = dex or get_dex()
+    (my_team, opponent_team, my_pokemon, opponent_pokemon, my_active, opponent_active,
+     turn, weather, screens, opponent_moves) = _fields(data, BATTLE_SCHEMA, "battle")
+    my_team = _decode_team("my", my_team, my_pokemon, my_active, dex)
+    opponent_team = _decode_team("opponent", opponent_team, opponent_pokemon, opponent_active, dex)
+
+    state = BattleState(my_team[my_active], opponent_team[opponent_active], my_team, opponent_team)
+    state.turn_count = turn
+    if weather is not None:
+        weather_type, turns, permanent = _fields(weather, WEATHER_SCHEMA, "battle.weather")
+        if _WEATHER_TYPES[weather_type] is not WeatherType.NONE:
+            state.set_weather(_WEATHER_TYPES[weather_type], turns, permanent)
+    for index, screen in enumerate(screens):
+        side, effect, turns = _fields(screen, SCREEN_SCHEMA, f"battle.screens[{index}]")
+        state.add_screen_effect(effect, turns, side)
+    for index, move in enumerate(opponent_moves):
+        # Names are taken as given: the opponent may use moves the dex does not have
+        if not isinstance(move, str):
+            move = decode_move(move, dex, f"battle.opponent_moves[{index}]").name
+        state.record_move_used("opponent", move)
+    return state
+
+
+# Encoding
+def encode_move(move: Move, dex: Optional[Dex] = None) -> Any:
+    """A Move as its dex id, or inline if the dex does not have it"""
+    dex = dex or get_dex()
+    move_id = dex.move_id(move.name)
+    if move_id is not None and dex.moves[move_id] == move:
+        return move_id
+    data = {"name": move.name, "type": move.type, "power": move.power, "accuracy": move.accuracy,
+            "pp": move.pp, "damage_class": move.damage_class, "priority": move.priority}
+    if move.effect is not None:
+        data["effect"] = move.effect
+    return data
+
+
+def encode_pokemon_dict(pokemon: Pokemon, dex: Optional[Dex] = None) -> Dict:
+    """A Pokemon as a POKEMON dict"""
+    return _encode_pokemon(pokemon, dex or get_dex(), pokemon.current_hp, pokemon.status_condition)
+
+
+def _encode_pokemon(pokemon: Pokemon, dex: Dex, hp: Optional[int], status: Optional[str]) -> Dict:
+    species = dex.species.get(pokemon.species_id) if pokemon.species_id is not None else None
+    if species is not None and species.name == pokemon.name and species.stats == pokemon.stats and \
+            species.types == pokemon.types:
+        species_data = species.id
+    else:
+        stats = pokemon.stats
+        species_data = {"name": pokemon.name, "types": list(pokemon.types),
+                        "stats": [getattr(stats, name) for name in _STAT_NAMES]}
+    data = {"species": species_data, "moves": [encode_move(move, dex) for move in pokemon.moves],
+            "level": pokemon.level}
+    if hp is not None and hp != pokemon.calculate_hp():
+        data["hp"] = hp
+    if status is not None:
+        data["status"] = status
+    if pokemon.item is not None:
+        data["item"] = pokemon.item
+    if pokemon.nature is not None:
+        data["nature"] = pokemon.nature
+    return data
+
+
+def encode_battle_dict(state: BattleState, dex: Optional[Dex] = None) -> Dict:
+    """A BattleState as a BATTLE dict (HP and status come from the team arrays)"""
+    dex = dex or get_dex()
+    data = {}
+    for prefix, side in (("my", "ally"), ("opponent", "opponent")):
+        team = state.get_team(side)
+        data[f"{prefix}_team"] = [
+            _encode_pokemon(pokemon, dex, state.get_hp(side, index), state.get_status(side, index))
+            for index, pokemon in enumerate(team.members)]
+        data[f"{prefix}_active"] = team.active
+    data["turn"] = state.turn_count
+    field = state.field
+    if field.weather_code:
+        data["weather"] = {"type": field.weather_type.value, "turns": field.weather_turns,
+                           "permanent": field.weather_permanent}
+    screens = [{"side": screen.affects_side, "effect": screen.effect_name, "turns": screen.turns_remaining}
+               for screen in state.screens]
+    if screens:
+        data["screens"] = screens
+    # Only the active opponent's moves: decoding gives every listed move to it
+    log = state.event_log
+    opponent_moves = [name for stint in log.stints_by_side[SIDE_CODES["opponent"]]
+                      if log.stint_roster[stint] == state.opponent_team.active
+                      for name, _ in PokemonBattleHistory(log, stint).moves_used]
+    if opponent_moves:
+        data["opponent_moves"] = opponent_moves
+    return data
@@ -0,0 +1,373 @@
+"""
+Compact append-only battle event log.
+
+Events are stored column-wise in int arrays (turn, kind, side and three
+integer arguments) with strings interned into a shared name table, so a
+long battle costs 18 bytes per event instead of a tuple per record.
+The battle history accessors on BattleState are read-only views over it.
+"""
+from array import array
+from enum import IntEnum
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import numpy as np
+from pokemon import Pokemon
+from battle.field_state import WEATHER_BY_CODE, MAX_SCREEN_TURNS
+from battle.team_state import status_code, STATUS_CONDITIONS
+
+class EventType(IntEnum):
+    """Kinds of events recorded in the log"""
+    TURN = 0      # turn advanced (turn column holds the new turn number)
+    MOVE = 1      # arg0 = move name id, arg1 = target name id
+    DAMAGE = 2    # arg0 = damage taken, arg1 = damage dealt
+    SWITCH = 3    # arg0 = roster index of the Pokemon switched in
+    KO = 4
+    WEATHER = 5   # arg0 = weather code (-1 when cleared), arg1 = duration, arg2 = permanent
+    SCREEN = 6    # arg0 = effect name id, arg1 = duration
+
+SIDES = ("ally", "opponent")
+SIDE_CODES = {"ally": 0, "opponent": 1}
+NO_SIDE = -1
+
+
+class MoveHistoryView(Sequence):
+    """Read-only sequence of move tuples for one side, backed by the event log"""
+
+    def __init__(self, log: 'BattleEventLog', side: int, start: int = 0,
+                 stop: Optional[int] = None, with_target: bool = False):
+        self._log = log
+        self._side = side
+        self._start = start
+        self._stop = stop
+        self._with_target = with_target
+
+    def _bounds(self) -> Tuple[int, int]:
+        stop = self._stop if self._stop is not None else len(self._log.move_events[self._side])
+        return self._start, stop
+
+    def __len__(self) -> int:
+        start, stop = self._bounds()
+        return stop - start
+
+    def _item(self, position: int) -> tuple:
+        log = self._log
+        event = log.move_events[self._side][position]
+        move_name = log.names[log.arg0[event]]
+        if self._with_target:
+            return (move_name, log.turn[event], log.names[log.arg1[event]])
+        return (move_name, log.turn[event])
+
+    def __getitem__(self, index):
+        start, stop = self._bounds()
+        if isinstance(index, slice):
+            return [self._item(start + i) for i in range(*index.indices(stop - start))]
+        if index < 0:
+            index += stop - start
+        if not 0 <= index < stop - start:
+            raise IndexError("move history index out of range")
+        return self._item(start + index)
+
+    def __iter__(self) -> Iterator[tuple]:
+        start, stop = self._bounds()
+        for position in range(start, stop):
+            yield self._item(position)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (list, tuple, MoveHistoryView)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class PokemonBattleHistory:
+    """Tracks a Pokemon's battle history (a view over one stint in the event log)"""
+
+    def __init__(self, log: 'BattleEventLog', stint: int):
+        self._log = log
+        self._stint = stint
+
+    @property
+    def pokemon(self) -> Pokemon:
+        log = self._log
+        return log.roster[log.stint_side[self._stint]][log.stint_roster[self._stint]]
+
+    @property
+    def turn_switched_in(self) -> int:
+        return self._log.stint_turn_in[self._stint]
+
+    @property
+    def turn_switched_out(self) -> Optional[int]:
+        turn_out = self._log.stint_turn_out[self._stint]
+        return None if turn_out < 0 else turn_out
+
+    @property
+    def moves_used(self) -> MoveHistoryView:
+        """(move_name, turn) tuples for moves used during this stint"""
+        log = self._log
+        side = log.stint_side[self._stint]
+        start = log.stint_first_move[self._stint]
+        stop = start + log.stint_move_count[self._stint]
+        return MoveHistoryView(log, side, start, stop)
+
+    @property
+    def damage_taken(self) -> int:
+        return self._log.stint_damage_taken[self._stint]
+
+    @property
+    def damage_dealt(self) -> int:
+        return self._log.stint_damage_dealt[self._stint]
+
+    @property
+    def was_ko(self) -> bool:
+        return bool(self._log.stint_ko[self._stint])
+
+    def __repr__(self) -> str:
+        return (f"PokemonBattleHistory(pokemon={self.pokemon.name!r}, turn_switched_in={self.turn_switched_in}, "
+                f"turn_switched_out={self.turn_switched_out}, damage_taken={self.damage_taken}, "
+                f"damage_dealt={self.damage_dealt}, was_ko={self.was_ko})")
+
+
+class BattleEventLog:
+    """Columnar, append-only log of battle events"""
+
+    # Array attributes (single arrays, then per-side pairs), in serialization order
+    ARRAY_FIELDS = ("turn", "kind", "side", "arg0", "arg1", "arg2",
+                    "stint_side", "stint_roster", "stint_turn_in", "stint_turn_out", "stint_first_move",
+                    "stint_move_count", "stint_damage_taken", "stint_damage_dealt", "stint_ko")
+    ARRAY_PAIR_FIELDS = ("move_events", "stints_by_side", "start_hp", "start_status")
+    # Array attributes of signed bytes; the others are ints
+    BYTE_FIELDS = ("kind", "side", "stint_side", "stint_ko", "start_status")
+
+    def __init__(self, rosters: Tuple[List[Pokemon], List[Pokemon]], leads: Tuple[int, int], turn: int = 0,
+                 start: Optional[Tuple[Tuple[array, array], Tuple[array, array]]] = None):
+        """
+        Args:
+            rosters: Team member lists for each side; events refer to Pokemon by index into them
+            leads: Roster index of the active Pokemon on each side when logging starts
+            turn: Turn number when logging starts
+            start: (HP, status code) arrays of each side's roster when logging starts
+                (read from the Pokemon objects if not given)
+        """
+        # Event columns
+        self.turn = array('i')
+        self.kind = array('b')
+        self.side = array('b')
+        self.arg0 = array('i')
+        self.arg1 = array('i')
+        self.arg2 = array('i')
+
+        # Interned strings (move names, targets, screen names)
+        self.names: List[str] = []
+        self._name_ids: Dict[str, int] = {}
+
+        # Team members on each side (shared with the team state)
+        self.roster = rosters
+
+        # Event positions of MOVE events per side, for move history views
+        self.move_events = (array('i'), array('i'))
+
+        # Stint table: one row per time a Pokemon is on the field
+        self.stint_side = array('b')
+        self.stint_roster = array('i')
+        self.stint_turn_in = array('i')
+        self.stint_turn_out = array('i')
+        self.stint_first_move = array('i')
+        self.stint_move_count = array('i')
+        self.stint_damage_taken = array('i')
+        self.stint_damage_dealt = array('i')
+        self.stint_ko = array('b')
+        self.stints_by_side = (array('i'), array('i'))
+
+        # HP and status code of each roster member when logging starts (or when it joins
+        # the roster), so a replay can start from them
+        if start is None:
+            self.start_hp = (array('i'), array('i'))
+            self.start_status = (array('b'), array('b'))
+        else:
+            self.start_hp = (start[0][0][:], start[1][0][:])
+            self.start_status = (start[0][1][:], start[1][1][:])
+        self._cover_roster(0)
+        self._cover_roster(1)
+
+        self._open_stint(0, leads[0], turn)
+        self._open_stint(1, leads[1], turn)
+
+    def __len__(self) -> int:
+        return len(self.kind)
+
+    def copy(self, rosters: Tuple[List[Pokemon], List[Pokemon]]) -> 'BattleEventLog':
+        """Copy the log, attaching it to the given team member lists"""
+        log = BattleEventLog.__new__(BattleEventLog)
+        for name in self.ARRAY_FIELDS:
+            setattr(log, name, getattr(self, name)[:])
+        for name in self.ARRAY_PAIR_FIELDS:
+            setattr(log, name, tuple(column[:] for column in getattr(self, name)))
+        log.names = self.names[:]
+        log._name_ids = dict(self._name_ids)
+        log.roster = rosters
+        return log
+
+    def lead_indices(self) -> Tuple[int, int]:
+        """Roster index of the Pokemon that started on each side"""
+        return (self.stint_roster[self.stints_by_side[0][0]],
+                self.stint_roster[self.stints_by_side[1][0]])
+
+    def intern(self, name: str) -> int:
+        """Return the id of a string in the name table, adding it if needed"""
+        name_id = self._name_ids.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self.names.append(name)
+            self._name_ids[name] = name_id
+        return name_id
+
+    def _cover_roster(self, side: int):
+        """Record the starting HP and status of roster members that joined since the last call"""
+        hp = self.start_hp[side]
+        for pokemon in self.roster[side][len(hp):]:
+            hp.append(pokemon.current_hp)
+            self.start_status[side].append(status_code(pokemon.status_condition))
+
+    def start_of(self, side: int, roster_index: int) -> Tuple[int, Optional[str]]:
+        """HP and status of a roster member when logging started"""
+        self._cover_roster(side)
+        return self.start_hp[side][roster_index], STATUS_CONDITIONS[self.start_status[side][roster_index]]
+
+    def current_stint(self, side: int) -> int:
+        return self.stints_by_side[side][-1]
+
+    def _open_stint(self, side: int, roster_index: int, turn: int):
+        self.stints_by_side[side].append(len(self.stint_side))
+        self.stint_side.append(side)
+        self.stint_roster.append(roster_index)
+        self.stint_turn_in.append(turn)
+        self.stint_turn_out.append(-1)
+        self.stint_first_move.append(len(self.move_events[side]))
+        self.stint_move_count.append(0)
+        self.stint_damage_taken.append(0)
+        self.stint_damage_dealt.append(0)
+        self.stint_ko.append(0)
+
+    def _append(self, turn: int, kind: EventType, side: int, arg0: int = 0, arg1: int = 0, arg2: int = 0):
+        self.turn.append(turn)
+        self.kind.append(kind)
+        self.side.append(side)
+        self.arg0.append(arg0)
+        self.arg1.append(arg1)
+        self.arg2.append(arg2)
+
+    # Recording
+    def log_turn(self, turn: int):
+        self._append(turn, EventType.TURN, NO_SIDE)
+
+    def log_move(self, turn: int, side: int, move_name: str, target: str):
+        self.move_events[side].append(len(self.kind))
+        self._append(turn, EventType.MOVE, side, self.intern(move_name), self.intern(target))
+        self.stint_move_count[self.current_stint(side)] += 1
+
+    def log_damage(self, turn: int, side: int, damage_taken: int, damage_dealt: int):
+        self._append(turn, EventType.DAMAGE, side, damage_taken, damage_dealt)
+        stint = self.current_stint(side)
+        self.stint_damage_taken[stint] += damage_taken
+        self.stint_damage_dealt[stint] += damage_dealt
+
+    def log_switch(self, turn: int, side: int, roster_index: int):
+        self._cover_roster(side)
+        self._append(turn, EventType.SWITCH, side, roster_index)
+        self.stint_turn_out[self.current_stint(side)] = turn
+        self._open_stint(side, roster_index, turn)
+
+    def log_ko(self, turn: int, side: int):
+        self._append(turn, EventType.KO, side)
+        self.stint_ko[self.current_stint(side)] = 1
+
+    def log_weather(self, turn: int, weather_code: int, duration: int = 0, permanent: bool = False):
+        self._append(turn, EventType.WEATHER, NO_SIDE, weather_code, duration, int(permanent))
+
+    def log_screen(self, turn: int, side: int, effect_name: str, duration: int):
+        self._append(turn, EventType.SCREEN, side, self.intern(effect_name), duration)
+
+    def validate(self):
+        """
+        Check that the columns agree in length and every kind, side, name id, roster index
+        and stint refers to something that exists, raising ValueError if not (for decoded logs)
+        """
+        columns = [(name, getattr(self, name)) for name in self.ARRAY_FIELDS]
+        columns += [(name, column) for name in self.ARRAY_PAIR_FIELDS for column in getattr(self, name)]
+        for name, column in columns:
+            if column.typecode != ('b' if name in self.BYTE_FIELDS else 'i'):
+                raise ValueError(f"Event log column {name} has type code {column.typecode!r}")
+        events = len(self.kind)
+        for name in ("turn", "side", "arg0", "arg1", "arg2"):
+            if len(getattr(self, name)) != events:
+                raise ValueError(f"Event log column {name} has {len(getattr(self, name))} rows, expected {events}")
+        stints = len(self.stint_side)
+        for name in self.ARRAY_FIELDS:
+            if not name.startswith("stint_"):
+                continue
+            if len(getattr(self, name)) != stints:
+                raise ValueError(f"Event log column {name} has {len(getattr(self, name))} rows, expected {stints}")
+        names = len(self.names)
+        roster_sizes = np.array([len(roster) for roster in self.roster])
+
+        kinds, sides, arg0, arg1 = (np.frombuffer(column, dtype=column.typecode)
+                                    for column in (self.kind, self.side, self.arg0, self.arg1))
+        bad = (kinds < 0) | (kinds >= len(EventType))
+        sideless = (kinds == EventType.TURN) | (kinds == EventType.WEATHER)
+        bad |= np.where(sideless, sides != NO_SIDE, (sides != 0) & (sides != 1))
+        named = (kinds == EventType.MOVE) | (kinds == EventType.SCREEN)
+        bad |= named & ((arg0 < 0) | (arg0 >= names))
+        bad |= (kinds == EventType.MOVE) & ((arg1 < 0) | (arg1 >= names))
+        bad |= (kinds == EventType.DAMAGE) & ((arg0 < 0) | (arg1 < 0))
+        bad |= (kinds == EventType.SWITCH) & ((arg0 < 0) | (arg0 >= roster_sizes[sides.clip(0, 1)]))
+        bad |= (kinds == EventType.WEATHER) & ((arg0 < -1) | (arg0 >= len(WEATHER_BY_CODE)) | (arg1 < 0))
+        bad |= (kinds == EventType.SCREEN) & ((arg1 < 0) | (arg1 > MAX_SCREEN_TURNS))
+        if bad.any():
+            position = int(np.argmax(bad))
+            raise ValueError(f"Event {position} (kind {kinds[position]}, side {sides[position]}) is out of range")
+
+        for side in (0, 1):
+            moves = np.frombuffer(self.move_events[side], dtype='i')
+            if len(moves) and (moves.min() < 0 or moves.max() >= events or (kinds[moves] != EventType.MOVE).any()
+                               or (sides[moves] != side).any()):
+                raise ValueError(f"Move index of side {side} refers to events that are not its moves")
+            if not self.stints_by_side[side]:
+                raise ValueError(f"Event log has no stint for side {side}")
+            for stint in self.stints_by_side[side]:
+                if not 0 <= stint < stints or self.stint_side[stint] != side:
+                    raise ValueError(f"Stint index of side {side} refers to stint {stint}, which is not its stint")
+            start_hp, start_status = self.start_hp[side], self.start_status[side]
+            if len(start_hp) != len(start_status) or len(start_hp) > roster_sizes[side]:
+                raise ValueError(f"Starting HP and status of side {side} do not match its roster")
+            if any(not 0 <= code < len(STATUS_CONDITIONS) for code in start_status):
+                raise ValueError(f"Starting status of side {side} has an unknown status code")
+
+        for stint in range(stints):
+            side = self.stint_side[stint]
+            if side not in (0, 1) or not 0 <= self.stint_roster[stint] < roster_sizes[side]:
+                raise ValueError(f"Stint {stint} refers to a Pokemon that is not in the roster")
+            first, count = self.stint_first_move[stint], self.stint_move_count[stint]
+            if first < 0 or count < 0 or first + count > len(self.move_events[side]):
+                raise ValueError(f"Stint {stint} refers to moves that are not in the log")
+
+    # Views
+    def move_history(self, side: int, with_target: bool = False) -> MoveHistoryView:
+        """All moves used by one side, oldest first"""
+        return MoveHistoryView(self, side, with_target=with_target)
+
+    def archived_histories(self, side: int) -> List[PokemonBattleHistory]:
+        """History views for every Pokemon that has left the field on a side"""
+        return [PokemonBattleHistory(self, stint) for stint in self.stints_by_side[side][:-1]]
+
+    def events(self, start: int = 0, stop: Optional[int] = None) -> Iterator[tuple]:
+        """Iterate raw events as (turn, kind, side, arg0, arg1, arg2) tuples"""
+        stop = len(self.kind) if stop is None else stop
+        for i in range(start, stop):
+            yield (self.turn[i], EventType(self.kind[i]), self.side[i],
+                   self.arg0[i], self.arg1[i], self.arg2[i])
+
+    def nbytes(self) -> int:
+        """Approximate size of the event columns in bytes"""
+        columns = (self.turn, self.kind, self.side, self.arg0, self.arg1, self.arg2)
+        return sum(column.itemsize * len(column) for column in columns)
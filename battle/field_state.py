@@ -0,0 +1,189 @@
+"""
+Fixed-size field state: weather and per-side screen effects.
+
+Weather is stored as an integer code plus a turn counter, and every
+(side, screen effect) pair owns one slot in a small array of turns
+remaining. Ticking a turn, checking a screen and copying the field are
+constant-time and do not build any intermediate lists.
+"""
+from array import array
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+class WeatherType(Enum):
+    """Weather conditions that can be active in battle"""
+    NONE = "none"
+    SUN = "sun"
+    RAIN = "rain"
+    SANDSTORM = "sandstorm"
+    HAIL = "hail"
+    SNOW = "snow"  # For newer generations
+    FOG = "fog"
+    HARSH_SUNLIGHT = "harsh_sunlight"
+    HEAVY_RAIN = "heavy_rain"
+    STRONG_WINDS = "strong_winds"
+
+@dataclass
+class WeatherCondition:
+    """Represents active weather in battle"""
+    weather_type: WeatherType
+    turns_remaining: int
+    is_permanent: bool = False  # For abilities like Drought
+
+@dataclass
+class ScreenEffect:
+    """Represents screen effects like Light Screen, Reflect, etc."""
+    effect_name: str
+    turns_remaining: int
+    affects_side: str  # "ally" or "opponent"
+
+# Stable integer codes for weather types (code 0 is no weather)
+WEATHER_BY_CODE: List[WeatherType] = list(WeatherType)
+WEATHER_CODES: Dict[WeatherType, int] = {weather: code for code, weather in enumerate(WEATHER_BY_CODE)}
+
+# Screen effects with a fixed slot. The table is shared by every battle and never grows;
+# other effects get a slot of their own field state (see FieldState.effect_slot)
+MAX_SCREEN_EFFECTS = 16
+# Longest screen duration; screen_turns holds signed 16-bit counters
+MAX_SCREEN_TURNS = 0x7FFF
+SCREEN_EFFECTS: Tuple[str, ...] = ("Light Screen", "Reflect", "Aurora Veil", "Safeguard", "Mist", "Tailwind",
+                                   "Lucky Chant")
+_SCREEN_SLOTS: Dict[str, int] = {name: slot for slot, name in enumerate(SCREEN_EFFECTS)}
+
+LIGHT_SCREEN = _SCREEN_SLOTS["Light Screen"]
+REFLECT = _SCREEN_SLOTS["Reflect"]
+AURORA_VEIL = _SCREEN_SLOTS["Aurora Veil"]
+
+FIELD_SIDES = ("ally", "opponent")
+_SIDE_OFFSETS = {"ally": 0, "opponent": MAX_SCREEN_EFFECTS}
+
+
+def screen_slot(effect_name: str) -> int:
+    """Get the fixed slot of a screen effect"""
+    slot = _SCREEN_SLOTS.get(effect_name)
+    if slot is None:
+        raise ValueError(f"Unknown screen effect: {effect_name!r}. Expected one of {SCREEN_EFFECTS}")
+    return slot
+
+
+class FieldState:
+    """Weather and screen counters for both sides of the field"""
+    __slots__ = ("weather_code", "weather_turns", "weather_permanent", "screen_turns", "screen_mask",
+                 "custom_screens")
+
+    def __init__(self):
+        self.weather_code = 0
+        self.weather_turns = 0
+        self.weather_permanent = False
+        # Turns remaining per (side, effect); ally slots first, then opponent slots
+        self.screen_turns = array('h', bytes(4 * MAX_SCREEN_EFFECTS))
+        # Bit i is set while screen_turns[i] > 0
+        self.screen_mask = 0
+        # Effects outside SCREEN_EFFECTS, in the slots after the fixed ones
+        self.custom_screens: Tuple[str, ...] = ()
+
+    def copy(self) -> 'FieldState':
+        """Copy the field state"""
+        field_copy = FieldState.__new__(FieldState)
+        field_copy.weather_code = self.weather_code
+        field_copy.weather_turns = self.weather_turns
+        field_copy.weather_permanent = self.weather_permanent
+        field_copy.screen_turns = self.screen_turns[:]
+        field_copy.screen_mask = self.screen_mask
+        field_copy.custom_screens = self.custom_screens
+        return field_copy
+
+    def tick(self):
+        """Count down weather and screens by one turn, expiring those that run out"""
+        if self.weather_code and not self.weather_permanent:
+            self.weather_turns -= 1
+            if self.weather_turns <= 0:
+                self.weather_code = 0
+                self.weather_turns = 0
+
+        mask = self.screen_mask
+        turns = self.screen_turns
+        while mask:
+            low_bit = mask & -mask
+            index = low_bit.bit_length() - 1
+            turns[index] -= 1
+            if turns[index] <= 0:
+                turns[index] = 0
+                self.screen_mask ^= low_bit
+            mask ^= low_bit
+
+    # Weather
+    @property
+    def weather_type(self) -> WeatherType:
+        return WEATHER_BY_CODE[self.weather_code]
+
+    def set_weather(self, weather_type: WeatherType, duration: int, permanent: bool = False):
+        self.weather_code = WEATHER_CODES[weather_type]
+        self.weather_turns = duration
+        self.weather_permanent = permanent
+
+    def clear_weather(self):
+        self.weather_code = 0
+        self.weather_turns = 0
+        self.weather_permanent = False
+
+    # Screens
+    def set_screen(self, side: str, slot: int, duration: int):
+        """Set (or replace) a screen effect on a side"""
+        index = _SIDE_OFFSETS[side] + slot
+        if duration > 0:
+            self.screen_turns[index] = duration
+            self.screen_mask |= 1 << index
+        else:
+            self.screen_turns[index] = 0
+            self.screen_mask &= ~(1 << index)
+
+    def effect_slot(self, effect_name: str, add: bool = False) -> int:
+        """
+        Get the slot of a screen effect on this field, or -1 if it has none.
+        Args:
+            add: Give an effect outside SCREEN_EFFECTS a slot of this field if it has none
+        """
+        slot = _SCREEN_SLOTS.get(effect_name)
+        if slot is not None:
+            return slot
+        if effect_name in self.custom_screens:
+            return len(SCREEN_EFFECTS) + self.custom_screens.index(effect_name)
+        if not add:
+            return -1
+        slot = len(SCREEN_EFFECTS) + len(self.custom_screens)
+        if slot >= MAX_SCREEN_EFFECTS:
+            raise ValueError(f"Cannot track more than {MAX_SCREEN_EFFECTS} distinct screen effects in one battle")
+        self.custom_screens += (effect_name,)
+        return slot
+
+    def screen_turns_remaining(self, side: str, slot: int) -> int:
+        return self.screen_turns[_SIDE_OFFSETS[side] + slot]
+
+    def has_screen(self, side: str, slot: int) -> bool:
+        return (self.screen_mask >> (_SIDE_OFFSETS[side] + slot)) & 1 == 1
+
+    def swap_sides(self):
+        """Swap the ally and opponent screens (for viewing the field from the other side)"""
+        turns = self.screen_turns
+        turns[:MAX_SCREEN_EFFECTS], turns[MAX_SCREEN_EFFECTS:] = turns[MAX_SCREEN_EFFECTS:], turns[:MAX_SCREEN_EFFECTS]
+        low = self.screen_mask & ((1 << MAX_SCREEN_EFFECTS) - 1)
+        self.screen_mask = (self.screen_mask >> MAX_SCREEN_EFFECTS) | (low << MAX_SCREEN_EFFECTS)
+
+    @property
+    def active_screen_count(self) -> int:
+        return bin(self.screen_mask).count("1")
+
+    def screen_effects(self, side: Optional[str] = None) -> List[ScreenEffect]:
+        """Build ScreenEffect snapshots of the active screens, optionally for one side"""
+        effects = []
+        for field_side in FIELD_SIDES:
+            if side is not None and field_side != side:
+                continue
+            offset = _SIDE_OFFSETS[field_side]
+            for slot, effect_name in enumerate(SCREEN_EFFECTS + self.custom_screens):
+                turns = self.screen_turns[offset + slot]
+                if turns > 0:
+                    effects.append(ScreenEffect(effect_name, turns, field_side))
+        return effects
@@ -0,0 +1,265 @@
+"""
+Monte Carlo Tree Search engine.
+
+Turns are simultaneous, so each tree node keeps separate UCT statistics
+for our moves and the opponent's moves (decoupled UCT) and children are
+indexed by the joint action. The tree is open-loop: every iteration
+replays turns from the root with battle.simulator, so chance outcomes
+(order ties, accuracy, crits, damage rolls) are averaged inside the node
+statistics instead of branching the tree. Node statistics live in a preallocated pool of
+flat arrays rather than one object per node.
+
+With opponent_prior_weight > 0, the opponent's choices for its current
+Pokemon are guided by the next-move distribution of battle.move_predictor:
+untried moves are tried most likely first and a PUCT-style prior term is
+added to their UCT score.
+"""
+import math
+import random
+import time
+from array import array
+from typing import Optional
+from battle.battle_state import BattleState
+from battle.move_predictor import next_move_distribution
+from battle.search import SearchResult, EVAL_MIN, EVAL_MAX, evaluate
+from battle.simulator import (
+    BattleSimulator, Policy, DAMAGE_ROLLS, greedy_policy, random_policy, team_defeated
+)
+
+SIDE_ALLY = 0
+SIDE_OPPONENT = 1
+NO_CHILD = -1
+
+
+# Rollout policies share the simulator's policy signature
+greedy_rollout_policy = greedy_policy
+random_rollout_policy = random_policy
+
+
+class NodePool:
+    """Struct-of-arrays storage for tree nodes, grown by doubling"""
+
+    def __init__(self, width: int, capacity: int = 1024):
+        """
+        Args:
+            width: Maximum number of moves per side
+            capacity: Number of nodes to preallocate
+        """
+        self.width = width
+        self.size = 0
+        self.capacity = 0
+        self.visits = array('i')
+        # Per node and side: visits and summed value for each move
+        self.action_visits = array('i')
+        self.action_values = array('d')
+        # Per node: child index for each joint action
+        self.children = array('i')
+        self._grow(capacity)
+
+    def _grow(self, capacity: int):
+        extra = capacity - self.capacity
+        width = self.width
+        self.visits.extend([0] * extra)
+        self.action_visits.extend([0] * (extra * 2 * width))
+        self.action_values.extend([0.0] * (extra * 2 * width))
+        self.children.extend([NO_CHILD] * (extra * width * width))
+        self.capacity = capacity
+
+    def new_node(self) -> int:
+        if self.size == self.capacity:
+            self._grow(self.capacity * 2)
+        index = self.size
+        self.size += 1
+        return index
+
+    def stat_index(self, node: int, side: int, action: int) -> int:
+        return (node * 2 + side) * self.width + action
+
+    def child_index(self, node: int, my_action: int, opponent_action: int) -> int:
+        return (node * self.width + my_action) * self.width + opponent_action
+
+
+class MCTSSearch:
+    """Decoupled-UCT Monte Carlo Tree Search with a pluggable rollout policy"""
+
+    def __init__(self, iterations: Optional[int] = 1000, time_budget_ms: Optional[float] = None,
+                 exploration: float = 1.4, rollout_depth: int = 10,
+                 rollout_policy: Policy = greedy_rollout_policy,
+                 seed: Optional[int] = None, damage_rolls=DAMAGE_ROLLS,
+                 rng: Optional[random.Random] = None, opponent_prior_weight: float = 0.0):
+        """
+        Args:
+            iterations: Number of simulations to run (None to run until the time budget or deadline)
+            time_budget_ms: Stop after this many milliseconds
+            exploration: UCT exploration constant
+            rollout_depth: Maximum number of turns played out from a new leaf
+            rollout_policy: Move selection used during rollouts
+            seed: Seed for the engine's random number generator
+            damage_rolls: Random damage multipliers sampled each attack
+            rng: Random number generator to draw from (overrides seed), e.g. a stream from utils.rng
+            opponent_prior_weight: Weight of the predicted next-move distribution in the
+                opponent's move selection (0 for plain decoupled UCT)
+        """
+        self.iterations = iterations
+        self.time_budget_ms = time_budget_ms
+        self.exploration = exploration
+        self.rollout_depth = rollout_depth
+        self.rollout_policy = rollout_policy
+        self.rng = rng if rng is not None else random.Random(seed)
+        self.simulator = BattleSimulator(rng=self.rng, damage_rolls=damage_rolls)
+        self.opponent_prior_weight = opponent_prior_weight
+        self.pool: Optional[NodePool] = None
+        self._opponent_prior = None
+
+    def search(self, state: BattleState, deadline: Optional[float] = None) -> SearchResult:
+        """
+        Run simulations from the current position and return the most visited move.
+        Args:
+            state: Battle to search (not modified; simulations run on clones)
+            deadline: Absolute time.perf_counter() deadline, overriding time_budget_ms
+        """
+        start = time.perf_counter()
+        if deadline is None and self.time_budget_ms is not None:
+            deadline = start + self.time_budget_ms / 1000
+        if self.iterations is None and deadline is None:
+            raise ValueError("MCTS needs an iteration count, a time budget or a deadline")
+        self.simulator.damage_cache.clear()
+
+        root_state = state.clone()
+        root_moves = root_state.my_pokemon.moves
+        result = SearchResult(best_move=root_moves[0].name if root_moves else None, engine="mcts")
+        if not root_moves:
+            return result
+
+        members = root_state.ally_team.members + root_state.opponent_team.members
+        width = max(1, max(len(pokemon.moves) for pokemon in members))
+        capacity = min(self.iterations + 1, 1 << 16) if self.iterations else 1024
+        pool = self.pool = NodePool(width, capacity)
+        root = pool.new_node()
+
+        # Prior over the moves of the opponent's current Pokemon (aligned with its move list)
+        self._opponent_prior = None
+        if self.opponent_prior_weight > 0:
+            opponent = root_state.opponent_pokemon
+            distribution = next_move_distribution(root_state)
+            self._opponent_prior = (opponent, [distribution.get(move.name, 0.0) for move in opponent.moves])
+
+        iterations = 0
+        max_depth = 0
+        while self.iterations is None or iterations < self.iterations:
+            if deadline is not None and time.perf_counter() >= deadline:
+                result.completed = self.iterations is None
+                break
+            max_depth = max(max_depth, self._simulate(root_state.clone(), root))
+            iterations += 1
+
+        for action, move in enumerate(root_moves):
+            stat = pool.stat_index(root, SIDE_ALLY, action)
+            visits = pool.action_visits[stat]
+            result.move_visits[move.name] = visits
+            if visits:
+                result.move_scores[move.name] = pool.action_values[stat] / visits
+        best = max(range(len(root_moves)),
+                   key=lambda action: pool.action_visits[pool.stat_index(root, SIDE_ALLY, action)])
+        result.best_move = root_moves[best].name
+        result.score = result.move_scores.get(result.best_move, 0.0)
+        result.iterations = iterations
+        result.depth = max_depth
+        result.nodes = pool.size
+        result.elapsed_ms = (time.perf_counter() - start) * 1000
+        return result
+
+    def _simulate(self, state: BattleState, root: int) -> int:
+        """Run one selection/expansion/rollout/backpropagation pass and return the tree depth reached"""
+        pool = self.pool
+        path = []
+        node = root
+        while True:
+            if team_defeated(state, "opponent"):
+                value = EVAL_MAX
+                break
+            if team_defeated(state, "ally"):
+                value = EVAL_MIN
+                break
+            my_moves = state.my_pokemon.moves
+            opponent_moves = state.opponent_pokemon.moves
+            my_action = self._select(node, SIDE_ALLY, len(my_moves))
+            prior = self._opponent_prior
+            opponent_action = self._select(node, SIDE_OPPONENT, len(opponent_moves),
+                                           prior[1] if prior is not None and state.opponent_pokemon is prior[0] else None)
+            path.append((node, my_action, opponent_action))
+            self.simulator.resolve_turn(state, my_moves[my_action] if my_moves else None,
+                                      opponent_moves[opponent_action] if opponent_moves else None)
+
+            child_slot = pool.child_index(node, my_action, opponent_action)
+            child = pool.children[child_slot]
+            if child == NO_CHILD:
+                pool.children[child_slot] = pool.new_node()
+                value = self._rollout(state)
+                break
+            node = child
+
+        for node, my_action, opponent_action in path:
+            pool.visits[node] += 1
+            stat = pool.stat_index(node, SIDE_ALLY, my_action)
+            pool.action_visits[stat] += 1
+            pool.action_values[stat] += value
+            stat = pool.stat_index(node, SIDE_OPPONENT, opponent_action)
+            pool.action_visits[stat] += 1
+            pool.action_values[stat] -= value
+        return len(path)
+
+    def _select(self, node: int, side: int, count: int, prior=None) -> int:
+        """
+        UCT choice among the first `count` moves of one side (untried moves first).
+        With a prior (probability per move), untried moves go most likely first
+        and each move's score gets a bonus proportional to its prior.
+        """
+        if count <= 1:
+            return 0
+        pool = self.pool
+        base = pool.stat_index(node, side, 0)
+        visits = pool.action_visits
+        untried = [action for action in range(count) if visits[base + action] == 0]
+        if untried:
+            if prior is not None:
+                return max(untried, key=lambda action: prior[action])
+            return untried[self.rng.randrange(len(untried))]
+
+        log_visits = math.log(pool.visits[node])
+        values = pool.action_values
+        prior_scale = self.opponent_prior_weight * math.sqrt(pool.visits[node]) if prior is not None else 0.0
+        best_action, best_score = 0, -math.inf
+        for action in range(count):
+            n = visits[base + action]
+            score = values[base + action] / n + self.exploration * math.sqrt(log_visits / n)
+            if prior_scale:
+                score += prior_scale * prior[action] / (1 + n)
+            if score > best_score:
+                best_action, best_score = action, score
+        return best_action
+
+    def _rollout(self, state: BattleState) -> float:
+        """Play out turns with the rollout policy and evaluate the final position"""
+        policy = self.rollout_policy
+        for _ in range(self.rollout_depth):
+            if team_defeated(state, "opponent"):
+                return EVAL_MAX
+            if team_defeated(state, "ally"):
+                return EVAL_MIN
+            my_moves = state.my_pokemon.moves
+            opponent_moves = state.opponent_pokemon.moves
+            my_move = policy(state, "ally", my_moves, self.rng) if my_moves else None
+            opponent_move = policy(state, "opponent", opponent_moves, self.rng) if opponent_moves else None
+            self.simulator.resolve_turn(state, my_move, opponent_move)
+        if team_defeated(state, "opponent"):
+            return EVAL_MAX
+        if team_defeated(state, "ally"):
+            return EVAL_MIN
+        return evaluate(state)
+
+
+def mcts_search(state: BattleState, iterations: Optional[int] = 1000, time_budget_ms: Optional[float] = None,
+                seed: Optional[int] = None, **options) -> SearchResult:
+    """Run a Monte Carlo Tree Search from the current position"""
+    return MCTSSearch(iterations=iterations, time_budget_ms=time_budget_ms, seed=seed, **options).search(state)
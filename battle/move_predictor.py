@@ -0,0 +1,146 @@
+"""
+Incremental n-gram predictor of the opponent's next move.
+
+For each opponent Pokemon, the model counts which move followed every
+context of the last 0..order moves it used, so recording a move is
+order + 1 dict increments. The next-move distribution interpolates the
+contexts Witten-Bell style from the shortest to the longest and bottoms
+out in a prior: how likely the species is to carry each move under the
+moveset belief (battle.opponent_model, built from corpus usage
+statistics), or uniform over its known moves when its species has no
+learnset.
+
+Models are copied on write, so cloning a BattleState for search only
+copies a small dict.
+"""
+from typing import Dict, Optional, Set, Tuple
+from pokemon import Pokemon
+
+# Moves of context the predictor conditions on
+ORDER = 2
+
+
+class MoveSequenceModel:
+    """Next-move counts after each recent-move context of one Pokemon"""
+
+    __slots__ = ("order", "counts", "totals", "history")
+
+    def __init__(self, order: int = ORDER):
+        self.order = order
+        self.counts: Dict[Tuple[str, ...], Dict[str, int]] = {}
+        self.totals: Dict[Tuple[str, ...], int] = {}
+        self.history: Tuple[str, ...] = ()
+
+    def observe(self, move_name: str):
+        """Count the move after each context the history ends with"""
+        history = self.history
+        counts = self.counts
+        totals = self.totals
+        for length in range(min(self.order, len(history)) + 1):
+            context = history[len(history) - length:]
+            following = counts.get(context)
+            if following is None:
+                following = counts[context] = {}
+            following[move_name] = following.get(move_name, 0) + 1
+            totals[context] = totals.get(context, 0) + 1
+        self.history = (history + (move_name,))[-self.order:] if self.order else ()
+
+    def distribution(self, prior: Dict[str, float]) -> Dict[str, float]:
+        """
+        Probability of each move being used next.
+        Args:
+            prior: Non-negative weight of each move before any counts (normalized here)
+        """
+        moves = dict.fromkeys(prior)
+        moves.update(dict.fromkeys(self.counts.get((), ())))
+        if not moves:
+            return {}
+        total = sum(prior.values())
+        if total > 0:
+            probabilities = {move: prior.get(move, 0.0) / total for move in moves}
+        else:
+            probabilities = {move: 1 / len(moves) for move in moves}
+
+        history = self.history
+        for length in range(len(history) + 1):
+            context = history[len(history) - length:]
+            following = self.counts.get(context)
+            if following is None:
+                # Longer contexts end with this one, so they were never seen either
+                break
+            distinct = len(following)
+            denominator = self.totals[context] + distinct
+            probabilities = {move: (following.get(move, 0) + distinct * probability) / denominator
+                             for move, probability in probabilities.items()}
+        return probabilities
+
+    def support(self) -> Tuple[Tuple[str, ...], int]:
+        """The longest context with counts and how often it was seen"""
+        history = self.history
+        best = ((), self.totals.get((), 0))
+        for length in range(1, len(history) + 1):
+            context = history[len(history) - length:]
+            count = self.totals.get(context)
+            if count is None:
+                break
+            best = (context, count)
+        return best
+
+    def copy(self) -> 'MoveSequenceModel':
+        model = MoveSequenceModel(self.order)
+        model.counts = {context: dict(following) for context, following in self.counts.items()}
+        model.totals = dict(self.totals)
+        model.history = self.history
+        return model
+
+
+class OpponentMovePredictor:
+    """Move sequence models for each opponent Pokemon seen in a battle"""
+
+    def __init__(self, order: int = ORDER):
+        self.order = order
+        self._models: Dict[str, MoveSequenceModel] = {}
+        # Models this predictor may update in place; the rest are shared with copies
+        self._owned: Set[str] = set()
+
+    def model(self, pokemon: Pokemon) -> Optional[MoveSequenceModel]:
+        return self._models.get(pokemon.name)
+
+    def observe(self, pokemon: Pokemon, move_name: str):
+        """Record that a Pokemon used a move"""
+        key = pokemon.name
+        model = self._models.get(key)
+        if model is None:
+            model = self._models[key] = MoveSequenceModel(self.order)
+            self._owned.add(key)
+        elif key not in self._owned:
+            model = self._models[key] = model.copy()
+            self._owned.add(key)
+        model.observe(move_name)
+
+    def distribution(self, pokemon: Pokemon, prior: Dict[str, float]) -> Dict[str, float]:
+        model = self._models.get(pokemon.name)
+        if model is None:
+            model = MoveSequenceModel(self.order)
+        return model.distribution(prior)
+
+    def copy(self) -> 'OpponentMovePredictor':
+        predictor = OpponentMovePredictor(self.order)
+        predictor._models = dict(self._models)
+        # Both sides now share every model and copy it before their next update
+        self._owned = set()
+        return predictor
+
+
+def move_prior(state) -> Dict[str, float]:
+    """Prior weight of each move of the opponent's active Pokemon"""
+    opponent = state.opponent_pokemon
+    belief = state.opponent_model.belief(opponent)
+    if belief is not None:
+        return belief.move_probabilities()
+    return {move.name: 1.0 for move in opponent.moves}
+
+
+def next_move_distribution(state) -> Dict[str, float]:
+    """Probability of each move being the opponent active Pokemon's next move"""
+    return state.move_predictor.distribution(state.opponent_pokemon, move_prior(state))
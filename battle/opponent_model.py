@@ -0,0 +1,242 @@
+"""
+Bayesian belief over the opponent's movesets.
+
+For each species a candidate table lists every moveset of up to
+MOVESET_SIZE moves from its learnset (pokedata.learnsets) as a bitmask
+over the learnset (cut to its MAX_CANDIDATE_MOVES most used moves;
+other moves are treated as unexpected when revealed), with a prior from usage rates: each move is included
+independently with its usage rate, conditioned on the set size. Usage
+rates come from the usage index (pokedata.usage_ingest) when it has the
+species, otherwise from the learnset file. Tables
+are built once per species and shared. Revealing a move keeps only the
+candidates whose mask contains it, so an update is one vectorized AND
+over the table, and marginal move and move-type probabilities are
+matrix-vector products.
+
+Beliefs are immutable, so copying an OpponentModel (e.g. when a
+BattleState is cloned for search) only copies a small dict.
+"""
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import chain, combinations
+from math import comb
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import numpy as np
+from pokemon import Pokemon
+from pokedata.dex import get_dex
+from pokedata.learnsets import get_learnsets
+from pokedata.usage_ingest import get_usage_index
+
+# Moves a Pokemon carries
+MOVESET_SIZE = 4
+# Usage rates are clamped away from 0 and 1 so every learnable set stays possible
+USAGE_FLOOR = 0.01
+# Learnset moves a candidate table covers, most used first: C(24, 4) is 10,626 candidates,
+# and masks are int64, so this can never exceed 63
+MAX_CANDIDATE_MOVES = 24
+
+
+@dataclass(frozen=True, eq=False)
+class CandidateTable:
+    """Every candidate moveset of one species with its prior probability"""
+    species_id: int
+    move_ids: Tuple[int, ...]     # The learnset; bit i of a mask is move_ids[i]
+    move_names: Tuple[str, ...]
+    masks: np.ndarray             # (candidates,) int64 bitmasks over the learnset
+    contains: np.ndarray          # (candidates, learnset) float, 1 where the set has the move
+    types: Tuple[str, ...]        # Lowercase move types found in the learnset
+    has_type: np.ndarray          # (candidates, types) float, 1 where the set has a move of the type
+    prior: np.ndarray             # (candidates,) probabilities
+    index: Dict[int, int] = field(default_factory=dict)  # Move id -> bit
+
+    def __len__(self) -> int:
+        return len(self.masks)
+
+
+def _usage_rates(species_id: int, move_ids: Tuple[int, ...]) -> List[float]:
+    """Share of the species' sets running each move, from the usage index if it knows the species"""
+    dex = get_dex()
+    usage = get_usage_index()
+    species = dex.get_species(species_id).name
+    if usage is not None and usage.has_species(species):
+        return [usage.move_frequency(species, dex.get_move(move_id).name) for move_id in move_ids]
+    learnsets = get_learnsets()
+    return [learnsets.usage(species_id, move_id) for move_id in move_ids]
+
+
+@lru_cache(maxsize=None)
+def candidate_table(species_id: Optional[int]) -> Optional[CandidateTable]:
+    """Build (once) the candidate table of a species, or None if it has no learnset"""
+    learnsets = get_learnsets()
+    move_ids = learnsets.learnset(species_id) if species_id is not None else ()
+    if not move_ids:
+        return None
+    dex = get_dex()
+    rates = _usage_rates(species_id, move_ids)
+    if len(move_ids) > MAX_CANDIDATE_MOVES:
+        kept = sorted(range(len(move_ids)), key=lambda bit: -rates[bit])[:MAX_CANDIDATE_MOVES]
+        move_ids = tuple(move_ids[bit] for bit in kept)
+        rates = [rates[bit] for bit in kept]
+    count = len(move_ids)
+    size = min(MOVESET_SIZE, count)
+
+    rows = comb(count, size)
+    combos = np.fromiter(chain.from_iterable(combinations(range(count), size)), dtype=np.int64,
+                         count=rows * size).reshape(rows, size)
+    contains = np.zeros((rows, count))
+    contains[np.arange(rows)[:, None], combos] = 1.0
+    masks = (np.int64(1) << combos).sum(axis=1)
+
+    # Sets of equal size share the product of (1 - rate), so the prior is proportional to the odds product
+    rates = np.clip(rates, USAGE_FLOOR, 1 - USAGE_FLOOR)
+    log_prior = contains @ np.log(rates / (1 - rates))
+    prior = np.exp(log_prior - log_prior.max())
+    prior /= prior.sum()
+
+    moves = [dex.get_move(move_id) for move_id in move_ids]
+    types = tuple(sorted({move.type.lower() for move in moves}))
+    type_columns = np.array([[1.0 if move.type.lower() == move_type else 0.0 for move_type in types]
+                             for move in moves])
+    has_type = np.minimum(1.0, contains @ type_columns)
+
+    return CandidateTable(
+        species_id=species_id,
+        move_ids=tuple(move_ids),
+        move_names=tuple(move.name for move in moves),
+        masks=masks,
+        contains=contains,
+        types=types,
+        has_type=has_type,
+        prior=prior,
+        index={move_id: bit for bit, move_id in enumerate(move_ids)},
+    )
+
+
+class MovesetBelief:
+    """Posterior over one opponent species' candidate movesets"""
+
+    __slots__ = ("table", "probabilities", "revealed", "unexpected", "_move_probabilities", "_type_probabilities")
+
+    def __init__(self, table: CandidateTable, probabilities: np.ndarray, revealed: int = 0,
+                 unexpected: FrozenSet[str] = frozenset()):
+        """
+        Args:
+            table: Candidate movesets of the species
+            probabilities: Probability of each candidate
+            revealed: Bitmask of revealed learnset moves
+            unexpected: Revealed moves that are not in the learnset
+        """
+        self.table = table
+        self.probabilities = probabilities
+        self.revealed = revealed
+        self.unexpected = unexpected
+        self._move_probabilities: Optional[Dict[str, float]] = None
+        self._type_probabilities: Optional[Dict[str, float]] = None
+
+    @classmethod
+    def prior(cls, table: CandidateTable) -> 'MovesetBelief':
+        return _prior_belief(table)
+
+    def observe(self, move_name: str) -> 'MovesetBelief':
+        """Belief after seeing the move (self if nothing changes)"""
+        table = self.table
+        move_id = get_dex().move_id(move_name)
+        bit = table.index.get(move_id) if move_id is not None else None
+        if bit is None:
+            if move_name in self.unexpected:
+                return self
+            return MovesetBelief(table, self.probabilities, self.revealed, self.unexpected | {move_name})
+        flag = 1 << bit
+        if self.revealed & flag:
+            return self
+        posterior = self.probabilities * ((table.masks & flag) != 0)
+        total = posterior.sum()
+        # More distinct moves than a set can hold: keep the previous distribution
+        posterior = posterior / total if total > 0 else self.probabilities
+        return MovesetBelief(table, posterior, self.revealed | flag, self.unexpected)
+
+    @property
+    def candidate_count(self) -> int:
+        """Number of movesets still possible"""
+        return int(np.count_nonzero(self.probabilities))
+
+    def revealed_moves(self) -> List[str]:
+        names = [name for bit, name in enumerate(self.table.move_names) if self.revealed >> bit & 1]
+        return names + sorted(self.unexpected)
+
+    def move_probabilities(self) -> Dict[str, float]:
+        """Probability that the opponent carries each move"""
+        if self._move_probabilities is None:
+            marginals = np.minimum(1.0, self.probabilities @ self.table.contains)
+            probabilities = {name: float(p) for name, p in zip(self.table.move_names, marginals)}
+            for name in self.unexpected:
+                probabilities[name] = 1.0
+            self._move_probabilities = probabilities
+        return self._move_probabilities
+
+    def type_probabilities(self) -> Dict[str, float]:
+        """Probability that the opponent carries at least one move of each (lowercase) type"""
+        if self._type_probabilities is None:
+            marginals = np.minimum(1.0, self.probabilities @ self.table.has_type)
+            probabilities = {move_type: float(p) for move_type, p in zip(self.table.types, marginals)}
+            dex = get_dex()
+            for name in self.unexpected:
+                move = dex.find_move(name)
+                if move is not None:
+                    probabilities[move.type.lower()] = 1.0
+            self._type_probabilities = probabilities
+        return self._type_probabilities
+
+    def most_likely_sets(self, count: int = 5) -> List[Tuple[List[str], float]]:
+        """The most probable movesets with their probabilities"""
+        order = np.argsort(-self.probabilities, kind="stable")[:count]
+        names = self.table.move_names
+        return [([names[bit] for bit in np.flatnonzero(self.table.contains[index])], float(self.probabilities[index]))
+                for index in order if self.probabilities[index] > 0]
+
+
+@lru_cache(maxsize=None)
+def _prior_belief(table: CandidateTable) -> MovesetBelief:
+    return MovesetBelief(table, table.prior)
+
+
+def species_key(pokemon: Pokemon) -> Optional[int]:
+    """Dex species id of a Pokemon (looked up by name if it was not built from the dex)"""
+    species_id = getattr(pokemon, "species_id", None)
+    return species_id if species_id is not None else get_dex().species_id(pokemon.name)
+
+
+class OpponentModel:
+    """Moveset beliefs for each opponent species seen in a battle"""
+
+    def __init__(self):
+        self._beliefs: Dict[int, MovesetBelief] = {}
+
+    def belief(self, pokemon: Pokemon) -> Optional[MovesetBelief]:
+        """Current belief about a Pokemon's moveset, or None if its species has no learnset"""
+        species_id = species_key(pokemon)
+        belief = self._beliefs.get(species_id)
+        if belief is None:
+            table = candidate_table(species_id)
+            if table is None:
+                return None
+            belief = _prior_belief(table)
+        return belief
+
+    def observe(self, pokemon: Pokemon, move_name: str):
+        """Update the belief about a Pokemon after it used a move"""
+        belief = self.belief(pokemon)
+        if belief is None:
+            return
+        updated = belief.observe(move_name)
+        if updated is not belief:
+            self._beliefs[species_key(pokemon)] = updated
+
+    def move_probabilities(self, pokemon: Pokemon) -> Dict[str, float]:
+        belief = self.belief(pokemon)
+        return belief.move_probabilities() if belief is not None else {}
+
+    def copy(self) -> 'OpponentModel':
+        model = OpponentModel()
+        model._beliefs = dict(self._beliefs)
+        return model
@@ -0,0 +1,155 @@
+"""
+Root-parallel search across a process pool.
+
+Expectiminimax splits our root moves between workers; MCTS runs one
+independent tree per worker with its own seed. Either way the workers
+return per-move statistics that are merged at the root; expectiminimax
+scores are compared at the deepest iteration every worker finished.
+States are sent to workers in the compact binary encoding, and each
+worker loads the dex and type chart once when it starts.
+"""
+import atexit
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+from battle.battle_state import BattleState
+from battle.serialization import encode_battle_state, decode_battle_state
+from battle.search import SearchResult, ExpectiminimaxSearch, EVAL_MIN
+from battle.mcts import MCTSSearch
+from battle.decision_engine import DEADLINE_MAX_DEPTH
+from utils.rng import RngStreams, SEARCH_STREAM
+
+PARALLEL_ENGINES = ("expectiminimax", "mcts")
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+
+
+def _init_worker():
+    """Warm the shared tables once per worker process"""
+    import utils.type_effectiveness  # Loads the type chart on import
+    from pokedata.dex import get_dex
+    get_dex()
+
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    """Get the shared warmed pool with this many workers"""
+    pool = _pools.get(workers)
+    if pool is None:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        _pools[workers] = pool
+    return pool
+
+
+@atexit.register
+def shutdown_pools():
+    """Shut down every shared pool"""
+    for pool in _pools.values():
+        pool.shutdown(wait=True)
+    _pools.clear()
+
+
+def _run_worker_search(data: bytes, engine: str, options: Dict, budget_ms: Optional[float],
+                       root_moves: Optional[List[str]]) -> SearchResult:
+    """Decode a state and search it inside a worker"""
+    state = decode_battle_state(data)
+    deadline = time.perf_counter() + budget_ms / 1000 if budget_ms is not None else None
+    if engine == "expectiminimax":
+        return ExpectiminimaxSearch(**options).search(state, deadline, root_moves)
+    return MCTSSearch(**options).search(state, deadline)
+
+
+def split_moves(move_names: List[str], parts: int) -> List[List[str]]:
+    """Deal moves round-robin into at most `parts` non-empty groups"""
+    groups = [move_names[index::parts] for index in range(parts)]
+    return [group for group in groups if group]
+
+
+def merge_results(results: List[SearchResult], engine: str) -> SearchResult:
+    """Combine worker results at the root"""
+    merged = SearchResult(best_move=None, engine=engine, completed=all(r.completed for r in results))
+    merged.nodes = sum(r.nodes for r in results)
+    merged.iterations = sum(r.iterations for r in results) if engine == "mcts" else min(r.iterations for r in results)
+    merged.depth = max(r.depth for r in results) if engine == "mcts" else min(r.depth for r in results)
+
+    if engine == "mcts":
+        # Pool the trees: visit counts add up and values are visit-weighted means
+        value_sums: Dict[str, float] = {}
+        for result in results:
+            for name, visits in result.move_visits.items():
+                merged.move_visits[name] = merged.move_visits.get(name, 0) + visits
+                value_sums[name] = value_sums.get(name, 0.0) + result.move_scores.get(name, 0.0) * visits
+        for name, visits in merged.move_visits.items():
+            if visits:
+                merged.move_scores[name] = value_sums[name] / visits
+        if merged.move_visits:
+            merged.best_move = max(merged.move_visits, key=merged.move_visits.get)
+    elif merged.depth > 0:
+        # Compare the workers at the deepest iteration all of them finished: a worker's best score
+        # is exact for its own moves at a given depth, but scores of different depths do not compare
+        best_value = EVAL_MIN - 1
+        for result in results:
+            scores = result.depth_scores[merged.depth]
+            merged.move_scores.update(scores)
+            best_move = result.depth_best[merged.depth]
+            if best_move is not None and scores[best_move] > best_value:
+                best_value = scores[best_move]
+                merged.best_move = best_move
+    else:
+        # Some worker finished no iteration before the deadline: fall back to partial results
+        best_value = EVAL_MIN - 1
+        for result in results:
+            merged.move_scores.update(result.move_scores)
+            if result.best_move is not None and result.move_scores and result.score > best_value:
+                best_value = result.score
+                merged.best_move = result.best_move
+        if merged.best_move is None:
+            merged.best_move = next((r.best_move for r in results if r.best_move), None)
+
+    merged.score = merged.move_scores.get(merged.best_move, 0.0)
+    return merged
+
+
+def parallel_search(state: BattleState, engine: str = "mcts", workers: int = 2,
+                    deadline_ms: Optional[float] = None, **engine_options) -> SearchResult:
+    """
+    Search with several worker processes and merge their results at the root.
+    Args:
+        state: Battle to search
+        engine: "expectiminimax" (root moves split between workers) or "mcts" (one tree per worker)
+        workers: Number of worker processes
+        deadline_ms: Time limit for the whole decision
+        engine_options: Passed to each worker's engine; for MCTS, iterations is per worker
+            and each worker's seed is split from seed by worker index (see utils.rng)
+    """
+    if engine not in PARALLEL_ENGINES:
+        raise ValueError(f"Unknown parallel engine: {engine}. Expected one of {PARALLEL_ENGINES}")
+    start = time.perf_counter()
+    data = encode_battle_state(state)
+
+    jobs = []
+    if engine == "expectiminimax":
+        if deadline_ms is not None:
+            engine_options.setdefault("depth", DEADLINE_MAX_DEPTH)
+        move_groups = split_moves([move.name for move in state.my_pokemon.moves], workers) or [None]
+        for group in move_groups:
+            jobs.append((engine_options, group))
+    else:
+        if deadline_ms is not None:
+            engine_options.setdefault("iterations", None)
+        seed = engine_options.pop("seed", None)
+        for index in range(workers):
+            worker_seed = None if seed is None else RngStreams(seed).worker(index).seed(SEARCH_STREAM)
+            options = dict(engine_options, seed=worker_seed)
+            jobs.append((options, None))
+
+    def remaining_ms():
+        if deadline_ms is None:
+            return None
+        return max(0.0, deadline_ms - (time.perf_counter() - start) * 1000)
+
+    pool = get_pool(workers)
+    futures = [pool.submit(_run_worker_search, data, engine, options, remaining_ms(), group)
+               for options, group in jobs]
+    merged = merge_results([future.result() for future in futures], engine)
+    merged.elapsed_ms = (time.perf_counter() - start) * 1000
+    return merged
@@ -0,0 +1,152 @@
+"""
+Streaming report generation for archived battles.
+
+Battles are read lazily from battle log files (battle.serialization), one
+decoded BattleState at a time, and rendered as generators of lines that
+are written straight to the output, so memory stays flat however many
+battles the corpus holds. Two renderings are available:
+    report    the full create_battle_report text, preceded by a line naming the battle
+    summary   one JSON object per battle (JSON Lines)
+
+With several workers the corpus is cut into shards of consecutive battles
+(plan_shards), each worker renders its shards to part files, and the parts
+are copied to the output in corpus order as they finish; the output is
+byte-for-byte the one a single process writes.
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, TextIO
+from battle.battle_state import BattleState
+from battle.battle_utils import iter_battle_report
+from battle.serialization import iter_battle_log, count_battle_log
+from pokedata.usage_ingest import corpus_files
+
+# Shards planned per worker, so a slow shard does not leave the other workers idle
+SHARDS_PER_WORKER = 4
+
+
+def render_report(source: str, index: int, state: BattleState) -> Iterator[str]:
+    """The battle report of one battle"""
+    yield f"{source} #{index}"
+    yield from iter_battle_report(state)
+
+
+def render_summary(source: str, index: int, state: BattleState) -> Iterator[str]:
+    """One JSON line summarising one battle"""
+    summary = {"source": source, "battle": index, "winner": state.winner, "ended": state.battle_ended}
+    summary.update(state.get_battle_summary())
+    yield json.dumps(summary, separators=(",", ":"))
+
+
+RENDERERS: Dict[str, Callable[[str, int, BattleState], Iterator[str]]] = {
+    "report": render_report,
+    "summary": render_summary,
+}
+
+
+@dataclass(frozen=True)
+class LogShard:
+    """Battles start..stop of one battle log file"""
+    path: str
+    start: int
+    stop: int
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+
+def _renderer(kind: str) -> Callable[[str, int, BattleState], Iterator[str]]:
+    renderer = RENDERERS.get(kind)
+    if renderer is None:
+        raise ValueError(f"Unknown rendering '{kind}' (expected one of {', '.join(RENDERERS)})")
+    return renderer
+
+
+def render_lines(shards: Iterable[LogShard], kind: str = "report") -> Iterator[str]:
+    """Lines of the rendering of every battle in the shards, decoding one battle at a time"""
+    renderer = _renderer(kind)
+    for shard in shards:
+        for index, state in enumerate(iter_battle_log(shard.path, shard.start, shard.stop), shard.start):
+            yield from renderer(shard.path, index, state)
+
+
+def write_lines(lines: Iterable[str], out: TextIO) -> int:
+    """Write lines to a text stream and return how many were written"""
+    count = 0
+    write = out.write
+    for line in lines:
+        write(line)
+        write("\n")
+        count += 1
+    return count
+
+
+def plan_shards(paths: Iterable[str], shard_size: Optional[int] = None, shards: int = 1) -> List[LogShard]:
+    """
+    Cut the battle log files under the given files and directories into shards of consecutive battles.
+    Counting skips from record to record without decoding anything.
+    Args:
+        shard_size: Battles per shard (default: the corpus split into `shards` roughly equal shards)
+        shards: Number of shards wanted when shard_size is not given
+    """
+    counts = [(path, count_battle_log(path)) for path in corpus_files(paths)]
+    if shard_size is None:
+        total = sum(count for _, count in counts)
+        shard_size = max(1, -(-total // max(1, shards)))
+    planned = []
+    for path, count in counts:
+        for start in range(0, count, shard_size):
+            planned.append(LogShard(path, start, min(start + shard_size, count)))
+    return planned
+
+
+def _render_shard(task) -> str:
+    """Render one shard to its part file in a worker process"""
+    shard, kind, part_path = task
+    with open(part_path, "w", encoding="utf-8") as out:
+        write_lines(render_lines([shard], kind), out)
+    return part_path
+
+
+def render_corpus(paths: Iterable[str], out: Optional[TextIO] = None, kind: str = "report",
+                  workers: int = 1) -> int:
+    """
+    Render every battle in the battle log files under the given files and directories.
+    Args:
+        out: Text stream to write to (default stdout)
+        kind: "report" or "summary"
+        workers: Worker processes; 1 renders in this process
+    Returns:
+        The number of battles rendered
+    """
+    _renderer(kind)
+    out = sys.stdout if out is None else out
+    paths = list(paths)
+    if workers <= 1:
+        shards = plan_shards(paths)
+        for shard in shards:
+            write_lines(render_lines([shard], kind), out)
+        return sum(len(shard) for shard in shards)
+
+    shards = plan_shards(paths, shards=workers * SHARDS_PER_WORKER)
+    with tempfile.TemporaryDirectory(prefix="battle-reports-") as directory:
+        tasks = [(shard, kind, os.path.join(directory, f"part-{number:06d}.txt"))
+                 for number, shard in enumerate(shards)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map yields in task order, so each part is copied as soon as it and its predecessors are done
+            for part_path in pool.map(_render_shard, tasks):
+                with open(part_path, encoding="utf-8") as part:
+                    shutil.copyfileobj(part, out)
+                os.remove(part_path)
+    return sum(len(shard) for shard in shards)
+
+
+def render_to_file(paths: Iterable[str], output_path: str, kind: str = "report", workers: int = 1) -> int:
+    """Render every battle in the corpus to a file (see render_corpus)"""
+    with open(output_path, "w", encoding="utf-8") as out:
+        return render_corpus(paths, out, kind, workers)
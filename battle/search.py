@@ -0,0 +1,313 @@
+"""
+Depth-limited expectiminimax search over BattleState clones.
+
+Each search ply is one full turn: we pick a move (max node), the
+opponent picks a reply from its known moves (min node), and a chance
+node enumerates accuracy and damage-roll outcomes for both attacks in
+speed/priority order; the turn mechanics (damage modifiers, end-of-turn
+chip and replacement) come from battle.simulator. Chance nodes use Star1 pruning on the bounded
+evaluation, and max nodes use alpha-beta with a transposition table
+keyed on BattleState.state_key().
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from pokemon import Move
+from battle.battle_state import BattleState
+from battle.simulator import BattleSimulator, opposing_side, team_defeated
+
+# Evaluation bounds (needed for Star1 pruning)
+EVAL_MIN = -1.0
+EVAL_MAX = 1.0
+
+# Damage roll multipliers enumerated at chance nodes (equally likely).
+# A coarser set than the simulator's 16 rolls keeps the chance branching small.
+DAMAGE_ROLLS = (0.85, 0.925, 1.0)
+
+# Transposition table bound flags
+_EXACT = 0
+_LOWER = 1
+_UPPER = 2
+
+# How many nodes to expand between deadline checks
+_TIME_CHECK_INTERVAL = 16
+
+
+@dataclass
+class SearchResult:
+    """Outcome of an engine search"""
+    best_move: Optional[str]
+    score: float = 0.0
+    move_scores: Dict[str, float] = field(default_factory=dict)
+    move_visits: Dict[str, int] = field(default_factory=dict)
+    depth: int = 0
+    iterations: int = 0
+    nodes: int = 0
+    elapsed_ms: float = 0.0
+    completed: bool = True
+    engine: str = "expectiminimax"
+    # Expectiminimax: best move and root move scores of each finished iteration, by depth
+    depth_best: Dict[int, str] = field(default_factory=dict)
+    depth_scores: Dict[int, Dict[str, float]] = field(default_factory=dict)
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search when its time budget runs out"""
+
+
+def evaluate(state: BattleState) -> float:
+    """
+    Static evaluation from our side, in [EVAL_MIN, EVAL_MAX].
+    Difference between the average remaining HP fraction of each known team.
+    """
+    ally = state.ally_team
+    opponent = state.opponent_team
+    ally_fraction = sum(hp / max_hp for hp, max_hp in zip(ally.hp, ally.max_hp)) / len(ally.hp)
+    opponent_fraction = sum(hp / max_hp for hp, max_hp in zip(opponent.hp, opponent.max_hp)) / len(opponent.hp)
+    return ally_fraction - opponent_fraction
+
+
+class ExpectiminimaxSearch:
+    """Depth-limited expectiminimax with alpha-beta, Star1 chance pruning and a transposition table"""
+
+    def __init__(self, depth: int = 2, time_budget_ms: Optional[float] = None,
+                 damage_rolls: Tuple[float, ...] = DAMAGE_ROLLS, use_transposition_table: bool = True):
+        """
+        Args:
+            depth: Number of full turns to look ahead
+            time_budget_ms: Stop searching after this many milliseconds and return the best move found
+            damage_rolls: Random damage multipliers enumerated at chance nodes
+            use_transposition_table: Cache max node values by position
+        """
+        self.depth = depth
+        self.time_budget_ms = time_budget_ms
+        # Chance nodes enumerate outcomes themselves; critical hits are not modelled
+        self.simulator = BattleSimulator(damage_rolls=damage_rolls, crit_chance=0)
+        self.use_transposition_table = use_transposition_table
+        self._deadline: Optional[float] = None
+        self._nodes = 0
+        self._table: Dict[tuple, Tuple[float, int, Optional[int]]] = {}
+
+    # Public API
+    def search(self, state: BattleState, deadline: Optional[float] = None,
+               root_moves: Optional[List[str]] = None) -> SearchResult:
+        """
+        Search from the current position and return the best move for our active Pokemon.
+        With a deadline the search deepens iteratively up to self.depth and returns the
+        best move of the deepest finished iteration (improved by a partial deeper one).
+        Root moves that cannot beat the best move are cut off, so their scores are upper bounds.
+        Args:
+            state: Battle to search (not modified; the search works on clones)
+            deadline: Absolute time.perf_counter() deadline, overriding time_budget_ms
+            root_moves: Only search these of our moves (used to split the root across workers)
+        """
+        start = time.perf_counter()
+        if deadline is None and self.time_budget_ms is not None:
+            deadline = start + self.time_budget_ms / 1000
+        self._deadline = deadline
+        self._nodes = 0
+        self._table.clear()
+        self.simulator.damage_cache.clear()
+
+        root = state.clone()
+        moves = root.my_pokemon.moves
+        if root_moves is not None:
+            moves = [move for move in moves if move.name in root_moves]
+        result = SearchResult(best_move=moves[0].name if moves else None, engine="expectiminimax")
+        if not moves:
+            return result
+
+        depths = range(1, self.depth + 1) if deadline is not None else (self.depth,)
+        for depth in depths:
+            scores: Dict[str, float] = {}
+            best_move, best_value = None, EVAL_MIN - 1
+            try:
+                for move in self._root_order(root, moves, result.move_scores):
+                    value = self._min_node(root, move, depth, best_value, EVAL_MAX + 1)
+                    scores[move.name] = value
+                    if value > best_value:
+                        best_move, best_value = move.name, value
+            except SearchTimeout:
+                result.completed = False
+                # The previous best move is searched first, so a partial iteration can only improve on it
+                if best_move is not None:
+                    result.best_move = best_move
+                    if not result.move_scores:
+                        result.move_scores, result.score = scores, best_value
+                break
+            result.best_move, result.score, result.move_scores = best_move, best_value, scores
+            result.depth = depth
+            result.depth_best[depth] = best_move
+            result.depth_scores[depth] = scores
+            result.iterations += 1
+
+        result.nodes = self._nodes
+        result.elapsed_ms = (time.perf_counter() - start) * 1000
+        return result
+
+    def _root_order(self, root: BattleState, moves: List[Move], previous_scores: Dict[str, float]) -> List[Move]:
+        """Order root moves by the previous iteration's scores, or by expected damage on the first"""
+        if not previous_scores:
+            return self._ordered_moves(root, "ally", moves)
+        return sorted(moves, key=lambda move: previous_scores.get(move.name, EVAL_MIN - 1), reverse=True)
+
+    # Tree nodes
+    def _max_node(self, state: BattleState, depth: int, alpha: float, beta: float) -> float:
+        self._count_node()
+        if team_defeated(state, "opponent"):
+            return EVAL_MAX
+        if team_defeated(state, "ally"):
+            return EVAL_MIN
+        if depth == 0:
+            return evaluate(state)
+
+        key = None
+        if self.use_transposition_table:
+            key = (state.state_key(), depth)
+            entry = self._table.get(key)
+            if entry is not None:
+                value, flag, _ = entry
+                if flag == _EXACT or (flag == _LOWER and value >= beta) or (flag == _UPPER and value <= alpha):
+                    return value
+
+        moves = state.my_pokemon.moves
+        if not moves:
+            return evaluate(state)
+
+        original_alpha = alpha
+        best_value = EVAL_MIN - 1
+        best_index = None
+        for move in self._ordered_moves(state, "ally", moves, key):
+            value = self._min_node(state, move, depth, alpha, beta)
+            if value > best_value:
+                best_value = value
+                best_index = moves.index(move)
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+        if key is not None:
+            if best_value <= original_alpha:
+                flag = _UPPER
+            elif best_value >= beta:
+                flag = _LOWER
+            else:
+                flag = _EXACT
+            self._table[key] = (best_value, flag, best_index)
+        return best_value
+
+    def _min_node(self, state: BattleState, my_move: Move, depth: int, alpha: float, beta: float) -> float:
+        opponent_moves = state.opponent_pokemon.moves
+        if not opponent_moves:
+            return self._chance_node(state, my_move, None, depth, alpha, beta)
+
+        best_value = EVAL_MAX + 1
+        for move in self._ordered_moves(state, "opponent", opponent_moves):
+            value = self._chance_node(state, my_move, move, depth, alpha, beta)
+            best_value = min(best_value, value)
+            beta = min(beta, value)
+            if alpha >= beta:
+                break
+        return best_value
+
+    def _chance_node(self, state: BattleState, my_move: Move, opponent_move: Optional[Move],
+                     depth: int, alpha: float, beta: float) -> float:
+        """Star1-pruned expectation over the outcomes of one turn"""
+        outcomes = self.turn_outcomes(state, my_move, opponent_move)
+        total = 0.0
+        remaining = 1.0
+        for probability, child in outcomes:
+            remaining -= probability
+            child_alpha = (alpha - total - remaining * EVAL_MAX) / probability
+            child_beta = (beta - total - remaining * EVAL_MIN) / probability
+            value = self._max_node(child, depth - 1, max(EVAL_MIN, child_alpha), min(EVAL_MAX, child_beta))
+            total += probability * value
+            if value <= child_alpha:
+                return total + remaining * EVAL_MAX
+            if value >= child_beta:
+                return total + remaining * EVAL_MIN
+        return total
+
+    # Turn model
+    def turn_outcomes(self, state: BattleState, my_move: Optional[Move],
+                      opponent_move: Optional[Move]) -> List[Tuple[float, BattleState]]:
+        """
+        Enumerate the states after one turn with their probabilities.
+        Identical resulting positions are merged.
+        """
+        merged: Dict[tuple, List] = {}
+        for order_probability, actions in self.simulator.action_orders(state, my_move, opponent_move):
+            # (probability, state, is_fresh_clone)
+            partial = [(order_probability, state, False)]
+            for side, move in actions:
+                expanded = []
+                for probability, current, fresh in partial:
+                    if current.get_team(side).hp[current.get_team(side).active] <= 0:
+                        expanded.append((probability, current, fresh))
+                        continue
+                    for outcome_probability, child, child_fresh in self._attack_outcomes(current, side, move):
+                        expanded.append((probability * outcome_probability, child, child_fresh or fresh))
+                partial = expanded
+
+            for probability, current, fresh in partial:
+                child = current if fresh else current.clone()
+                self.simulator.end_turn(child)
+                key = child.state_key()
+                entry = merged.get(key)
+                if entry is None:
+                    merged[key] = [probability, child]
+                else:
+                    entry[0] += probability
+
+        # Most likely outcomes first tightens the Star1 bounds sooner
+        return sorted(((p, child) for p, child in merged.values()), key=lambda item: -item[0])
+
+    def _attack_outcomes(self, state: BattleState, side: str, move: Optional[Move]):
+        """Outcomes of one attack as (probability, state, is_fresh_clone)"""
+        if move is None or not move.power:
+            return [(1.0, state, False)]
+        hit_chance = 1.0 if move.accuracy is None else min(move.accuracy, 100) / 100
+        defender = opposing_side(side)
+
+        outcomes = []
+        roll_probability = hit_chance / len(self.simulator.damage_rolls)
+        damage_counts: Dict[int, int] = {}
+        for damage in self.simulator.move_damage(state, side, move):
+            damage_counts[damage] = damage_counts.get(damage, 0) + 1
+        for damage, count in damage_counts.items():
+            child = state.clone()
+            child.apply_damage(defender, damage)
+            outcomes.append((roll_probability * count, child, True))
+        if hit_chance < 1.0:
+            outcomes.append((1.0 - hit_chance, state, False))
+        return outcomes
+
+    # Helpers
+    def _ordered_moves(self, state: BattleState, side: str, moves: List[Move], key: Optional[tuple] = None) -> List[Move]:
+        """Order moves by expected damage, trying the transposition table's best move first"""
+        def expected_damage(move: Move) -> float:
+            if not move.power:
+                return 0.0
+            accuracy = 1.0 if move.accuracy is None else move.accuracy / 100
+            return self.simulator.move_damage(state, side, move)[-1] * accuracy
+
+        ordered = sorted(moves, key=expected_damage, reverse=True)
+        if key is not None:
+            entry = self._table.get(key)
+            if entry is not None and entry[2] is not None and entry[2] < len(moves):
+                best = moves[entry[2]]
+                ordered.remove(best)
+                ordered.insert(0, best)
+        return ordered
+
+    def _count_node(self):
+        self._nodes += 1
+        if self._deadline is not None and self._nodes % _TIME_CHECK_INTERVAL == 0:
+            if time.perf_counter() >= self._deadline:
+                raise SearchTimeout()
+
+
+def expectiminimax_search(state: BattleState, depth: int = 2, time_budget_ms: Optional[float] = None,
+                          **options) -> SearchResult:
+    """Run a depth-limited expectiminimax search from the current position"""
+    return ExpectiminimaxSearch(depth=depth, time_budget_ms=time_budget_ms, **options).search(state)
@@ -0,0 +1,530 @@
+"""
+Compact, versioned binary encoding for Pokemon and BattleState.
+
+Layout (all integers little-endian):
+    header       magic "PKB", format version (u8), record kind (u8)
+    strings      every distinct string once; records refer to them by index
+    moves        every distinct Move once, either as a local dex id or inline
+    body         the Pokemon or BattleState record
+
+The encoding is lossless for the battle tracking state (teams with HP and
+status, field, opponent move statistics and the full event log) and
+decodes without any PokeAPI access; the opponent moveset belief and move
+predictor are rebuilt from the event log. Moves that match the local dex are
+stored as a dex id; anything else is stored inline. Records of another
+version, or truncated or corrupt ones, are rejected with ValueError.
+
+Archived battles are stored as battle log files, which can be read one
+battle at a time and skipped through without decoding:
+    header       magic "PKBLOG", format version (u8)
+    records      record length (u32) followed by an encoded BattleState, repeated
+"""
+import struct
+import sys
+from array import array
+from collections import Counter, deque
+from functools import lru_cache
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+from pokemon import Pokemon, Move, Ability, PokemonStats
+from pokedata.dex import Dex, get_dex
+from battle.battle_state import BattleState, RECENT_MOVE_WINDOW
+from battle.event_log import BattleEventLog, PokemonBattleHistory, SIDE_CODES
+from battle.field_state import FieldState, WEATHER_BY_CODE, MAX_SCREEN_TURNS
+
+MAGIC = b'PKB'
+FORMAT_VERSION = 2  # 2: event logs keep the starting HP and status of each roster member
+
+KIND_POKEMON = 1
+KIND_BATTLE_STATE = 2
+
+LOG_MAGIC = b'PKBLOG'
+LOG_FORMAT_VERSION = 1
+_LOG_HEADER = struct.Struct('<6sB')
+_LOG_LENGTH = struct.Struct('<I')
+
+_NONE_INT = -2 ** 31
+_NO_STRING = 0xFFFFFFFF
+_MOVE_FROM_DEX = 0
+_MOVE_INLINE = 1
+
+
+@lru_cache(maxsize=None)
+def _struct(fmt: str) -> struct.Struct:
+    """Compiled little-endian struct for a format string"""
+    return struct.Struct('<' + fmt)
+
+
+def _load_dex() -> Optional[Dex]:
+    try:
+        return get_dex()
+    except OSError:
+        return None
+
+
+def _opt_int(value: Optional[int]) -> int:
+    return _NONE_INT if value is None else value
+
+
+def _from_opt_int(value: int) -> Optional[int]:
+    return None if value == _NONE_INT else value
+
+
+def _array_to_le_bytes(values: array) -> bytes:
+    if sys.byteorder == 'big':
+        values = values[:]
+        values.byteswap()
+    return values.tobytes()
+
+
+def _array_from_le_bytes(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+class _Encoder:
+    """Collects the string and move tables while the body is written"""
+
+    def __init__(self, dex: Optional[Dex]):
+        self.dex = dex
+        self.body: List[bytes] = []
+        self.strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+        self.moves: List[Move] = []
+        self._move_ids: Dict[int, int] = {}
+
+    def pack(self, fmt: str, *values):
+        self.body.append(_struct(fmt).pack(*values))
+
+    def string(self, value: Optional[str]) -> int:
+        if value is None:
+            return _NO_STRING
+        string_id = self._string_ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self.strings.append(value)
+            self._string_ids[value] = string_id
+        return string_id
+
+    def move(self, move: Move) -> int:
+        move_id = self._move_ids.get(id(move))
+        if move_id is None:
+            move_id = len(self.moves)
+            self.moves.append(move)
+            self._move_ids[id(move)] = move_id
+        return move_id
+
+    def finish(self, kind: int) -> bytes:
+        # The move table interns strings, so it is built before the string table
+        move_parts = [struct.pack('<H', len(self.moves))]
+        for move in self.moves:
+            dex_id = self.dex.move_id(move.name) if self.dex is not None else None
+            if dex_id is not None and self.dex.get_move(dex_id) == move:
+                move_parts.append(struct.pack('<BH', _MOVE_FROM_DEX, dex_id))
+            else:
+                move_parts.append(struct.pack(
+                    '<BIIiiiIIi', _MOVE_INLINE, self.string(move.name), self.string(move.type),
+                    _opt_int(move.power), _opt_int(move.accuracy), move.pp,
+                    self.string(move.damage_class), self.string(move.effect), move.priority))
+
+        string_parts = [struct.pack('<I', len(self.strings))]
+        for value in self.strings:
+            encoded = value.encode('utf-8')
+            string_parts.append(struct.pack('<I', len(encoded)))
+            string_parts.append(encoded)
+
+        header = MAGIC + struct.pack('<BB', FORMAT_VERSION, kind)
+        return b''.join([header] + string_parts + move_parts + self.body)
+
+
+class _Decoder:
+    """Reads the header, string table and move table, then body fields in order"""
+
+    def __init__(self, data: bytes, expected_kind: Optional[int], dex: Optional[Dex]):
+        if len(data) < 5 or data[:3] != MAGIC:
+            raise ValueError("Not an encoded Pokemon battle record")
+        version, kind = struct.unpack_from('<BB', data, 3)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported encoding version {version} (expected {FORMAT_VERSION})")
+        if expected_kind is not None and kind != expected_kind:
+            raise ValueError(f"Encoded record has kind {kind}, expected {expected_kind}")
+        self.kind = kind
+        self.data = data
+        self.offset = 5
+
+        (count,) = self.unpack('I')
+        self.strings: List[str] = []
+        for _ in range(count):
+            (length,) = self.unpack('I')
+            self.strings.append(self.raw(length).decode('utf-8'))
+
+        (count,) = self.unpack('H')
+        self.moves: List[Move] = []
+        for _ in range(count):
+            (tag,) = self.unpack('B')
+            if tag == _MOVE_FROM_DEX:
+                (dex_id,) = self.unpack('H')
+                if dex is None:
+                    raise ValueError("Encoded record references the local dex, but it is not available")
+                if dex_id not in dex.moves:
+                    raise ValueError(f"Encoded record references unknown dex move {dex_id}")
+                self.moves.append(dex.get_move(dex_id))
+            else:
+                name, move_type, power, accuracy, pp, damage_class, effect, priority = self.unpack('IIiiiIIi')
+                self.moves.append(Move(
+                    name=self.string(name), type=self.string(move_type),
+                    power=_from_opt_int(power), accuracy=_from_opt_int(accuracy), pp=pp,
+                    damage_class=self.string(damage_class), effect=self.string(effect), priority=priority))
+
+    def _need(self, size: int):
+        if self.offset + size > len(self.data):
+            raise ValueError(f"Encoded record is truncated: needs {self.offset + size} bytes, has {len(self.data)}")
+
+    def unpack(self, fmt: str) -> tuple:
+        compiled = _struct(fmt)
+        self._need(compiled.size)
+        values = compiled.unpack_from(self.data, self.offset)
+        self.offset += compiled.size
+        return values
+
+    def string(self, string_id: int) -> Optional[str]:
+        if string_id == _NO_STRING:
+            return None
+        if string_id >= len(self.strings):
+            raise ValueError(f"Encoded record references unknown string {string_id}")
+        return self.strings[string_id]
+
+    def move(self, move_index: int) -> Move:
+        if move_index >= len(self.moves):
+            raise ValueError(f"Encoded record references unknown move {move_index}")
+        return self.moves[move_index]
+
+    def raw(self, length: int) -> bytes:
+        self._need(length)
+        chunk = self.data[self.offset:self.offset + length]
+        self.offset += length
+        return chunk
+
+
+# Pokemon records
+def _write_pokemon(encoder: _Encoder, pokemon: Pokemon):
+    string = encoder.string
+    stats = pokemon.stats
+    encoder.pack('IB', string(pokemon.name), len(pokemon.types))
+    encoder.pack(f'{len(pokemon.types)}I', *[string(t) for t in pokemon.types])
+    encoder.pack('6HH', stats.hp, stats.attack, stats.defense, stats.special_attack,
+                 stats.special_defense, stats.speed, pokemon.level)
+    encoder.pack('IIBdBd', string(pokemon.nature), string(pokemon.item),
+                 pokemon.height is not None, pokemon.height or 0.0,
+                 pokemon.weight is not None, pokemon.weight or 0.0)
+    encoder.pack('iIii', _opt_int(pokemon.current_hp), string(pokemon.status_condition),
+                 _opt_int(pokemon.species_id), _opt_int(pokemon.base_experience))
+    encoder.pack('B', len(pokemon.moves))
+    encoder.pack(f'{len(pokemon.moves)}H', *[encoder.move(move) for move in pokemon.moves])
+    encoder.pack('B', len(pokemon.abilities))
+    for ability in pokemon.abilities:
+        encoder.pack('IIB', string(ability.name), string(ability.effect), ability.is_hidden)
+
+
+def _read_pokemon(decoder: _Decoder) -> Pokemon:
+    string = decoder.string
+    name, type_count = decoder.unpack('IB')
+    types = [string(t) for t in decoder.unpack(f'{type_count}I')]
+    hp, attack, defense, special_attack, special_defense, speed, level = decoder.unpack('6HH')
+    nature, item, has_height, height, has_weight, weight = decoder.unpack('IIBdBd')
+    current_hp, status, species_id, base_experience = decoder.unpack('iIii')
+    (move_count,) = decoder.unpack('B')
+    moves = [decoder.move(index) for index in decoder.unpack(f'{move_count}H')]
+    (ability_count,) = decoder.unpack('B')
+    abilities = []
+    for _ in range(ability_count):
+        ability_name, effect, is_hidden = decoder.unpack('IIB')
+        abilities.append(Ability(string(ability_name), string(effect), bool(is_hidden)))
+    return Pokemon(
+        name=string(name),
+        types=types,
+        stats=PokemonStats(hp, attack, defense, special_attack, special_defense, speed),
+        moves=moves,
+        abilities=abilities,
+        level=level,
+        nature=string(nature),
+        item=string(item),
+        height=height if has_height else None,
+        weight=weight if has_weight else None,
+        current_hp=_from_opt_int(current_hp),
+        status_condition=string(status),
+        species_id=_from_opt_int(species_id),
+        base_experience=_from_opt_int(base_experience)
+    )
+
+
+def encode_pokemon(pokemon: Pokemon, use_dex: bool = True) -> bytes:
+    """Encode a Pokemon into the compact binary format"""
+    encoder = _Encoder(_load_dex() if use_dex else None)
+    _write_pokemon(encoder, pokemon)
+    return encoder.finish(KIND_POKEMON)
+
+
+def decode_pokemon(data: bytes) -> Pokemon:
+    """Decode a Pokemon encoded with encode_pokemon"""
+    decoder = _Decoder(data, KIND_POKEMON, _load_dex())
+    return _read_pokemon(decoder)
+
+
+# BattleState records
+def _write_counter(encoder: _Encoder, counter: Counter):
+    encoder.pack('I', len(counter))
+    for name, count in counter.items():
+        encoder.pack('Ii', encoder.string(name), count)
+
+
+def _read_counter(decoder: _Decoder) -> Counter:
+    (count,) = decoder.unpack('I')
+    counter = Counter()
+    for _ in range(count):
+        name, value = decoder.unpack('Ii')
+        counter[decoder.string(name)] = value
+    return counter
+
+
+def _write_array(encoder: _Encoder, values: array):
+    encoder.pack('cI', values.typecode.encode('ascii'), len(values))
+    encoder.body.append(_array_to_le_bytes(values))
+
+
+def _read_array(decoder: _Decoder) -> array:
+    typecode, length = decoder.unpack('cI')
+    typecode = typecode.decode('ascii')
+    return _array_from_le_bytes(typecode, decoder.raw(length * array(typecode).itemsize))
+
+
+def encode_battle_state(state: BattleState, use_dex: bool = True) -> bytes:
+    """Encode a BattleState (teams, field, statistics and event log) into the compact binary format"""
+    encoder = _Encoder(_load_dex() if use_dex else None)
+    string = encoder.string
+
+    encoder.pack('iBBI', state.turn_count, state.is_my_turn, state.battle_ended, string(state.winner))
+
+    # Field
+    field = state.field
+    screens = field.screen_effects()
+    encoder.pack('BiBB', field.weather_code, field.weather_turns, field.weather_permanent, len(screens))
+    for screen in screens:
+        encoder.pack('BIh', screen.affects_side == "opponent", string(screen.effect_name), screen.turns_remaining)
+
+    # Teams (HP and status come from the team arrays, so clones encode correctly)
+    for side in ("ally", "opponent"):
+        team = state.get_team(side)
+        encoder.pack('BB', len(team), team.active)
+        for pokemon in team.members:
+            _write_pokemon(encoder, pokemon)
+        for index in range(len(team)):
+            encoder.pack('iI', state.get_hp(side, index), string(state.get_status(side, index)))
+
+    # Opponent move statistics
+    _write_counter(encoder, state.opponent_move_counts)
+    encoder.pack('Ii', string(state._most_used_opponent_move), state._opponent_moves_total)
+    encoder.pack('B', len(state.recent_opponent_moves))
+    for name in state.recent_opponent_moves:
+        encoder.pack('I', string(name))
+    _write_counter(encoder, state.ally_move_counts)
+
+    # Event log
+    log = state.event_log
+    encoder.pack('I', len(log.names))
+    for name in log.names:
+        encoder.pack('I', string(name))
+    for name in BattleEventLog.ARRAY_FIELDS:
+        _write_array(encoder, getattr(log, name))
+    for name in BattleEventLog.ARRAY_PAIR_FIELDS:
+        for column in getattr(log, name):
+            _write_array(encoder, column)
+
+    return encoder.finish(KIND_BATTLE_STATE)
+
+
+def decode_battle_state(data: bytes) -> BattleState:
+    """Decode a BattleState encoded with encode_battle_state"""
+    decoder = _Decoder(data, KIND_BATTLE_STATE, _load_dex())
+    string = decoder.string
+
+    turn_count, is_my_turn, battle_ended, winner = decoder.unpack('iBBI')
+
+    field = FieldState()
+    weather_code, weather_turns, weather_permanent, screen_count = decoder.unpack('BiBB')
+    if weather_code >= len(WEATHER_BY_CODE) or weather_turns < 0:
+        raise ValueError(f"Encoded field has weather code {weather_code} for {weather_turns} turns")
+    field.weather_code = weather_code
+    field.weather_turns = weather_turns
+    field.weather_permanent = bool(weather_permanent)
+    for _ in range(screen_count):
+        is_opponent, effect_name, turns = decoder.unpack('BIh')
+        if not 0 <= turns <= MAX_SCREEN_TURNS:
+            raise ValueError(f"Encoded screen effect has {turns} turns")
+        field.set_screen("opponent" if is_opponent else "ally", field.effect_slot(string(effect_name), add=True),
+                         turns)
+
+    teams: List[Tuple[List[Pokemon], int]] = []
+    for _ in range(2):
+        size, active = decoder.unpack('BB')
+        if active >= size:
+            raise ValueError(f"Encoded team has no slot {active} to be active")
+        members = [_read_pokemon(decoder) for _ in range(size)]
+        for pokemon in members:
+            hp, status = decoder.unpack('iI')
+            pokemon.current_hp = hp
+            pokemon.status_condition = string(status)
+        teams.append((members, active))
+
+    (ally_members, ally_active), (opponent_members, opponent_active) = teams
+    state = BattleState(ally_members[ally_active], opponent_members[opponent_active],
+                        ally_members, opponent_members)
+    state.turn_count = turn_count
+    state.is_my_turn = bool(is_my_turn)
+    state.battle_ended = bool(battle_ended)
+    state.winner = string(winner)
+    state.field = field
+
+    state.opponent_move_counts = _read_counter(decoder)
+    state.seen_opponent_moves = set(state.opponent_move_counts)
+    state._first_seen_order = {name: order for order, name in enumerate(state.opponent_move_counts)}
+    most_used, total = decoder.unpack('Ii')
+    state._most_used_opponent_move = string(most_used)
+    state._opponent_moves_total = total
+    (recent_count,) = decoder.unpack('B')
+    state.recent_opponent_moves = deque((string(decoder.unpack('I')[0]) for _ in range(recent_count)),
+                                        maxlen=RECENT_MOVE_WINDOW)
+    state.ally_move_counts = _read_counter(decoder)
+
+    log = BattleEventLog.__new__(BattleEventLog)
+    (name_count,) = decoder.unpack('I')
+    log.names = [string(decoder.unpack('I')[0]) for _ in range(name_count)]
+    log._name_ids = {name: name_id for name_id, name in enumerate(log.names)}
+    for name in BattleEventLog.ARRAY_FIELDS:
+        setattr(log, name, _read_array(decoder))
+    for name in BattleEventLog.ARRAY_PAIR_FIELDS:
+        setattr(log, name, (_read_array(decoder), _read_array(decoder)))
+    log.roster = (state.ally_team.members, state.opponent_team.members)
+    log.validate()
+    state._event_log = log
+    state._log_origin = None
+
+    # The moveset belief and move predictor are rebuilt from the logged opponent moves
+    for stint in log.stints_by_side[SIDE_CODES["opponent"]]:
+        history = PokemonBattleHistory(log, stint)
+        for move_name, _ in history.moves_used:
+            state.opponent_model.observe(history.pokemon, move_name)
+            state.move_predictor.observe(history.pokemon, move_name)
+
+    return state
+
+
+def decode(data: bytes):
+    """Decode any encoded record (Pokemon or BattleState)"""
+    if len(data) < 5 or data[:3] != MAGIC:
+        raise ValueError("Not an encoded Pokemon battle record")
+    kind = data[4]
+    if kind == KIND_POKEMON:
+        return decode_pokemon(data)
+    if kind == KIND_BATTLE_STATE:
+        return decode_battle_state(data)
+    raise ValueError(f"Unknown record kind {kind}")
+
+
+# Battle log files
+class BattleLogWriter:
+    """Appends encoded battles to a battle log file"""
+
+    def __init__(self, path: str, use_dex: bool = True):
+        self.use_dex = use_dex
+        self.count = 0
+        self._file: BinaryIO = open(path, "wb")
+        self._file.write(_LOG_HEADER.pack(LOG_MAGIC, LOG_FORMAT_VERSION))
+
+    def write(self, state: BattleState):
+        data = encode_battle_state(state, self.use_dex)
+        self._file.write(_LOG_LENGTH.pack(len(data)))
+        self._file.write(data)
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> 'BattleLogWriter':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_battle_log(states: Iterable[BattleState], path: str, use_dex: bool = True) -> int:
+    """Write battles to a battle log file and return how many were written"""
+    with BattleLogWriter(path, use_dex) as writer:
+        for state in states:
+            writer.write(state)
+    return writer.count
+
+
+def _open_battle_log(path: str) -> BinaryIO:
+    f = open(path, "rb")
+    header = f.read(_LOG_HEADER.size)
+    if len(header) < _LOG_HEADER.size or header[:len(LOG_MAGIC)] != LOG_MAGIC:
+        f.close()
+        raise ValueError(f"{path} is not a battle log file")
+    _, version = _LOG_HEADER.unpack(header)
+    if version != LOG_FORMAT_VERSION:
+        f.close()
+        raise ValueError(f"Unsupported battle log version {version} (expected {LOG_FORMAT_VERSION})")
+    return f
+
+
+def _next_record_length(f: BinaryIO, path: str) -> Optional[int]:
+    prefix = f.read(_LOG_LENGTH.size)
+    if not prefix:
+        return None
+    if len(prefix) < _LOG_LENGTH.size:
+        raise ValueError(f"{path} ends inside a record")
+    return _LOG_LENGTH.unpack(prefix)[0]
+
+
+def iter_battle_log_records(path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Stream the encoded battles of a battle log file.
+    Args:
+        start: Index of the first battle to read; earlier ones are skipped without reading them
+        stop: Index after the last battle to read (default the end of the file)
+    """
+    with _open_battle_log(path) as f:
+        index = 0
+        while stop is None or index < stop:
+            length = _next_record_length(f, path)
+            if length is None:
+                return
+            if index < start:
+                f.seek(length, 1)
+            else:
+                data = f.read(length)
+                if len(data) < length:
+                    raise ValueError(f"{path} ends inside a record")
+                yield data
+            index += 1
+
+
+def iter_battle_log(path: str, start: int = 0, stop: Optional[int] = None) -> Iterator[BattleState]:
+    """Stream the battles of a battle log file, decoding one at a time"""
+    for data in iter_battle_log_records(path, start, stop):
+        yield decode_battle_state(data)
+
+
+def count_battle_log(path: str) -> int:
+    """Number of battles in a battle log file, found by skipping from record to record"""
+    count = 0
+    with _open_battle_log(path) as f:
+        length = _next_record_length(f, path)
+        while length is not None:
+            f.seek(length, 1)
+            count += 1
+            length = _next_record_length(f, path)
+    return count
@@ -0,0 +1,299 @@
+"""
+Seeded, headless turn resolver and battle simulator.
+
+Resolves full turns on a BattleState: priority and speed order (speed
+ties are random), accuracy, critical hits, the 16 discrete damage rolls,
+weather and screen modifiers, burn, fainting with replacement, and the
+end-of-turn weather/burn chip and field countdown. Damage comes from
+utils.damage_calculator and is cached per matchup, so resolving a turn
+is mostly table lookups. All randomness is drawn from one random.Random,
+so a seed reproduces a battle exactly. Given RngStreams (utils.rng) instead,
+turn order/accuracy/crits, damage rolls and policies each draw from their
+own stream of the battle, so a battle replays from (root seed, battle id).
+
+Simulations normally run on clones; with record=True every action is
+also written to the state's event log.
+"""
+import random
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+from pokemon import Move
+from battle.battle_state import BattleState, WeatherType
+from battle.field_state import WEATHER_CODES, LIGHT_SCREEN, REFLECT, AURORA_VEIL
+from battle.decision_engine import _calculate_move_score, _get_weather_modifier, calculate_move_damage
+from utils.damage_calculator import calculate_physical_damage, calculate_special_damage
+from utils.rng import RngStreams, TURN_STREAM, DAMAGE_STREAM, POLICY_STREAM
+
+# The 16 equally likely damage rolls (85% to 100%)
+DAMAGE_ROLLS = tuple((85 + roll) / 100 for roll in range(16))
+
+CRIT_CHANCE = 1 / 24
+CRIT_MULTIPLIER = 1.5
+SCREEN_MULTIPLIER = 0.5
+BURN_MULTIPLIER = 0.5
+CHIP_FRACTION = 1 / 16
+
+# Weather that damages every active Pokemon at the end of the turn, and the types it spares
+WEATHER_CHIP_IMMUNE_TYPES = {
+    WEATHER_CODES[WeatherType.SANDSTORM]: {"rock", "ground", "steel"},
+    WEATHER_CODES[WeatherType.HAIL]: {"ice"},
+}
+
+SIDES = ("ally", "opponent")
+
+# A policy picks a move for one side: policy(state, side, moves, rng) -> Move
+Policy = Callable[[BattleState, str, List[Move], random.Random], Move]
+
+
+def opposing_side(side: str) -> str:
+    return "opponent" if side == "ally" else "ally"
+
+
+def team_defeated(state: BattleState, side: str) -> bool:
+    # HP is clamped at 0, so a defeated team's HP array is all zeros
+    return not any(state.get_team(side).hp)
+
+
+def greedy_policy(state: BattleState, side: str, moves: List[Move], rng: random.Random) -> Move:
+    """
+    Pick the best move by the one-ply greedy score.
+    Our side uses the decision engine's move score; the opponent picks its highest expected damage.
+    """
+    if side == "ally":
+        patterns = state.get_opponent_move_pattern()
+        return max(moves, key=lambda move: _calculate_move_score(state, move, patterns))
+    attacker, defender = state.opponent_pokemon, state.my_pokemon
+    return max(moves, key=lambda move: calculate_move_damage(attacker, defender, move) * (move.accuracy or 100))
+
+
+def random_policy(state: BattleState, side: str, moves: List[Move], rng: random.Random) -> Move:
+    """Pick a uniformly random move"""
+    return moves[int(rng.random() * len(moves))]
+
+
+@dataclass
+class BattleResult:
+    """Outcome of a simulated battle"""
+    winner: Optional[str]  # "ally", "opponent", or None for a draw or turn limit
+    turns: int
+    ally_remaining: int
+    opponent_remaining: int
+    state: BattleState
+
+
+class BattleSimulator:
+    """Resolves turns and whole battles with seeded randomness"""
+
+    def __init__(self, seed: Optional[int] = None, rng: Optional[random.Random] = None,
+                 damage_rolls: Tuple[float, ...] = DAMAGE_ROLLS, crit_chance: float = CRIT_CHANCE,
+                 record: bool = False, streams: Optional[RngStreams] = None):
+        """
+        Args:
+            seed: Seed for a new random number generator
+            rng: Random number generator to share (overrides seed)
+            streams: Per-battle streams to draw turns, damage rolls and policies from (overrides rng and seed)
+            damage_rolls: Equally likely random damage multipliers
+            crit_chance: Chance of a critical hit (0 disables crits)
+            record: Write moves, damage, KOs, switches and turns to the state's event log
+        """
+        if streams is not None:
+            self.rng = streams.stream(TURN_STREAM)
+            self.damage_rng = streams.stream(DAMAGE_STREAM)
+            self.policy_rng = streams.stream(POLICY_STREAM)
+        else:
+            self.rng = rng if rng is not None else random.Random(seed)
+            self.damage_rng = self.policy_rng = self.rng
+        self.streams = streams
+        self.damage_rolls = damage_rolls
+        self.crit_chance = crit_chance
+        self.record = record
+        self.damage_cache: Dict[tuple, Tuple[int, ...]] = {}
+
+    # Damage
+    def move_damage(self, state: BattleState, side: str, move: Move, critical: bool = False) -> Tuple[int, ...]:
+        """
+        Damage for each damage roll, including weather, screens on the defending
+        side (ignored by critical hits) and the attacker's burn.
+        """
+        attacker = state.my_pokemon if side == "ally" else state.opponent_pokemon
+        defender = state.opponent_pokemon if side == "ally" else state.my_pokemon
+        defending_side = opposing_side(side)
+        field = state.field
+        damage_class = move.damage_class.lower()
+        screened = not critical and (field.has_screen(defending_side, AURORA_VEIL) or (
+            field.has_screen(defending_side, REFLECT) if damage_class == 'physical'
+            else damage_class == 'special' and field.has_screen(defending_side, LIGHT_SCREEN)))
+        burned = (damage_class == 'physical' and state.get_status(side) == "burned"
+                  and "guts" not in attacker.ability_names)
+
+        # Keyed on the values the damage formula reads, never on object ids, which are reused
+        # once a battle's Pokemon are garbage collected
+        if damage_class == 'physical':
+            stats = (attacker.attack, defender.defense)
+        else:
+            stats = (attacker.special_attack, defender.special_defense)
+        key = (move.name, move.type, move.power, damage_class, attacker.level, tuple(attacker.types),
+               tuple(defender.types), stats, field.weather_code, screened, burned, critical)
+        damages = self.damage_cache.get(key)
+        if damages is None:
+            modifier = _get_weather_modifier(state, move)
+            if screened:
+                modifier *= SCREEN_MULTIPLIER
+            if burned:
+                modifier *= BURN_MULTIPLIER
+            if critical:
+                modifier *= CRIT_MULTIPLIER
+            if damage_class == 'physical':
+                calculate = calculate_physical_damage
+            elif damage_class == 'special':
+                calculate = calculate_special_damage
+            else:
+                calculate = None
+            damages = tuple(int(calculate(attacker, defender, move, roll) * modifier) if calculate and move.power else 0
+                            for roll in self.damage_rolls)
+            self.damage_cache[key] = damages
+        return damages
+
+    # Turn order
+    def action_orders(self, state: BattleState, my_move: Optional[Move], opponent_move: Optional[Move]):
+        """Possible action orders with their probabilities (speed ties are a coin flip)"""
+        mine = ("ally", my_move)
+        theirs = ("opponent", opponent_move)
+        my_priority = my_move.priority if my_move else 0
+        their_priority = opponent_move.priority if opponent_move else 0
+        if my_priority != their_priority:
+            return [(1.0, (mine, theirs) if my_priority > their_priority else (theirs, mine))]
+        my_speed = state.my_pokemon.speed
+        their_speed = state.opponent_pokemon.speed
+        if my_speed != their_speed:
+            return [(1.0, (mine, theirs) if my_speed > their_speed else (theirs, mine))]
+        return [(0.5, (mine, theirs)), (0.5, (theirs, mine))]
+
+    # Turn resolution
+    def resolve_turn(self, state: BattleState, my_move: Optional[Move], opponent_move: Optional[Move]):
+        """Resolve one full turn in place"""
+        rng = self.rng
+        orders = self.action_orders(state, my_move, opponent_move)
+        actions = orders[0][1] if len(orders) == 1 or rng.random() < 0.5 else orders[1][1]
+        if self.record and my_move is not None and opponent_move is not None:
+            state.record_turn_order(actions[0][0], my_move.name, opponent_move.name)
+        for side, move in actions:
+            team = state.get_team(side)
+            if team.hp[team.active] <= 0 or move is None:
+                continue
+            self.use_move(state, side, move)
+        self.end_turn(state)
+
+    def use_move(self, state: BattleState, side: str, move: Move) -> int:
+        """Use a move from one side's active Pokemon and return the damage dealt"""
+        rng = self.rng
+        record = self.record
+        if record:
+            state.record_move_used(side, move.name)
+        if not move.power:
+            return 0
+        if move.accuracy is not None and rng.random() * 100 >= move.accuracy:
+            return 0
+        critical = self.crit_chance > 0 and rng.random() < self.crit_chance
+        damages = self.move_damage(state, side, move, critical)
+        defender = opposing_side(side)
+        dealt = state.apply_damage(defender, damages[int(self.damage_rng.random() * len(damages))])
+        if record:
+            state.record_damage(defender, dealt, move_name=move.name, critical=critical)
+            state.record_damage(side, 0, dealt)
+            if state.get_hp(defender) <= 0:
+                state.record_ko(defender)
+        return dealt
+
+    def end_turn(self, state: BattleState):
+        """Weather and burn chip, replacement of fainted Pokemon, then count down the field"""
+        immune_types = WEATHER_CHIP_IMMUNE_TYPES.get(state.field.weather_code)
+        for side in SIDES:
+            team = state.get_team(side)
+            if team.hp[team.active] <= 0:
+                continue
+            chip = 0
+            if immune_types is not None and not any(t.lower() in immune_types for t in team.active_pokemon.types):
+                chip += max(1, int(team.max_hp[team.active] * CHIP_FRACTION))
+            if state.get_status(side) == "burned":
+                chip += max(1, int(team.max_hp[team.active] * CHIP_FRACTION))
+            if chip:
+                dealt = state.apply_damage(side, chip)
+                if self.record:
+                    state.record_damage(side, dealt)
+                    if state.get_hp(side) <= 0:
+                        state.record_ko(side)
+
+        self.replace_fainted(state)
+        if self.record:
+            state.advance_turn()
+        else:
+            state.field.tick()
+            state.turn_count += 1
+
+    def replace_fainted(self, state: BattleState):
+        """Send in the healthiest bench Pokemon for any side whose active Pokemon fainted"""
+        for side in SIDES:
+            team = state.get_team(side)
+            if team.hp[team.active] > 0:
+                continue
+            best_index, best_fraction = -1, 0.0
+            for index in range(len(team.hp)):
+                fraction = team.hp[index] / team.max_hp[index]
+                if fraction > best_fraction:
+                    best_index, best_fraction = index, fraction
+            if best_index < 0:
+                continue
+            if self.record:
+                state.switch_to(side, best_index)
+            else:
+                team.active = best_index
+
+    # Whole battles
+    def run_battle(self, state: BattleState, ally_policy: Policy = greedy_policy,
+                   opponent_policy: Policy = greedy_policy, max_turns: int = 200,
+                   in_place: bool = False) -> BattleResult:
+        """
+        Play a battle to the end (or max_turns) with a policy for each side.
+        Args:
+            state: Starting position (cloned unless in_place)
+            ally_policy: Chooses our moves
+            opponent_policy: Chooses the opponent's moves
+            max_turns: Turn limit, after which the battle is a draw
+            in_place: Resolve turns on state itself
+        """
+        if in_place:
+            state.sync_teams()
+        else:
+            state = state.clone(keep_history=self.record)
+        rng = self.policy_rng
+        start_turn = state.turn_count
+        for _ in range(max_turns):
+            if team_defeated(state, "ally") or team_defeated(state, "opponent"):
+                break
+            my_moves = state.my_pokemon.moves
+            opponent_moves = state.opponent_pokemon.moves
+            my_move = ally_policy(state, "ally", my_moves, rng) if my_moves else None
+            opponent_move = opponent_policy(state, "opponent", opponent_moves, rng) if opponent_moves else None
+            self.resolve_turn(state, my_move, opponent_move)
+
+        ally_defeated = team_defeated(state, "ally")
+        opponent_defeated = team_defeated(state, "opponent")
+        winner = None
+        if opponent_defeated and not ally_defeated:
+            winner = "ally"
+        elif ally_defeated and not opponent_defeated:
+            winner = "opponent"
+        if winner is not None:
+            state.battle_ended = True
+            state.winner = winner
+        return BattleResult(winner, state.turn_count - start_turn,
+                            state.ally_team.alive_count(), state.opponent_team.alive_count(), state)
+
+
+def run_battle(state: BattleState, ally_policy: Policy = greedy_policy, opponent_policy: Policy = greedy_policy,
+               seed: Optional[int] = None, max_turns: int = 200, record: bool = False,
+               streams: Optional[RngStreams] = None) -> BattleResult:
+    """Simulate a battle from a position on a clone and return the result"""
+    simulator = BattleSimulator(seed=seed, record=record, streams=streams)
+    return simulator.run_battle(state, ally_policy, opponent_policy, max_turns)
@@ -0,0 +1,390 @@
+"""
+Opponent stat-spread inference from observed damage and turn order.
+
+Every opponent species gets a grid of candidate spreads: EV investments
+(EV_LEVELS per stat within EV_BUDGET) x the 21 distinct nature modifiers x
+stat-boosting items. Each candidate's stats are precomputed as numpy
+columns, together with the few distinct values each column takes. An
+observation is checked once per distinct value with the vectorized damage
+formula (all 16 damage rolls) or a speed
+comparison, then mapped back to the remaining candidates with one gather, so beliefs
+are narrowed incrementally at well under a millisecond per observation.
+
+The surviving spreads bound each stat; the nominal stat of the Pokemon
+(no EVs, neutral nature, no item) is clipped into those bounds and the
+result is used by the analysis in place of the nominal stats.
+Beliefs are immutable, so copying a SpreadInference only copies a dict.
+"""
+from dataclasses import dataclass, field, fields
+from functools import lru_cache
+from itertools import product
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from pokemon import Pokemon, Move
+from battle.field_state import LIGHT_SCREEN, REFLECT, AURORA_VEIL
+from battle.decision_engine import _get_weather_modifier
+from battle.opponent_model import species_key
+from battle.simulator import DAMAGE_ROLLS, CRIT_MULTIPLIER, SCREEN_MULTIPLIER, BURN_MULTIPLIER
+from pokedata.dex import get_dex
+from utils.damage_calculator import damage_formula
+from utils.type_effectiveness import get_multiplier
+
+STATS = ("hp", "attack", "defense", "special_attack", "special_defense", "speed")
+# Stats the damage formula and turn order read (hp is only bounded)
+BATTLE_STATS = STATS[1:]
+
+# EVs considered per stat, and the total a spread may use
+EV_LEVELS = (0, 124, 252)
+EV_BUDGET = 508
+IV = 31
+
+# Nature -> (raised stat, lowered stat); neutral natures raise and lower the same stat
+NATURES = {
+    "Hardy": ("attack", "attack"), "Lonely": ("attack", "defense"), "Brave": ("attack", "speed"),
+    "Adamant": ("attack", "special_attack"), "Naughty": ("attack", "special_defense"),
+    "Bold": ("defense", "attack"), "Docile": ("defense", "defense"), "Relaxed": ("defense", "speed"),
+    "Impish": ("defense", "special_attack"), "Lax": ("defense", "special_defense"),
+    "Timid": ("speed", "attack"), "Hasty": ("speed", "defense"), "Serious": ("speed", "speed"),
+    "Jolly": ("speed", "special_attack"), "Naive": ("speed", "special_defense"),
+    "Modest": ("special_attack", "attack"), "Mild": ("special_attack", "defense"),
+    "Quiet": ("special_attack", "speed"), "Bashful": ("special_attack", "special_attack"),
+    "Rash": ("special_attack", "special_defense"),
+    "Calm": ("special_defense", "attack"), "Gentle": ("special_defense", "defense"),
+    "Sassy": ("special_defense", "speed"), "Careful": ("special_defense", "special_attack"),
+    "Quirky": ("special_defense", "special_defense"),
+}
+
+# Items that multiply a stat (None: no stat-boosting item)
+STAT_ITEMS = {
+    None: {},
+    "Choice Band": {"attack": 1.5},
+    "Choice Specs": {"special_attack": 1.5},
+    "Choice Scarf": {"speed": 1.5},
+    "Assault Vest": {"special_defense": 1.5},
+}
+
+_ROLLS = np.array(DAMAGE_ROLLS)
+
+
+def _distinct_natures() -> Tuple[Tuple[str, ...], np.ndarray]:
+    """One nature per distinct modifier vector (in percent), the neutral one first"""
+    names = ["Hardy"]
+    modifiers = [np.full(len(STATS), 100)]
+    for name, (raised, lowered) in NATURES.items():
+        if raised == lowered:
+            continue
+        row = np.full(len(STATS), 100)
+        row[STATS.index(raised)] = 110
+        row[STATS.index(lowered)] = 90
+        names.append(name)
+        modifiers.append(row)
+    return tuple(names), np.array(modifiers)
+
+
+@dataclass(frozen=True, eq=False)
+class SpreadGrid:
+    """Candidate spreads of one species at one level with their stats"""
+    evs: np.ndarray               # (candidates, 6) EVs in STATS order
+    natures: Tuple[str, ...]      # Candidate nature names, indexed by nature_index
+    nature_index: np.ndarray      # (candidates,)
+    items: Tuple[Optional[str], ...]
+    item_index: np.ndarray        # (candidates,)
+    stats: np.ndarray             # (candidates, 6) stats including the item multiplier
+    values: Tuple[np.ndarray, ...] = field(default=())   # Per stat, its distinct values
+    inverse: Tuple[np.ndarray, ...] = field(default=())  # Per stat, each candidate's index into values
+
+    def __len__(self) -> int:
+        return len(self.stats)
+
+
+@lru_cache(maxsize=None)
+def spread_grid(base_stats: Tuple[int, ...], level: int) -> SpreadGrid:
+    """Build (once) the candidate grid for base stats (in STATS order) at a level"""
+    levels = np.array(EV_LEVELS)
+    evs = levels[np.array(list(product(range(len(EV_LEVELS)), repeat=len(STATS))))]
+    evs = evs[evs.sum(axis=1) <= EV_BUDGET]
+    evs = evs[np.argsort(evs.sum(axis=1), kind="stable")]
+    nature_names, nature_modifiers = _distinct_natures()
+    items = tuple(STAT_ITEMS)
+    item_modifiers = np.array([[STAT_ITEMS[item].get(stat, 1.0) for stat in STATS] for item in items])
+
+    # Least invested spreads first, so candidate 0 is the nominal spread (no EVs, neutral nature, no item)
+    ev_index, nature_index, item_index = (axis.ravel() for axis in np.meshgrid(
+        np.arange(len(evs)), np.arange(len(nature_names)), np.arange(len(items)), indexing="ij"))
+    candidate_evs = evs[ev_index]
+    base = np.array(base_stats)
+    raw = ((2 * base + IV + candidate_evs // 4) * level) // 100
+    stats = (raw + 5) * nature_modifiers[nature_index] // 100
+    stats[:, 0] = raw[:, 0] + level + 10
+    stats = np.floor(stats * item_modifiers[item_index])
+
+    values, inverse = zip(*(np.unique(stats[:, column], return_inverse=True) for column in range(len(STATS))))
+    return SpreadGrid(candidate_evs, nature_names, nature_index, items, item_index, stats,
+                      tuple(values), tuple(np.ravel(index).astype(np.uint8) for index in inverse))
+
+
+def grid_for(pokemon: Pokemon) -> SpreadGrid:
+    stats = pokemon.stats
+    return spread_grid((stats.hp, stats.attack, stats.defense, stats.special_attack,
+                        stats.special_defense, stats.speed), pokemon.level)
+
+
+def _possible_damage(levels, powers, attacker_stats, defender_stats, stab, effectiveness,
+                     modifiers: Sequence[float]) -> np.ndarray:
+    """
+    Damage of every roll under every modifier, truncated like the simulator
+    (the formula, then the modifier). The last axis runs over modifiers x rolls.
+    """
+    base = np.maximum(0, np.trunc(damage_formula(levels, powers, attacker_stats, defender_stats,
+                                                 stab, effectiveness, _ROLLS)))
+    return np.concatenate([np.trunc(base * modifier) for modifier in modifiers], axis=-1)
+
+
+class SpreadBelief:
+    """The spreads of one opponent Pokemon that are consistent with what was observed"""
+
+    __slots__ = ("grid", "candidates", "observations", "_bounds", "_estimates")
+
+    def __init__(self, grid: SpreadGrid, candidates: np.ndarray, observations: int = 0):
+        """
+        Args:
+            grid: Candidate spreads of the species
+            candidates: Indices of the grid rows still possible, ascending
+            observations: Number of observations that narrowed the belief
+        """
+        self.grid = grid
+        self.candidates = candidates
+        self.observations = observations
+        self._bounds: Optional[Dict[str, Tuple[int, int]]] = None
+        self._estimates: Dict[int, Tuple[Pokemon, Pokemon]] = {}
+
+    @classmethod
+    def prior(cls, grid: SpreadGrid) -> 'SpreadBelief':
+        return _prior_belief(grid)
+
+    def _narrow(self, stat: str, consistent: np.ndarray) -> 'SpreadBelief':
+        """Belief restricted to candidates whose value of stat is consistent (self if nothing changes)"""
+        if consistent.all():
+            return self
+        inverse = self.grid.inverse[STATS.index(stat)]
+        candidates = self.candidates
+        if len(candidates) == len(inverse):
+            narrowed = np.flatnonzero(consistent.take(inverse))
+        else:
+            # Only the remaining candidates are checked, so updates get cheaper as the belief narrows
+            narrowed = candidates.compress(consistent.take(inverse.take(candidates)))
+        # An empty result means nothing explains the observation (e.g. an ability or item we do not model)
+        if len(narrowed) == len(candidates) or not len(narrowed):
+            return self
+        return SpreadBelief(self.grid, narrowed, self.observations + 1)
+
+    def observe_attack(self, attacker: Pokemon, defender: Pokemon, move: Move, damage: int,
+                       modifiers: Sequence[float] = (1.0,), knocked_out: bool = False) -> 'SpreadBelief':
+        """
+        Belief after this Pokemon (attacker) hit a known defender for damage.
+        Args:
+            modifiers: Possible products of the weather/screen/burn/critical hit multipliers
+            knocked_out: The damage was capped by the defender's remaining HP
+        """
+        damage_class = (move.damage_class or "").lower()
+        if not move.power or damage_class not in ('physical', 'special'):
+            return self
+        physical = damage_class == 'physical'
+        stat = "attack" if physical else "special_attack"
+        values = self.grid.values[STATS.index(stat)]
+        defender_stat = defender.defense if physical else defender.special_defense
+        stab = 1.5 if move.type in attacker.types else 1
+        damages = _possible_damage(attacker.level, move.power, values[:, None], defender_stat, stab,
+                                   get_multiplier(move.type, defender.types), modifiers)
+        return self._narrow(stat, self._matches(damages, damage, knocked_out))
+
+    def observe_defense(self, defender: Pokemon, attacker: Pokemon, move: Move, damage: int,
+                        modifiers: Sequence[float] = (1.0,), knocked_out: bool = False) -> 'SpreadBelief':
+        """Belief after a known attacker hit this Pokemon (defender) for damage"""
+        damage_class = (move.damage_class or "").lower()
+        if not move.power or damage_class not in ('physical', 'special'):
+            return self
+        physical = damage_class == 'physical'
+        stat = "defense" if physical else "special_defense"
+        values = self.grid.values[STATS.index(stat)]
+        attacker_stat = attacker.attack if physical else attacker.special_attack
+        stab = 1.5 if move.type in attacker.types else 1
+        damages = _possible_damage(attacker.level, move.power, attacker_stat, values[:, None], stab,
+                                   get_multiplier(move.type, defender.types), modifiers)
+        return self._narrow(stat, self._matches(damages, damage, knocked_out))
+
+    def observe_order(self, other_speed: int, moved_first: bool) -> 'SpreadBelief':
+        """Belief after this Pokemon moved before (or after) one with other_speed at equal priority"""
+        values = self.grid.values[STATS.index("speed")]
+        # Speed ties are a coin flip, so equal speed is consistent with either order
+        consistent = values >= other_speed if moved_first else values <= other_speed
+        return self._narrow("speed", consistent)
+
+    @staticmethod
+    def _matches(damages: np.ndarray, damage: int, knocked_out: bool) -> np.ndarray:
+        if knocked_out:
+            return (damages >= damage).any(axis=1)
+        return (damages == damage).any(axis=1)
+
+    @property
+    def candidate_count(self) -> int:
+        """Number of spreads still possible"""
+        return len(self.candidates)
+
+    def stat_bounds(self) -> Dict[str, Tuple[int, int]]:
+        """Lowest and highest value of each stat over the remaining spreads"""
+        if self._bounds is None:
+            stats = self.grid.stats[self.candidates]
+            self._bounds = {stat: (int(low), int(high))
+                            for stat, low, high in zip(STATS, stats.min(axis=0), stats.max(axis=0))}
+        return self._bounds
+
+    def estimate(self, pokemon: Pokemon) -> Pokemon:
+        """
+        The Pokemon with each nominal stat clipped into the remaining bounds
+        (the Pokemon itself when every nominal stat is still possible).
+        """
+        cached = self._estimates.get(id(pokemon))
+        if cached is not None and cached[0] is pokemon:
+            return cached[1]
+        bounds = self.stat_bounds()
+        inferred = {}
+        for stat in BATTLE_STATS:
+            nominal = getattr(pokemon, stat)
+            low, high = bounds[stat]
+            if not low <= nominal <= high:
+                inferred[stat] = min(max(nominal, low), high)
+        estimate = InferredPokemon.from_pokemon(pokemon, inferred) if inferred else pokemon
+        self._estimates[id(pokemon)] = (pokemon, estimate)
+        return estimate
+
+    def likely_spreads(self, count: int = 3) -> List[Tuple[Dict[str, int], str, Optional[str]]]:
+        """A few remaining spreads as (EVs by stat, nature, item), least invested first"""
+        grid = self.grid
+        indices = self.candidates[:count]
+        return [({stat: int(ev) for stat, ev in zip(STATS, grid.evs[index]) if ev},
+                 grid.natures[grid.nature_index[index]], grid.items[grid.item_index[index]])
+                for index in indices]
+
+
+@lru_cache(maxsize=None)
+def _prior_belief(grid: SpreadGrid) -> SpreadBelief:
+    return SpreadBelief(grid, np.arange(len(grid)))
+
+
+@dataclass
+class InferredPokemon(Pokemon):
+    """A Pokemon whose battle stats are replaced by inferred values"""
+    inferred_stats: Dict[str, int] = field(default_factory=dict)
+
+    @classmethod
+    def from_pokemon(cls, pokemon: Pokemon, inferred_stats: Dict[str, int]) -> 'InferredPokemon':
+        values = {f.name: getattr(pokemon, f.name) for f in fields(Pokemon)}
+        return cls(**values, inferred_stats=inferred_stats)
+
+    def _stat(self, name: str, base_stat: int) -> int:
+        value = self.inferred_stats.get(name)
+        return value if value is not None else self.calculate_stat(base_stat)
+
+    @property
+    def attack(self) -> int:
+        return self._stat("attack", self.stats.attack)
+
+    @property
+    def defense(self) -> int:
+        return self._stat("defense", self.stats.defense)
+
+    @property
+    def special_attack(self) -> int:
+        return self._stat("special_attack", self.stats.special_attack)
+
+    @property
+    def special_defense(self) -> int:
+        return self._stat("special_defense", self.stats.special_defense)
+
+    @property
+    def speed(self) -> int:
+        return self._stat("speed", self.stats.speed)
+
+
+def _find_move(pokemon: Pokemon, move_name: str) -> Optional[Move]:
+    return pokemon.get_move_by_name(move_name) or get_dex().find_move(move_name)
+
+
+def hit_modifier(state, attacking_side: str, move: Move, critical: bool = False) -> float:
+    """Weather, screen, burn and critical hit multiplier of a hit in the state, as the simulator applies it"""
+    defending_side = "opponent" if attacking_side == "ally" else "ally"
+    attacker = state.my_pokemon if attacking_side == "ally" else state.opponent_pokemon
+    field_state = state.field
+    damage_class = move.damage_class.lower()
+    modifier = _get_weather_modifier(state, move)
+    if (damage_class == 'physical' and state.get_status(attacking_side) == "burned"
+            and "guts" not in attacker.ability_names):
+        modifier *= BURN_MULTIPLIER
+    if critical:
+        # Critical hits ignore screens
+        return modifier * CRIT_MULTIPLIER
+    if field_state.has_screen(defending_side, AURORA_VEIL) or (
+            field_state.has_screen(defending_side, REFLECT) if damage_class == 'physical'
+            else field_state.has_screen(defending_side, LIGHT_SCREEN)):
+        modifier *= SCREEN_MULTIPLIER
+    return modifier
+
+
+class SpreadInference:
+    """Spread beliefs for each opponent species seen in a battle"""
+
+    def __init__(self):
+        self._beliefs: Dict[int, SpreadBelief] = {}
+
+    def belief(self, pokemon: Pokemon) -> SpreadBelief:
+        """Current belief about a Pokemon's spread"""
+        belief = self._beliefs.get(species_key(pokemon))
+        return belief if belief is not None else _prior_belief(grid_for(pokemon))
+
+    def _update(self, pokemon: Pokemon, belief: SpreadBelief, updated: SpreadBelief):
+        if updated is not belief:
+            self._beliefs[species_key(pokemon)] = updated
+
+    def record_hit(self, state, defending_side: str, move_name: str, damage: int, critical: bool = False):
+        """
+        Update from a hit between the active Pokemon, recorded after the
+        damage was applied to the state.
+        """
+        if damage <= 0:
+            return
+        opponent = state.opponent_pokemon
+        mine = state.my_pokemon
+        attacking_side = "opponent" if defending_side == "ally" else "ally"
+        move = _find_move(opponent if attacking_side == "opponent" else mine, move_name)
+        if move is None or not move.power:
+            return
+        modifiers = (hit_modifier(state, attacking_side, move, critical),)
+        knocked_out = state.get_hp(defending_side) <= 0
+        belief = self.belief(opponent)
+        if attacking_side == "opponent":
+            updated = belief.observe_attack(opponent, mine, move, damage, modifiers, knocked_out)
+        else:
+            updated = belief.observe_defense(opponent, mine, move, damage, modifiers, knocked_out)
+        self._update(opponent, belief, updated)
+
+    def record_order(self, state, first_side: str, ally_move_name: str, opponent_move_name: str):
+        """Update from the order the active Pokemon moved in (only informative at equal priority)"""
+        opponent = state.opponent_pokemon
+        mine = state.my_pokemon
+        ally_move = _find_move(mine, ally_move_name)
+        opponent_move = _find_move(opponent, opponent_move_name)
+        if ally_move is None or opponent_move is None or ally_move.priority != opponent_move.priority:
+            return
+        belief = self.belief(opponent)
+        self._update(opponent, belief, belief.observe_order(mine.speed, first_side == "opponent"))
+
+    def estimate(self, pokemon: Pokemon) -> Pokemon:
+        """The Pokemon with its stats narrowed by what was observed"""
+        belief = self._beliefs.get(species_key(pokemon))
+        return belief.estimate(pokemon) if belief is not None else pokemon
+
+    def copy(self) -> 'SpreadInference':
+        inference = SpreadInference()
+        inference._beliefs = dict(self._beliefs)
+        return inference
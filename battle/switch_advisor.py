@@ -0,0 +1,205 @@
+"""
+Switch evaluation and unified move/switch ranking.
+
+For our active Pokemon and every healthy bench Pokemon the advisor builds
+two damage matrices with one vectorized damage pass:
+    damage_taken[i, j]  opponent's move j against our candidate i
+    damage_dealt[i, k]  our candidate i's move k against the opponent
+including weather, screens and burn. The opponent's moves are weighted by
+the probability that it carries them under the state's moveset belief
+(battle.opponent_model); without a learnset for its species, its revealed
+moves count fully and the rest of its set is discounted. Moves and switches are
+then scored on one scale, the share of the opponent's HP we take this turn
+and next minus the share of ours we lose, and returned as a single ranking.
+"""
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+import numpy as np
+from pokemon import Move
+from battle.battle_state import BattleState
+from battle.field_state import LIGHT_SCREEN, REFLECT, AURORA_VEIL
+from battle.decision_engine import _get_weather_modifier
+from battle.simulator import SCREEN_MULTIPLIER, BURN_MULTIPLIER
+from pokedata.dex import get_dex
+from utils.damage_calculator import calculate_damage_batch
+
+# Weight of unrevealed opponent moves when its species has no learnset
+UNREVEALED_MOVE_WEIGHT = 0.6
+# Weight of next turn's matchup relative to this turn
+MATCHUP_WEIGHT = 0.5
+# Bonus for a move that knocks the opponent out before it can act
+KO_BONUS = 0.5
+
+
+@dataclass
+class RankedAction:
+    """A move or a switch with its score"""
+    kind: str                 # "move" or "switch"
+    name: str                 # Move name, or the name of the Pokemon to switch to
+    score: float
+    damage_dealt: float       # Share of the opponent's current HP we expect to take this turn
+    damage_taken: float       # Share of our (incoming) Pokemon's current HP we expect to lose this turn
+    slot: Optional[int] = None  # Team slot for switches
+
+    def describe(self) -> str:
+        if self.kind == "switch":
+            return (f"Switch to {self.name} (takes ~{self.damage_taken:.0%} of its HP, "
+                    f"then threatens ~{self.damage_dealt:.0%})")
+        return f"Use {self.name} (~{self.damage_dealt:.0%} of the opponent's HP, takes ~{self.damage_taken:.0%})"
+
+
+def likely_opponent_moves(state: BattleState) -> List[Tuple[Move, float]]:
+    """The opponent active's possible moves, weighted by the probability that it carries them"""
+    opponent = state.opponent_pokemon
+    belief = state.opponent_model.belief(opponent)
+    if belief is None:
+        seen = state.seen_opponent_moves
+        return [(move, 1.0 if move.name in seen else UNREVEALED_MOVE_WEIGHT) for move in opponent.moves]
+
+    dex = get_dex()
+    moves = []
+    for name, probability in belief.move_probabilities().items():
+        move = dex.find_move(name) or opponent.get_move_by_name(name)
+        if move is not None and probability > 0:
+            moves.append((move, probability))
+    return moves
+
+
+class SwitchAdvisor:
+    """Damage matrices for our candidates against the opponent's active Pokemon"""
+
+    def __init__(self, state: BattleState, opponent_moves: Optional[Sequence[Tuple[Move, float]]] = None):
+        """
+        Args:
+            state: Current battle
+            opponent_moves: (move, weight) pairs the opponent may use; defaults to
+                likely_opponent_moves(state)
+        """
+        state.sync_teams()
+        self.state = state
+        team = state.ally_team
+        self.slots = [team.active] if team.hp[team.active] > 0 else []
+        self.slots += team.bench_indices()
+        self.candidates = [team.members[slot] for slot in self.slots]
+        self.hp = np.array([team.hp[slot] for slot in self.slots], dtype=np.float64)
+        # Stats narrowed by observed damage and turn order (battle.spread_inference)
+        self.opponent = state.estimated_opponent()
+        self.opponent_hp = max(1, state.get_hp("opponent"))
+
+        if opponent_moves is None:
+            opponent_moves = likely_opponent_moves(state)
+        self.opponent_moves = [move for move, _ in opponent_moves]
+        self.opponent_weights = np.array([weight for _, weight in opponent_moves], dtype=np.float64)
+        self.move_slots = max((len(pokemon.moves) for pokemon in self.candidates), default=0)
+
+        self.damage_taken, self.damage_dealt = self._damage_matrices()
+
+    def _damage_matrices(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Both matrices from one batched damage calculation"""
+        state = self.state
+        opponent = self.opponent
+        count = len(self.candidates)
+        taken_shape = (count, len(self.opponent_moves))
+        dealt_shape = (count, self.move_slots)
+
+        triples = []
+        modifiers = []
+        for pokemon in self.candidates:
+            for move in self.opponent_moves:
+                triples.append((opponent, pokemon, move))
+                modifiers.append(self._modifier(move, "opponent", "ally"))
+        dealt_index = []
+        for i, pokemon in enumerate(self.candidates):
+            for k, move in enumerate(pokemon.moves):
+                triples.append((pokemon, opponent, move))
+                # Burn only affects the Pokemon that has it, i.e. our active one
+                burned = i == 0 and self.slots[0] == state.ally_team.active and state.get_status("ally") == "burned"
+                accuracy = (move.accuracy or 100) / 100
+                modifiers.append(self._modifier(move, "ally", "opponent", burned) * accuracy)
+                dealt_index.append(i * self.move_slots + k)
+
+        damage = calculate_damage_batch(triples).astype(np.float64) if triples else np.zeros(0)
+        damage *= np.array(modifiers, dtype=np.float64)
+        split = taken_shape[0] * taken_shape[1]
+        damage_taken = damage[:split].reshape(taken_shape)
+        damage_dealt = np.zeros(count * self.move_slots)
+        damage_dealt[dealt_index] = damage[split:]
+        return damage_taken, damage_dealt.reshape(dealt_shape)
+
+    def _modifier(self, move: Move, attacking_side: str, defending_side: str, burned: bool = False) -> float:
+        """Weather, screen and burn multiplier for one move"""
+        field = self.state.field
+        damage_class = (move.damage_class or "").lower()
+        modifier = _get_weather_modifier(self.state, move) if move.power else 1.0
+        if field.has_screen(defending_side, AURORA_VEIL) or (
+                field.has_screen(defending_side, REFLECT) if damage_class == 'physical'
+                else damage_class == 'special' and field.has_screen(defending_side, LIGHT_SCREEN)):
+            modifier *= SCREEN_MULTIPLIER
+        if burned and damage_class == 'physical':
+            modifier *= BURN_MULTIPLIER
+        return modifier
+
+    def expected_damage_taken(self) -> np.ndarray:
+        """Per candidate, the damage of the opponent's most threatening likely move"""
+        if not self.opponent_moves:
+            return np.zeros(len(self.candidates))
+        return (self.damage_taken * self.opponent_weights).max(axis=1)
+
+    def taken_fraction(self) -> np.ndarray:
+        """Per candidate, the share of its current HP it is expected to lose to one attack"""
+        return np.minimum(1.0, self.expected_damage_taken() / np.maximum(self.hp, 1))
+
+    def dealt_fraction(self) -> np.ndarray:
+        """Per candidate and move, the share of the opponent's current HP it takes"""
+        return np.minimum(1.0, self.damage_dealt / self.opponent_hp)
+
+    def matchup(self) -> np.ndarray:
+        """Per candidate, its best move's damage share minus the share of its HP it loses"""
+        dealt = self.dealt_fraction()
+        best = dealt.max(axis=1) if dealt.size else np.zeros(len(self.candidates))
+        return best - self.taken_fraction()
+
+    def rank(self) -> List[RankedAction]:
+        """Moves of the active Pokemon and switches to the bench, best first"""
+        state = self.state
+        taken = self.taken_fraction()
+        dealt = self.dealt_fraction()
+        matchup = self.matchup()
+        actions = []
+
+        active_alive = bool(self.slots) and self.slots[0] == state.ally_team.active
+        if active_alive:
+            active = self.candidates[0]
+            opponent_priority = max((move.priority for move in self.opponent_moves), default=0)
+            for k, move in enumerate(active.moves):
+                knocks_out = dealt[0, k] >= 1.0
+                moves_first = move.priority > opponent_priority or (
+                    move.priority == opponent_priority and active.speed > self.opponent.speed)
+                # Knocking the opponent out first means we take nothing this turn
+                lost = 0.0 if knocks_out and moves_first else taken[0]
+                score = dealt[0, k] - lost + (KO_BONUS if knocks_out else 0.0)
+                if lost < 1.0:
+                    score += MATCHUP_WEIGHT * matchup[0]
+                actions.append(RankedAction("move", move.name, float(score), float(dealt[0, k]), float(lost)))
+
+        first_bench = 1 if active_alive else 0
+        for i in range(first_bench, len(self.candidates)):
+            # The incoming Pokemon takes the hit this turn and only attacks next turn
+            score = -taken[i] + MATCHUP_WEIGHT * matchup[i] if taken[i] < 1.0 else -taken[i]
+            best_dealt = float(dealt[i].max()) if dealt.size else 0.0
+            actions.append(RankedAction("switch", self.candidates[i].name, float(score), best_dealt,
+                                        float(taken[i]), self.slots[i]))
+
+        actions.sort(key=lambda action: action.score, reverse=True)
+        return actions
+
+
+def rank_actions(state: BattleState, opponent_moves: Optional[Sequence[Tuple[Move, float]]] = None) -> List[RankedAction]:
+    """Rank every move of the active Pokemon and every switch in one call"""
+    return SwitchAdvisor(state, opponent_moves).rank()
+
+
+def recommend_action(state: BattleState) -> Optional[RankedAction]:
+    """The best move or switch, or None when there is nothing to do"""
+    actions = rank_actions(state)
+    return actions[0] if actions else None
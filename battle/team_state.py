@@ -0,0 +1,108 @@
+"""
+Array-backed team state for one side of a battle.
+
+Each side keeps up to six Pokemon. The Pokemon objects hold the static
+build (species, stats, moves) and are shared between copies, while HP
+and status live in small typed arrays, so switching is an index change
+and copying a team only copies a few bytes.
+"""
+from array import array
+from typing import Dict, List, Optional, Tuple
+from pokemon import Pokemon
+
+MAX_TEAM_SIZE = 6
+
+# Status conditions with stable integer codes (code 0 is healthy); fixed, since the codes
+# are stored per slot and shared by every battle
+STATUS_CONDITIONS: Tuple[Optional[str], ...] = (None, "paralyzed", "burned", "frozen", "poisoned",
+                                                "badly_poisoned", "asleep")
+_STATUS_CODES: Dict[Optional[str], int] = {status: code for code, status in enumerate(STATUS_CONDITIONS)}
+
+
+def status_code(status: Optional[str]) -> int:
+    """Get the code for a status condition"""
+    code = _STATUS_CODES.get(status)
+    if code is None:
+        raise ValueError(f"Unknown status condition: {status!r}. Expected one of {STATUS_CONDITIONS}")
+    return code
+
+
+class TeamState:
+    """HP, status and active slot for a team of up to six Pokemon"""
+    __slots__ = ("members", "hp", "max_hp", "status", "active")
+
+    def __init__(self, members: List[Pokemon], active: int = 0):
+        if not members:
+            raise ValueError("A team needs at least one Pokemon")
+        if len(members) > MAX_TEAM_SIZE:
+            raise ValueError(f"A team can have at most {MAX_TEAM_SIZE} Pokemon")
+        self.members = list(members)
+        self.hp = array('i', [pokemon.current_hp for pokemon in members])
+        self.max_hp = array('i', [pokemon.calculate_hp() for pokemon in members])
+        self.status = array('b', [status_code(pokemon.status_condition) for pokemon in members])
+        self.active = active
+
+    def copy(self) -> 'TeamState':
+        """Copy the team; Pokemon objects are shared, HP and status are copied"""
+        team = TeamState.__new__(TeamState)
+        team.members = self.members[:]
+        team.hp = self.hp[:]
+        team.max_hp = self.max_hp
+        team.status = self.status[:]
+        team.active = self.active
+        return team
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    @property
+    def active_pokemon(self) -> Pokemon:
+        return self.members[self.active]
+
+    def index_of(self, pokemon: Pokemon) -> int:
+        """
+        Get the slot of a Pokemon in the team, or -1 if it is not a member.
+        The object itself is matched first, then a member of the same species, so a
+        Pokemon rebuilt by a decoder or the dex finds the slot of the one it describes.
+        """
+        for index, member in enumerate(self.members):
+            if member is pokemon:
+                return index
+        species_id = pokemon.species_id
+        for index, member in enumerate(self.members):
+            if species_id is not None and member.species_id is not None:
+                if member.species_id == species_id:
+                    return index
+            elif member.name == pokemon.name:
+                return index
+        return -1
+
+    def add(self, pokemon: Pokemon) -> int:
+        """Add a Pokemon to the team (e.g. a newly revealed opponent) and return its slot"""
+        if len(self.members) >= MAX_TEAM_SIZE:
+            raise ValueError(f"A team can have at most {MAX_TEAM_SIZE} Pokemon")
+        self.members.append(pokemon)
+        self.hp.append(pokemon.current_hp)
+        self.max_hp = self.max_hp + array('i', [pokemon.calculate_hp()])
+        self.status.append(status_code(pokemon.status_condition))
+        return len(self.members) - 1
+
+    def is_fainted(self, index: int) -> bool:
+        return self.hp[index] <= 0
+
+    def bench_indices(self) -> List[int]:
+        """Slots of the non-fainted Pokemon that are not active"""
+        return [index for index in range(len(self.members))
+                if index != self.active and self.hp[index] > 0]
+
+    def alive_count(self) -> int:
+        return sum(1 for hp in self.hp if hp > 0)
+
+    def get_status(self, index: int) -> Optional[str]:
+        return STATUS_CONDITIONS[self.status[index]]
+
+    def sync_from_pokemon(self):
+        """Reload HP and status from the Pokemon objects"""
+        for index, pokemon in enumerate(self.members):
+            self.hp[index] = pokemon.current_hp
+            self.status[index] = status_code(pokemon.status_condition)
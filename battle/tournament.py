@@ -0,0 +1,373 @@
+"""
+Self-play tournament between engine configurations.
+
+A JSON spec lists teams and engine variants (an engine from
+decision_engine.ENGINES plus its options and, for greedy, ScoreWeights).
+Every pair of engines plays battles_per_pairing seeded battles on every
+team matchup, swapping sides each battle so neither engine keeps the
+faster team. Battles run headless on BattleSimulator across a process
+pool; each battle draws from its own RNG streams (utils.rng), so results do
+not depend on the number of workers and replay_battle reproduces any battle
+from (seed, battle id). Everything is built from the local dex.
+
+Spec format:
+    {
+      "seed": 1, "battles_per_pairing": 200, "max_turns": 100, "workers": 2,
+      "teams": {"name": [{"species": "Blaziken", "moves": ["Flamethrower"], "level": 50}]},
+      "matchups": [["team a", "team b"]],          (optional, default every ordered pair)
+      "engines": {"name": {"engine": "greedy", "options": {}, "weights": {}}}
+    }
+"""
+import json
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
+from itertools import combinations
+from typing import Dict, List, Optional, Tuple
+from battle.battle_state import BattleState
+from battle.decision_engine import ENGINES, ScoreWeights, run_search_engine
+from battle.simulator import BattleSimulator, BattleResult
+from pokedata.dex import get_dex
+from utils.rng import RngStreams, SEARCH_STREAM
+
+# z for a 95% confidence interval
+Z_95 = 1.959963984540054
+
+
+@dataclass
+class EngineConfig:
+    """One engine variant taking part in the tournament"""
+    name: str
+    engine: str = "greedy"
+    options: Dict = field(default_factory=dict)
+    weights: Dict = field(default_factory=dict)
+
+    def __post_init__(self):
+        if self.engine not in ENGINES:
+            raise ValueError(f"Unknown engine for {self.name}: {self.engine}. Expected one of {ENGINES}")
+        if self.weights and self.engine != "greedy":
+            raise ValueError(f"Weights only apply to the greedy engine ({self.name})")
+        ScoreWeights(**self.weights)  # Reject unknown weight names up front
+
+
+@dataclass
+class TournamentSpec:
+    """Teams, engines and battle settings for a tournament"""
+    teams: Dict[str, List[Dict]]
+    engines: List[EngineConfig]
+    matchups: List[Tuple[str, str]] = field(default_factory=list)
+    seed: int = 0
+    battles_per_pairing: int = 100
+    max_turns: int = 100
+    workers: int = 1
+
+    def __post_init__(self):
+        if len(self.engines) < 2:
+            raise ValueError("A tournament needs at least two engines")
+        if not self.matchups:
+            names = list(self.teams)
+            self.matchups = [(a, b) for a in names for b in names if a != b] or [(names[0], names[0])]
+        for matchup in self.matchups:
+            for team in matchup:
+                if team not in self.teams:
+                    raise ValueError(f"Unknown team in matchup: {team}")
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'TournamentSpec':
+        engines = [EngineConfig(name=name, **config) for name, config in data["engines"].items()]
+        settings = {key: data[key] for key in ("seed", "battles_per_pairing", "max_turns", "workers") if key in data}
+        matchups = [tuple(matchup) for matchup in data.get("matchups", [])]
+        return cls(teams=data["teams"], engines=engines, matchups=matchups, **settings)
+
+    def to_dict(self) -> Dict:
+        return {
+            "seed": self.seed,
+            "battles_per_pairing": self.battles_per_pairing,
+            "max_turns": self.max_turns,
+            "workers": self.workers,
+            "teams": self.teams,
+            "matchups": [list(matchup) for matchup in self.matchups],
+            "engines": {config.name: {"engine": config.engine, "options": config.options, "weights": config.weights}
+                        for config in self.engines},
+        }
+
+
+def load_spec(path: str) -> TournamentSpec:
+    """Load a tournament spec from a JSON file"""
+    with open(path, encoding="utf-8") as f:
+        return TournamentSpec.from_dict(json.load(f))
+
+
+def build_team(members: List[Dict]):
+    """Create a team's Pokemon from the local dex"""
+    dex = get_dex()
+    return [dex.create_pokemon(member["species"], level=member.get("level", 50), move_names=member.get("moves"))
+            for member in members]
+
+
+def wilson_interval(successes: float, trials: int, z: float = Z_95) -> Tuple[float, float]:
+    """Wilson score interval for a binomial proportion"""
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+class EnginePolicy:
+    """
+    Simulator policy backed by a decision engine.
+    The engines always decide for the ally side, so the opponent side decides
+    on a mirrored view of the state. Decision latency is recorded per call.
+    """
+
+    def __init__(self, config: EngineConfig, search_rng: Optional[random.Random] = None):
+        """
+        Args:
+            config: Engine variant
+            search_rng: Stream for the engine's own randomness (MCTS rollouts), so
+                the whole battle stays reproducible
+        """
+        self.config = config
+        self.options = dict(config.options)
+        if config.engine == "greedy":
+            self.options["weights"] = ScoreWeights(**config.weights)
+        elif config.engine == "mcts" and search_rng is not None and "seed" not in self.options:
+            self.options["rng"] = search_rng
+        self.latencies_ms: List[float] = []
+
+    def __call__(self, state: BattleState, side: str, moves, rng: random.Random):
+        view = state if side == "ally" else state.mirrored()
+        start = time.perf_counter()
+        result = run_search_engine(view, self.config.engine, **self.options)
+        self.latencies_ms.append((time.perf_counter() - start) * 1000)
+        for move in moves:
+            if move.name == result.best_move:
+                return move
+        return moves[0]
+
+
+@dataclass
+class BattleRecord:
+    """Outcome of one tournament battle"""
+    battle_id: int
+    pairing: Tuple[str, str]
+    ally_engine: str
+    opponent_engine: str
+    ally_team: str
+    opponent_team: str
+    winner: Optional[str]  # Engine name, or None for a draw
+    turns: int
+    latencies_ms: Dict[str, List[float]]
+
+
+def schedule(spec: TournamentSpec) -> List[Tuple[int, int, int, int, int, int]]:
+    """
+    List every battle as (battle_id, engine a, engine b, matchup, ally engine, opponent engine)
+    using engine indices; sides alternate within each pairing and matchup.
+    """
+    battles = []
+    battle_id = 0
+    for a, b in combinations(range(len(spec.engines)), 2):
+        for matchup in range(len(spec.matchups)):
+            for game in range(spec.battles_per_pairing):
+                ally, opponent = (a, b) if game % 2 == 0 else (b, a)
+                battles.append((battle_id, a, b, matchup, ally, opponent))
+                battle_id += 1
+    return battles
+
+
+# Per-process tournament state, built once by _init_worker
+_worker: Dict = {}
+
+
+def _init_worker(spec_data: Dict):
+    """Build the spec's teams and engines once per worker process"""
+    spec = TournamentSpec.from_dict(spec_data)
+    _worker["spec"] = spec
+    _worker["teams"] = {name: build_team(members) for name, members in spec.teams.items()}
+
+
+def _simulate(spec: TournamentSpec, teams: Dict[str, List], task: Tuple[int, int, int, int, int, int],
+              record: bool = False) -> Tuple[BattleResult, EnginePolicy, EnginePolicy]:
+    """Play one scheduled battle on the RNG streams of its battle id"""
+    battle_id, _, _, matchup, ally, opponent = task
+    ally_team_name, opponent_team_name = spec.matchups[matchup]
+    my_team = teams[ally_team_name]
+    opponent_team = teams[opponent_team_name]
+    state = BattleState(my_team[0], opponent_team[0], my_team, opponent_team)
+
+    streams = RngStreams(spec.seed).battle(battle_id)
+    ally_policy = EnginePolicy(spec.engines[ally], streams.stream((SEARCH_STREAM, "ally")))
+    opponent_policy = EnginePolicy(spec.engines[opponent], streams.stream((SEARCH_STREAM, "opponent")))
+    simulator = BattleSimulator(streams=streams, record=record)
+    result = simulator.run_battle(state, ally_policy, opponent_policy, max_turns=spec.max_turns)
+    return result, ally_policy, opponent_policy
+
+
+def replay_battle(spec: TournamentSpec, battle_id: int, record: bool = True) -> BattleResult:
+    """
+    Replay one battle of a tournament bit-for-bit in this process.
+    With record, the returned state's event log holds every move, hit and KO.
+    """
+    tasks = schedule(spec)
+    if not 0 <= battle_id < len(tasks):
+        raise ValueError(f"Battle id {battle_id} out of range (tournament has {len(tasks)} battles)")
+    teams = {name: build_team(members) for name, members in spec.teams.items()}
+    return _simulate(spec, teams, tasks[battle_id], record)[0]
+
+
+def _play_battle(task: Tuple[int, int, int, int, int, int]) -> BattleRecord:
+    """Play one scheduled battle in this process"""
+    battle_id, a, b, matchup, ally, opponent = task
+    spec: TournamentSpec = _worker["spec"]
+    ally_team_name, opponent_team_name = spec.matchups[matchup]
+    result, ally_policy, opponent_policy = _simulate(spec, _worker["teams"], task)
+
+    names = {"ally": spec.engines[ally].name, "opponent": spec.engines[opponent].name}
+    latencies = {names["ally"]: ally_policy.latencies_ms}
+    latencies.setdefault(names["opponent"], []).extend(opponent_policy.latencies_ms)
+    return BattleRecord(
+        battle_id=battle_id,
+        pairing=(spec.engines[a].name, spec.engines[b].name),
+        ally_engine=names["ally"],
+        opponent_engine=names["opponent"],
+        ally_team=ally_team_name,
+        opponent_team=opponent_team_name,
+        winner=names[result.winner] if result.winner else None,
+        turns=result.turns,
+        latencies_ms=latencies,
+    )
+
+
+@dataclass
+class PairingStats:
+    """Head-to-head results of engine a against engine b"""
+    engine_a: str
+    engine_b: str
+    battles: int = 0
+    wins: int = 0
+    losses: int = 0
+    draws: int = 0
+
+    @property
+    def win_rate(self) -> float:
+        """Engine a's score, counting draws as half a win"""
+        return (self.wins + 0.5 * self.draws) / self.battles if self.battles else 0.0
+
+    def to_dict(self) -> Dict:
+        low, high = wilson_interval(self.wins + 0.5 * self.draws, self.battles)
+        data = asdict(self)
+        data.update(win_rate=self.win_rate, ci_low=low, ci_high=high)
+        return data
+
+
+@dataclass
+class TournamentReport:
+    """Aggregated tournament results"""
+    pairings: List[PairingStats]
+    latencies_ms: Dict[str, List[float]]
+    battles: int
+    turns: int
+    elapsed_s: float
+    workers: int
+    records: List[BattleRecord] = field(default_factory=list, repr=False)
+
+    def latency_summary(self) -> Dict[str, Dict[str, float]]:
+        """Mean and 95th percentile decision latency per engine"""
+        summary = {}
+        for name, latencies in self.latencies_ms.items():
+            ordered = sorted(latencies)
+            p95 = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] if ordered else 0.0
+            summary[name] = {
+                "decisions": len(ordered),
+                "mean_ms": sum(ordered) / len(ordered) if ordered else 0.0,
+                "p95_ms": p95,
+            }
+        return summary
+
+    def to_dict(self) -> Dict:
+        seconds = self.elapsed_s or 1e-9
+        return {
+            "pairings": [stats.to_dict() for stats in self.pairings],
+            "latency": self.latency_summary(),
+            "throughput": {
+                "battles": self.battles,
+                "turns": self.turns,
+                "elapsed_s": self.elapsed_s,
+                "battles_per_s": self.battles / seconds,
+                "turns_per_s": self.turns / seconds,
+                "workers": self.workers,
+            },
+        }
+
+    def format_table(self) -> str:
+        lines = [f"{'engine a':<20}{'engine b':<20}{'battles':>8}{'W-L-D':>14}{'win rate':>10}{'95% CI':>16}"]
+        for stats in self.pairings:
+            data = stats.to_dict()
+            record = f"{stats.wins}-{stats.losses}-{stats.draws}"
+            interval = f"[{data['ci_low']:.3f}, {data['ci_high']:.3f}]"
+            lines.append(f"{stats.engine_a:<20}{stats.engine_b:<20}{stats.battles:>8}{record:>14}"
+                         f"{stats.win_rate:>10.3f}{interval:>16}")
+        lines.append("")
+        lines.append(f"{'engine':<20}{'decisions':>10}{'mean ms':>10}{'p95 ms':>10}")
+        for name, latency in self.latency_summary().items():
+            lines.append(f"{name:<20}{latency['decisions']:>10}{latency['mean_ms']:>10.3f}{latency['p95_ms']:>10.3f}")
+        throughput = self.to_dict()["throughput"]
+        lines.append("")
+        lines.append(f"{self.battles} battles, {self.turns} turns in {self.elapsed_s:.2f}s on {self.workers} worker(s): "
+                     f"{throughput['battles_per_s']:.1f} battles/s, {throughput['turns_per_s']:.0f} turns/s")
+        return "\n".join(lines)
+
+
+def aggregate(spec: TournamentSpec, records: List[BattleRecord], elapsed_s: float, workers: int) -> TournamentReport:
+    """Fold battle records into per-pairing win rates and per-engine latencies"""
+    pairings: Dict[Tuple[str, str], PairingStats] = {}
+    for a, b in combinations(spec.engines, 2):
+        pairings[(a.name, b.name)] = PairingStats(a.name, b.name)
+    latencies: Dict[str, List[float]] = {config.name: [] for config in spec.engines}
+    turns = 0
+    for record in records:
+        stats = pairings[record.pairing]
+        stats.battles += 1
+        if record.winner is None:
+            stats.draws += 1
+        elif record.winner == stats.engine_a:
+            stats.wins += 1
+        else:
+            stats.losses += 1
+        for name, values in record.latencies_ms.items():
+            latencies[name].extend(values)
+        turns += record.turns
+    return TournamentReport(list(pairings.values()), latencies, len(records), turns, elapsed_s, workers, records)
+
+
+def run_tournament(spec: TournamentSpec, workers: Optional[int] = None, chunksize: int = 8) -> TournamentReport:
+    """
+    Play every scheduled battle and aggregate the results.
+    Args:
+        spec: Teams, engines and settings
+        workers: Worker processes (default spec.workers); 1 plays in this process
+        chunksize: Battles sent to a worker at a time
+    """
+    workers = workers or spec.workers
+    tasks = schedule(spec)
+    spec_data = spec.to_dict()
+    start = time.perf_counter()
+    if workers <= 1:
+        _init_worker(spec_data)
+        records = [_play_battle(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(spec_data,)) as pool:
+            records = list(pool.map(_play_battle, tasks, chunksize=chunksize))
+    return aggregate(spec, records, time.perf_counter() - start, workers)
+
+
+def write_report(report: TournamentReport, path: str):
+    """Write the report as JSON"""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report.to_dict(), f, indent=2)
@@ -0,0 +1,331 @@
+"""
+Vectorized simulation of many independent battles.
+
+All battles live in numpy struct-of-arrays (HP, stats, types and move
+tables per battle/side/team slot, plus weather and screen counters), and
+each step resolves one turn of every unfinished battle with array
+operations. The rules follow battle.simulator: priority and speed order
+with random ties, accuracy, critical hits, the 16 damage rolls, weather,
+Reflect/Light Screen/Aurora Veil, burn, end-of-turn chip, replacement of
+fainted Pokemon by the healthiest bench member and the field countdown.
+Damage uses the shared damage formula and type chart, so for the same
+roll it matches BattleSimulator.move_damage exactly.
+
+Only the screens that affect damage are tracked; other field effects
+are ignored.
+"""
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+import numpy as np
+from battle.battle_state import BattleState
+from battle.field_state import WEATHER_BY_CODE, LIGHT_SCREEN, REFLECT, AURORA_VEIL
+from battle.decision_engine import _get_weather_modifier
+from battle.simulator import DAMAGE_ROLLS, CRIT_CHANCE, CRIT_MULTIPLIER, SCREEN_MULTIPLIER, \
+    BURN_MULTIPLIER, CHIP_FRACTION, SIDES, WEATHER_CHIP_IMMUNE_TYPES
+from utils.damage_calculator import damage_formula
+from utils.type_effectiveness import TYPE_CHART
+
+# Move categories
+STATUS = 0
+PHYSICAL = 1
+SPECIAL = 2
+_CATEGORIES = {'physical': PHYSICAL, 'special': SPECIAL}
+
+# Screen counters kept per side
+SCREEN_SLOTS = (LIGHT_SCREEN, REFLECT, AURORA_VEIL)
+_LIGHT_SCREEN, _REFLECT, _AURORA_VEIL = range(3)
+
+NO_WINNER = -1
+
+# A vector policy returns one move slot per battle: policy(battles, side) -> int array of shape (n,)
+VectorPolicy = Callable[['VectorBattles', int], np.ndarray]
+
+
+def random_vector_policy(battles: 'VectorBattles', side: int) -> np.ndarray:
+    """Pick a uniformly random move for every battle"""
+    counts = battles.active_move_counts(side)
+    return (battles.rng.random(battles.n) * counts).astype(np.int64)
+
+
+def greedy_vector_policy(battles: 'VectorBattles', side: int) -> np.ndarray:
+    """Pick the move with the highest expected damage (max roll times accuracy) in every battle"""
+    expected = np.stack([battles.expected_damage(side, slot) for slot in range(battles.move_slots)], axis=1)
+    expected[np.arange(battles.move_slots) >= battles.active_move_counts(side)[:, None]] = -1
+    return expected.argmax(axis=1)
+
+
+class VectorBattles:
+    """N battles stepped together"""
+
+    # Arrays with one row per battle
+    _BATTLE_ARRAYS = ("hp", "max_hp", "level", "attack", "defense", "special_attack", "special_defense",
+                      "speed", "type1", "type2", "burned", "guts", "move_power", "move_type",
+                      "move_accuracy", "move_category", "move_priority", "move_count", "active",
+                      "weather", "weather_turns", "weather_permanent", "screens", "turn", "done", "winner")
+
+    def __init__(self, states: List[BattleState], seed: Optional[int] = None,
+                 crit_chance: float = CRIT_CHANCE, damage_rolls=DAMAGE_ROLLS):
+        """
+        Args:
+            states: Starting positions (not modified)
+            seed: Seed for the numpy random generator
+            crit_chance: Chance of a critical hit (0 disables crits)
+            damage_rolls: Equally likely random damage multipliers
+        """
+        self.rng = np.random.default_rng(seed)
+        self.crit_chance = crit_chance
+        self.damage_rolls = np.asarray(damage_rolls, dtype=np.float64)
+        self._load(states)
+
+    @classmethod
+    def repeat(cls, state: BattleState, n: int, **options) -> 'VectorBattles':
+        """N copies of one starting position"""
+        battles = cls([state], **options)
+        for name in battles._BATTLE_ARRAYS:
+            setattr(battles, name, np.repeat(getattr(battles, name), n, axis=0))
+        battles.n = n
+        return battles
+
+    def _load(self, states: List[BattleState]):
+        n = len(states)
+        team_size = max(len(state.get_team(side).members) for state in states for side in SIDES)
+        move_slots = max(1, max(len(pokemon.moves) for state in states for side in SIDES
+                                for pokemon in state.get_team(side).members))
+        self.n, self.team_size, self.move_slots = n, team_size, move_slots
+
+        type_ids: Dict[str, int] = {"": 0}
+        def type_id(name: str) -> int:
+            return type_ids.setdefault(name, len(type_ids))
+
+        shape = (n, 2, team_size)
+        self.hp = np.zeros(shape, dtype=np.int64)
+        self.max_hp = np.ones(shape, dtype=np.int64)
+        self.level = np.ones(shape)
+        self.attack = np.ones(shape)
+        self.defense = np.ones(shape)
+        self.special_attack = np.ones(shape)
+        self.special_defense = np.ones(shape)
+        self.speed = np.zeros(shape)
+        self.type1 = np.zeros(shape, dtype=np.int64)
+        self.type2 = np.zeros(shape, dtype=np.int64)
+        self.burned = np.zeros(shape, dtype=bool)
+        self.guts = np.zeros(shape, dtype=bool)
+        move_shape = shape + (move_slots,)
+        self.move_power = np.zeros(move_shape)
+        self.move_type = np.zeros(move_shape, dtype=np.int64)
+        self.move_accuracy = np.full(move_shape, np.inf)
+        self.move_category = np.zeros(move_shape, dtype=np.int8)
+        self.move_priority = np.zeros(move_shape, dtype=np.int64)
+        self.move_count = np.ones(shape, dtype=np.int64)
+        self.active = np.zeros((n, 2), dtype=np.int64)
+        self.weather = np.zeros(n, dtype=np.int64)
+        self.weather_turns = np.zeros(n, dtype=np.int64)
+        self.weather_permanent = np.zeros(n, dtype=bool)
+        self.screens = np.zeros((n, 2, len(SCREEN_SLOTS)), dtype=np.int64)
+        self.turn = np.zeros(n, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.winner = np.full(n, NO_WINNER, dtype=np.int64)
+
+        for b, state in enumerate(states):
+            field = state.field
+            self.weather[b] = field.weather_code
+            self.weather_turns[b] = field.weather_turns
+            self.weather_permanent[b] = field.weather_permanent
+            for s, side in enumerate(SIDES):
+                team = state.get_team(side)
+                self.active[b, s] = team.active
+                for k, screen in enumerate(SCREEN_SLOTS):
+                    self.screens[b, s, k] = field.screen_turns_remaining(side, screen)
+                for t, pokemon in enumerate(team.members):
+                    self.hp[b, s, t] = state.get_hp(side, t)
+                    self.max_hp[b, s, t] = state.get_max_hp(side, t)
+                    self.level[b, s, t] = pokemon.level
+                    self.attack[b, s, t] = pokemon.attack
+                    self.defense[b, s, t] = pokemon.defense
+                    self.special_attack[b, s, t] = pokemon.special_attack
+                    self.special_defense[b, s, t] = pokemon.special_defense
+                    self.speed[b, s, t] = pokemon.speed
+                    self.type1[b, s, t] = type_id(pokemon.types[0]) if pokemon.types else 0
+                    self.type2[b, s, t] = type_id(pokemon.types[1]) if len(pokemon.types) > 1 else 0
+                    self.burned[b, s, t] = state.get_status(side, t) == "burned"
+                    self.guts[b, s, t] = "guts" in pokemon.ability_names
+                    self.move_count[b, s, t] = max(1, len(pokemon.moves))
+                    for m, move in enumerate(pokemon.moves):
+                        self.move_type[b, s, t, m] = type_id(move.type)
+                        self.move_priority[b, s, t, m] = move.priority
+                        if move.accuracy is not None:
+                            self.move_accuracy[b, s, t, m] = move.accuracy
+                        category = _CATEGORIES.get(move.damage_class.lower(), STATUS)
+                        if move.power and category != STATUS:
+                            self.move_power[b, s, t, m] = move.power
+                            self.move_category[b, s, t, m] = category
+        self._build_tables(type_ids)
+        self._update_done()
+
+    def _build_tables(self, type_ids: Dict[str, int]):
+        """Type chart, weather modifier and weather chip immunity as lookup tables by type id"""
+        names = sorted(type_ids, key=type_ids.get)
+        count = len(names)
+        self.effectiveness = np.ones((count, count))
+        for a, attacking in enumerate(names):
+            for d, defending in enumerate(names[1:], start=1):
+                self.effectiveness[a, d] = TYPE_CHART.get(attacking, {}).get(defending, 1.0)
+
+        self.weather_modifier = np.ones((len(WEATHER_BY_CODE), count))
+        for code, weather in enumerate(WEATHER_BY_CODE):
+            conditions = SimpleNamespace(weather_type=weather)
+            for t, name in enumerate(names):
+                self.weather_modifier[code, t] = _get_weather_modifier(conditions, SimpleNamespace(type=name))
+
+        # chip_immune[weather, type] is True when the weather does not chip that type
+        self.chip_immune = np.ones((len(WEATHER_BY_CODE), count), dtype=bool)
+        for code, immune_types in WEATHER_CHIP_IMMUNE_TYPES.items():
+            self.chip_immune[code] = [name.lower() in immune_types for name in names]
+
+    # Views of the active Pokemon
+    def active_move_counts(self, side: int) -> np.ndarray:
+        everyone = np.arange(self.n)
+        return self.move_count[everyone, side, self.active[:, side]]
+
+    def active_accuracy(self, side: int, move_slot: int) -> np.ndarray:
+        """Hit chance (0-1) of a move slot of each battle's active Pokemon"""
+        everyone = np.arange(self.n)
+        accuracy = self.move_accuracy[everyone, side, self.active[:, side], move_slot]
+        return np.minimum(accuracy, 100) / 100
+
+    # Damage
+    def _damage(self, battles: np.ndarray, attacker_side: np.ndarray, move_slot: np.ndarray,
+                roll: np.ndarray, critical: np.ndarray) -> np.ndarray:
+        """Damage of each battle's attack, for arrays of battles, sides, move slots, rolls and crits"""
+        defender_side = 1 - attacker_side
+        a_slot = self.active[battles, attacker_side]
+        d_slot = self.active[battles, defender_side]
+        a = (battles, attacker_side, a_slot)
+        d = (battles, defender_side, d_slot)
+        m = a + (move_slot,)
+
+        category = self.move_category[m]
+        physical = category == PHYSICAL
+        special = category == SPECIAL
+        move_type = self.move_type[m]
+        attacker_stat = np.where(physical, self.attack[a], self.special_attack[a])
+        defender_stat = np.where(physical, self.defense[d], self.special_defense[d])
+        stab = np.where((move_type == self.type1[a]) | (move_type == self.type2[a]), 1.5, 1.0)
+        effectiveness = 1.0 * self.effectiveness[move_type, self.type1[d]] * self.effectiveness[move_type, self.type2[d]]
+        base = np.maximum(0, np.trunc(damage_formula(self.level[a], self.move_power[m], attacker_stat,
+                                                     defender_stat, stab, effectiveness, roll)))
+
+        # Same modifier order as BattleSimulator.move_damage: weather, screen, burn, crit
+        screens = self.screens[battles, defender_side]
+        screened = ~critical & ((screens[:, _AURORA_VEIL] > 0) | (physical & (screens[:, _REFLECT] > 0))
+                                | (special & (screens[:, _LIGHT_SCREEN] > 0)))
+        modifier = self.weather_modifier[self.weather[battles], move_type]
+        modifier = modifier * np.where(screened, SCREEN_MULTIPLIER, 1.0)
+        modifier = modifier * np.where(physical & self.burned[a] & ~self.guts[a], BURN_MULTIPLIER, 1.0)
+        modifier = modifier * np.where(critical, CRIT_MULTIPLIER, 1.0)
+        damage = np.trunc(base * modifier).astype(np.int64)
+        damage[category == STATUS] = 0
+        return damage
+
+    def move_damage(self, side: int, move_slot: int, critical: bool = False) -> np.ndarray:
+        """Damage of a move slot of each battle's active Pokemon for every roll, shape (n, rolls)"""
+        rolls = len(self.damage_rolls)
+        battles = np.repeat(np.arange(self.n), rolls)
+        count = len(battles)
+        damage = self._damage(battles, np.full(count, side), np.full(count, move_slot),
+                              np.tile(self.damage_rolls, self.n), np.full(count, critical))
+        return damage.reshape(self.n, rolls)
+
+    def expected_damage(self, side: int, move_slot: int) -> np.ndarray:
+        """Max-roll damage times hit chance of a move slot of each battle's active Pokemon"""
+        everyone = np.arange(self.n)
+        damage = self._damage(everyone, np.full(self.n, side), np.full(self.n, move_slot),
+                              np.full(self.n, self.damage_rolls[-1]), np.zeros(self.n, dtype=bool))
+        return damage * self.active_accuracy(side, move_slot)
+
+    # Turn resolution
+    def step(self, ally_moves: np.ndarray, opponent_moves: np.ndarray):
+        """Resolve one turn of every unfinished battle with the chosen move slots"""
+        live = np.nonzero(~self.done)[0]
+        if not len(live):
+            return
+        rng = self.rng
+        moves = np.stack([ally_moves, opponent_moves], axis=1)[live]
+        ally_slot = self.active[live, 0]
+        opponent_slot = self.active[live, 1]
+        ally_priority = self.move_priority[live, 0, ally_slot, moves[:, 0]]
+        opponent_priority = self.move_priority[live, 1, opponent_slot, moves[:, 1]]
+        ally_speed = self.speed[live, 0, ally_slot]
+        opponent_speed = self.speed[live, 1, opponent_slot]
+        tie_break = rng.random(len(live)) < 0.5
+        ally_first = np.where(ally_priority != opponent_priority, ally_priority > opponent_priority,
+                              np.where(ally_speed != opponent_speed, ally_speed > opponent_speed, tie_break))
+        first = np.where(ally_first, 0, 1)
+
+        for order in (first, 1 - first):
+            alive = self.hp[live, order, self.active[live, order]] > 0
+            battles, attacker, move_slot = live[alive], order[alive], moves[alive, order[alive]]
+            count = len(battles)
+            hit = rng.random(count) * 100 < self.move_accuracy[battles, attacker, self.active[battles, attacker], move_slot]
+            critical = rng.random(count) < self.crit_chance
+            roll = self.damage_rolls[rng.integers(0, len(self.damage_rolls), count)]
+            damage = np.where(hit, self._damage(battles, attacker, move_slot, roll, critical), 0)
+            defender = (battles, 1 - attacker, self.active[battles, 1 - attacker])
+            self.hp[defender] = np.maximum(0, self.hp[defender] - damage)
+
+        self._end_turn(live)
+
+    def _end_turn(self, live: np.ndarray):
+        """Weather and burn chip, replacement of fainted Pokemon and the field countdown"""
+        for side in range(2):
+            slot = self.active[live, side]
+            pokemon = (live, side, slot)
+            alive = self.hp[pokemon] > 0
+            weather = self.weather[live]
+            immune = self.chip_immune[weather, self.type1[pokemon]] | self.chip_immune[weather, self.type2[pokemon]]
+            chip_amount = np.maximum(1, np.trunc(self.max_hp[pokemon] * CHIP_FRACTION).astype(np.int64))
+            chip = np.where(~immune, chip_amount, 0) + np.where(self.burned[pokemon], chip_amount, 0)
+            self.hp[pokemon] = np.where(alive, np.maximum(0, self.hp[pokemon] - chip), self.hp[pokemon])
+
+            # Replace fainted Pokemon with the healthiest bench member (first on ties)
+            fainted = live[self.hp[live, side, self.active[live, side]] == 0]
+            if len(fainted):
+                fractions = self.hp[fainted, side] / self.max_hp[fainted, side]
+                best = fractions.argmax(axis=1)
+                has_replacement = fractions[np.arange(len(fainted)), best] > 0
+                self.active[fainted[has_replacement], side] = best[has_replacement]
+
+        weather = self.weather[live]
+        counting = (weather > 0) & ~self.weather_permanent[live]
+        turns = self.weather_turns[live] - counting
+        expired = counting & (turns <= 0)
+        self.weather_turns[live] = np.where(expired, 0, turns)
+        self.weather[live] = np.where(expired, 0, weather)
+        self.screens[live] = np.maximum(0, self.screens[live] - 1)
+        self.turn[live] += 1
+        self._update_done()
+
+    def _update_done(self):
+        ally_out = ~(self.hp[:, 0] > 0).any(axis=1)
+        opponent_out = ~(self.hp[:, 1] > 0).any(axis=1)
+        finished = (ally_out | opponent_out) & ~self.done
+        self.winner[finished & opponent_out & ~ally_out] = 0
+        self.winner[finished & ally_out & ~opponent_out] = 1
+        self.done |= ally_out | opponent_out
+
+    # Whole battles
+    def run(self, ally_policy: VectorPolicy = random_vector_policy,
+            opponent_policy: VectorPolicy = random_vector_policy, max_turns: int = 200) -> Dict[str, np.ndarray]:
+        """
+        Step every battle until it ends or reaches max_turns.
+        Returns winner (0 ally, 1 opponent, -1 none) and turns per battle.
+        """
+        for _ in range(max_turns):
+            if self.done.all():
+                break
+            self.step(ally_policy(self, 0), opponent_policy(self, 1))
+        return {"winner": self.winner.copy(), "turns": self.turn.copy()}
+
+    def win_rates(self) -> Dict[str, float]:
+        return {"ally": float((self.winner == 0).mean()), "opponent": float((self.winner == 1).mean()),
+                "unfinished": float((~self.done).mean())}
@@ -0,0 +1,75 @@
+"""
+Benchmark decoding and encoding tool-call payloads with the dict codec.
+
+Times JSON text -> BattleState (json.loads + decode_battle_dict) and
+BattleState -> JSON text for a 1v1 and a 6v6 payload, against building
+the same battle with dex.create_pokemon by name and no validation.
+
+Usage: python bench_dict_codec.py [calls]
+"""
+import json
+import sys
+import time
+from battle.battle_state import BattleState, WeatherType
+from battle.dict_codec import decode_battle_dict, encode_battle_dict
+from pokedata.dex import get_dex
+
+TEAM_SPECS = [
+    ("Blaziken", ["Flamethrower", "Close Combat", "Earthquake", "Thunder Punch"]),
+    ("Swampert", ["Surf", "Earthquake", "Ice Beam", "Stealth Rock"]),
+    ("Sceptile", ["Leaf Blade", "Earthquake", "Dragon Claw", "Aerial Ace"]),
+    ("Metagross", ["Meteor Mash", "Zen Headbutt", "Earthquake", "Bullet Punch"]),
+    ("Gengar", ["Shadow Ball", "Sludge Bomb", "Focus Blast", "Thunderbolt"]),
+    ("Dragonite", ["Outrage", "Extreme Speed", "Earthquake", "Dragon Dance"]),
+]
+
+
+def payload(size: int) -> dict:
+    """A battle payload with `size` Pokemon a side, given by name"""
+    my_team = [{"species": name, "moves": moves} for name, moves in TEAM_SPECS[:size]]
+    opponent_team = [{"species": name, "moves": moves} for name, moves in reversed(TEAM_SPECS[-size:])]
+    my_team[0]["hp"] = 100
+    return {"my_team": my_team, "opponent_team": opponent_team, "turn": 4,
+            "weather": {"type": "rain", "turns": 3},
+            "opponent_moves": opponent_team[0]["moves"][:2]}
+
+
+def build_by_name(spec: dict) -> BattleState:
+    """The same battle built with dex.create_pokemon, without validation"""
+    dex = get_dex()
+    my_team = [dex.create_pokemon(member["species"], move_names=member["moves"]) for member in spec["my_team"]]
+    opponent_team = [dex.create_pokemon(member["species"], move_names=member["moves"])
+                     for member in spec["opponent_team"]]
+    my_team[0].current_hp = spec["my_team"][0]["hp"]
+    battle = BattleState(my_team[0], opponent_team[0], my_team, opponent_team)
+    battle.turn_count = spec["turn"]
+    battle.set_weather(WeatherType(spec["weather"]["type"]), spec["weather"]["turns"])
+    for move in spec["opponent_moves"]:
+        battle.record_move_used("opponent", move)
+    return battle
+
+
+def calls_per_second(func, calls: int) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(calls):
+        func()
+    return calls / (time.perf_counter() - start)
+
+
+def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"{'payload':<10}{'bytes':>8}{'decode/s':>12}{'by name/s':>12}{'encode/s':>12}")
+    for label, size in (("1v1", 1), ("6v6", 6)):
+        spec = payload(size)
+        # Tool payloads come back from the encoder, with dex ids
+        text = json.dumps(encode_battle_dict(decode_battle_dict(spec)))
+        state = decode_battle_dict(json.loads(text))
+        decode = calls_per_second(lambda: decode_battle_dict(json.loads(text)), calls)
+        by_name = calls_per_second(lambda: build_by_name(spec), calls)
+        encode = calls_per_second(lambda: json.dumps(encode_battle_dict(state)), calls)
+        print(f"{label:<10}{len(text):>8}{decode:>12,.0f}{by_name:>12,.0f}{encode:>12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
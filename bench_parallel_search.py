@@ -0,0 +1,78 @@
+"""
+Benchmark root-parallel search scaling over a fixed corpus of battle states.
+
+Each engine runs the same total amount of work at every worker count:
+MCTS splits a fixed simulation budget between independent trees, and
+expectiminimax splits the root moves of a fixed-depth search.
+
+Usage: python bench_parallel_search.py [max_workers]
+"""
+import os
+import sys
+import time
+from battle.battle_state import BattleState, WeatherType
+from battle.parallel_search import parallel_search, shutdown_pools
+from pokedata.dex import get_dex
+
+TEAM_SPECS = [
+    ("Blaziken", ["Flamethrower", "Close Combat", "Earthquake", "Thunder Punch"]),
+    ("Swampert", ["Surf", "Earthquake", "Ice Beam", "Stealth Rock"]),
+    ("Sceptile", ["Leaf Blade", "Earthquake", "Dragon Claw", "Aerial Ace"]),
+    ("Metagross", ["Meteor Mash", "Zen Headbutt", "Earthquake", "Bullet Punch"]),
+    ("Gengar", ["Shadow Ball", "Sludge Bomb", "Focus Blast", "Thunderbolt"]),
+    ("Dragonite", ["Outrage", "Extreme Speed", "Earthquake", "Dragon Dance"]),
+]
+
+MCTS_SIMULATIONS = 4000
+SEARCH_DEPTH = 2
+
+
+def build_corpus():
+    """Fixed 3v3 positions with varied leads, HP and field"""
+    dex = get_dex()
+    corpus = []
+    for index in range(len(TEAM_SPECS)):
+        mine = [dex.create_pokemon(name, move_names=moves) for name, moves in TEAM_SPECS[index:index + 3]]
+        if len(mine) < 3:
+            mine += [dex.create_pokemon(name, move_names=moves) for name, moves in TEAM_SPECS[:3 - len(mine)]]
+        theirs = [dex.create_pokemon(name, move_names=moves) for name, moves in reversed(TEAM_SPECS[:3])]
+        battle = BattleState(mine[0], theirs[0], mine, theirs)
+        battle.apply_damage("opponent", 20 * index)
+        if index % 2:
+            battle.set_weather(WeatherType.RAIN, 5)
+        corpus.append(battle)
+    return corpus
+
+
+def time_engine(corpus, engine: str, workers: int, options: dict) -> float:
+    start = time.perf_counter()
+    for battle in corpus:
+        parallel_search(battle, engine, workers, **dict(options))
+    return time.perf_counter() - start
+
+
+def main():
+    max_workers = int(sys.argv[1]) if len(sys.argv) > 1 else (os.cpu_count() or 1)
+    corpus = build_corpus()
+    print(f"{len(corpus)} positions, {os.cpu_count()} CPUs\n")
+
+    for engine in ("mcts", "expectiminimax"):
+        print(f"{engine}:")
+        print(f"{'workers':>8}{'seconds':>10}{'speedup':>10}")
+        baseline = None
+        for workers in range(1, max_workers + 1):
+            if engine == "mcts":
+                options = {"iterations": MCTS_SIMULATIONS // workers, "seed": 1}
+            else:
+                options = {"depth": SEARCH_DEPTH}
+            # Start and warm the pool before timing
+            parallel_search(corpus[0], engine, workers, **dict(options))
+            seconds = time_engine(corpus, engine, workers, options)
+            baseline = baseline or seconds
+            print(f"{workers:>8}{seconds:>10.2f}{baseline / seconds:>10.2f}")
+        print()
+    shutdown_pools()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark the compact BattleState encoding against pickle and JSON.
+
+Usage: python bench_serialization.py [turns]
+"""
+import json
+import pickle
+import sys
+import time
+from dataclasses import asdict
+from battle.battle_state import BattleState, WeatherType
+from battle.serialization import encode_battle_state, decode_battle_state
+from pokedata.dex import get_dex
+
+TEAM_SPECS = [
+    ("Blaziken", ["Flamethrower", "Close Combat", "Earthquake", "Thunder Punch"]),
+    ("Swampert", ["Surf", "Earthquake", "Ice Beam", "Stealth Rock"]),
+    ("Sceptile", ["Leaf Blade", "Earthquake", "Dragon Claw", "Aerial Ace"]),
+    ("Metagross", ["Meteor Mash", "Zen Headbutt", "Earthquake", "Bullet Punch"]),
+    ("Gengar", ["Shadow Ball", "Sludge Bomb", "Focus Blast", "Thunderbolt"]),
+    ("Dragonite", ["Outrage", "Extreme Speed", "Earthquake", "Dragon Dance"]),
+]
+
+
+def build_battle(turns: int) -> BattleState:
+    """Build a 6v6 battle with a long history"""
+    dex = get_dex()
+    my_team = [dex.create_pokemon(name, move_names=moves) for name, moves in TEAM_SPECS]
+    opponent_team = [dex.create_pokemon(name, move_names=moves) for name, moves in reversed(TEAM_SPECS)]
+    battle = BattleState(my_team[0], opponent_team[0], my_team, opponent_team)
+    battle.set_weather(WeatherType.RAIN, 5)
+    for turn in range(turns):
+        battle.advance_turn()
+        ally = battle.my_pokemon
+        opponent = battle.opponent_pokemon
+        battle.record_move_used("ally", ally.moves[turn % 4].name)
+        battle.record_damage("opponent", 30 + turn % 17, 30 + turn % 17)
+        battle.record_move_used("opponent", opponent.moves[(turn * 3) % 4].name)
+        battle.record_damage("ally", 25 + turn % 13, 25 + turn % 13)
+        if turn % 10 == 9:
+            battle.switch_to("ally", (battle.ally_team.active + 1) % 6)
+            battle.add_screen_effect("Light Screen", 5, "opponent")
+    return battle
+
+
+def to_json_dict(battle: BattleState) -> dict:
+    """Lossless dict form of a battle for the JSON comparison"""
+    log = battle.event_log
+    return {
+        "turn_count": battle.turn_count,
+        "field": [battle.field.weather_code, battle.field.weather_turns, list(battle.field.screen_turns)],
+        "teams": [{"members": [asdict(pokemon) for pokemon in team.members],
+                   "hp": list(team.hp), "status": list(team.status), "active": team.active}
+                  for team in battle.teams],
+        "opponent_move_counts": dict(battle.opponent_move_counts),
+        "log": {name: list(getattr(log, name)) for name in log.ARRAY_FIELDS},
+        "log_names": log.names,
+    }
+
+
+def time_call(func, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+def main():
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    repeat = 200
+    battle = build_battle(turns)
+    print(f"6v6 battle, {turns} turns, {len(battle.event_log)} logged events\n")
+
+    compact = encode_battle_state(battle)
+    pickled = pickle.dumps(battle, protocol=pickle.HIGHEST_PROTOCOL)
+    as_json = json.dumps(to_json_dict(battle)).encode('utf-8')
+
+    rows = [
+        ("compact", len(compact),
+         time_call(lambda: encode_battle_state(battle), repeat),
+         time_call(lambda: decode_battle_state(compact), repeat)),
+        ("pickle", len(pickled),
+         time_call(lambda: pickle.dumps(battle, protocol=pickle.HIGHEST_PROTOCOL), repeat),
+         time_call(lambda: pickle.loads(pickled), repeat)),
+        ("json", len(as_json),
+         time_call(lambda: json.dumps(to_json_dict(battle)), repeat),
+         time_call(lambda: json.loads(as_json), repeat)),
+    ]
+    print(f"{'format':<10}{'bytes':>10}{'encode us':>12}{'decode us':>12}")
+    for name, size, encode_us, decode_us in rows:
+        print(f"{name:<10}{size:>10}{encode_us:>12.1f}{decode_us:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Benchmark the headless battle simulator in turns per second.
+
+Usage: python bench_simulator.py [battles]
+"""
+import sys
+import time
+from battle.battle_state import BattleState, WeatherType
+from battle.simulator import BattleSimulator, greedy_policy, random_policy
+from pokedata.dex import get_dex
+
+TEAM_SPECS = [
+    ("Blaziken", ["Flamethrower", "Close Combat", "Earthquake", "Thunder Punch"]),
+    ("Swampert", ["Surf", "Earthquake", "Ice Beam", "Stealth Rock"]),
+    ("Sceptile", ["Leaf Blade", "Earthquake", "Dragon Claw", "Aerial Ace"]),
+    ("Metagross", ["Meteor Mash", "Zen Headbutt", "Earthquake", "Bullet Punch"]),
+    ("Gengar", ["Shadow Ball", "Sludge Bomb", "Focus Blast", "Thunderbolt"]),
+    ("Dragonite", ["Outrage", "Extreme Speed", "Earthquake", "Dragon Dance"]),
+]
+
+
+def build_battle() -> BattleState:
+    dex = get_dex()
+    my_team = [dex.create_pokemon(name, move_names=moves) for name, moves in TEAM_SPECS]
+    opponent_team = [dex.create_pokemon(name, move_names=moves) for name, moves in reversed(TEAM_SPECS)]
+    battle = BattleState(my_team[0], opponent_team[0], my_team, opponent_team)
+    battle.set_weather(WeatherType.SANDSTORM, 5)
+    battle.add_screen_effect("Reflect", 5, "opponent")
+    return battle
+
+
+def main():
+    battles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    battle = build_battle()
+    print(f"6v6, {battles} battles per row\n")
+    print(f"{'policies':<18}{'turns':>8}{'seconds':>10}{'turns/s':>12}{'ally wins':>11}")
+    for name, policy, count in (("random", random_policy, battles), ("greedy", greedy_policy, battles // 10),
+                                ("recorded random", random_policy, battles)):
+        simulator = BattleSimulator(seed=1, record=name.startswith("recorded"))
+        start = time.perf_counter()
+        turns = wins = 0
+        for _ in range(count):
+            result = simulator.run_battle(battle, policy, policy)
+            turns += result.turns
+            wins += result.winner == "ally"
+        seconds = time.perf_counter() - start
+        print(f"{name:<18}{turns:>8}{seconds:>10.2f}{turns / seconds:>12.0f}{wins / count:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
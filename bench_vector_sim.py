@@ -0,0 +1,57 @@
+"""
+Benchmark the vectorized multi-battle simulator in battles per second.
+
+Usage: python bench_vector_sim.py [sizes...]   (default 1000 10000 100000)
+"""
+import sys
+import time
+from battle.battle_state import BattleState, WeatherType
+from battle.simulator import BattleSimulator, random_policy
+from battle.vector_sim import VectorBattles, random_vector_policy, greedy_vector_policy
+from pokedata.dex import get_dex
+
+TEAM_SPECS = [
+    ("Blaziken", ["Flamethrower", "Close Combat", "Earthquake", "Thunder Punch"]),
+    ("Swampert", ["Surf", "Earthquake", "Ice Beam", "Stealth Rock"]),
+    ("Sceptile", ["Leaf Blade", "Earthquake", "Dragon Claw", "Aerial Ace"]),
+    ("Metagross", ["Meteor Mash", "Zen Headbutt", "Earthquake", "Bullet Punch"]),
+    ("Gengar", ["Shadow Ball", "Sludge Bomb", "Focus Blast", "Thunderbolt"]),
+    ("Dragonite", ["Outrage", "Extreme Speed", "Earthquake", "Dragon Dance"]),
+]
+
+
+def build_battle() -> BattleState:
+    dex = get_dex()
+    my_team = [dex.create_pokemon(name, move_names=moves) for name, moves in TEAM_SPECS]
+    opponent_team = [dex.create_pokemon(name, move_names=moves) for name, moves in reversed(TEAM_SPECS)]
+    battle = BattleState(my_team[0], opponent_team[0], my_team, opponent_team)
+    battle.set_weather(WeatherType.SANDSTORM, 5)
+    battle.add_screen_effect("Reflect", 5, "opponent")
+    return battle
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    battle = build_battle()
+
+    # Scalar simulator baseline
+    simulator = BattleSimulator(seed=1)
+    count = 1000
+    start = time.perf_counter()
+    wins = sum(simulator.run_battle(battle, random_policy, random_policy).winner == "ally" for _ in range(count))
+    seconds = time.perf_counter() - start
+    print(f"scalar simulator, random policies: {count / seconds:.0f} battles/s (ally wins {wins / count:.2f})\n")
+
+    print(f"{'policies':<10}{'battles':>9}{'seconds':>10}{'battles/s':>12}{'turns':>8}{'ally wins':>11}")
+    for name, policy in (("random", random_vector_policy), ("greedy", greedy_vector_policy)):
+        for n in sizes:
+            start = time.perf_counter()
+            battles = VectorBattles.repeat(battle, n, seed=1)
+            result = battles.run(policy, policy)
+            seconds = time.perf_counter() - start
+            print(f"{name:<10}{n:>9}{seconds:>10.2f}{n / seconds:>12.0f}{result['turns'].mean():>8.1f}"
+                  f"{battles.win_rates()['ally']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+Aggregate statistics over battle log files and write them as a columnar file.
+
+Usage: python build_battle_stats.py LOGS [LOGS ...] [-o data/battle_stats.bin] [-w workers]
+       (LOGS is a battle log file or a directory of them)
+"""
+import sys
+import time
+from battle.analytics import aggregate_corpus, write_aggregate
+
+BATTLE_STATS_PATH = 'data/battle_stats.bin'
+
+
+def main():
+    args = sys.argv[1:]
+    options = {}
+    for flag in ("-o", "-w"):
+        if flag in args:
+            index = args.index(flag)
+            options[flag] = args[index + 1]
+            del args[index:index + 2]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+
+    output = options.get("-o", BATTLE_STATS_PATH)
+    workers = int(options.get("-w", 1))
+    start = time.perf_counter()
+    aggregate = aggregate_corpus(args, workers)
+    write_aggregate(aggregate, output)
+    seconds = time.perf_counter() - start
+    print(f"{aggregate.battles} battles ({aggregate.average_turns:.1f} turns on average, {aggregate.draws} draws) "
+          f"in {seconds:.2f}s on {workers} worker(s) ({aggregate.battles / max(seconds, 1e-9):.0f} battles/s)")
+    for (species, move), uses in aggregate.move_uses.most_common(5):
+        print(f"  {species:<12} {move:<16} {uses:>8} uses")
+    print(f"Statistics written to {output}")
+
+
+if __name__ == "__main__":
+    main()
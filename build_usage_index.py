@@ -0,0 +1,39 @@
+"""
+Build the usage index from a local corpus of battle logs and team files.
+
+Usage: python build_usage_index.py CORPUS [CORPUS ...] [-o data/usage_index.bin]
+       (CORPUS is a file or a directory; .gz files are read compressed)
+"""
+import resource
+import sys
+import time
+from pokedata.usage_ingest import UsageIngester, USAGE_INDEX_PATH, corpus_files
+
+
+def main():
+    args = sys.argv[1:]
+    output = USAGE_INDEX_PATH
+    if "-o" in args:
+        index = args.index("-o")
+        output = args[index + 1]
+        del args[index:index + 2]
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+
+    ingester = UsageIngester()
+    start = time.perf_counter()
+    files = 0
+    for path in corpus_files(args):
+        ingester.ingest_file(path)
+        files += 1
+    ingester.write(output)
+    seconds = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{ingester.teams} teams from {files} files in {seconds:.2f}s "
+          f"({ingester.teams / max(seconds, 1e-9):.0f} teams/s), {len(ingester.counts)} counts, peak RSS {peak_mb:.0f} MB")
+    print(f"Index written to {output}")
+
+
+if __name__ == "__main__":
+    main()
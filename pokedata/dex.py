@@ -0,0 +1,111 @@
+"""
+Local Pokedex of moves and species with stable integer ids.
+
+Loaded from data/dex.json so that battles can be built, encoded and
+decoded without calling PokeAPI. Move and species objects returned by
+the dex are shared and should be treated as read-only.
+"""
+import json
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional
+from pokemon import Pokemon, Move, PokemonStats
+
+DEX_PATH = 'data/dex.json'
+
+
+def normalize_name(name: str) -> str:
+    """Normalize a move or species name for lookup ("Sky Uppercut" -> "sky-uppercut")"""
+    return name.strip().lower().replace(' ', '-')
+
+
+@dataclass
+class Species:
+    """A species entry in the local dex"""
+    id: int
+    name: str
+    types: List[str]
+    stats: PokemonStats
+
+
+class Dex:
+    """Indexed move and species tables"""
+
+    def __init__(self, data: Dict):
+        self.moves: Dict[int, Move] = {}
+        self._move_ids: Dict[str, int] = {}
+        for entry in data.get('moves', []):
+            move = Move(
+                name=entry['name'],
+                type=entry['type'],
+                power=entry['power'],
+                accuracy=entry['accuracy'],
+                pp=entry['pp'],
+                damage_class=entry['damage_class'],
+                priority=entry.get('priority', 0)
+            )
+            self.moves[entry['id']] = move
+            self._move_ids[normalize_name(entry['name'])] = entry['id']
+
+        self.species: Dict[int, Species] = {}
+        self._species_ids: Dict[str, int] = {}
+        for entry in data.get('species', []):
+            species = Species(entry['id'], entry['name'], list(entry['types']),
+                              PokemonStats(**entry['base_stats']))
+            self.species[entry['id']] = species
+            self._species_ids[normalize_name(entry['name'])] = entry['id']
+
+    @classmethod
+    def load(cls, path: str = DEX_PATH) -> 'Dex':
+        with open(path) as f:
+            return cls(json.load(f))
+
+    # Moves
+    def move_id(self, name: str) -> Optional[int]:
+        """Get the id of a move by name, or None if it is not in the dex"""
+        return self._move_ids.get(normalize_name(name))
+
+    def get_move(self, move_id: int) -> Move:
+        return self.moves[move_id]
+
+    def find_move(self, name: str) -> Optional[Move]:
+        move_id = self.move_id(name)
+        return self.moves[move_id] if move_id is not None else None
+
+    # Species
+    def species_id(self, name: str) -> Optional[int]:
+        """Get the id of a species by name, or None if it is not in the dex"""
+        return self._species_ids.get(normalize_name(name))
+
+    def get_species(self, species_id: int) -> Species:
+        return self.species[species_id]
+
+    def find_species(self, name: str) -> Optional[Species]:
+        species_id = self.species_id(name)
+        return self.species[species_id] if species_id is not None else None
+
+    def create_pokemon(self, species_name: str, level: int = 50, move_names: Optional[List[str]] = None) -> Pokemon:
+        """Create a Pokemon from local dex data (no network access)"""
+        species = self.find_species(species_name)
+        if species is None:
+            raise KeyError(f"Unknown species: {species_name}")
+        moves = []
+        for move_name in move_names or []:
+            move = self.find_move(move_name)
+            if move is None:
+                raise KeyError(f"Unknown move: {move_name}")
+            moves.append(move)
+        return Pokemon(
+            name=species.name,
+            types=list(species.types),
+            stats=species.stats,
+            moves=moves,
+            level=level,
+            species_id=species.id
+        )
+
+
+@lru_cache(maxsize=1)
+def get_dex() -> Dex:
+    """Get the shared local dex"""
+    return Dex.load()
@@ -0,0 +1,64 @@
+"""
+Local learnset and usage index keyed by dex ids.
+
+Loaded from data/learnsets.json, which lists for each species the moves
+it can learn together with their usage rate (the share of sets that run
+the move). Names are resolved against the dex once at load time, so
+lookups are by integer species and move ids.
+"""
+import json
+from functools import lru_cache
+from typing import Dict, Iterable, Optional, Tuple
+from pokedata.dex import Dex, get_dex
+
+LEARNSETS_PATH = 'data/learnsets.json'
+
+
+class LearnsetIndex:
+    """Learnable moves and usage rates per species"""
+
+    def __init__(self, data: Dict, dex: Dex):
+        self.dex = dex
+        self._learnsets: Dict[int, Tuple[int, ...]] = {}
+        self._usage: Dict[int, Dict[int, float]] = {}
+        for species_name, entry in data.get('species', {}).items():
+            species_id = dex.species_id(species_name)
+            if species_id is None:
+                raise KeyError(f"Unknown species in learnsets: {species_name}")
+            usage = {}
+            for move_name, rate in entry['moves'].items():
+                move_id = dex.move_id(move_name)
+                if move_id is None:
+                    raise KeyError(f"Unknown move in learnset of {species_name}: {move_name}")
+                usage[move_id] = float(rate)
+            # Most used moves first
+            self._learnsets[species_id] = tuple(sorted(usage, key=lambda move_id: (-usage[move_id], move_id)))
+            self._usage[species_id] = usage
+
+    @classmethod
+    def load(cls, path: str = LEARNSETS_PATH, dex: Optional[Dex] = None) -> 'LearnsetIndex':
+        with open(path) as f:
+            return cls(json.load(f), dex or get_dex())
+
+    def species_ids(self) -> Iterable[int]:
+        return self._learnsets.keys()
+
+    def has_species(self, species_id: Optional[int]) -> bool:
+        return species_id in self._learnsets
+
+    def learnset(self, species_id: int) -> Tuple[int, ...]:
+        """Move ids the species can learn, most used first (empty if unknown)"""
+        return self._learnsets.get(species_id, ())
+
+    def can_learn(self, species_id: int, move_id: int) -> bool:
+        return move_id in self._usage.get(species_id, ())
+
+    def usage(self, species_id: int, move_id: int) -> float:
+        """Share of the species' sets that run the move (0 if it cannot learn it)"""
+        return self._usage.get(species_id, {}).get(move_id, 0.0)
+
+
+@lru_cache(maxsize=1)
+def get_learnsets() -> LearnsetIndex:
+    """Get the shared learnset index"""
+    return LearnsetIndex.load()
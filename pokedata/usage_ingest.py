@@ -0,0 +1,426 @@
+"""
+Usage statistics built by streaming a local corpus of battle logs and team files.
+
+Input is read line by line (plain or gzipped), so memory is bounded by the
+size of one battle plus the number of distinct (species, value) pairs,
+not by the corpus. Two formats are recognised per file:
+    battle logs   Showdown protocol lines ("|switch|p1a: Nick|Garchomp, L50|...",
+                  "|move|...", "|-item|...", "[from] ability: ..."), one or more
+                  battles per file separated by "|win|"/"|tie|"
+    team files    Showdown export ("Garchomp @ Choice Scarf", "Ability: ...",
+                  "- Earthquake"), teams separated by "=== ... ===" headers or two blank lines
+Each team counts once per species, move, item, ability and teammate.
+
+The index file is an open-addressing hash table that is memory-mapped for
+reading, so every count is one or two probes without loading the file:
+    header   magic "PKUSAGE", version (u8), capacity, entries (u32), teams (u64),
+             string pool offset and size (u64)
+    slots    capacity x (key hash u64, count u32, species string u32,
+             value string u32, kind u8, 3 pad bytes); key hash 0 marks an empty slot
+    strings  u16 length-prefixed UTF-8 names
+Each species also gets one TOP_* slot per kind whose value string lists its
+most common values with counts, so the top list is a single probe too.
+"""
+import gzip
+import hashlib
+import mmap
+import os
+import struct
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from pokedata.dex import normalize_name
+
+USAGE_INDEX_PATH = 'data/usage_index.bin'
+MAGIC = b'PKUSAGE'
+FORMAT_VERSION = 1
+
+# Kinds of counts
+SPECIES = 0
+MOVE = 1
+ITEM = 2
+ABILITY = 3
+TEAMMATE = 4
+KINDS = (MOVE, ITEM, ABILITY, TEAMMATE)
+TOP_FLAG = 0x80
+
+# Values kept in each species' top list
+TOP_LIST_SIZE = 16
+
+_HEADER = struct.Struct('<7sBIIQQQ')
+_SLOT = struct.Struct('<QIIIB3x')
+_LENGTH = struct.Struct('<H')
+_TOP_SEPARATOR = '\x1e'
+_COUNT_SEPARATOR = '\x1f'
+
+
+def key_hash(kind: int, species: str, value: str = "") -> int:
+    """Stable non-zero 64-bit hash of a (kind, species, value) key"""
+    digest = hashlib.blake2b(f"{kind}\x1f{normalize_name(species)}\x1f{normalize_name(value)}".encode("utf-8"),
+                             digest_size=8).digest()
+    return int.from_bytes(digest, "little") or 1
+
+
+class TeamRecord:
+    """What one team revealed about each of its Pokemon"""
+
+    __slots__ = ("members",)
+
+    def __init__(self):
+        self.members: Dict[str, Dict] = {}
+
+    def member(self, species: str) -> Dict:
+        entry = self.members.get(species)
+        if entry is None:
+            entry = self.members[species] = {"moves": set(), "item": None, "ability": None}
+        return entry
+
+    def __bool__(self) -> bool:
+        return bool(self.members)
+
+
+# Parsing
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+def _species_from_details(details: str) -> str:
+    """'Garchomp, L50, M' -> 'Garchomp'"""
+    return details.split(",")[0].strip()
+
+
+def _tagged(parts: List[str], tag: str) -> Optional[str]:
+    """Value of a '[from] item: X' style tag among the protocol parts"""
+    for part in parts:
+        if part.startswith(tag):
+            return part[len(tag):].strip()
+    return None
+
+
+def parse_battle_log(lines: Iterable[str]) -> Iterator[TeamRecord]:
+    """Yield both teams of each battle in a Showdown protocol log"""
+    teams: Dict[str, TeamRecord] = {}
+    positions: Dict[str, str] = {}  # "p1a: Nick" -> species
+
+    def side_of(position: str) -> str:
+        return position[:2]
+
+    def member(position: str) -> Optional[Dict]:
+        species = positions.get(position.split(",")[0].strip())
+        if species is None:
+            return None
+        return teams.setdefault(side_of(position), TeamRecord()).member(species)
+
+    def owner_of(parts: List[str]) -> str:
+        return _tagged(parts, "[of] ") or parts[2]
+
+    for line in lines:
+        if not line.startswith("|"):
+            continue
+        parts = line.rstrip("\n").split("|")
+        command = parts[1] if len(parts) > 1 else ""
+        if command == "poke" and len(parts) > 3:
+            teams.setdefault(parts[2], TeamRecord()).member(_species_from_details(parts[3]))
+        elif command in ("switch", "drag", "replace") and len(parts) > 3:
+            position = parts[2]
+            key = position.split(":")[0][:2] + ":" + position.split(":", 1)[-1]
+            species = _species_from_details(parts[3])
+            positions[position] = species
+            positions[key] = species
+            teams.setdefault(side_of(position), TeamRecord()).member(species)
+        elif command == "move" and len(parts) > 3:
+            entry = member(parts[2])
+            if entry is not None:
+                entry["moves"].add(parts[3])
+        elif command in ("-item", "-enditem") and len(parts) > 3:
+            # Items handed over by Trick and the like are not the holder's own
+            entry = member(parts[2])
+            if entry is not None and not _tagged(parts, "[from] move: "):
+                entry["item"] = parts[3]
+        elif command == "-ability" and len(parts) > 3:
+            # "|-ability|p1a: X|Intimidate|[from] ability: Trace|[of] p2a: Y": X has Trace, Y has Intimidate
+            source = _tagged(parts, "[from] ability: ")
+            entry = member(parts[2])
+            if entry is not None:
+                entry["ability"] = source or parts[3]
+            owner = _tagged(parts, "[of] ")
+            if source and owner:
+                entry = member(owner)
+                if entry is not None:
+                    entry["ability"] = parts[3]
+            continue
+        elif command in ("win", "tie"):
+            yield from (team for team in teams.values() if team)
+            teams, positions = {}, {}
+            continue
+        # Items and abilities named as the source of another effect
+        if len(parts) > 2 and command.startswith("-"):
+            item = _tagged(parts, "[from] item: ")
+            ability = _tagged(parts, "[from] ability: ")
+            if item or ability:
+                entry = member(owner_of(parts))
+                if entry is not None:
+                    if item:
+                        entry["item"] = item
+                    if ability:
+                        entry["ability"] = ability
+    yield from (team for team in teams.values() if team)
+
+
+def parse_team_export(lines: Iterable[str]) -> Iterator[TeamRecord]:
+    """Yield each team of a Showdown team export"""
+    team = TeamRecord()
+    current: Optional[Dict] = None
+    previous_blank = False
+    for line in lines:
+        text = line.strip()
+        # A header or a second blank line ends the team; one blank line ends a Pokemon
+        if text.startswith("===") or (not text and previous_blank):
+            if team:
+                yield team
+            team, current = TeamRecord(), None
+        previous_blank = not text
+        if not text or text.startswith("==="):
+            current = None
+            continue
+        if current is None:
+            # "Nickname (Species) (M) @ Item" or "Species @ Item"
+            name, _, item = text.partition(" @ ")
+            name = name.replace(" (M)", "").replace(" (F)", "").strip()
+            if name.endswith(")") and "(" in name:
+                name = name[name.rindex("(") + 1:-1]
+            current = team.member(name.strip())
+            if item:
+                current["item"] = item.strip()
+        elif text.startswith("Ability:"):
+            current["ability"] = text[len("Ability:"):].strip()
+        elif text.startswith("- "):
+            current["moves"].add(text[2:].strip())
+    if team:
+        yield team
+
+
+def iter_teams(path: str) -> Iterator[TeamRecord]:
+    """Stream the teams in one corpus file, detecting its format from the first line"""
+    with _open_text(path) as f:
+        first = ""
+        for first in f:
+            if first.strip():
+                break
+        lines = _chain(first, f)
+        if first.startswith("|") or first.startswith(">"):
+            yield from parse_battle_log(lines)
+        else:
+            yield from parse_team_export(lines)
+
+
+def _chain(first: str, rest: Iterable[str]) -> Iterator[str]:
+    yield first
+    yield from rest
+
+
+def corpus_files(paths: Iterable[str]) -> Iterator[str]:
+    """Files under the given files and directories, in a stable order"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, directories, files in os.walk(path):
+                directories.sort()
+                for name in sorted(files):
+                    yield os.path.join(root, name)
+        else:
+            yield path
+
+
+# Building
+class UsageIngester:
+    """Accumulates usage counts team by team"""
+
+    def __init__(self, top_list_size: int = TOP_LIST_SIZE):
+        self.top_list_size = top_list_size
+        self.counts: Counter = Counter()       # (kind, species key, value key) -> count
+        self.names: Dict[str, str] = {}        # Normalized name -> first display name seen
+        self.teams = 0
+
+    def _name(self, name: str) -> str:
+        key = normalize_name(name)
+        self.names.setdefault(key, name)
+        return key
+
+    def add_team(self, team: TeamRecord):
+        counts = self.counts
+        species_keys = [self._name(species) for species in team.members]
+        for species, key in zip(team.members, species_keys):
+            entry = team.members[species]
+            counts[(SPECIES, key, "")] += 1
+            for move in entry["moves"]:
+                counts[(MOVE, key, self._name(move))] += 1
+            if entry["item"]:
+                counts[(ITEM, key, self._name(entry["item"]))] += 1
+            if entry["ability"]:
+                counts[(ABILITY, key, self._name(entry["ability"]))] += 1
+            for other in species_keys:
+                if other != key:
+                    counts[(TEAMMATE, key, other)] += 1
+        self.teams += 1
+
+    def ingest_file(self, path: str) -> int:
+        """Add every team in a file and return how many there were"""
+        before = self.teams
+        for team in iter_teams(path):
+            self.add_team(team)
+        return self.teams - before
+
+    def ingest(self, paths: Iterable[str]) -> int:
+        """Add every team in the given files and directories"""
+        return sum(self.ingest_file(path) for path in corpus_files(paths))
+
+    def write(self, path: str = USAGE_INDEX_PATH):
+        """Write the memory-mappable index"""
+        strings = bytearray()
+        offsets: Dict[str, int] = {}
+
+        def string(text: str) -> int:
+            offset = offsets.get(text)
+            if offset is None:
+                encoded = text.encode("utf-8")[:0xFFFF]
+                offset = offsets[text] = len(strings)
+                strings.extend(_LENGTH.pack(len(encoded)))
+                strings.extend(encoded)
+            return offset
+
+        entries: List[Tuple[int, int, int, int, int]] = []
+        tops: Dict[Tuple[int, str], List[Tuple[int, str]]] = {}
+        for (kind, species, value), count in self.counts.items():
+            entries.append((key_hash(kind, species, value), count, string(self.names[species]),
+                            string(self.names.get(value, value)), kind))
+            if kind != SPECIES:
+                tops.setdefault((kind, species), []).append((count, value))
+        for (kind, species), values in tops.items():
+            values.sort(key=lambda item: (-item[0], item[1]))
+            listing = _TOP_SEPARATOR.join(f"{self.names[value]}{_COUNT_SEPARATOR}{count}"
+                                          for count, value in values[:self.top_list_size])
+            entries.append((key_hash(kind | TOP_FLAG, species), len(values), string(self.names[species]),
+                            string(listing), kind | TOP_FLAG))
+
+        capacity = 8
+        while capacity < 2 * len(entries):
+            capacity *= 2
+        slots = bytearray(capacity * _SLOT.size)
+        mask = capacity - 1
+        for entry in entries:
+            index = entry[0] & mask
+            while _SLOT.unpack_from(slots, index * _SLOT.size)[0]:
+                index = (index + 1) & mask
+            _SLOT.pack_into(slots, index * _SLOT.size, *entry)
+
+        pool_offset = _HEADER.size + len(slots)
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, capacity, len(entries), self.teams,
+                                 pool_offset, len(strings)))
+            f.write(slots)
+            f.write(strings)
+
+
+def build_usage_index(corpus: Iterable[str], path: str = USAGE_INDEX_PATH) -> int:
+    """Stream a corpus into a usage index file and return the number of teams"""
+    ingester = UsageIngester()
+    ingester.ingest(corpus)
+    ingester.write(path)
+    return ingester.teams
+
+
+# Reading
+class UsageIndex:
+    """Read-only, memory-mapped usage index with O(1) lookups"""
+
+    def __init__(self, path: str = USAGE_INDEX_PATH):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, capacity, entries, teams, pool_offset, _ = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a usage index: {path}")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported usage index version {version}")
+        self.capacity = capacity
+        self.entries = entries
+        self.teams = teams
+        self._pool_offset = pool_offset
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self) -> 'UsageIndex':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _slot(self, kind: int, species: str, value: str = "") -> Optional[tuple]:
+        key = key_hash(kind, species, value)
+        mask = self.capacity - 1
+        index = key & mask
+        data = self._map
+        while True:
+            slot = _SLOT.unpack_from(data, _HEADER.size + index * _SLOT.size)
+            if slot[0] == key:
+                return slot
+            if slot[0] == 0:
+                return None
+            index = (index + 1) & mask
+
+    def _string(self, offset: int) -> str:
+        start = self._pool_offset + offset
+        length = _LENGTH.unpack_from(self._map, start)[0]
+        return self._map[start + _LENGTH.size:start + _LENGTH.size + length].decode("utf-8")
+
+    def count(self, kind: int, species: str, value: str = "") -> int:
+        """Teams with this species that showed the value (with kind SPECIES: teams with the species)"""
+        slot = self._slot(kind, species, value)
+        return slot[1] if slot is not None else 0
+
+    def species_count(self, species: str) -> int:
+        return self.count(SPECIES, species)
+
+    def has_species(self, species: str) -> bool:
+        return self.species_count(species) > 0
+
+    def frequency(self, kind: int, species: str, value: str) -> float:
+        """Share of the species' teams that showed the value"""
+        total = self.species_count(species)
+        return self.count(kind, species, value) / total if total else 0.0
+
+    def move_frequency(self, species: str, move: str) -> float:
+        return self.frequency(MOVE, species, move)
+
+    def item_frequency(self, species: str, item: str) -> float:
+        return self.frequency(ITEM, species, item)
+
+    def ability_frequency(self, species: str, ability: str) -> float:
+        return self.frequency(ABILITY, species, ability)
+
+    def teammate_frequency(self, species: str, teammate: str) -> float:
+        return self.frequency(TEAMMATE, species, teammate)
+
+    def top(self, kind: int, species: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Most common values of a kind for the species, with their frequencies"""
+        slot = self._slot(kind | TOP_FLAG, species)
+        total = self.species_count(species)
+        if slot is None or not total:
+            return []
+        values = []
+        for item in self._string(slot[3]).split(_TOP_SEPARATOR)[:limit]:
+            name, _, count = item.partition(_COUNT_SEPARATOR)
+            values.append((name, int(count) / total))
+        return values
+
+
+@lru_cache(maxsize=None)
+def get_usage_index(path: str = USAGE_INDEX_PATH) -> Optional[UsageIndex]:
+    """Get the shared usage index, or None if no index has been built"""
+    if not os.path.exists(path):
+        return None
+    return UsageIndex(path)
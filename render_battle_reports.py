@@ -0,0 +1,40 @@
+"""
+Render reports or summaries for archived battles in battle log files.
+
+Usage: python render_battle_reports.py LOGS [LOGS ...] [--summary] [-o reports.txt] [-w workers]
+       (LOGS is a battle log file or a directory of them; output goes to stdout without -o)
+"""
+import sys
+import time
+from battle.report_pipeline import render_corpus, render_to_file
+
+
+def main():
+    args = sys.argv[1:]
+    options = {}
+    for flag in ("-o", "-w"):
+        if flag in args:
+            index = args.index(flag)
+            options[flag] = args[index + 1]
+            del args[index:index + 2]
+    kind = "report"
+    if "--summary" in args:
+        args.remove("--summary")
+        kind = "summary"
+    if not args:
+        print(__doc__)
+        sys.exit(1)
+
+    workers = int(options.get("-w", 1))
+    start = time.perf_counter()
+    if "-o" in options:
+        battles = render_to_file(args, options["-o"], kind, workers)
+    else:
+        battles = render_corpus(args, sys.stdout, kind, workers)
+    seconds = time.perf_counter() - start
+    print(f"Rendered {battles} battles in {seconds:.2f}s ({battles / max(seconds, 1e-9):.0f} battles/s) "
+          f"on {workers} worker(s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Run the battle-agent tool server (JSON-RPC 2.0, one message per line).
+
+Usage: python run_tool_server.py                  (stdin/stdout)
+       python run_tool_server.py --port 8765      (TCP on 127.0.0.1)
+       python run_tool_server.py --socket PATH    (Unix socket)
+"""
+import sys
+from agents.tool_server import ToolServer, make_socket_server, serve_stdio
+
+
+def main():
+    args = sys.argv[1:]
+    if not args:
+        serve_stdio()
+        return
+    if len(args) != 2 or args[0] not in ("--port", "--socket"):
+        print(__doc__)
+        sys.exit(1)
+
+    server = ToolServer()
+    server.warm_up()
+    address = int(args[1]) if args[0] == "--port" else args[1]
+    socket_server = make_socket_server(server, address)
+    print(f"Tool server listening on {socket_server.server_address}", file=sys.stderr)
+    try:
+        socket_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        socket_server.server_close()
+
+
+if __name__ == "__main__":
+    main()
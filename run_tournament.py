@@ -0,0 +1,25 @@
+"""
+Run a self-play tournament between engine configurations.
+
+Usage: python run_tournament.py [spec.json] [results.json] [workers]
+       (default data/tournament_spec.json, results printed only, workers from the spec)
+"""
+import sys
+from battle.tournament import load_spec, run_tournament, write_report
+
+
+def main():
+    spec_path = sys.argv[1] if len(sys.argv) > 1 else "data/tournament_spec.json"
+    output_path = sys.argv[2] if len(sys.argv) > 2 else None
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    spec = load_spec(spec_path)
+    report = run_tournament(spec, workers)
+    print(report.format_table())
+    if output_path:
+        write_report(report, output_path)
+        print(f"\nResults written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
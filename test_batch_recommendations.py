@@ -0,0 +1,62 @@
+"""
+Test batched damage calculation and move recommendations for many battles
+"""
+from battle.battle_state import BattleState, WeatherType
+from battle.decision_engine import recommend_move, recommend_moves
+from pokedata.dex import get_dex
+from utils.damage_calculator import calculate_physical_damage, calculate_special_damage, calculate_damage_batch
+
+def _scalar_damage(attacker, defender, move, random_multiplier=1.0):
+    damage_class = move.damage_class.lower()
+    if damage_class == 'physical':
+        return calculate_physical_damage(attacker, defender, move, random_multiplier)
+    if damage_class == 'special':
+        return calculate_special_damage(attacker, defender, move, random_multiplier)
+    return 0
+
+def test_batch_damage_matches_scalar():
+    """Test that the vectorized damage pass matches the scalar calculator exactly"""
+    print("=== Testing Batched Damage ===\n")
+
+    dex = get_dex()
+    pokemon = [dex.create_pokemon(species.name, level=level)
+               for species, level in zip(dex.species.values(), (5, 50, 100) * 10)]
+    moves = list(dex.moves.values())
+    triples = [(attacker, defender, move) for attacker in pokemon[:6] for defender in pokemon for move in moves]
+
+    for random_multiplier in (0.85, 0.93, 1.0):
+        batch = calculate_damage_batch(triples, random_multiplier)
+        scalar = [_scalar_damage(a, d, m, random_multiplier) for a, d, m in triples]
+        assert batch.tolist() == scalar
+    print(f"✅ {len(triples)} triples match the scalar damage calculator")
+
+def test_recommend_moves_matches_recommend_move():
+    """Test that the batch API makes the same decision as recommend_move for every state"""
+    print("\n=== Testing recommend_moves ===\n")
+
+    dex = get_dex()
+    specs = [("Blaziken", ["Flamethrower", "Close Combat", "Thunder Punch"]),
+             ("Swampert", ["Surf", "Earthquake", "Ice Beam"]),
+             ("Sceptile", ["Leaf Blade", "Earthquake", "Dragon Claw"]),
+             ("Gengar", ["Shadow Ball", "Sludge Bomb", "Thunderbolt"])]
+    states = []
+    for i, (my_name, my_moves) in enumerate(specs):
+        for j, (their_name, their_moves) in enumerate(specs):
+            battle = BattleState(dex.create_pokemon(my_name, move_names=my_moves),
+                                 dex.create_pokemon(their_name, move_names=their_moves))
+            if (i + j) % 2:
+                battle.set_weather(WeatherType.RAIN, 5)
+            if j == 3:
+                battle.add_screen_effect("Light Screen", 5, "opponent")
+            battle.apply_damage("opponent", battle.get_max_hp("opponent") - 40 * (j + 1))
+            battle.record_move_used("opponent", their_moves[0])
+            states.append(battle)
+
+    batch = recommend_moves(states)
+    assert batch == [recommend_move(state) for state in states]
+    assert recommend_moves([]) == []
+    print(f"✅ recommend_moves matches recommend_move for {len(states)} battles")
+
+if __name__ == "__main__":
+    test_batch_damage_matches_scalar()
+    test_recommend_moves_matches_recommend_move()
@@ -0,0 +1,122 @@
+"""
+Test corpus analytics over battle log files
+"""
+import os
+import tempfile
+import time
+from battle.analytics import (
+    BattleAggregate, aggregate_corpus, write_aggregate, load_aggregate, read_columnar, write_columnar
+)
+from battle.battle_state import BattleState
+from battle.serialization import write_battle_log
+from battle.simulator import BattleSimulator, random_policy
+from pokedata.dex import get_dex
+
+def _finished_battles(count):
+    """Finished simulated battles, alternating which team leads with which Pokemon"""
+    dex = get_dex()
+    for seed in range(count):
+        my_team = [dex.create_pokemon("Sceptile", move_names=["Leaf Blade", "Dragon Claw"]),
+                   dex.create_pokemon("Swampert", move_names=["Surf", "Earthquake"])]
+        opponent_team = [dex.create_pokemon("Blaziken", move_names=["Flamethrower", "Close Combat"]),
+                         dex.create_pokemon("Metagross", move_names=["Meteor Mash", "Zen Headbutt"])]
+        if seed % 2:
+            my_team, opponent_team = opponent_team, my_team
+        battle = BattleState(my_team[0], opponent_team[0], my_team, opponent_team)
+        yield BattleSimulator(seed=seed, record=True).run_battle(battle, random_policy, random_policy).state
+
+def _same(a: BattleAggregate, b: BattleAggregate) -> bool:
+    return a.tables() == b.tables()
+
+def test_fold_and_merge():
+    """Test folding battles and that merged partial aggregates equal one fold"""
+    print("=== Testing Aggregation ===\n")
+
+    battles = list(_finished_battles(8))
+    total = BattleAggregate().add_battles(battles)
+    assert total.battles == 8
+    assert total.turns == sum(battle.turn_count for battle in battles)
+    assert total.draws == sum(battle.winner is None for battle in battles)
+    assert sum(total.move_uses.values()) == sum(len(battle.event_log.move_history(0)) +
+                                                len(battle.event_log.move_history(1)) for battle in battles)
+    assert total.species_battles["Sceptile"] == 8
+    assert total.damage_dealt["Sceptile"] > 0 and total.damage_taken["Blaziken"] > 0
+
+    # Both lead orders land in one matchup row, whose win rates add up to one
+    assert list(total.matchup_battles) == [("Blaziken", "Sceptile")]
+    assert total.lead_win_rate("Sceptile", "Blaziken") + total.lead_win_rate("Blaziken", "Sceptile") == 1
+    assert total.lead_win_rate("Sceptile", "Metagross") is None
+
+    merged = BattleAggregate().add_battles(battles[5:]).merge(BattleAggregate().add_battles(battles[:5]))
+    assert _same(merged, total)
+    print(f"✅ {total.battles} battles, {total.average_turns:.1f} turns on average; "
+          f"Sceptile lead wins {total.lead_win_rate('Sceptile', 'Blaziken'):.0%} against Blaziken")
+
+def test_corpus_map_reduce():
+    """Test that folding a corpus on worker processes matches folding it in this process"""
+    print("\n=== Testing Corpus Map-Reduce ===\n")
+
+    battles = list(_finished_battles(12))
+    with tempfile.TemporaryDirectory() as directory:
+        write_battle_log(battles[:7], os.path.join(directory, "a.pkbl"))
+        write_battle_log(battles[7:], os.path.join(directory, "b.pkbl"))
+        serial = aggregate_corpus([directory])
+        parallel = aggregate_corpus([directory], workers=2)
+    assert _same(serial, BattleAggregate().add_battles(battles))
+    assert _same(parallel, serial)
+    print("✅ Two workers produce the same statistics as one")
+
+def test_columnar_file():
+    """Test writing and reading back the columnar statistics file"""
+    print("\n=== Testing Columnar Files ===\n")
+
+    total = BattleAggregate().add_battles(_finished_battles(6))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "stats.bin")
+        write_aggregate(total, path)
+        tables = read_columnar(path)
+        assert set(tables) == {"totals", "moves", "matchups", "species"}
+        expected = total.tables()
+        for table, columns in expected.items():
+            for column, values in columns.items():
+                assert list(tables[table][column]) == values, (table, column)
+        assert _same(load_aggregate(path), total)
+        assert list(read_columnar(path, ["species"])) == ["species"]
+
+        # Merging new battles into a written file
+        updated = load_aggregate(path).add_battles(_finished_battles(2))
+        assert updated.battles == 8
+        size = os.path.getsize(path)
+
+        try:
+            write_columnar({"bad": {"a": [1, 2], "b": [1]}}, path)
+            assert False, "Expected ValueError"
+        except ValueError:
+            pass
+        with open(path, "wb") as f:
+            f.write(b"PKSTATS")
+        try:
+            read_columnar(path)
+            assert False, "Expected ValueError"
+        except ValueError:
+            pass
+    print(f"✅ Tables round trip through a {size}-byte file")
+
+def test_fold_throughput():
+    """Test that folding a battle is cheap"""
+    print("\n=== Testing Fold Throughput ===\n")
+
+    battles = list(_finished_battles(20))
+    aggregate = BattleAggregate()
+    start = time.perf_counter()
+    for _ in range(10):
+        aggregate.add_battles(battles)
+    per_battle_us = (time.perf_counter() - start) * 1e6 / 200
+    assert per_battle_us < 1000
+    print(f"✅ {per_battle_us:.0f} µs per battle folded")
+
+if __name__ == "__main__":
+    test_fold_and_merge()
+    test_corpus_map_reduce()
+    test_columnar_file()
+    test_fold_throughput()
@@ -0,0 +1,120 @@
+"""
+Test the columnar battle event log and replay
+"""
+from battle.battle_state import BattleState, WeatherType
+from battle.event_log import EventType
+from pokemon import Pokemon, PokemonStats, Move
+
+def _create_battle():
+    """Create a short battle with switches, weather and screens"""
+    charizard = Pokemon("Charizard", ["Fire", "Flying"], PokemonStats(78, 84, 78, 109, 85, 100),
+                        [Move("Fire Blast", "Fire", 110, 85, 5, "special")], level=50)
+    blastoise = Pokemon("Blastoise", ["Water"], PokemonStats(79, 83, 100, 85, 105, 78),
+                        [Move("Hydro Pump", "Water", 110, 80, 5, "special")], level=50)
+    venusaur = Pokemon("Venusaur", ["Grass", "Poison"], PokemonStats(80, 82, 83, 100, 100, 80),
+                       [Move("Solar Beam", "Grass", 120, 100, 10, "special")], level=50)
+
+    battle = BattleState(charizard, blastoise)
+    battle.set_weather(WeatherType.SUN, 4)
+    battle.add_screen_effect("Light Screen", 5, "ally")
+
+    battle.advance_turn()
+    battle.record_move_used("ally", "Fire Blast")
+    battle.apply_damage("opponent", 60)
+    battle.record_damage("opponent", 60, 60)
+    battle.record_move_used("opponent", "Hydro Pump")
+    battle.apply_damage("ally", 110)
+    battle.record_damage("ally", 110, 110)
+
+    battle.advance_turn()
+    battle.switch_pokemon(venusaur, "ally")
+    battle.record_move_used("opponent", "Hydro Pump")
+    battle.apply_damage("ally", 30)
+    battle.record_damage("ally", 30, 30)
+
+    battle.advance_turn()
+    battle.record_move_used("ally", "Solar Beam")
+    battle.apply_damage("opponent", 140)
+    battle.record_damage("opponent", 140, 140)
+    battle.record_ko("opponent")
+    battle.add_screen_effect("Reflect", 5, "opponent")
+
+    return battle, charizard, venusaur
+
+def test_history_views():
+    """Test that history accessors read from the event log"""
+    print("=== Testing Event Log History Views ===\n")
+
+    battle, charizard, venusaur = _create_battle()
+
+    assert battle.opponent_move_history == [("Hydro Pump", 1, "opponent"), ("Hydro Pump", 2, "opponent")]
+    assert battle.opponent_move_history[-1] == ("Hydro Pump", 2, "opponent")
+
+    archived = battle.ally_pokemon_history
+    assert len(archived) == 1
+    assert archived[0].pokemon is charizard
+    assert archived[0].moves_used == [("Fire Blast", 1)]
+    assert archived[0].damage_taken == 110
+    assert archived[0].turn_switched_out == 2
+
+    current = battle.current_ally_history
+    assert current.pokemon is venusaur
+    assert current.moves_used == [("Solar Beam", 3)]
+    assert current.damage_taken == 30
+    assert battle.current_opponent_history.was_ko
+    assert battle.current_opponent_history.damage_taken == 200
+
+    kinds = [event[1] for event in battle.event_log.events()]
+    print(f"Logged {len(battle.event_log)} events ({battle.event_log.nbytes()} bytes): {[k.name for k in kinds]}")
+    assert kinds.count(EventType.TURN) == 3
+    print("✅ History views match recorded events")
+
+def test_replay():
+    """Test rebuilding the battle state at each turn from the log"""
+    print("\n=== Testing Event Log Replay ===\n")
+
+    battle, charizard, venusaur = _create_battle()
+
+    full = battle.replay()
+    assert full.get_battle_summary() == battle.get_battle_summary()
+    assert full.get_opponent_move_pattern() == battle.get_opponent_move_pattern()
+    assert list(full.event_log.events()) == list(battle.event_log.events())
+
+    turn_one = battle.replay(turn=1)
+    assert turn_one.turn_count == 1
+    assert turn_one.my_pokemon.name == charizard.name and turn_one.my_pokemon is not charizard
+    assert turn_one.get_weather_info()["turns_remaining"] == 3
+    assert not turn_one.has_screen_active("Reflect", "opponent")
+    assert len(turn_one.opponent_move_history) == 1
+
+    turn_two = battle.replay(turn=2)
+    assert turn_two.my_pokemon.name == venusaur.name
+    assert len(turn_two.ally_pokemon_history) == 1
+    print(f"Turn 1 summary: {turn_one.get_battle_summary()}")
+    print("✅ Replay rebuilds state at any turn")
+
+def test_replay_rewinds_hp_without_touching_the_battle():
+    """Test that replays start from the logged HP and run on copies of the Pokemon"""
+    print("\n=== Testing Replay Isolation ===\n")
+
+    battle, charizard, venusaur = _create_battle()
+    max_hp = charizard.calculate_hp()
+    assert battle.get_hp("ally", 0) == max_hp - 110
+
+    start = battle.replay(turn=0)
+    assert start.get_hp("ally", 0) == max_hp
+    assert start.get_hp("opponent") == battle.get_max_hp("opponent")
+    assert battle.replay(turn=1).get_hp("ally", 0) == max_hp - 110
+
+    live_hp = [battle.get_hp("ally", index) for index in range(2)]
+    start.set_hp("ally", 1)
+    start.set_status("ally", "burned")
+    assert [battle.get_hp("ally", index) for index in range(2)] == live_hp
+    assert charizard.current_hp == max_hp - 110 and charizard.status_condition is None
+    assert battle.get_status("ally", 0) is None
+    print(f"✅ Turn 0 replay restores {max_hp} HP and leaves the live battle unchanged")
+
+if __name__ == "__main__":
+    test_history_views()
+    test_replay()
+    test_replay_rewinds_hp_without_touching_the_battle()
@@ -0,0 +1,138 @@
+"""
+Test the validated dict codec for tool-call payloads
+"""
+import json
+import time
+from battle.dict_codec import decode_battle_dict, decode_pokemon_dict, encode_battle_dict, encode_pokemon_dict
+from battle.decision_engine import recommend_move
+from pokedata.dex import get_dex
+
+BATTLE = {
+    "my_team": [{"species": "Sceptile", "moves": ["Leaf Blade", "Dragon Claw"], "hp": 80, "status": "burned"},
+                {"species": "Swampert", "moves": ["Surf", "Earthquake"], "level": 60}],
+    "opponent_team": [{"species": "Blaziken", "moves": ["Flamethrower", "Close Combat"]}],
+    "turn": 3,
+    "weather": {"type": "rain", "turns": 4},
+    "screens": [{"side": "opponent", "effect": "Reflect", "turns": 3}],
+    "opponent_moves": ["Flamethrower", "Flamethrower"],
+}
+
+def _expect_error(data, fragment):
+    try:
+        decode_battle_dict(data)
+    except ValueError as error:
+        assert fragment in str(error), (fragment, str(error))
+        return
+    assert False, f"Expected ValueError for {data}"
+
+def test_round_trip():
+    """Test that encoded battles decode to the same state and encode identically"""
+    print("=== Testing Round Trip ===\n")
+
+    state = decode_battle_dict(BATTLE)
+    assert state.turn_count == 3 and state.my_pokemon.name == "Sceptile"
+    assert state.get_hp("ally", 0) == 80 and state.get_status("ally", 0) == "burned"
+    assert state.ally_team.members[1].level == 60
+    assert state.field.weather_type.value == "rain" and state.field.active_screen_count == 1
+    assert state.opponent_move_counts["Flamethrower"] == 2
+
+    encoded = encode_battle_dict(state)
+    assert encoded["my_team"][0]["species"] == get_dex().find_species("Sceptile").id
+    assert "hp" not in encoded["my_team"][1]  # Full HP is left out
+    encoded = json.loads(json.dumps(encoded))
+    again = decode_battle_dict(encoded)
+    assert encode_battle_dict(again) == encoded
+    assert recommend_move(again) == recommend_move(state)
+    assert again.get_battle_summary() == state.get_battle_summary()
+    print(f"✅ {len(json.dumps(encoded))}-byte payload round trips")
+
+def test_round_trip_after_switch():
+    """Test that a switched opponent and a custom screen survive encode, decode and re-encode"""
+    print("\n=== Testing Round Trip After a Switch ===\n")
+
+    state = decode_battle_dict(dict(BATTLE, opponent_team=BATTLE["opponent_team"] + [
+        {"species": "Metagross", "moves": ["Meteor Mash", "Zen Headbutt"]}]))
+    state.add_screen_effect("Spotlight Veil", 4, "ally")
+    state.switch_to("opponent", 1)
+    state.record_move_used("opponent", "Meteor Mash")
+    state.switch_to("opponent", 0)
+    state.record_move_used("opponent", "Close Combat")
+
+    encoded = json.loads(json.dumps(encode_battle_dict(state)))
+    assert encoded["opponent_moves"] == ["Flamethrower", "Flamethrower", "Close Combat"]
+    assert {"side": "ally", "effect": "Spotlight Veil", "turns": 4} in encoded["screens"]
+    again = decode_battle_dict(encoded)
+    assert encode_battle_dict(again) == encoded
+    assert again.opponent_move_counts == {"Flamethrower": 2, "Close Combat": 1}
+    print(f"✅ {len(encoded['screens'])} screens and {len(encoded['opponent_moves'])} active opponent moves "
+          f"round trip")
+
+def test_ids_names_and_inline():
+    """Test that dex ids, names and inline species and moves decode alike"""
+    print("\n=== Testing Ids, Names and Inline Data ===\n")
+
+    dex = get_dex()
+    by_name = decode_pokemon_dict({"species": "Metagross", "moves": ["Meteor Mash", "Zen Headbutt"]})
+    by_id = decode_pokemon_dict({"species": by_name.species_id,
+                                 "moves": [dex.move_id("Meteor Mash"), dex.move_id("Zen Headbutt")]})
+    assert by_id == by_name
+    assert decode_pokemon_dict(encode_pokemon_dict(by_name)) == by_name
+
+    custom = {"species": {"name": "Glitch", "types": ["ghost"], "stats": [80, 90, 70, 110, 70, 100]},
+              "moves": [{"name": "Hex Burst", "type": "ghost", "power": 75, "accuracy": 100, "pp": 10,
+                         "damage_class": "special"}]}
+    pokemon = decode_pokemon_dict(custom)
+    assert pokemon.species_id is None and pokemon.moves[0].power == 75
+    encoded = encode_pokemon_dict(pokemon)
+    assert isinstance(encoded["species"], dict) and isinstance(encoded["moves"][0], dict)
+    assert decode_pokemon_dict(encoded) == pokemon
+    print("✅ Ids, names and inline data give the same Pokemon")
+
+def test_validation_errors():
+    """Test that bad payloads are rejected with the path of the offending field"""
+    print("\n=== Testing Validation ===\n")
+
+    opponent = {"species": "Blaziken"}
+    _expect_error({"my_pokemon": {"species": "Sceptile", "nickname": "x"}, "opponent_pokemon": opponent},
+                  "battle.my_pokemon: unknown field 'nickname'")
+    _expect_error({"my_pokemon": {"species": "Sceptile", "level": True}, "opponent_pokemon": opponent},
+                  "battle.my_pokemon.level: expected int")
+    _expect_error({"my_pokemon": {"species": "Sceptile", "level": 101}, "opponent_pokemon": opponent},
+                  "battle.my_pokemon.level")
+    _expect_error({"my_pokemon": {"species": "Sceptile", "status": "sleepy"}, "opponent_pokemon": opponent},
+                  "battle.my_pokemon.status")
+    _expect_error({"my_pokemon": {"species": 99999}, "opponent_pokemon": opponent},
+                  "battle.my_pokemon.species: unknown species id 99999")
+    _expect_error({"my_team": [{"species": "Sceptile", "moves": ["Splash Dance"]}], "opponent_pokemon": opponent},
+                  "battle.my_team[0].moves[0]: unknown move")
+    _expect_error({"my_pokemon": {"species": "Sceptile"}}, "opponent_team or opponent_pokemon")
+    _expect_error({"my_pokemon": {"species": "Sceptile"}, "opponent_pokemon": opponent, "my_active": 2},
+                  "my_active")
+    _expect_error(dict(BATTLE, weather={"type": "rain", "turns": -1}), "battle.weather.turns: expected non-negative")
+    _expect_error(dict(BATTLE, screens=[{"side": "ally", "effect": "Reflect", "turns": -3}]),
+                  "battle.screens[0].turns")
+    _expect_error(dict(BATTLE, screens=[{"side": "ally", "effect": "Reflect", "turns": 40000}]),
+                  "battle.screens[0].turns")
+    _expect_error([], "battle")
+    print("✅ Unknown fields, wrong types and out-of-range values name their path")
+
+def test_decode_throughput():
+    """Test that decoding a typical tool payload is cheap"""
+    print("\n=== Testing Decode Throughput ===\n")
+
+    payload = json.dumps(BATTLE)
+    decode_battle_dict(json.loads(payload))
+    calls = 500
+    start = time.perf_counter()
+    for _ in range(calls):
+        decode_battle_dict(json.loads(payload))
+    per_second = calls / (time.perf_counter() - start)
+    assert per_second > 1000
+    print(f"✅ {per_second:,.0f} payloads decoded per second")
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_round_trip_after_switch()
+    test_ids_names_and_inline()
+    test_validation_errors()
+    test_decode_throughput()
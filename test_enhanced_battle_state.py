@@ -1,8 +1,10 @@
 """
 Test the enhanced BattleState with comprehensive battle tracking
 """
+import battle.field_state as field_state
 from battle.battle_state import BattleState, WeatherType
 from battle.decision_engine import recommend_move
+from battle.field_state import SCREEN_EFFECTS, MAX_SCREEN_EFFECTS
 from pokemon import Pokemon, PokemonStats, Move
 
 def test_enhanced_battle_state():
@@ -204,9 +206,102 @@ def test_comprehensive_battle_simulation():
     
     return battle
 
+def test_incremental_opponent_move_stats():
+    """Test that incremental move statistics match a full recount of the history"""
+    print("\n=== Incremental Opponent Move Statistics ===\n")
+    
+    pikachu = Pokemon("Pikachu", ["Electric"], PokemonStats(35, 55, 40, 50, 50, 90), level=50)
+    onix = Pokemon("Onix", ["Rock", "Ground"], PokemonStats(35, 45, 160, 30, 45, 70), level=50)
+    battle = BattleState(pikachu, onix)
+    
+    sequence = ["Rock Throw", "Tackle", "Tackle", "Rock Throw", "Bind",
+                "Rock Throw", "Tackle", "Bind", "Bind", "Bind", "Tackle"]
+    for move_name in sequence:
+        battle.advance_turn()
+        battle.record_move_used("opponent", move_name)
+        
+        pattern = battle.get_opponent_move_pattern()
+        
+        # Recount from the full history the way the old implementation did
+        move_counts = {}
+        for name, _, _ in battle.opponent_move_history:
+            move_counts[name] = move_counts.get(name, 0) + 1
+        expected_most_used = max(move_counts.items(), key=lambda x: x[1])[0]
+        
+        assert pattern["most_used"] == expected_most_used
+        assert pattern["move_frequency"] == move_counts
+        pattern["move_frequency"].clear()  # A copy; the battle's counters are untouched
+        assert battle.get_opponent_move_pattern()["move_frequency"] == move_counts
+        assert pattern["recent_moves"] == [move[0] for move in battle.opponent_move_history[-5:]]
+        assert pattern["total_moves_used"] == len(battle.opponent_move_history)
+        print(f"Turn {battle.turn_count}: most used {pattern['most_used']}, recent {pattern['recent_moves']}")
+    
+    print("✅ Incremental statistics match full recount")
+
+def test_field_state_slots():
+    """Test weather and screen countdown on the fixed-slot field state"""
+    print("\n=== Field State Slots ===\n")
+    
+    pikachu = Pokemon("Pikachu", ["Electric"], PokemonStats(35, 55, 40, 50, 50, 90), level=50)
+    onix = Pokemon("Onix", ["Rock", "Ground"], PokemonStats(35, 45, 160, 30, 45, 70), level=50)
+    battle = BattleState(pikachu, onix)
+    
+    battle.set_weather(WeatherType.RAIN, 2)
+    battle.add_screen_effect("Reflect", 3, "opponent")
+    battle.add_screen_effect("Light Screen", 1, "ally")
+    battle.add_screen_effect("Spotlight Veil", 2, "ally")  # custom effect gets its own slot
+    
+    assert battle.has_screen_active("Reflect", "opponent")
+    assert not battle.has_screen_active("Reflect", "ally")
+    assert battle.has_screen_active("Spotlight Veil", "ally")
+    assert not battle.has_screen_active("Unknown Screen", "ally")
+    
+    snapshot = battle.field.copy()
+    
+    battle.advance_turn()
+    assert battle.get_weather_info() == {"type": "rain", "turns_remaining": 1, "is_permanent": False}
+    assert not battle.has_screen_active("Light Screen", "ally")
+    assert [s.effect_name for s in battle.get_active_screens("ally")] == ["Spotlight Veil"]
+    
+    battle.advance_turn()
+    assert battle.weather is None
+    assert len(battle.screens) == 1
+    
+    # Re-adding an effect replaces its counter
+    battle.add_screen_effect("Reflect", 5, "opponent")
+    assert battle.get_active_screens("opponent")[0].turns_remaining == 5
+    
+    # The copy taken earlier is unaffected by ticking the original
+    assert snapshot.weather_turns == 2 and snapshot.active_screen_count == 3
+    print(f"Screens after two turns: {battle.screens}")
+
+    # Custom effects take slots of their own battle only, never of the shared table
+    slots = dict(field_state._SCREEN_SLOTS)
+    fixed = tuple(SCREEN_EFFECTS)
+    for number in range(40):
+        other = BattleState(pikachu, onix)
+        other.add_screen_effect(f"Custom Screen {number}", 3, "opponent")
+        assert other.has_screen_active(f"Custom Screen {number}", "opponent")
+        assert not battle.has_screen_active(f"Custom Screen {number}", "opponent")
+    assert field_state._SCREEN_SLOTS == slots and field_state.SCREEN_EFFECTS == fixed
+    crowded = BattleState(pikachu, onix)
+    try:
+        for number in range(MAX_SCREEN_EFFECTS):
+            crowded.add_screen_effect(f"Custom Screen {number}", 3, "ally")
+        assert False, "Expected ValueError"
+    except ValueError:
+        pass
+    print("✅ Field state slots count down and expire correctly")
+
 if __name__ == "__main__":
     # Run basic enhanced battle state test
     enhanced_state = test_enhanced_battle_state()
     
     # Run comprehensive simulation
     comprehensive_battle = test_comprehensive_battle_simulation()
+    
+    # Check incremental opponent statistics
+    test_incremental_opponent_move_stats()
+    
+    # Check fixed-slot field state
+    test_field_state_slots()
@@ -0,0 +1,97 @@
+"""
+Test change notification and the incremental battle analyzer
+"""
+import time
+from battle.battle_state import BattleState, WeatherType, CHANGE_MOVE, CHANGE_HP, CHANGE_SWITCH
+from battle.battle_utils import BattleStateAnalyzer, create_battle_report, get_battle_recommendations
+from pokedata.dex import get_dex
+
+def _create_battle():
+    dex = get_dex()
+    my_team = [dex.create_pokemon("Sceptile", move_names=["Leaf Blade", "Dragon Claw"]),
+               dex.create_pokemon("Swampert", move_names=["Surf", "Earthquake"])]
+    opponent = dex.create_pokemon("Blaziken", move_names=["Flamethrower", "Close Combat"])
+    return BattleState(my_team[0], opponent, my_team)
+
+def test_change_notification():
+    """Test that mutations are reported to subscribers and clones start without them"""
+    print("=== Testing Change Notification ===\n")
+
+    battle = _create_battle()
+    changes = []
+    listener = battle.subscribe(lambda state, change: changes.append(change))
+    battle.record_move_used("opponent", "Flamethrower")
+    battle.apply_damage("ally", 30)
+    battle.switch_to("ally", 1)
+    assert changes == [CHANGE_MOVE, CHANGE_HP, CHANGE_SWITCH]
+
+    clone = battle.clone()
+    clone.apply_damage("ally", 10)
+    assert len(changes) == 3
+
+    battle.unsubscribe(listener)
+    battle.advance_turn()
+    assert len(changes) == 3
+    print("✅ Subscribers see each mutation; clones and unsubscribed listeners do not")
+
+def test_sections_recompute_only_when_their_inputs_change():
+    """Test that each change only invalidates the sections that read it"""
+    print("\n=== Testing Dirty Sections ===\n")
+
+    battle = _create_battle()
+    analyzer = BattleStateAnalyzer.attach(battle)
+    report = create_battle_report(battle, analyzer)
+    recommendations = get_battle_recommendations(battle, analyzer)
+    assert create_battle_report(battle, analyzer) is report
+    assert get_battle_recommendations(battle, analyzer) is recommendations
+    assert analyzer.recomputed["report"] == 1 and analyzer.recomputed["actions"] == 1
+
+    battle.record_move_used("opponent", "Flamethrower")
+    assert create_battle_report(battle, analyzer) == create_battle_report(battle)
+    assert analyzer.recomputed["prediction"] == 2 and analyzer.recomputed["momentum"] == 2
+    assert analyzer.recomputed["type_analysis"] == 1 and analyzer.recomputed["phase"] == 1
+
+    battle.apply_damage("ally", 40)
+    create_battle_report(battle, analyzer)
+    assert analyzer.recomputed["phase"] == 2 and analyzer.recomputed["prediction"] == 2
+
+    battle.switch_to("ally", 1)
+    battle.set_weather(WeatherType.RAIN, 5)
+    assert create_battle_report(battle, analyzer) == create_battle_report(battle)
+    assert get_battle_recommendations(battle, analyzer) == get_battle_recommendations(battle)
+    assert analyzer.recomputed["type_analysis"] == 2
+
+    # Changes made behind the state's back are picked up once reported
+    battle.my_pokemon.current_hp = 1
+    battle.notify(CHANGE_HP)
+    assert analyzer.get_battle_phase_analysis()["recommended_strategy"] == "defensive"
+
+    analyzer.detach()
+    battle.advance_turn()
+    assert analyzer.get_battle_phase_analysis()["turn_count"] == battle.turn_count
+    print(f"✅ Sections recomputed: {dict(analyzer.recomputed)}")
+
+def test_refreshing_an_unchanged_battle_is_cheap():
+    """Test that a cached report refresh is much faster than building one"""
+    print("\n=== Testing Refresh Cost ===\n")
+
+    battle = _create_battle()
+    battle.record_move_used("opponent", "Flamethrower")
+    analyzer = BattleStateAnalyzer.attach(battle)
+    create_battle_report(battle, analyzer)
+
+    start = time.perf_counter()
+    for _ in range(200):
+        create_battle_report(battle)
+    fresh = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(200):
+        create_battle_report(battle, analyzer)
+    cached = time.perf_counter() - start
+    assert cached * 10 < fresh
+    print(f"✅ Report refresh: {fresh / 200 * 1e6:.0f} µs fresh, {cached / 200 * 1e6:.1f} µs cached")
+
+if __name__ == "__main__":
+    test_change_notification()
+    test_sections_recompute_only_when_their_inputs_change()
+    test_refreshing_an_unchanged_battle_is_cheap()
@@ -0,0 +1,82 @@
+"""
+Test the n-gram opponent move predictor
+"""
+import time
+from battle.battle_utils import BattleStateAnalyzer
+from battle.mcts import MCTSSearch
+from battle.move_predictor import MoveSequenceModel, next_move_distribution, move_prior
+from test_opponent_model import _create_battle
+
+def test_sequence_model():
+    """Test the interpolated n-gram distribution"""
+    print("=== Testing Sequence Model ===\n")
+
+    prior = {"A": 1.0, "B": 1.0, "C": 2.0}
+    model = MoveSequenceModel(order=2)
+    assert model.distribution(prior) == {"A": 0.25, "B": 0.25, "C": 0.5}
+
+    for move in "ABABABAB":
+        model.observe(move)
+    distribution = model.distribution(prior)
+    assert abs(sum(distribution.values()) - 1) < 1e-9
+    assert distribution["A"] > 0.8  # A always followed B
+    assert 0 < distribution["C"] < prior["C"] / 4  # Never used, but still possible
+    assert model.support() == (("A", "B"), 3)
+
+    # Moves outside the prior get probability from their counts alone
+    model.observe("D")
+    assert model.distribution(prior)["D"] > 0
+
+    # Updates touch order + 1 contexts, however long the sequence
+    start = time.perf_counter()
+    for index in range(20000):
+        model.observe("ABCD"[index % 4])
+    per_update_us = (time.perf_counter() - start) * 1e6 / 20000
+    assert len(model.counts) <= 1 + 5 + 25
+    print(f"✅ Distribution follows the sequence; {per_update_us:.2f} µs per update")
+
+def test_battle_state_integration():
+    """Test that BattleState trains the predictor and clones copy it on write"""
+    print("\n=== Testing Battle State Integration ===\n")
+
+    battle = _create_battle()
+    prior = move_prior(battle)
+    assert prior == battle.opponent_model.belief(battle.opponent_pokemon).move_probabilities()
+    for move in ["Earthquake", "Earthquake", "Earthquake", "Waterfall", "Earthquake", "Waterfall", "Earthquake"]:
+        battle.record_move_used("opponent", move)
+
+    # The most used move is Earthquake, but after Waterfall -> Earthquake comes Waterfall
+    prediction = BattleStateAnalyzer(battle).predict_opponent_next_move()
+    assert battle.get_opponent_move_pattern()['most_used'] == "Earthquake"
+    assert prediction["prediction"] == "Waterfall"
+    assert "Waterfall -> Earthquake" in prediction["reasoning"]
+    assert abs(sum(prediction["distribution"].values()) - 1) < 1e-9
+
+    clone = battle.clone()
+    before = next_move_distribution(battle)
+    clone.record_move_used("opponent", "Ice Beam")
+    assert next_move_distribution(battle) == before
+    assert next_move_distribution(clone) != before
+    battle.record_move_used("opponent", "Waterfall")
+    assert clone.move_predictor.model(clone.opponent_pokemon).history == ("Earthquake", "Ice Beam")
+    assert battle.mirrored()._move_predictor is None
+    print(f"✅ Predicted {prediction['prediction']} ({prediction['confidence']:.0f}%): {prediction['reasoning']}")
+
+def test_mcts_opponent_prior():
+    """Test that MCTS can use the predicted distribution as the opponent's prior"""
+    print("\n=== Testing MCTS Opponent Prior ===\n")
+
+    battle = _create_battle()
+    for move in ["Waterfall", "Earthquake", "Waterfall", "Earthquake"]:
+        battle.record_move_used("opponent", move)
+    first = MCTSSearch(iterations=200, seed=3, opponent_prior_weight=2.0).search(battle)
+    second = MCTSSearch(iterations=200, seed=3, opponent_prior_weight=2.0).search(battle)
+    assert first.best_move in ("Leaf Blade", "Earthquake")
+    assert first.move_visits == second.move_visits
+    assert sum(first.move_visits.values()) == 200
+    print(f"✅ MCTS with the opponent prior picks {first.best_move} ({first.move_visits})")
+
+if __name__ == "__main__":
+    test_sequence_model()
+    test_battle_state_integration()
+    test_mcts_opponent_prior()
@@ -0,0 +1,126 @@
+"""
+Test the learnset index and the Bayesian opponent moveset model
+"""
+from math import comb
+import battle.opponent_model as opponent_model
+from battle.battle_state import BattleState
+from battle.decision_engine import _get_move_types_from_names, _get_strategic_bonus, ScoreWeights
+from battle.opponent_model import MovesetBelief, candidate_table, MAX_CANDIDATE_MOVES, MOVESET_SIZE
+from pokedata.dex import get_dex
+from pokedata.learnsets import LearnsetIndex, get_learnsets
+
+def _create_battle():
+    dex = get_dex()
+    my_pokemon = dex.create_pokemon("Sceptile", move_names=["Leaf Blade", "Earthquake"])
+    opponent = dex.create_pokemon("Swampert", move_names=["Earthquake", "Waterfall", "Ice Beam", "Stealth Rock"])
+    return BattleState(my_pokemon, opponent)
+
+def test_learnset_index_and_tables():
+    """Test the learnset index and the precomputed candidate tables"""
+    print("=== Testing Learnsets ===\n")
+
+    dex = get_dex()
+    learnsets = get_learnsets()
+    swampert = dex.species_id("Swampert")
+    earthquake = dex.move_id("Earthquake")
+    assert learnsets.can_learn(swampert, earthquake)
+    assert not learnsets.can_learn(swampert, dex.move_id("Flamethrower"))
+    assert learnsets.learnset(swampert)[0] == earthquake  # Most used first
+    assert learnsets.usage(swampert, earthquake) == 0.9
+
+    table = candidate_table(swampert)
+    size = len(table.move_ids)
+    assert len(table) == comb(size, MOVESET_SIZE)
+    assert (table.contains.sum(axis=1) == MOVESET_SIZE).all()
+    assert abs(table.prior.sum() - 1) < 1e-9
+    assert candidate_table(swampert) is table
+    assert candidate_table(None) is None
+    print(f"✅ Swampert: {size} learnable moves, {len(table)} candidate sets")
+
+def test_large_learnset_is_capped():
+    """Test that a learnset past MAX_CANDIDATE_MOVES keeps only its most used moves"""
+    print("\n=== Testing Large Learnsets ===\n")
+
+    dex = get_dex()
+    moves = [move.name for move in dex.moves.values()]
+    learnsets = LearnsetIndex({"species": {"Swampert": {"moves": {name: 1 / (rank + 2) for rank, name
+                                                                   in enumerate(moves)}}}}, dex)
+    shared = opponent_model.get_learnsets
+    opponent_model.get_learnsets = lambda: learnsets
+    try:
+        # Built outside the shared cache, which holds the real learnset
+        table = candidate_table.__wrapped__(dex.species_id("Swampert"))
+    finally:
+        opponent_model.get_learnsets = shared
+    assert len(moves) > MAX_CANDIDATE_MOVES and len(table.move_ids) == MAX_CANDIDATE_MOVES
+    assert len(table) == comb(MAX_CANDIDATE_MOVES, MOVESET_SIZE) and (table.masks > 0).all()
+    assert abs(table.prior.sum() - 1) < 1e-9
+    dropped = next(name for name in moves if dex.move_id(name) not in table.index)
+    assert MovesetBelief.prior(table).observe(dropped).unexpected == {dropped}
+    print(f"✅ {len(moves)} learnable moves cut to {len(table.move_ids)}, {len(table)} candidate sets")
+
+def test_belief_updates():
+    """Test that revealed moves narrow the distribution"""
+    print("\n=== Testing Moveset Belief ===\n")
+
+    battle = _create_battle()
+    model = battle.opponent_model
+    prior = model.belief(battle.opponent_pokemon)
+    probabilities = prior.move_probabilities()
+    assert probabilities["Earthquake"] > probabilities["Rest"]
+    assert abs(sum(probabilities.values()) - MOVESET_SIZE) < 1e-9
+
+    battle.record_move_used("opponent", "Waterfall")
+    belief = model.belief(battle.opponent_pokemon)
+    size = len(belief.table.move_ids)
+    assert belief.candidate_count == comb(size - 1, MOVESET_SIZE - 1)
+    assert abs(belief.move_probabilities()["Waterfall"] - 1) < 1e-9
+    # The other moves now share the three remaining slots
+    others = {name: p for name, p in belief.move_probabilities().items() if name != "Waterfall"}
+    assert abs(sum(others.values()) - (MOVESET_SIZE - 1)) < 1e-9
+    assert others["Scald"] < probabilities["Scald"]
+    assert belief.type_probabilities()["water"] == 1.0
+
+    # Repeats change nothing; unknown moves are noted without breaking the belief
+    battle.record_move_used("opponent", "Waterfall")
+    assert model.belief(battle.opponent_pokemon) is belief
+    battle.record_move_used("opponent", "Flamethrower")
+    belief = model.belief(battle.opponent_pokemon)
+    assert belief.move_probabilities()["Flamethrower"] == 1.0
+    assert belief.revealed_moves() == ["Waterfall", "Flamethrower"]
+
+    for moves, probability in belief.most_likely_sets(3):
+        print(f"  {probability:.3f} {', '.join(moves)}")
+    assert all("Waterfall" in moves for moves, _ in belief.most_likely_sets(3))
+
+    # Clones carry the belief but update independently
+    clone = battle.clone()
+    clone.record_move_used("opponent", "Earthquake")
+    assert battle.opponent_model.belief(battle.opponent_pokemon) is belief
+    assert clone.opponent_model.belief(clone.opponent_pokemon).candidate_count < belief.candidate_count
+    assert battle.mirrored()._opponent_model is None
+    print("✅ Beliefs update incrementally and stay per state")
+
+def test_engine_scores_against_the_belief():
+    """Test that move types come from the dex and the counter bonus from the belief"""
+    print("\n=== Testing Engine Integration ===\n")
+
+    assert _get_move_types_from_names(["Hydro Pump", "Stone Edge", "Not A Move"]) == ["water", "rock"]
+
+    battle = _create_battle()
+    leaf_blade = battle.my_pokemon.get_move_by_name("Leaf Blade")
+    patterns = battle.get_opponent_move_pattern()
+    weights = ScoreWeights(ko_bonus=0, near_ko_bonus=0)
+    before = _get_strategic_bonus(battle, leaf_blade, patterns, damage=0, weights=weights)
+    # Grass beats Water and Ground moves, which Swampert very likely carries
+    assert 0 < before < weights.counter_bonus
+    battle.record_move_used("opponent", "Waterfall")
+    after = _get_strategic_bonus(battle, leaf_blade, battle.get_opponent_move_pattern(), damage=0, weights=weights)
+    assert after == weights.counter_bonus
+    print(f"✅ Leaf Blade counter bonus: {before:.1f} before any move, {after:.1f} after Waterfall")
+
+if __name__ == "__main__":
+    test_learnset_index_and_tables()
+    test_large_learnset_is_capped()
+    test_belief_updates()
+    test_engine_scores_against_the_belief()
@@ -0,0 +1,142 @@
+"""
+Test the token-budgeted prompt encoder
+"""
+import json
+import time
+from agents.prompt_encoder import PromptEncoder, REQUIRED, VALUE, encode_battle_prompt, estimate_tokens
+from agents.tool_server import ToolServer
+from battle.battle_utils import create_battle_report
+from battle.dict_codec import decode_battle_dict
+
+BATTLE = {
+    "my_team": [{"species": "Sceptile", "moves": ["Leaf Blade", "Dragon Claw", "Earthquake"], "hp": 80},
+                {"species": "Swampert", "moves": ["Surf", "Earthquake", "Ice Beam"]},
+                {"species": "Metagross", "moves": ["Meteor Mash", "Zen Headbutt"]}],
+    "opponent_team": [{"species": "Blaziken", "moves": ["Flamethrower", "Close Combat"]}],
+    "turn": 2,
+    "weather": {"type": "rain", "turns": 4},
+    "screens": [{"side": "opponent", "effect": "Reflect", "turns": 3}],
+    "opponent_moves": ["Flamethrower", "Close Combat"],
+}
+
+def _play_turn(state, opponent_move="Flamethrower", damage=20):
+    state.advance_turn()
+    state.record_move_used("opponent", opponent_move)
+    state.apply_damage("ally", damage)
+    state.record_move_used("ally", "Leaf Blade")
+
+def test_compact_and_deterministic():
+    """Test that the prompt covers the battle in fewer tokens than the report and summary"""
+    print("=== Testing Compact Encoding ===\n")
+
+    state = decode_battle_dict(BATTLE)
+    prompt = encode_battle_prompt(state)
+    assert prompt.dropped == () and prompt.tokens == estimate_tokens(prompt.text)
+    for text in ("TURN 2", "weather rain 4t", "opponent Reflect 3t", "*Sceptile 80/", "Blaziken 100%",
+                 "Flamethrower, Close Combat", "ACTIONS", "Leaf Blade[Grass,phys,90,100]"):
+        assert text in prompt.text, text
+
+    # The same battle always gives the same text
+    assert encode_battle_prompt(decode_battle_dict(BATTLE)).text == prompt.text
+    assert not state._listeners
+
+    verbose = estimate_tokens(create_battle_report(state)) + estimate_tokens(json.dumps(state.get_battle_summary()))
+    assert prompt.tokens < verbose
+    print(f"✅ {prompt.tokens} tokens against {verbose} for the report and summary")
+
+def test_budget_drops_low_value_sections():
+    """Test that sections are dropped cheapest first and required ones are kept"""
+    print("\n=== Testing Token Budget ===\n")
+
+    state = decode_battle_dict(BATTLE)
+    encoder = PromptEncoder(state)
+    full = encoder.encode(10000)
+    previous = full
+    for budget in range(full.tokens, 0, -10):
+        prompt = encoder.encode(budget)
+        assert prompt.tokens <= budget or set(prompt.sections) <= set(REQUIRED)
+        assert set(previous.dropped) <= set(prompt.dropped)
+        assert [VALUE[name] for name in prompt.dropped] == sorted(VALUE[name] for name in prompt.dropped)
+        assert prompt.tokens == estimate_tokens(prompt.text)
+        assert all(name in prompt.sections for name in REQUIRED)
+        previous = prompt
+    assert set(previous.sections) == set(REQUIRED)
+    print(f"✅ Down to the required sections ({previous.tokens} tokens) from {full.tokens}")
+
+def test_incremental_prefix():
+    """Test that a turn re-renders only the volatile sections and keeps the prompt prefix"""
+    print("\n=== Testing Incremental Prefix ===\n")
+
+    state = decode_battle_dict(BATTLE)
+    encoder = PromptEncoder(state)
+    first = encoder.encode()
+    assert set(first.rendered) >= set(REQUIRED) and first.stable_chars == 0
+    unchanged = encoder.encode()
+    assert unchanged.rendered == () and unchanged.text == first.text and unchanged.stable_chars == len(first.text)
+
+    _play_turn(state)
+    after = encoder.encode()
+    assert "team" not in after.rendered and "header" not in after.rendered
+    assert after.text[:after.stable_chars] == first.text[:after.stable_chars]
+    assert after.stable_chars >= first.text.index("OPPONENTS")
+    # Matches a fresh encoding of the same state
+    assert after.text == encode_battle_prompt(state).text
+
+    # A newly revealed move changes the opponents section, but not the team before it
+    _play_turn(state, "Earthquake")
+    revealed = encoder.encode()
+    assert "Flamethrower, Close Combat, Earthquake" in revealed.text
+    assert revealed.stable_chars == revealed.text.index("OPPONENTS")
+
+    turns = 50
+    start = time.perf_counter()
+    for _ in range(turns):
+        _play_turn(state, damage=0)
+        encoder.encode()
+    per_turn_ms = (time.perf_counter() - start) * 1000 / turns
+    encoder.detach()
+    assert not state._listeners
+    print(f"✅ {after.stable_chars} of {len(after.text)} characters kept across a turn; "
+          f"{per_turn_ms:.2f} ms per turn")
+
+def test_direct_pokemon_changes():
+    """Test that HP and status changed on the Pokemon objects show in the next prompt"""
+    print("\n=== Testing Direct Pokemon Changes ===\n")
+
+    state = decode_battle_dict(BATTLE)
+    encoder = PromptEncoder(state)
+    max_hp = state.get_max_hp("ally")
+    assert f"*Sceptile 80/{max_hp}" in encoder.encode().text
+    state.my_pokemon.current_hp -= 50
+    state.notify("hp")
+    state.my_pokemon.status_condition = "paralyzed"
+    state.notify("status")
+    prompt = encoder.encode()
+    ally = next(line for line in prompt.text.splitlines() if line.startswith("ALLY:"))
+    assert f"*Sceptile 30/{max_hp} par" in ally and prompt.text == encode_battle_prompt(state).text
+    assert state.get_battle_summary()["current_pokemon"]["ally"]["hp"] == f"30/{max_hp}"
+    encoder.detach()
+    print(f"✅ Prompt follows the Pokemon: {ally}")
+
+def test_tool_server_prompt():
+    """Test the tool server's prompt method"""
+    print("\n=== Testing Prompt Method ===\n")
+
+    server = ToolServer()
+    request = {"jsonrpc": "2.0", "id": 1, "method": "new_battle", "params": {"battle": BATTLE, "battle_id": "p"}}
+    assert server.handle(request)["result"]["battle_id"] == "p"
+    result = server.handle({"jsonrpc": "2.0", "id": 2, "method": "prompt",
+                            "params": {"battle_id": "p", "budget": 250}})["result"]
+    assert result["tokens"] <= 250 and result["dropped"]
+    assert result["prompt"] == encode_battle_prompt(server.sessions["p"].state, 250).text
+    state = server.sessions["p"].state
+    server.handle({"jsonrpc": "2.0", "id": 3, "method": "end_battle", "params": {"battle_id": "p"}})
+    assert not state._listeners
+    print(f"✅ {result['tokens']}-token prompt, dropped {', '.join(result['dropped'])}")
+
+if __name__ == "__main__":
+    test_compact_and_deterministic()
+    test_budget_drops_low_value_sections()
+    test_incremental_prefix()
+    test_direct_pokemon_changes()
+    test_tool_server_prompt()
@@ -0,0 +1,136 @@
+"""
+Test battle log files and the streaming report pipeline
+"""
+import io
+import json
+import os
+import tempfile
+import tracemalloc
+from battle.battle_state import BattleState
+from battle.battle_utils import create_battle_report, iter_battle_report
+from battle.report_pipeline import plan_shards, render_corpus, render_lines
+from battle.serialization import (
+    write_battle_log, iter_battle_log, iter_battle_log_records, count_battle_log, encode_battle_state
+)
+from battle.simulator import BattleSimulator, random_policy
+from pokedata.dex import get_dex
+
+def _finished_battles(count):
+    """Finished simulated battles, played one at a time"""
+    dex = get_dex()
+    for seed in range(count):
+        my_team = [dex.create_pokemon("Sceptile", move_names=["Leaf Blade", "Dragon Claw"]),
+                   dex.create_pokemon("Swampert", move_names=["Surf", "Earthquake"])]
+        opponent_team = [dex.create_pokemon("Blaziken", move_names=["Flamethrower", "Close Combat"]),
+                         dex.create_pokemon("Metagross", move_names=["Meteor Mash", "Zen Headbutt"])]
+        battle = BattleState(my_team[0], opponent_team[0], my_team, opponent_team)
+        yield BattleSimulator(seed=seed, record=True).run_battle(battle, random_policy, random_policy).state
+
+def test_battle_log_files():
+    """Test writing, skipping through and reading back a battle log file"""
+    print("=== Testing Battle Log Files ===\n")
+
+    battles = list(_finished_battles(5))
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "battles.pkbl")
+        assert write_battle_log(battles, path) == 5
+        assert count_battle_log(path) == 5
+        records = list(iter_battle_log_records(path))
+        assert records == [encode_battle_state(battle) for battle in battles]
+        assert list(iter_battle_log_records(path, 2, 4)) == records[2:4]
+        decoded = list(iter_battle_log(path, start=3))
+        assert [state.get_battle_summary() for state in decoded] == \
+               [battle.get_battle_summary() for battle in battles[3:]]
+
+        not_a_log = os.path.join(directory, "other.bin")
+        with open(not_a_log, "wb") as f:
+            f.write(records[0])
+        try:
+            count_battle_log(not_a_log)
+            assert False, "Expected ValueError"
+        except ValueError:
+            pass
+        with open(path, "rb") as f:
+            truncated = f.read()[:-10]
+        with open(not_a_log, "wb") as f:
+            f.write(truncated)
+        try:
+            list(iter_battle_log_records(not_a_log))
+            assert False, "Expected ValueError"
+        except ValueError:
+            pass
+    print(f"✅ 5 battles round trip; {sum(map(len, records))} bytes of records")
+
+def test_streamed_report_matches_report():
+    """Test that the generated report lines are the report"""
+    print("\n=== Testing Report Generator ===\n")
+
+    for battle in _finished_battles(3):
+        lines = iter_battle_report(battle)
+        assert not isinstance(lines, (list, str))
+        assert "\n".join(lines) == create_battle_report(battle)
+    print("✅ Joined report lines equal create_battle_report")
+
+def test_render_corpus():
+    """Test rendering a corpus serially and on worker processes"""
+    print("\n=== Testing Corpus Rendering ===\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = os.path.join(directory, "corpus")
+        os.makedirs(corpus)
+        battles = list(_finished_battles(6))
+        write_battle_log(battles[:4], os.path.join(corpus, "a.pkbl"))
+        write_battle_log(battles[4:], os.path.join(corpus, "b.pkbl"))
+
+        shards = plan_shards([corpus], shard_size=3)
+        assert [(os.path.basename(shard.path), shard.start, shard.stop) for shard in shards] == \
+               [("a.pkbl", 0, 3), ("a.pkbl", 3, 4), ("b.pkbl", 0, 2)]
+
+        serial = io.StringIO()
+        assert render_corpus([corpus], serial) == 6
+        expected = "".join(create_battle_report(battle) + "\n" for battle in battles)
+        assert "\n".join(line for line in serial.getvalue().split("\n") if ".pkbl #" not in line) == expected
+        parallel = io.StringIO()
+        assert render_corpus([corpus], parallel, workers=2) == 6
+        assert parallel.getvalue() == serial.getvalue()
+
+        summaries = io.StringIO()
+        render_corpus([corpus], summaries, kind="summary", workers=2)
+        rows = [json.loads(line) for line in summaries.getvalue().splitlines()]
+        assert [(os.path.basename(row["source"]), row["battle"]) for row in rows] == \
+               [("a.pkbl", 0), ("a.pkbl", 1), ("a.pkbl", 2), ("a.pkbl", 3), ("b.pkbl", 0), ("b.pkbl", 1)]
+        assert [row["winner"] for row in rows] == [battle.winner for battle in battles]
+
+        try:
+            render_corpus([corpus], io.StringIO(), kind="html")
+            assert False, "Expected ValueError"
+        except ValueError:
+            pass
+    print("✅ Two workers write the same reports as one; summaries are JSON lines in corpus order")
+
+def test_memory_stays_flat():
+    """Test that rendering holds one battle at a time, whatever the corpus size"""
+    print("\n=== Testing Memory Use ===\n")
+
+    battles = list(_finished_battles(4))
+    peaks = []
+    with tempfile.TemporaryDirectory() as directory:
+        for count in (8, 80):
+            path = os.path.join(directory, f"{count}.pkbl")
+            write_battle_log((battles[index % 4] for index in range(count)), path)
+            # Warm the dex and type chart caches so only the rendering is measured
+            list(render_lines(plan_shards([path], shard_size=1)[:4], "report"))
+            tracemalloc.start()
+            for shard in plan_shards([path]):
+                for _ in render_lines([shard]):
+                    pass
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+    assert peaks[1] < peaks[0] * 1.5
+    print(f"✅ Peak traced memory: {peaks[0] / 1024:.0f} KiB for 8 battles, {peaks[1] / 1024:.0f} KiB for 80")
+
+if __name__ == "__main__":
+    test_battle_log_files()
+    test_streamed_report_matches_report()
+    test_render_corpus()
+    test_memory_stays_flat()
@@ -0,0 +1,55 @@
+"""
+Test the deterministic per-battle RNG streams
+"""
+from battle.simulator import BattleSimulator, random_policy, run_battle
+from battle.tournament import TournamentSpec, EngineConfig, run_tournament, replay_battle
+from utils.rng import RngStreams, battle_streams, derive_seed, DAMAGE_STREAM
+from test_simulator import _create_battle
+from test_tournament import TEAMS
+
+def test_streams_are_keyed_by_path():
+    """Test that streams depend only on (root seed, path, name)"""
+    print("=== Testing RNG Streams ===\n")
+
+    assert derive_seed(7, "battle", 3) == derive_seed(7, "battle", 3)
+    assert derive_seed(7, "battle", 3) != derive_seed(7, "battle", 4)
+    assert derive_seed(7, "battle", 3) != derive_seed(8, "battle", 3)
+
+    # Drawing from one stream does not move any other stream
+    busy = battle_streams(7, 3)
+    for _ in range(1000):
+        busy.stream("turns").random()
+    assert busy.stream(DAMAGE_STREAM).random() == battle_streams(7, 3).stream(DAMAGE_STREAM).random()
+
+    # The same stream continues its sequence; a new tree restarts it
+    streams = RngStreams(7).worker(1)
+    first = [streams.stream("search").random() for _ in range(3)]
+    assert streams.stream("search").random() != first[0]
+    restarted = RngStreams(7).worker(1).stream("search")
+    assert [restarted.random() for _ in range(3)] == first
+    assert (streams.numpy("search").random(4) == RngStreams(7).worker(1).numpy("search").random(4)).all()
+    print("✅ Streams are reproducible and independent of each other")
+
+def test_battles_replay_from_streams():
+    """Test that a battle replays bit-for-bit from (root seed, battle id)"""
+    print("\n=== Testing Battle Replay ===\n")
+
+    battle = _create_battle()
+    first = run_battle(battle, random_policy, random_policy, streams=battle_streams(11, 42))
+    second = BattleSimulator(streams=battle_streams(11, 42)).run_battle(battle, random_policy, random_policy)
+    assert (first.winner, first.turns) == (second.winner, second.turns)
+    assert first.state.state_key() == second.state.state_key()
+
+    engines = [EngineConfig("greedy"), EngineConfig("mcts", "mcts", options={"iterations": 16, "rollout_depth": 3})]
+    spec = TournamentSpec(teams=TEAMS, engines=engines, seed=11, battles_per_pairing=4, max_turns=50)
+    report = run_tournament(spec, workers=2)
+    for record in report.records:
+        replay = replay_battle(spec, record.battle_id)
+        winner = {"ally": record.ally_engine, "opponent": record.opponent_engine}.get(replay.winner)
+        assert (winner, replay.turns) == (record.winner, record.turns)
+    assert sum(1 for _ in replay.state.event_log.events()) > 0
+    print(f"✅ {len(report.records)} battles from a 2-worker run replay identically in one process")
+
+if __name__ == "__main__":
+    test_streams_are_keyed_by_path()
+    test_battles_replay_from_streams()
@@ -0,0 +1,176 @@
+"""
+Test the search-based move recommendation engines
+"""
+from battle.battle_state import BattleState
+from battle.decision_engine import recommend_move, run_search_engine
+from battle.search import ExpectiminimaxSearch, SearchResult, evaluate, team_defeated, EVAL_MIN, EVAL_MAX
+from battle.mcts import MCTSSearch, random_rollout_policy
+from battle.parallel_search import merge_results, split_moves
+from pokedata.dex import get_dex
+from utils.rng import RngStreams, SEARCH_STREAM
+
+def _create_battle():
+    """Create a 2v2 battle from the local dex"""
+    dex = get_dex()
+    my_team = [dex.create_pokemon("Blaziken", move_names=["Flamethrower", "Close Combat", "Thunder Punch"]),
+               dex.create_pokemon("Swampert", move_names=["Surf", "Earthquake"])]
+    opponent_team = [dex.create_pokemon("Sceptile", move_names=["Leaf Blade", "Earthquake"]),
+                     dex.create_pokemon("Metagross", move_names=["Meteor Mash", "Zen Headbutt"])]
+    return BattleState(my_team[0], opponent_team[0], my_team, opponent_team)
+
+def _plain_expectiminimax(search, state, depth):
+    """Reference expectiminimax without pruning or caching"""
+    if team_defeated(state, "opponent"):
+        return EVAL_MAX
+    if team_defeated(state, "ally"):
+        return EVAL_MIN
+    if depth == 0:
+        return evaluate(state)
+    best = EVAL_MIN - 1
+    for my_move in state.my_pokemon.moves:
+        worst = EVAL_MAX + 1
+        for opponent_move in state.opponent_pokemon.moves:
+            value = sum(p * _plain_expectiminimax(search, child, depth - 1)
+                        for p, child in search.turn_outcomes(state, my_move, opponent_move))
+            worst = min(worst, value)
+        best = max(best, worst)
+    return best
+
+def test_expectiminimax_matches_plain_search():
+    """Test that pruning and the transposition table do not change the root value"""
+    print("=== Testing Expectiminimax Search ===\n")
+
+    battle = _create_battle()
+    battle.apply_damage("opponent", 60)
+    summary = battle.get_battle_summary()
+
+    for use_table in (False, True):
+        search = ExpectiminimaxSearch(depth=2, use_transposition_table=use_table)
+        result = search.search(battle)
+        expected = _plain_expectiminimax(search, battle.clone(), 2)
+        assert result.completed
+        assert abs(result.score - expected) < 1e-9
+        assert result.best_move in result.move_scores
+        print(f"table={use_table}: best {result.best_move} ({result.score:.3f}), {result.nodes} nodes")
+
+    # The searched state is never modified
+    assert battle.get_battle_summary() == summary
+    print("✅ Pruned search value matches plain expectiminimax")
+
+def test_search_finds_knockout():
+    """Test that the search sees a knockout on a 1 HP opponent"""
+    battle = _create_battle()
+    battle.set_hp("opponent", 1)
+    result = run_search_engine(battle, depth=1)
+    assert result.score > 0
+    assert recommend_move(battle, engine="expectiminimax", depth=1) == result.best_move
+    print(f"✅ Search finishes a 1 HP opponent with {result.best_move}")
+
+def test_search_time_budget():
+    """Test that a tiny time budget still returns a legal move"""
+    battle = _create_battle()
+    result = run_search_engine(battle, depth=6, time_budget_ms=1)
+    assert result.best_move in [move.name for move in battle.my_pokemon.moves]
+    print(f"✅ Budgeted search returned {result.best_move} "
+          f"(completed={result.completed}, {result.elapsed_ms:.1f} ms)")
+
+    try:
+        recommend_move(battle, engine="unknown")
+    except ValueError as e:
+        print(f"Rejected: {e}")
+    else:
+        raise AssertionError("recommend_move accepted an unknown engine")
+
+def test_mcts_engine():
+    """Test MCTS budgets, seeding and per-move statistics"""
+    print("\n=== Testing MCTS ===\n")
+
+    battle = _create_battle()
+    summary = battle.get_battle_summary()
+    result = run_search_engine(battle, engine="mcts", iterations=300, seed=7)
+    assert result.iterations == 300
+    assert sum(result.move_visits.values()) == 300
+    assert result.best_move == max(result.move_visits, key=result.move_visits.get)
+    assert all(EVAL_MIN <= score <= EVAL_MAX for score in result.move_scores.values())
+    assert battle.get_battle_summary() == summary
+    for name, visits in result.move_visits.items():
+        print(f"{name}: {visits} visits, value {result.move_scores.get(name, 0):.3f}")
+
+    # Same seed, same tree
+    again = run_search_engine(battle, engine="mcts", iterations=300, seed=7)
+    assert again.move_visits == result.move_visits
+    assert again.move_scores == result.move_scores
+
+    # Pluggable rollout policy and a time budget instead of an iteration count
+    search = MCTSSearch(iterations=None, time_budget_ms=20, rollout_policy=random_rollout_policy, seed=1)
+    timed = search.search(battle)
+    assert timed.iterations > 0 and timed.completed
+    print(f"✅ MCTS ran {timed.iterations} random-rollout simulations in {timed.elapsed_ms:.1f} ms "
+          f"({timed.nodes} nodes)")
+
+def test_deadline_for_every_engine():
+    """Test that deadline_ms bounds every engine and reports how far it got"""
+    print("\n=== Testing Decision Deadlines ===\n")
+
+    battle = _create_battle()
+    legal = [move.name for move in battle.my_pokemon.moves]
+    for engine in ("greedy", "expectiminimax", "mcts"):
+        result = run_search_engine(battle, engine, deadline_ms=30)
+        assert result.best_move in legal
+        # At least one full ply or simulation fits; the time bound only catches an ignored
+        # deadline, not scheduler noise
+        assert result.depth >= 1 and result.iterations >= 1
+        if engine == "expectiminimax":
+            assert result.iterations == result.depth
+        assert result.elapsed_ms < 30 * 10
+        print(f"{engine}: {result.best_move}, depth {result.depth}, "
+              f"{result.iterations} iterations, {result.elapsed_ms:.1f} ms")
+        assert recommend_move(battle, engine=engine, deadline_ms=30) in legal
+
+    # Iterative deepening reaches at least the first ply and searches deeper plies in order
+    result = run_search_engine(battle, "expectiminimax", deadline_ms=200, depth=3)
+    assert 1 <= result.depth <= 3
+    assert result.iterations == result.depth
+    print("✅ Every engine returns a move within the deadline")
+
+def test_root_parallel_search():
+    """Test that root-parallel search merges worker results like a single search"""
+    print("\n=== Testing Root-Parallel Search ===\n")
+
+    battle = _create_battle()
+    assert split_moves(["a", "b", "c"], 2) == [["a", "c"], ["b"]]
+
+    # Splitting the root moves gives the same best move and value as one process
+    single = run_search_engine(battle, "expectiminimax", depth=2)
+    parallel = run_search_engine(battle, "expectiminimax", depth=2, workers=2)
+    assert parallel.best_move == single.best_move
+    assert abs(parallel.score - single.score) < 1e-9
+    print(f"expectiminimax: {parallel.best_move} ({parallel.score:.3f}) with 2 workers")
+
+    # Under a deadline workers stop at different depths; they are compared at the depth all finished
+    deeper = SearchResult("Surf", 0.5, {"Surf": 0.5}, depth=3, iterations=3, completed=False,
+                          depth_best={1: "Surf", 2: "Surf", 3: "Surf"},
+                          depth_scores={1: {"Surf": 0.1}, 2: {"Surf": 0.2}, 3: {"Surf": 0.5}})
+    shallower = SearchResult("Ice Beam", 0.3, {"Ice Beam": 0.3}, depth=2, iterations=2, completed=False,
+                             depth_best={1: "Ice Beam", 2: "Ice Beam"},
+                             depth_scores={1: {"Ice Beam": 0.0}, 2: {"Ice Beam": 0.3}})
+    merged = merge_results([deeper, shallower], "expectiminimax")
+    assert merged.depth == 2 and merged.best_move == "Ice Beam" and merged.score == 0.3
+    assert merged.move_scores == {"Surf": 0.2, "Ice Beam": 0.3}
+
+    # Independent trees pool their root statistics
+    parallel = run_search_engine(battle, "mcts", iterations=100, seed=5, workers=2)
+    assert sum(parallel.move_visits.values()) == 200
+    seeds = [RngStreams(5).worker(index).seed(SEARCH_STREAM) for index in range(2)]
+    trees = [MCTSSearch(iterations=100, seed=seed).search(battle) for seed in seeds]
+    assert merge_results(trees, "mcts").move_visits == parallel.move_visits
+    print(f"mcts: {parallel.move_visits}")
+    print("✅ Root-parallel results match the merged single-process searches")
+
+if __name__ == "__main__":
+    test_expectiminimax_matches_plain_search()
+    test_search_finds_knockout()
+    test_search_time_budget()
+    test_mcts_engine()
+    test_deadline_for_every_engine()
+    test_root_parallel_search()
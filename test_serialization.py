@@ -0,0 +1,159 @@
+"""
+Test the compact binary encoding of Pokemon and BattleState
+"""
+import struct
+from battle.battle_state import BattleState, WeatherType
+from battle.event_log import EventType
+from battle.serialization import encode_pokemon, decode_pokemon, encode_battle_state, decode_battle_state, decode
+from battle.serialization import _Decoder, KIND_BATTLE_STATE
+from pokedata.dex import get_dex
+from pokemon import Pokemon, PokemonStats, Move, Ability
+
+def _create_battle():
+    """Create a battle with teams, field effects and some history"""
+    blaziken = Pokemon("Blaziken", ["Fire", "Fighting"], PokemonStats(80, 120, 70, 110, 70, 80), [
+        Move("Flamethrower", "Fire", 90, 100, 15, "special"),
+        Move("Sky Uppercut", "Fighting", 85, 90, 15, "physical"),
+        Move("Blaze Kick", "Fire", 85, 90, 10, "physical", effect="May burn the target")
+    ], abilities=[Ability("Blaze"), Ability("Speed Boost", "Raises Speed each turn", True)],
+        level=50, nature="Adamant", item="Life Orb", height=1.9, weight=52.0, species_id=257)
+    swampert = Pokemon("Swampert", ["Water", "Ground"], PokemonStats(100, 110, 90, 85, 90, 60),
+                       [Move("Surf", "Water", 90, 100, 15, "special")], level=50)
+    sceptile = Pokemon("Sceptile", ["Grass"], PokemonStats(70, 85, 65, 105, 85, 120),
+                       [Move("Leaf Blade", "Grass", 90, 100, 15, "physical")], level=50)
+
+    battle = BattleState(blaziken, swampert, [blaziken])
+    battle.set_weather(WeatherType.SUN, 5)
+    battle.add_screen_effect("Reflect", 5, "opponent")
+    for turn in range(4):
+        battle.advance_turn()
+        battle.record_move_used("ally", "Flamethrower")
+        battle.record_damage("opponent", 40, 40)
+        battle.record_move_used("opponent", "Surf" if turn % 2 else "Earthquake")
+        battle.record_damage("ally", 35, 35)
+    battle.apply_damage("ally", 70)
+    battle.set_status("ally", "burned")
+    battle.switch_pokemon(sceptile, "opponent")
+    return battle
+
+def test_pokemon_round_trip():
+    """Test that Pokemon survive encoding unchanged"""
+    print("=== Testing Pokemon Encoding ===\n")
+
+    battle = _create_battle()
+    for pokemon in (battle.my_pokemon, battle.opponent_pokemon):
+        data = encode_pokemon(pokemon)
+        decoded = decode_pokemon(data)
+        assert decoded == pokemon
+        assert decode(data) == pokemon
+        print(f"{pokemon.name}: {len(data)} bytes")
+    print("✅ Pokemon round trip is lossless")
+
+def test_battle_state_round_trip():
+    """Test that BattleState survives encoding, including clones"""
+    print("\n=== Testing BattleState Encoding ===\n")
+
+    battle = _create_battle()
+    data = encode_battle_state(battle)
+    decoded = decode_battle_state(data)
+
+    assert decoded.get_battle_summary() == battle.get_battle_summary()
+    assert decoded.get_opponent_move_pattern() == battle.get_opponent_move_pattern()
+    assert list(decoded.event_log.events()) == list(battle.event_log.events())
+    assert decoded.get_hp("ally") == battle.get_hp("ally")
+    assert decoded.get_status("ally") == "burned"
+    assert decoded.opponent_team.members == battle.opponent_team.members
+    assert encode_battle_state(decoded) == data
+    print(f"Encoded battle state: {len(data)} bytes, {len(battle.event_log)} events")
+
+    # Replay still works on a decoded state
+    assert decoded.replay(turn=2).get_battle_summary() == battle.replay(turn=2).get_battle_summary()
+
+    # Clones encode their own HP, not the shared Pokemon objects' HP
+    clone = battle.clone()
+    clone.apply_damage("opponent", 25)
+    decoded_clone = decode_battle_state(encode_battle_state(clone))
+    assert decoded_clone.get_hp("opponent") == battle.get_hp("opponent") - 25
+    print("✅ BattleState round trip is lossless")
+
+def test_rejects_bad_input():
+    """Test that corrupted or mismatched records are rejected"""
+    battle = _create_battle()
+    for bad in (b"nope", encode_pokemon(battle.my_pokemon)):
+        try:
+            decode_battle_state(bad)
+        except ValueError as e:
+            print(f"Rejected: {e}")
+        else:
+            raise AssertionError("decode_battle_state accepted an invalid record")
+
+def test_rejects_truncated_input():
+    """Test that a record cut short anywhere is rejected with ValueError"""
+    battle = _create_battle()
+    for data in (encode_pokemon(battle.my_pokemon), encode_battle_state(battle)):
+        for cut in range(len(data)):
+            try:
+                decode(data[:cut])
+            except ValueError:
+                continue
+            raise AssertionError(f"decode accepted a record cut at byte {cut} of {len(data)}")
+    print(f"Rejected every truncation of a {len(data)}-byte battle record")
+
+def _corrupt(battle, name):
+    log, field = battle.event_log, battle.field
+    move = log.kind.index(EventType.MOVE)
+    if name == "kind":
+        log.kind[0] = 99
+    elif name == "side":
+        log.side[move] = 5
+    elif name == "name id":
+        log.arg0[move] = 1000
+    elif name == "column length":
+        log.arg2.pop()
+    elif name == "stint roster":
+        log.stint_roster[0] = 7
+    elif name == "stint moves":
+        log.stint_move_count[0] = 1000
+    elif name == "stint index":
+        log.stints_by_side[1].append(99)
+    elif name == "weather code":
+        field.weather_code = 200
+    elif name == "logged screen turns":
+        log.arg1[log.kind.index(EventType.SCREEN)] = 40000
+
+def _with_screen_turns(data, turns):
+    """The record with the turns of its first field screen replaced"""
+    decoder = _Decoder(data, KIND_BATTLE_STATE, get_dex())
+    decoder.unpack('iBBI')
+    decoder.unpack('BiBB')
+    decoder.unpack('BI')
+    return data[:decoder.offset] + struct.pack('<h', turns) + data[decoder.offset + 2:]
+
+def test_rejects_corrupt_event_log():
+    """Test that decoded event logs and fields are checked before the battle is rebuilt"""
+    for name in ("kind", "side", "name id", "column length", "stint roster", "stint moves", "stint index",
+                 "weather code", "logged screen turns"):
+        battle = _create_battle()
+        _corrupt(battle, name)
+        try:
+            decode_battle_state(encode_battle_state(battle))
+        except ValueError as e:
+            print(f"Rejected {name}: {e}")
+        else:
+            raise AssertionError(f"decode_battle_state accepted a record with a bad {name}")
+
+    data = encode_battle_state(_create_battle())
+    assert decode_battle_state(_with_screen_turns(data, 4)).get_active_screens("opponent")[0].turns_remaining == 4
+    try:
+        decode_battle_state(_with_screen_turns(data, -3))
+    except ValueError as e:
+        print(f"Rejected screen turns: {e}")
+    else:
+        raise AssertionError("decode_battle_state accepted a screen with negative turns")
+
+if __name__ == "__main__":
+    test_pokemon_round_trip()
+    test_battle_state_round_trip()
+    test_rejects_bad_input()
+    test_rejects_truncated_input()
+    test_rejects_corrupt_event_log()
@@ -0,0 +1,130 @@
+"""
+Test the headless turn resolver and battle simulator
+"""
+from battle.battle_state import BattleState, WeatherType
+from battle.event_log import EventType
+from battle.simulator import BattleSimulator, run_battle, random_policy, CHIP_FRACTION
+from pokedata.dex import get_dex
+
+def _create_battle():
+    """Blaziken (faster) and Swampert against Metagross and Sceptile"""
+    dex = get_dex()
+    my_team = [dex.create_pokemon("Blaziken", move_names=["Flamethrower", "Close Combat"]),
+               dex.create_pokemon("Swampert", move_names=["Surf", "Earthquake"])]
+    opponent_team = [dex.create_pokemon("Metagross", move_names=["Meteor Mash", "Bullet Punch"]),
+                     dex.create_pokemon("Sceptile", move_names=["Leaf Blade", "Earthquake"])]
+    return BattleState(my_team[0], opponent_team[0], my_team, opponent_team)
+
+def _move(state, side, name):
+    pokemon = state.my_pokemon if side == "ally" else state.opponent_pokemon
+    return pokemon.get_move_by_name(name)
+
+def test_turn_order_and_fainting():
+    """Test speed and priority order, fainting and replacement"""
+    print("=== Testing Turn Resolution ===\n")
+
+    battle = _create_battle().clone()
+    simulator = BattleSimulator(seed=1, crit_chance=0)
+    assert battle.my_pokemon.speed > battle.opponent_pokemon.speed
+
+    # Both on 1 HP: the faster Pokemon moves first and the slower one never attacks
+    battle.set_hp("ally", 1)
+    battle.set_hp("opponent", 1)
+    simulator.resolve_turn(battle, _move(battle, "ally", "Flamethrower"), _move(battle, "opponent", "Meteor Mash"))
+    assert battle.get_hp("opponent", 0) == 0
+    assert battle.get_hp("ally") == 1
+    # Sceptile was the only healthy bench Pokemon
+    assert battle.opponent_pokemon.name == "Sceptile"
+    assert battle.turn_count == 1
+    print("✅ Faster Pokemon moves first; fainted Pokemon is replaced")
+
+    # Priority beats speed
+    battle = _create_battle().clone()
+    battle.set_hp("ally", 1)
+    battle.set_hp("opponent", 1)
+    simulator.resolve_turn(battle, _move(battle, "ally", "Flamethrower"), _move(battle, "opponent", "Bullet Punch"))
+    assert battle.get_hp("ally", 0) == 0
+    assert battle.get_hp("opponent", 0) == 1
+    print("✅ Priority moves go first")
+
+def test_damage_modifiers_and_chip():
+    """Test screens, crits, burn and weather chip"""
+    print("\n=== Testing Damage Modifiers ===\n")
+
+    battle = _create_battle().clone()
+    simulator = BattleSimulator(seed=1)
+    close_combat = _move(battle, "ally", "Close Combat")
+    plain = simulator.move_damage(battle, "ally", close_combat)
+    assert len(plain) == 16 and plain[0] <= plain[-1]
+
+    battle.add_screen_effect("Reflect", 5, "opponent")
+    screened = simulator.move_damage(battle, "ally", close_combat)
+    assert screened == tuple(int(damage * 0.5) for damage in plain)
+    # Critical hits ignore screens
+    critical = simulator.move_damage(battle, "ally", close_combat, critical=True)
+    assert critical[-1] > plain[-1]
+
+    battle.set_status("ally", "burned")
+    burned = simulator.move_damage(battle, "ally", close_combat)
+    assert burned[-1] < screened[-1]
+    print(f"Close Combat max damage: {plain[-1]}, Reflect {screened[-1]}, "
+          f"crit {critical[-1]}, burned behind Reflect {burned[-1]}")
+
+    # Sandstorm chips non-Rock/Ground/Steel Pokemon; burn chips too
+    battle.set_weather(WeatherType.SANDSTORM, 5)
+    ally_hp = battle.get_hp("ally")
+    opponent_hp = battle.get_hp("opponent")
+    simulator.end_turn(battle)
+    chip = int(battle.get_max_hp("ally") * CHIP_FRACTION)
+    assert battle.get_hp("ally") == ally_hp - 2 * chip
+    assert battle.get_hp("opponent") == opponent_hp  # Metagross is Steel
+    print("✅ Screens, crits, burn and sandstorm chip are applied")
+
+def test_damage_cache_across_battles():
+    """Test that a reused simulator never serves damage computed for another battle's Pokemon"""
+    print("\n=== Testing Damage Cache Reuse ===\n")
+
+    dex = get_dex()
+    simulator = BattleSimulator(seed=3)
+    stale = 0
+    for round_number in range(200):
+        level = 20 + round_number % 60
+        ally = dex.create_pokemon("Blaziken", level=level, move_names=["Flamethrower"])
+        opponent = dex.create_pokemon("Sceptile" if round_number % 2 else "Metagross", level=100 - level % 40,
+                                      move_names=["Earthquake"])
+        battle = BattleState(ally, opponent, [ally], [opponent])
+        flamethrower = ally.moves[0]
+        cached = simulator.move_damage(battle, "ally", flamethrower)
+        fresh = BattleSimulator(seed=3).move_damage(battle, "ally", flamethrower)
+        stale += cached != fresh
+        del ally, opponent, battle
+    assert stale == 0
+    print(f"✅ 200 battles on one simulator, {len(simulator.damage_cache)} cached damage rows")
+
+def test_seeded_battles():
+    """Test that whole battles are reproducible and leave the input untouched"""
+    print("\n=== Testing Seeded Battles ===\n")
+
+    battle = _create_battle()
+    summary = battle.get_battle_summary()
+    first = run_battle(battle, random_policy, random_policy, seed=42)
+    second = run_battle(battle, random_policy, random_policy, seed=42)
+    assert first.winner in ("ally", "opponent")
+    assert (first.winner, first.turns) == (second.winner, second.turns)
+    assert first.state.state_key() == second.state.state_key()
+    assert battle.get_battle_summary() == summary
+    print(f"Seed 42: {first.winner} wins in {first.turns} turns")
+
+    # Recording writes the battle to the event log
+    recorded = run_battle(battle, random_policy, random_policy, seed=42, record=True)
+    assert recorded.state.state_key() == first.state.state_key()
+    events = list(recorded.state.event_log.events())
+    assert sum(1 for event in events if event[1] == EventType.TURN) == recorded.turns
+    assert sum(1 for event in events if event[1] == EventType.KO) >= 2
+    print(f"✅ Seeded battles are reproducible ({len(events)} recorded events)")
+
+if __name__ == "__main__":
+    test_turn_order_and_fainting()
+    test_damage_modifiers_and_chip()
+    test_damage_cache_across_battles()
+    test_seeded_battles()
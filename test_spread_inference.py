@@ -0,0 +1,162 @@
+"""
+Test opponent stat-spread inference from observed damage and turn order
+"""
+import time
+import numpy as np
+from battle.battle_state import BattleState
+from battle.decision_engine import _get_strategic_bonus, calculate_move_damage
+from battle.simulator import BattleSimulator, random_policy
+from battle.spread_inference import InferredPokemon, grid_for, STATS
+from battle.switch_advisor import SwitchAdvisor
+from pokedata.dex import get_dex
+from utils.damage_calculator import calculate_physical_damage
+
+def _create_battle():
+    dex = get_dex()
+    my_team = [dex.create_pokemon("Sceptile", move_names=["Leaf Blade", "Dragon Claw"]),
+               dex.create_pokemon("Swampert", move_names=["Surf", "Earthquake"])]
+    opponent_team = [dex.create_pokemon("Blaziken", move_names=["Flamethrower", "Close Combat"]),
+                     dex.create_pokemon("Metagross", move_names=["Meteor Mash", "Zen Headbutt"])]
+    return BattleState(my_team[0], opponent_team[0], my_team, opponent_team)
+
+def _spread_stats(pokemon, evs, nature, item=None):
+    """Stats of one grid candidate"""
+    grid = grid_for(pokemon)
+    match = np.all(grid.evs == [evs.get(stat, 0) for stat in STATS], axis=1)
+    match &= np.array(grid.natures)[grid.nature_index] == nature
+    match &= np.array(grid.items, dtype=object)[grid.item_index] == item
+    row = grid.stats[np.flatnonzero(match)[0]]
+    return {stat: int(value) for stat, value in zip(STATS, row)}
+
+def test_grid():
+    """Test that the candidate grid starts with the nominal spread"""
+    print("=== Testing Spread Grid ===\n")
+
+    blaziken = _create_battle().opponent_pokemon
+    grid = grid_for(blaziken)
+    assert grid is grid_for(blaziken)  # Built once per species and level
+    nominal = grid.stats[0]
+    assert nominal[0] == blaziken.calculate_hp()
+    assert [nominal[STATS.index(stat)] for stat in STATS[1:]] == [
+        blaziken.attack, blaziken.defense, blaziken.special_attack, blaziken.special_defense, blaziken.speed]
+    assert np.all(grid.evs.sum(axis=1) <= 508)
+    adamant = _spread_stats(blaziken, {"attack": 252}, "Adamant")
+    assert adamant["attack"] > blaziken.attack and adamant["special_attack"] < blaziken.special_attack
+    print(f"✅ {len(grid)} candidate spreads, nominal first")
+
+def test_damage_narrows_the_spread():
+    """Test that damage from a hidden spread narrows the stat bounds and feeds the analysis"""
+    print("\n=== Testing Damage Observations ===\n")
+
+    battle = _create_battle()
+    battle.switch_to("ally", 1)
+    blaziken = battle.opponent_pokemon
+    swampert = battle.my_pokemon
+    truth = InferredPokemon.from_pokemon(blaziken, _spread_stats(blaziken, {"attack": 252}, "Adamant"))
+    close_combat = blaziken.get_move_by_name("Close Combat")
+    before = SwitchAdvisor(battle).damage_taken[0].max()
+
+    damage = calculate_physical_damage(truth, swampert, close_combat, 0.9)
+    battle.apply_damage("ally", damage)
+    battle.record_damage("ally", damage, move_name="Close Combat")
+    belief = battle.spread_inference.belief(blaziken)
+    low, high = belief.stat_bounds()["attack"]
+    assert blaziken.attack < low <= truth.attack <= high
+    assert belief.candidate_count < len(belief.grid)
+
+    # The analysis now assumes at least the lowest attack that explains the hit
+    estimate = battle.estimated_opponent()
+    assert estimate.attack == low and estimate.special_attack == blaziken.special_attack
+    assert SwitchAdvisor(battle).damage_taken[0].max() > before
+
+    # A hit nothing explains leaves the belief unchanged; without a move name nothing is inferred
+    battle.record_damage("ally", 1, move_name="Close Combat")
+    battle.record_damage("ally", damage)
+    assert battle.spread_inference.belief(blaziken) is belief
+
+    # Damage we deal bounds the defending stat
+    earthquake = swampert.get_move_by_name("Earthquake")
+    dealt = calculate_physical_damage(swampert, blaziken, earthquake)
+    battle.apply_damage("opponent", dealt)
+    battle.record_damage("opponent", dealt, move_name="Earthquake")
+    low, high = battle.spread_inference.belief(blaziken).stat_bounds()["defense"]
+    assert low <= blaziken.defense <= high < belief.stat_bounds()["defense"][1]
+    print(f"✅ Close Combat and Earthquake narrowed Blaziken's Attack and Defense; the advisor uses them")
+
+def test_strategic_bonus_uses_the_estimate():
+    """Test that the KO bonus judges our damage against the estimated opponent"""
+    print("\n=== Testing Strategic Bonus ===\n")
+
+    battle = _create_battle()
+    battle.switch_to("ally", 1)
+    blaziken = battle.opponent_pokemon
+    swampert = battle.my_pokemon
+    earthquake = swampert.get_move_by_name("Earthquake")
+    truth = InferredPokemon.from_pokemon(blaziken, _spread_stats(blaziken, {"defense": 252}, "Impish"))
+    dealt = calculate_physical_damage(swampert, truth, earthquake)
+    battle.apply_damage("opponent", dealt)
+    battle.record_damage("opponent", dealt, move_name="Earthquake")
+
+    # Enough HP left that the nominal spread is knocked out but the inferred bulkier one is not
+    estimated = calculate_physical_damage(swampert, battle.estimated_opponent(), earthquake)
+    nominal = calculate_physical_damage(swampert, blaziken, earthquake)
+    battle.set_hp("opponent", (estimated + nominal) // 2)
+    patterns = battle.get_opponent_move_pattern()
+    bonus = _get_strategic_bonus(battle, earthquake, patterns)
+    assert bonus == _get_strategic_bonus(battle, earthquake, patterns, damage=estimated)
+    assert bonus != _get_strategic_bonus(battle, earthquake, patterns, damage=nominal)
+    print(f"✅ Earthquake is judged at {estimated} damage against the estimate, not {nominal}")
+
+def test_turn_order_narrows_speed():
+    """Test that moving first at equal priority bounds the opponent's speed"""
+    print("\n=== Testing Turn Order ===\n")
+
+    battle = _create_battle()
+    sceptile_speed = battle.my_pokemon.speed
+    assert battle.opponent_pokemon.speed < sceptile_speed
+    battle.record_turn_order("opponent", "Leaf Blade", "Flamethrower")
+    low, high = battle.spread_inference.belief(battle.opponent_pokemon).stat_bounds()["speed"]
+    assert low >= sceptile_speed
+    assert battle.estimated_opponent().speed == low
+
+    # Clones carry the inference and update independently; the mirrored view starts fresh
+    clone = battle.clone()
+    clone.record_turn_order("ally", "Leaf Blade", "Flamethrower")
+    assert clone.spread_inference.belief(clone.opponent_pokemon) is battle.spread_inference.belief(battle.opponent_pokemon)
+    flamethrower = clone.opponent_pokemon.get_move_by_name("Flamethrower")
+    clone.record_damage("ally", calculate_move_damage(clone.opponent_pokemon, clone.my_pokemon, flamethrower),
+                        move_name="Flamethrower")
+    assert clone.spread_inference.belief(clone.opponent_pokemon) is not battle.spread_inference.belief(battle.opponent_pokemon)
+    assert battle.mirrored()._spread_inference is None
+    print(f"✅ Outspeeding Sceptile ({sceptile_speed}) bounds Blaziken's Speed to {low}-{high}")
+
+def test_recorded_battles_keep_the_true_spread():
+    """Test that every observation of a simulated battle is consistent with the real stats, quickly"""
+    print("\n=== Testing Recorded Battles ===\n")
+
+    observations = 0
+    for seed in range(5):
+        battle = _create_battle()
+        simulator = BattleSimulator(seed=seed, record=True)
+        state = simulator.run_battle(battle, random_policy, random_policy).state
+        for pokemon in state.opponent_team.members:
+            belief = state.spread_inference.belief(pokemon)
+            assert belief.candidates[0] == 0  # The nominal spread the simulator uses
+            assert state.spread_inference.estimate(pokemon) is pokemon
+            observations += belief.observations
+    assert observations > 0
+
+    battle = _create_battle()
+    start = time.perf_counter()
+    for damage in range(40, 80):
+        battle.clone().record_damage("ally", damage, move_name="Flamethrower")
+    per_observation_ms = (time.perf_counter() - start) * 1000 / 40
+    assert per_observation_ms < 1.0
+    print(f"✅ {observations} narrowing observations over 5 battles; {per_observation_ms:.3f} ms per observation")
+
+if __name__ == "__main__":
+    test_grid()
+    test_damage_narrows_the_spread()
+    test_strategic_bonus_uses_the_estimate()
+    test_turn_order_narrows_speed()
+    test_recorded_battles_keep_the_true_spread()
@@ -0,0 +1,93 @@
+"""
+Test the switch advisor and the unified move/switch ranking
+"""
+from battle.battle_state import BattleState, WeatherType
+from battle.battle_utils import get_battle_recommendations
+from battle.decision_engine import calculate_move_damage
+from battle.switch_advisor import SwitchAdvisor, rank_actions, UNREVEALED_MOVE_WEIGHT
+from pokedata.dex import get_dex
+
+def _create_battle():
+    """Sceptile (weak to Fire) with Swampert and Metagross on the bench against Blaziken"""
+    dex = get_dex()
+    my_team = [dex.create_pokemon("Sceptile", move_names=["Leaf Blade", "Dragon Claw"]),
+               dex.create_pokemon("Swampert", move_names=["Surf", "Earthquake"]),
+               dex.create_pokemon("Metagross", move_names=["Meteor Mash", "Zen Headbutt"])]
+    opponent_team = [dex.create_pokemon("Blaziken", move_names=["Flamethrower", "Close Combat"])]
+    return BattleState(my_team[0], opponent_team[0], my_team, opponent_team)
+
+def test_damage_matrices():
+    """Test that the vectorized matrices match the scalar damage calculation"""
+    print("=== Testing Damage Matrices ===\n")
+
+    battle = _create_battle()
+    advisor = SwitchAdvisor(battle)
+    assert advisor.damage_taken.shape == (3, len(advisor.opponent_moves))
+    assert advisor.damage_dealt.shape == (3, 2)
+    for i, pokemon in enumerate(advisor.candidates):
+        for j, move in enumerate(advisor.opponent_moves):
+            assert advisor.damage_taken[i, j] == calculate_move_damage(battle.opponent_pokemon, pokemon, move)
+        for k, move in enumerate(pokemon.moves):
+            expected = calculate_move_damage(pokemon, battle.opponent_pokemon, move) * (move.accuracy or 100) / 100
+            assert abs(advisor.damage_dealt[i, k] - expected) < 1e-9
+
+    # Weather and our screens change what we take
+    battle.set_weather(WeatherType.RAIN, 5)
+    battle.add_screen_effect("Reflect", 5, "ally")
+    rainy = SwitchAdvisor(battle)
+    names = [move.name for move in advisor.opponent_moves]
+    flamethrower, close_combat = names.index("Flamethrower"), names.index("Close Combat")
+    assert rainy.damage_taken[0, flamethrower] < advisor.damage_taken[0, flamethrower]  # Fire in rain
+    assert rainy.damage_taken[0, close_combat] < advisor.damage_taken[0, close_combat]  # Physical into Reflect
+    print("✅ Damage matrices match calculate_move_damage, with weather and screens")
+
+def test_unified_ranking():
+    """Test that moves and switches are ranked together"""
+    print("\n=== Testing Unified Ranking ===\n")
+
+    battle = _create_battle()
+    battle.record_move_used("opponent", "Flamethrower")
+    actions = rank_actions(battle)
+    kinds = sorted(action.kind for action in actions)
+    assert kinds == ["move", "move", "switch", "switch"]
+    assert actions == sorted(actions, key=lambda action: action.score, reverse=True)
+    for action in actions:
+        print(f"  {action.score:+.3f} {action.describe()}")
+    # Sceptile is outsped and badly hurt by Flamethrower; Swampert resists it
+    assert actions[0].kind == "switch" and actions[0].name == "Swampert" and actions[0].slot == 1
+
+    # Opponent moves are weighted by the moveset belief; the revealed move is certain
+    advisor = SwitchAdvisor(battle)
+    weights = dict(zip((move.name for move in advisor.opponent_moves), advisor.opponent_weights))
+    assert abs(weights["Flamethrower"] - 1.0) < 1e-9
+    assert 0 < weights["Protect"] < weights["Close Combat"] < 1
+
+    # Explicit opponent moves replace the belief
+    advisor = SwitchAdvisor(battle, [(move, 1.0 if move.name == "Flamethrower" else UNREVEALED_MOVE_WEIGHT)
+                                     for move in battle.opponent_pokemon.moves])
+    assert advisor.opponent_weights.tolist() == [1.0, UNREVEALED_MOVE_WEIGHT]
+
+    # With the active Pokemon fainted only switches are left
+    battle.set_hp("ally", 0)
+    assert all(action.kind == "switch" for action in rank_actions(battle))
+    print("✅ Moves and switches share one ranking")
+
+def test_recommendations_name_a_switch():
+    """Test that get_battle_recommendations suggests a concrete action"""
+    print("\n=== Testing Battle Recommendations ===\n")
+
+    battle = _create_battle()
+    battle.record_move_used("opponent", "Flamethrower")
+    battle.set_hp("ally", 20)
+    recommendations = get_battle_recommendations(battle)
+    assert recommendations["best_action"] is recommendations["ranked_actions"][0]
+    assert recommendations["recommendations"][0] == recommendations["best_action"].describe()
+    assert any("Swampert" in line for line in recommendations["recommendations"])
+    for line in recommendations["recommendations"]:
+        print(f"  • {line}")
+    print("✅ Recommendations name the best action")
+
+if __name__ == "__main__":
+    test_damage_matrices()
+    test_unified_ranking()
+    test_recommendations_name_a_switch()
@@ -0,0 +1,126 @@
+"""
+Test full team state, O(1) switching and BattleState cloning
+"""
+from battle.battle_state import BattleState, WeatherType
+from battle.team_state import STATUS_CONDITIONS
+from pokedata.dex import get_dex
+from pokemon import Pokemon, PokemonStats, Move
+
+def _create_teams():
+    """Create a three-Pokemon team for each side"""
+    blaziken = Pokemon("Blaziken", ["Fire", "Fighting"], PokemonStats(80, 120, 70, 110, 70, 80),
+                       [Move("Flamethrower", "Fire", 90, 100, 15, "special")], level=50)
+    swampert = Pokemon("Swampert", ["Water", "Ground"], PokemonStats(100, 110, 90, 85, 90, 60),
+                       [Move("Surf", "Water", 90, 100, 15, "special")], level=50)
+    sceptile = Pokemon("Sceptile", ["Grass"], PokemonStats(70, 85, 65, 105, 85, 120),
+                       [Move("Leaf Blade", "Grass", 90, 100, 15, "physical")], level=50)
+    charizard = Pokemon("Charizard", ["Fire", "Flying"], PokemonStats(78, 84, 78, 109, 85, 100),
+                        [Move("Air Slash", "Flying", 75, 95, 15, "special")], level=50)
+    blastoise = Pokemon("Blastoise", ["Water"], PokemonStats(79, 83, 100, 85, 105, 78),
+                        [Move("Hydro Pump", "Water", 110, 80, 5, "special")], level=50)
+    venusaur = Pokemon("Venusaur", ["Grass", "Poison"], PokemonStats(80, 82, 83, 100, 100, 80),
+                       [Move("Sludge Bomb", "Poison", 90, 100, 10, "special")], level=50)
+    return [blaziken, swampert, sceptile], [charizard, blastoise, venusaur]
+
+def test_team_switching():
+    """Test that switching is a team index change and bench HP is tracked"""
+    print("=== Testing Team State ===\n")
+
+    my_team, opponent_team = _create_teams()
+    battle = BattleState(my_team[0], opponent_team[0], my_team, opponent_team)
+
+    assert len(battle.ally_team) == 3
+    assert battle.get_bench("ally") == [1, 2]
+
+    battle.apply_damage("ally", 50, index=2)
+    assert battle.get_hp("ally", 2) == my_team[2].calculate_hp() - 50
+    assert my_team[2].current_hp == battle.get_hp("ally", 2)
+
+    battle.switch_to("ally", 1)
+    assert battle.my_pokemon is my_team[1]
+    assert battle.my_moves == my_team[1].moves
+    assert battle.ally_pokemon_history[0].pokemon is my_team[0]
+
+    # Switching to an unknown Pokemon adds it to the team
+    pikachu = Pokemon("Pikachu", ["Electric"], PokemonStats(35, 55, 40, 50, 50, 90), level=50)
+    battle.switch_pokemon(pikachu, "opponent")
+    assert battle.opponent_team.index_of(pikachu) == 3
+    assert battle.opponent_pokemon is pikachu
+
+    battle.set_hp("ally", 0, index=0)
+    battle.set_status("ally", "burned", index=2)
+    assert battle.get_bench("ally") == [2]
+    assert battle.get_status("ally", 2) == "burned"
+
+    # Status codes come from a fixed table; unknown conditions are rejected, not registered
+    conditions = STATUS_CONDITIONS
+    for status in ("confused", "sleepy"):
+        try:
+            battle.set_status("ally", status, index=2)
+            assert False, "Expected ValueError"
+        except ValueError:
+            pass
+    assert STATUS_CONDITIONS == conditions and battle.get_status("ally", 2) == "burned"
+    print(f"Ally HP: {list(battle.ally_team.hp)}, opponent team size: {len(battle.opponent_team)}")
+    print("✅ Team switching and bench tracking work")
+
+def test_switch_back_with_rebuilt_pokemon():
+    """Test that a rebuilt Pokemon of a team member's species switches into that member's slot"""
+    print("\n=== Testing Switch-Back With Rebuilt Pokemon ===\n")
+
+    dex = get_dex()
+    opponents = [dex.create_pokemon("Swampert"), dex.create_pokemon("Sceptile")]
+    battle = BattleState(dex.create_pokemon("Blaziken"), opponents[0])
+    battle.switch_pokemon(opponents[1], "opponent")
+    battle.apply_damage("opponent", 25)
+    for turn in range(10):
+        species = "Swampert" if turn % 2 == 0 else "Sceptile"
+        battle.switch_pokemon(dex.create_pokemon(species), "opponent")
+        assert battle.opponent_pokemon.name == species
+    assert len(battle.opponent_team) == 2
+    assert battle.get_hp("opponent", 1) == battle.get_max_hp("opponent", 1) - 25
+
+    # Without a species id the name is matched
+    pikachu = Pokemon("Pikachu", ["Electric"], PokemonStats(35, 55, 40, 50, 50, 90), level=50)
+    battle.switch_pokemon(pikachu, "ally")
+    battle.switch_pokemon(Pokemon("Pikachu", ["Electric"], PokemonStats(35, 55, 40, 50, 50, 90)), "ally")
+    assert len(battle.ally_team) == 2 and battle.my_pokemon is pikachu
+    print(f"✅ 10 switches with rebuilt Pokemon keep {len(battle.opponent_team)} opponent slots")
+
+def test_clone_is_independent():
+    """Test that a clone can be mutated without touching the original battle"""
+    print("\n=== Testing BattleState Clone ===\n")
+
+    my_team, opponent_team = _create_teams()
+    battle = BattleState(my_team[0], opponent_team[0], my_team, opponent_team)
+    battle.set_weather(WeatherType.RAIN, 3)
+    battle.record_move_used("opponent", "Hydro Pump")
+
+    clone = battle.clone()
+    clone.apply_damage("opponent", 40)
+    clone.set_status("ally", "paralyzed")
+    clone.switch_to("ally", 2)
+    clone.advance_turn()
+    clone.record_move_used("opponent", "Air Slash")
+
+    assert clone.get_hp("opponent") == opponent_team[0].calculate_hp() - 40
+    assert opponent_team[0].current_hp == opponent_team[0].calculate_hp()
+    assert my_team[0].status_condition is None
+    assert battle.my_pokemon is my_team[0]
+    assert battle.get_weather_info()["turns_remaining"] == 3
+    assert clone.get_weather_info()["turns_remaining"] == 2
+    assert battle.get_opponent_move_pattern()["total_moves_used"] == 1
+    assert clone.get_opponent_move_pattern()["total_moves_used"] == 2
+
+    # Clones pick up HP changes made directly on the Pokemon objects before cloning
+    opponent_team[1].take_damage(30)
+    assert battle.clone().get_hp("opponent", 1) == opponent_team[1].current_hp
+
+    history_clone = battle.clone(keep_history=True)
+    assert history_clone.opponent_move_history == battle.opponent_move_history
+    print("✅ Clones are independent of the original battle")
+
+if __name__ == "__main__":
+    test_team_switching()
+    test_switch_back_with_rebuilt_pokemon()
+    test_clone_is_independent()
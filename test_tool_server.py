@@ -0,0 +1,177 @@
+"""
+Test the battle-agent tool server
+"""
+import io
+import json
+import socket
+import threading
+import time
+from agents.tool_server import ToolServer, make_socket_server, serve_stream, INVALID_PARAMS, METHOD_NOT_FOUND
+from battle.decision_engine import recommend_move
+from battle.dict_codec import decode_battle_dict
+
+BATTLE = {
+    "my_team": [{"species": "Sceptile", "moves": ["Leaf Blade", "Dragon Claw"]},
+                {"species": "Swampert", "moves": ["Surf", "Earthquake"]}],
+    "opponent_team": [{"species": "Blaziken", "moves": ["Flamethrower", "Close Combat"]}],
+}
+
+def _call(server, method, request_id=1, **params):
+    response = server.handle({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
+    assert "error" not in response, response
+    return response["result"]
+
+def test_sessions_and_updates():
+    """Test that a session follows incremental updates and answers like recommend_move"""
+    print("=== Testing Sessions ===\n")
+
+    server = ToolServer()
+    battle_id = _call(server, "new_battle", battle=BATTLE)["battle_id"]
+    reference = decode_battle_dict(BATTLE)
+    assert _call(server, "select_move", battle_id=battle_id)["move"] == recommend_move(reference)
+
+    events = [
+        {"type": "order", "first": "opponent", "ally_move": "Leaf Blade", "opponent_move": "Flamethrower"},
+        {"type": "move", "side": "opponent", "move": "Flamethrower"},
+        {"type": "damage", "side": "ally", "amount": 90, "move": "Flamethrower"},
+        {"type": "move", "side": "ally", "move": "Leaf Blade"},
+        {"type": "damage", "side": "opponent", "amount": 40, "move": "Leaf Blade"},
+        {"type": "turn"},
+        {"type": "switch", "side": "ally", "index": 1},
+        {"type": "switch", "side": "opponent", "species": "metagross", "moves": ["Meteor Mash"]},
+        {"type": "weather", "weather": "rain", "turns": 5},
+        {"type": "screen", "side": "opponent", "effect": "Reflect", "turns": 5},
+    ]
+    assert _call(server, "update", battle_id=battle_id, events=events)["applied"] == len(events)
+    state = _call(server, "state", battle_id=battle_id)
+    assert state["turn_count"] == 1
+    assert state["current_pokemon"]["ally"]["name"] == "Swampert"
+    assert state["current_pokemon"]["opponent"]["name"] == "Metagross"
+    assert state["weather"]["type"] == "rain"
+    session_state = server.sessions[battle_id].state
+    assert session_state.get_hp("ally", 0) == session_state.get_max_hp("ally", 0) - 90
+    assert session_state.current_opponent_history.pokemon.name == "Metagross"
+
+    move = _call(server, "select_move", battle_id=battle_id)["move"]
+    assert move == recommend_move(session_state)
+    assert "Metagross" in _call(server, "report", battle_id=battle_id)["report"]
+    assert _call(server, "select_move", battle_id=battle_id, engine="mcts",
+                 options={"iterations": 50, "seed": 1})["move"] in ("Surf", "Earthquake")
+
+    # Bad input is reported as an error, not raised
+    bad = server.handle({"jsonrpc": "2.0", "id": 2, "method": "update",
+                         "params": {"battle_id": battle_id, "events": [{"type": "turn"}, {"type": "jump"}]}})
+    assert bad["error"]["code"] == INVALID_PARAMS and "Event 1" in bad["error"]["message"]
+    assert server.handle({"jsonrpc": "2.0", "id": 3, "method": "fly"})["error"]["code"] == METHOD_NOT_FOUND
+    assert server.handle({"jsonrpc": "2.0", "id": 4, "method": "new_battle",
+                          "params": {"battle": {"my_pokemon": {"species": "Missingno"}}}})["error"]["code"] == INVALID_PARAMS
+    assert server.handle({"jsonrpc": "2.0", "method": "ping"}) is None  # Notification
+
+    assert _call(server, "end_battle", battle_id=battle_id)["ended"]
+    assert server.handle({"jsonrpc": "2.0", "id": 5, "method": "state",
+                          "params": {"battle_id": battle_id}})["error"]["code"] == INVALID_PARAMS
+    print(f"✅ Session followed {len(events)} events and recommends {move}")
+
+def test_update_applies_all_or_nothing():
+    """Test that an update with a bad event leaves the battle as it was"""
+    print("\n=== Testing Update Validation ===\n")
+
+    server = ToolServer()
+    battle_id = _call(server, "new_battle", battle=BATTLE)["battle_id"]
+    state = server.sessions[battle_id].state
+    before = state.get_battle_summary()
+    bad_updates = [
+        [{"type": "move", "side": "opponent", "move": "Flamethrower"},
+         {"type": "damage", "side": "ally", "amount": "x"}],
+        [{"type": "turn"}, "turn"],
+        [{"type": "turn"}, {"type": "hp", "side": "ally", "hp": 10, "index": 5}],
+        [{"type": "switch", "side": "opponent", "species": "metagross"},
+         {"type": "switch", "side": "opponent", "species": "missingno"}],
+        [{"type": "screen", "side": "ally", "effect": f"Veil {number}"} for number in range(20)],
+        [{"type": "weather", "weather": "rain", "turns": -1}],
+        [{"type": "turn"}, {"type": "screen", "side": "ally", "effect": "Reflect", "turns": 40000}],
+        {"type": "turn"},
+    ]
+    for request_id, events in enumerate(bad_updates):
+        response = server.handle({"jsonrpc": "2.0", "id": request_id, "method": "update",
+                                  "params": {"battle_id": battle_id, "events": events}})
+        assert response["error"]["code"] == INVALID_PARAMS, response
+        assert state.get_battle_summary() == before, events
+    assert len(state.opponent_team) == 1 and not state.opponent_move_counts and not state.field.custom_screens
+
+    # Slots added earlier in the same update can be used later in it
+    events = [{"type": "switch", "side": "opponent", "species": "metagross"},
+              {"type": "hp", "side": "opponent", "hp": 50, "index": 1},
+              {"type": "switch", "side": "opponent", "index": 0}]
+    assert _call(server, "update", battle_id=battle_id, events=events)["applied"] == len(events)
+    assert state.get_hp("opponent", 1) == 50 and state.opponent_pokemon.name == "Blaziken"
+    print(f"✅ {len(bad_updates)} bad updates rejected with nothing applied")
+
+def test_stream_transport():
+    """Test line-delimited JSON-RPC, including batches and parse errors"""
+    print("\n=== Testing Stream Transport ===\n")
+
+    server = ToolServer()
+    requests = [
+        json.dumps({"jsonrpc": "2.0", "id": 1, "method": "new_battle", "params": {"battle": BATTLE, "battle_id": "a"}}),
+        json.dumps([{"jsonrpc": "2.0", "id": 2, "method": "ping"},
+                    {"jsonrpc": "2.0", "method": "update",
+                     "params": {"battle_id": "a", "events": [{"type": "turn"}]}},
+                    {"jsonrpc": "2.0", "id": 3, "method": "select_move", "params": {"battle_id": "a"}}]),
+        "{not json",
+        "",
+    ]
+    output = io.StringIO()
+    serve_stream(server, io.StringIO("\n".join(requests) + "\n"), output)
+    responses = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert responses[0]["result"]["battle_id"] == "a"
+    assert [response["id"] for response in responses[1]] == [2, 3]
+    assert responses[1][1]["result"]["move"] in ("Leaf Blade", "Dragon Claw")
+    assert responses[2]["error"]["code"] == -32700
+    assert len(responses) == 3
+    print("✅ Batches, notifications and parse errors follow JSON-RPC 2.0")
+
+def test_socket_latency():
+    """Test the TCP transport and that warm move requests are fast"""
+    print("\n=== Testing Socket Latency ===\n")
+
+    server = ToolServer()
+    server.warm_up()
+    socket_server = make_socket_server(server, 0)
+    thread = threading.Thread(target=socket_server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with socket.create_connection(socket_server.server_address) as connection:
+            stream = connection.makefile("rwb")
+
+            def call(request_id, method, **params):
+                message = {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+                stream.write((json.dumps(message) + "\n").encode("utf-8"))
+                stream.flush()
+                return json.loads(stream.readline())["result"]
+
+            call(1, "new_battle", battle=BATTLE, battle_id="live")
+            round_trips = []
+            for request_id in range(2, 52):
+                start = time.perf_counter()
+                call(request_id, "update", battle_id="live", events=[{"type": "move", "side": "opponent",
+                                                                      "move": "Flamethrower"}, {"type": "turn"}])
+                result = call(request_id, "select_move", battle_id="live")
+                round_trips.append((time.perf_counter() - start) * 1000)
+            stats = call(100, "stats")
+    finally:
+        socket_server.shutdown()
+        socket_server.server_close()
+
+    assert stats["latency"]["select_move"]["count"] == 50
+    assert result["move"] in ("Leaf Blade", "Dragon Claw")
+    round_trips.sort()
+    assert round_trips[len(round_trips) // 2] < 50
+    print(f"✅ Update + move round trip: median {round_trips[25]:.2f} ms; "
+          f"select_move p95 {stats['latency']['select_move']['p95_ms']:.2f} ms in the server")
+
+if __name__ == "__main__":
+    test_sessions_and_updates()
+    test_update_applies_all_or_nothing()
+    test_stream_transport()
+    test_socket_latency()
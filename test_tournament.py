@@ -0,0 +1,83 @@
+"""
+Test the self-play tournament harness
+"""
+from battle.battle_state import WeatherType
+from battle.decision_engine import ScoreWeights, run_search_engine
+from battle.tournament import TournamentSpec, EngineConfig, run_tournament, wilson_interval, schedule
+from test_simulator import _create_battle
+
+TEAMS = {
+    "blaziken": [{"species": "Blaziken", "moves": ["Flamethrower", "Close Combat"]},
+                 {"species": "Swampert", "moves": ["Surf", "Earthquake"]}],
+    "metagross": [{"species": "Metagross", "moves": ["Meteor Mash", "Bullet Punch"]},
+                  {"species": "Sceptile", "moves": ["Leaf Blade", "Earthquake"]}],
+}
+
+def _spec(battles=6):
+    engines = [EngineConfig("greedy"),
+               EngineConfig("no-ko", weights={"ko_bonus": 0, "near_ko_bonus": 0}),
+               EngineConfig("mcts", "mcts", options={"iterations": 16, "rollout_depth": 3})]
+    return TournamentSpec(teams=TEAMS, engines=engines, seed=3, battles_per_pairing=battles, max_turns=50)
+
+def test_wilson_interval_and_weights():
+    """Test the confidence interval and the tunable greedy weights"""
+    print("=== Testing Tournament Building Blocks ===\n")
+
+    low, high = wilson_interval(50, 100)
+    assert abs(low - 0.4038) < 1e-3 and abs(high - 0.5962) < 1e-3
+    assert wilson_interval(0, 10)[0] == 0.0
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    print(f"✅ Wilson interval for 50/100: [{low:.4f}, {high:.4f}]")
+
+    battle = _create_battle()
+    default = run_search_engine(battle, "greedy")
+    boosted = run_search_engine(battle, "greedy", weights=ScoreWeights(damage_weight=2))
+    for name, score in default.move_scores.items():
+        assert boosted.move_scores[name] >= score
+    print("✅ Greedy engine accepts ScoreWeights")
+
+def test_mirrored_state():
+    """Test that a mirrored state swaps sides"""
+    print("\n=== Testing Mirrored State ===\n")
+
+    battle = _create_battle()
+    battle.set_weather(WeatherType.RAIN, 4)
+    battle.add_screen_effect("Reflect", 3, "ally")
+    battle.set_hp("opponent", 50)
+    mirror = battle.mirrored()
+    assert mirror.my_pokemon.name == battle.opponent_pokemon.name
+    assert mirror.get_hp("ally") == 50
+    assert mirror.has_screen_active("Reflect", "opponent")
+    assert not mirror.has_screen_active("Reflect", "ally")
+    assert mirror.weather_type == WeatherType.RAIN
+    assert battle.get_hp("opponent") == 50 and battle.has_screen_active("Reflect", "ally")
+    assert mirror.mirrored().state_key() == battle.state_key()
+    print("✅ Teams, HP and screens swap sides; the original is untouched")
+
+def test_tournament_runs_and_is_seeded():
+    """Test scheduling, side swapping and reproducible results across worker counts"""
+    print("\n=== Testing Tournament ===\n")
+
+    spec = _spec()
+    tasks = schedule(spec)
+    # 3 pairings x 2 matchups x 6 battles, each engine on each side equally often
+    assert len(tasks) == 36
+    assert sum(1 for task in tasks if task[4] == task[1]) == 18
+
+    report = run_tournament(spec, workers=1)
+    assert report.battles == 36
+    for stats in report.pairings:
+        assert stats.wins + stats.losses + stats.draws == stats.battles == 12
+    latency = report.latency_summary()
+    assert all(latency[name]["decisions"] > 0 for name in ("greedy", "no-ko", "mcts"))
+    print(report.format_table())
+
+    parallel = run_tournament(spec, workers=2)
+    assert [(r.battle_id, r.winner, r.turns) for r in parallel.records] == \
+           [(r.battle_id, r.winner, r.turns) for r in report.records]
+    print("\n✅ Results are identical with 1 and 2 workers")
+
+if __name__ == "__main__":
+    test_wilson_interval_and_weights()
+    test_mirrored_state()
+    test_tournament_runs_and_is_seeded()
@@ -0,0 +1,161 @@
+"""
+Test the streaming usage ingester and the memory-mapped usage index
+"""
+import gzip
+import os
+import tempfile
+from battle.battle_state import BattleState
+from battle.battle_utils import BattleStateAnalyzer
+from pokedata.dex import get_dex
+from pokedata.usage_ingest import (UsageIngester, UsageIndex, build_usage_index, iter_teams,
+                                   MOVE, ITEM, TEAMMATE)
+
+BATTLE_LOG = """|j|Alice
+|player|p1|Alice|
+|player|p2|Bob|
+|poke|p1|Garchomp, L50, M|
+|poke|p1|Metagross, L50|
+|poke|p2|Swampert, L50, F|
+|poke|p2|Gengar, L50|
+|start
+|switch|p1a: Chompy|Garchomp, L50, M|100/100
+|switch|p2a: Swampert|Swampert, L50, F|100/100
+|turn|1
+|move|p1a: Chompy|Earthquake|p2a: Swampert
+|-damage|p2a: Swampert|60/100
+|move|p2a: Swampert|Ice Beam|p1a: Chompy
+|-damage|p1a: Chompy|0 fnt
+|-damage|p2a: Swampert|50/100|[from] item: Rocky Helmet|[of] p1a: Chompy
+|faint|p1a: Chompy
+|switch|p1a: Metagross|Metagross, L50|100/100
+|-heal|p2a: Swampert|56/100|[from] item: Leftovers
+|turn|2
+|move|p1a: Metagross|Meteor Mash|p2a: Swampert
+|-ability|p2a: Swampert|Torrent
+|move|p2a: Swampert|Earthquake|p1a: Metagross
+|win|Bob
+|switch|p1a: Swampert|Swampert, L50|100/100
+|switch|p2a: Ghost|Gengar, L50|100/100
+|move|p1a: Swampert|Stealth Rock|p2a: Ghost
+|move|p2a: Ghost|Shadow Ball|p1a: Swampert
+|-enditem|p1a: Swampert|Sitrus Berry|[eat]
+|win|Alice
+"""
+
+TEAM_EXPORT = """=== [gen9] Sand ===
+
+Garchomp @ Choice Scarf
+Ability: Rough Skin
+Jolly Nature
+- Earthquake
+- Outrage
+- Stone Edge
+- Fire Blast
+
+Tank (Swampert) (M) @ Leftovers
+Ability: Torrent
+- Earthquake
+- Scald
+- Stealth Rock
+- Toxic
+
+=== [gen9] Ghosts ===
+
+Gengar @ Life Orb
+Ability: Cursed Body
+- Shadow Ball
+- Sludge Bomb
+"""
+
+def _write_corpus(directory):
+    with open(os.path.join(directory, "battles.log"), "w") as f:
+        f.write(BATTLE_LOG)
+    with gzip.open(os.path.join(directory, "teams.txt.gz"), "wt") as f:
+        f.write(TEAM_EXPORT)
+
+def test_parsing():
+    """Test that battle logs and team exports yield one record per team"""
+    print("=== Testing Corpus Parsing ===\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        _write_corpus(directory)
+        battle_teams = list(iter_teams(os.path.join(directory, "battles.log")))
+        export_teams = list(iter_teams(os.path.join(directory, "teams.txt.gz")))
+
+    # Two battles with two teams each; three teams in the export
+    assert len(battle_teams) == 4
+    assert len(export_teams) == 2
+    first, second = battle_teams[0].members, battle_teams[1].members
+    assert set(first) == {"Garchomp", "Metagross"}
+    assert first["Garchomp"]["moves"] == {"Earthquake"}
+    assert first["Garchomp"]["item"] == "Rocky Helmet"
+    assert second["Swampert"]["item"] == "Leftovers"
+    assert second["Swampert"]["ability"] == "Torrent"
+    assert second["Swampert"]["moves"] == {"Ice Beam", "Earthquake"}
+    assert battle_teams[2].members["Swampert"]["item"] == "Sitrus Berry"
+    sand = export_teams[0].members
+    assert sand["Swampert"] == {"moves": {"Earthquake", "Scald", "Stealth Rock", "Toxic"},
+                                "item": "Leftovers", "ability": "Torrent"}
+    assert sand["Garchomp"]["item"] == "Choice Scarf" and len(sand["Garchomp"]["moves"]) == 4
+    print("✅ Battle logs (items, abilities, [from]/[of] tags) and team exports parse")
+
+def test_index_queries():
+    """Test counts, frequencies and top lists from the memory-mapped index"""
+    print("\n=== Testing Usage Index ===\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        _write_corpus(directory)
+        path = os.path.join(directory, "usage.bin")
+        teams = build_usage_index([directory], path)
+        assert teams == 6
+
+        with UsageIndex(path) as usage:
+            assert usage.teams == 6
+            assert usage.species_count("Swampert") == 3
+            assert usage.count(MOVE, "Swampert", "Earthquake") == 2
+            assert abs(usage.move_frequency("swampert", "earthquake") - 2 / 3) < 1e-9
+            assert usage.item_frequency("Swampert", "Leftovers") == 2 / 3
+            assert usage.ability_frequency("Garchomp", "Rough Skin") == 0.5
+            assert usage.teammate_frequency("Garchomp", "Metagross") == 0.5
+            assert usage.move_frequency("Swampert", "Flamethrower") == 0.0
+            assert usage.species_count("Pikachu") == 0
+
+            top_moves = usage.top(MOVE, "Swampert")
+            assert top_moves[0] == ("Earthquake", 2 / 3)
+            assert {name for name, _ in usage.top(TEAMMATE, "Swampert")} == {"Garchomp", "Gengar"}
+            assert usage.top(ITEM, "Swampert", 1) == [("Leftovers", 2 / 3)]
+            print(f"Swampert moves: {top_moves}")
+
+            # The analyzer queries the index for the opponent's species
+            dex = get_dex()
+            opponent_team = [dex.create_pokemon("Swampert", move_names=["Earthquake"]),
+                             dex.create_pokemon("Gengar", move_names=["Shadow Ball"])]
+            battle = BattleState(dex.create_pokemon("Garchomp", move_names=["Earthquake"]), opponent_team[0],
+                                 opponent_team=opponent_team)
+            battle.record_move_used("opponent", "Earthquake")
+            profile = BattleStateAnalyzer(battle).get_opponent_usage_profile(usage=usage)
+            assert profile["available"] and profile["teams"] == 3
+            assert "Earthquake" not in [name for name, _ in profile["unrevealed_moves"]]
+            assert profile["abilities"] == [("Torrent", 2 / 3)]
+            assert [name for name, _ in profile["unseen_teammates"]] == ["Garchomp"]
+    print("✅ Index answers counts, frequencies and top lists by hash probe")
+
+def test_ingester_memory_is_bounded():
+    """Test that repeating the corpus grows counts, not the number of keys"""
+    print("\n=== Testing Streaming Ingestion ===\n")
+
+    with tempfile.TemporaryDirectory() as directory:
+        _write_corpus(directory)
+        ingester = UsageIngester()
+        ingester.ingest([directory])
+        keys = len(ingester.counts)
+        for _ in range(50):
+            ingester.ingest([directory])
+        assert len(ingester.counts) == keys
+        assert ingester.teams == 51 * 6
+    print(f"✅ {ingester.teams} teams ingested into {keys} counters")
+
+if __name__ == "__main__":
+    test_parsing()
+    test_index_queries()
+    test_ingester_memory_is_bounded()
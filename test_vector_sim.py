@@ -0,0 +1,81 @@
+"""
+Test the vectorized multi-battle simulator against the scalar simulator
+"""
+from battle.battle_state import WeatherType
+from battle.simulator import BattleSimulator, random_policy
+from battle.vector_sim import VectorBattles, greedy_vector_policy
+from test_simulator import _create_battle
+
+def test_vector_damage_matches_simulator():
+    """Test that every roll of every move matches BattleSimulator.move_damage"""
+    print("=== Testing Vectorized Damage ===\n")
+
+    plain = _create_battle()
+    sunny = _create_battle()
+    sunny.set_weather(WeatherType.SUN, 5)
+    sunny.add_screen_effect("Light Screen", 3, "ally")
+    sandy = _create_battle()
+    sandy.set_weather(WeatherType.SANDSTORM, 5)
+    sandy.add_screen_effect("Reflect", 3, "opponent")
+    sandy.set_status("ally", "burned")
+    states = [plain, sunny, sandy]
+
+    battles = VectorBattles(states, seed=1)
+    simulator = BattleSimulator()
+    checked = 0
+    for side, side_name in enumerate(("ally", "opponent")):
+        for slot in range(battles.move_slots):
+            for critical in (False, True):
+                damage = battles.move_damage(side, slot, critical)
+                for b, state in enumerate(states):
+                    pokemon = state.my_pokemon if side == 0 else state.opponent_pokemon
+                    expected = simulator.move_damage(state, side_name, pokemon.moves[slot], critical)
+                    assert tuple(damage[b].tolist()) == expected
+                    checked += 1
+    print(f"✅ {checked} move/roll tables match the scalar simulator")
+
+def test_vector_turns():
+    """Test turn order, fainting and replacement across battles at once"""
+    print("\n=== Testing Vectorized Turns ===\n")
+
+    speed_order = _create_battle().clone()
+    speed_order.set_hp("ally", 1)
+    speed_order.set_hp("opponent", 1)
+    battles = VectorBattles([speed_order, speed_order], seed=1, crit_chance=0)
+    # Battle 0: Flamethrower vs Meteor Mash (faster side wins); battle 1: Flamethrower vs Bullet Punch (priority)
+    battles.step([0, 0], [0, 1])
+    assert battles.hp[0, 1, 0] == 0 and battles.hp[0, 0, 0] == 1
+    assert battles.active[0, 1] == 1 and battles.active[0, 0] == 0
+    assert battles.hp[1, 0, 0] == 0 and battles.hp[1, 1, 0] == 1
+    assert battles.active[1, 0] == 1
+    assert battles.turn.tolist() == [1, 1]
+    print("✅ Speed and priority order, fainting and replacement resolve per battle")
+
+def test_vector_battles_match_scalar_win_rate():
+    """Test that whole battles are reproducible and agree with the scalar simulator's win rate"""
+    print("\n=== Testing Vectorized Battles ===\n")
+
+    battle = _create_battle()
+    count = 2000
+    first = VectorBattles.repeat(battle, count, seed=7)
+    result = first.run()
+    second = VectorBattles.repeat(battle, count, seed=7)
+    assert (second.run()["winner"] == result["winner"]).all()
+    assert first.done.all()
+
+    simulator = BattleSimulator(seed=7)
+    scalar_wins = sum(simulator.run_battle(battle, random_policy, random_policy).winner == "ally"
+                      for _ in range(count)) / count
+    vector_wins = first.win_rates()["ally"]
+    print(f"Ally win rate: vector {vector_wins:.3f}, scalar {scalar_wins:.3f}")
+    assert abs(vector_wins - scalar_wins) < 0.06
+
+    greedy = VectorBattles.repeat(battle, 100, seed=7)
+    greedy.run(greedy_vector_policy, greedy_vector_policy)
+    assert greedy.done.all()
+    print("✅ Vectorized battles are seeded and agree with the scalar simulator")
+
+if __name__ == "__main__":
+    test_vector_damage_matches_simulator()
+    test_vector_turns()
+    test_vector_battles_match_scalar_win_rate()
@@ -1,3 +1,4 @@
+import numpy as np
 from utils.type_effectiveness import get_multiplier
 
 # Damage calculator for physical moves
@@ -148,4 +149,64 @@ def calculate_special_damage(attacker, defender, move, random_multiplier = 1.0,
     # Calculate base damage
     base_damage = ((((2*level / 5 + 2) * power * attacker_stat / defender_stat) / 50) * burn_multiplier * screen_multiplier * num_targets * weather_multiplier * flash_fire_multiplier + 2) * stockpile_multiplier * crit_multiplier * double_damage_multiplier * charge_multiplier * helping_hand_multiplier * STAB_multiplier * type_effectiveness_multiplier * random_multiplier
 
-    return max(0, int(base_damage))
\ No newline at end of file
+    return max(0, int(base_damage))
+
+
+# Array form of the damage formula shared by the batched and vectorized calculators
+def damage_formula(levels, powers, attacker_stats, defender_stats, stab, effectiveness, random_multiplier):
+    """
+    Damage before truncation for numpy arrays of inputs.
+    Operations are applied in the same order as the scalar formula (the multipliers
+    fixed at 1 there are exact no-ops), so truncating gives identical results.
+    """
+    base_damage = 2 * levels / 5 + 2
+    base_damage = base_damage * powers * attacker_stats / defender_stats / 50 + 2
+    return base_damage * stab * effectiveness * random_multiplier
+
+
+# Batched damage for many (attacker, defender, move) triples at once
+def calculate_damage_batch(triples, random_multiplier = 1.0):
+    """
+    Calculate damage for a list of (attacker, defender, move) triples with one vectorized pass.
+    Gives the same results as calculate_physical_damage / calculate_special_damage:
+    the formula is applied in the same order so the floating point rounding matches.
+    Status moves deal 0 damage. Returns an int64 numpy array.
+    """
+    if random_multiplier < 0.85 or random_multiplier > 1:
+        raise ValueError("Random multiplier must be between 0.85 and 1")
+
+    count = len(triples)
+    levels = np.ones(count)
+    powers = np.zeros(count)
+    attacker_stats = np.ones(count)
+    defender_stats = np.ones(count)
+    stab = np.ones(count)
+    effectiveness = np.ones(count)
+    effectiveness_cache = {}
+
+    for index, (attacker, defender, move) in enumerate(triples):
+        if not move.power:
+            continue
+        damage_class = move.damage_class.lower()
+        if damage_class == 'physical':
+            attacker_stats[index] = attacker.attack
+            defender_stats[index] = defender.defense
+        elif damage_class == 'special':
+            attacker_stats[index] = attacker.special_attack
+            defender_stats[index] = defender.special_defense
+        else:
+            continue
+        levels[index] = attacker.level
+        powers[index] = move.power
+        if move.type in attacker.types:
+            stab[index] = 1.5
+        key = (move.type, tuple(defender.types))
+        multiplier = effectiveness_cache.get(key)
+        if multiplier is None:
+            multiplier = effectiveness_cache[key] = get_multiplier(move.type, defender.types)
+        effectiveness[index] = multiplier
+
+    base_damage = damage_formula(levels, powers, attacker_stats, defender_stats, stab, effectiveness, random_multiplier)
+    damage = np.maximum(0, np.trunc(base_damage)).astype(np.int64)
+    damage[powers == 0] = 0
+    return damage
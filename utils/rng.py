@@ -0,0 +1,76 @@
+"""
+Deterministic, splittable random number streams.
+
+A stream is named by a path of keys under a root seed, e.g.
+(root seed, "battle", 1234, "damage"). The path is hashed into the
+stream's seed, so a stream never depends on how much any other stream
+has drawn or on which process created it. Any battle of a parallel run
+can be replayed bit-for-bit from (root seed, battle id), whatever the
+worker count.
+"""
+import hashlib
+import random
+from typing import Dict, Hashable, Tuple
+import numpy as np
+
+# Streams a simulated battle draws from
+TURN_STREAM = "turns"        # Speed ties, accuracy and critical hits
+DAMAGE_STREAM = "damage"     # Damage rolls
+POLICY_STREAM = "policy"     # Move choices, including search engine seeds
+SEARCH_STREAM = "search"     # Search engines' own randomness (rollouts)
+
+
+def derive_seed(root_seed: int, *keys: Hashable) -> int:
+    """64-bit seed for the stream at root_seed/keys"""
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(repr((int(root_seed),) + keys).encode("utf-8"))
+    return int.from_bytes(digest.digest(), "little")
+
+
+class RngStreams:
+    """
+    Tree of named random streams under one root seed.
+    Streams are created on first use and cached, so asking for the same
+    name twice continues the same sequence.
+    """
+
+    def __init__(self, root_seed: int = 0, path: Tuple[Hashable, ...] = ()):
+        self.root_seed = int(root_seed)
+        self.path = tuple(path)
+        self._streams: Dict[Hashable, random.Random] = {}
+
+    def split(self, *keys: Hashable) -> 'RngStreams':
+        """Independent child tree below this one"""
+        return RngStreams(self.root_seed, self.path + keys)
+
+    def battle(self, battle_id: int) -> 'RngStreams':
+        """Streams of one battle"""
+        return self.split("battle", battle_id)
+
+    def worker(self, worker_id: int) -> 'RngStreams':
+        """Streams of one worker (e.g. a root-parallel search tree)"""
+        return self.split("worker", worker_id)
+
+    def seed(self, name: Hashable) -> int:
+        """Seed of the named stream"""
+        return derive_seed(self.root_seed, *self.path, name)
+
+    def stream(self, name: Hashable) -> random.Random:
+        """The named stream (created on first use)"""
+        rng = self._streams.get(name)
+        if rng is None:
+            rng = random.Random(self.seed(name))
+            self._streams[name] = rng
+        return rng
+
+    def numpy(self, name: Hashable) -> np.random.Generator:
+        """A fresh numpy generator seeded like the named stream"""
+        return np.random.default_rng(self.seed(name))
+
+    def __repr__(self) -> str:
+        return f"RngStreams(root_seed={self.root_seed}, path={self.path!r})"
+
+
+def battle_streams(root_seed: int, battle_id: int) -> RngStreams:
+    """Streams of battle battle_id in a run seeded with root_seed"""
+    return RngStreams(root_seed).battle(battle_id)